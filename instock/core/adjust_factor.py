@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+__author__ = 'myh '
+__date__ = '2026/10/18 '
+
+# 不复权K线 + 复权因子，读取时计算前复权/后复权。
+# 东方财富不复权K线的 涨跌额 是相对交易所公布的前收盘价（除权除息参考价）计算的，
+# 因此 收盘价 - 涨跌额 就是当日的参考前收盘价；它与上一根K线收盘价不一致的那天就是除权除息日，
+# 比例 参考前收盘价 / 上一日收盘价 即当次的复权比例，不需要另外抓取分红送转数据。
+# 因子采用后复权累计因子（第一根K线为 1），每次除权除息在当天除以该比例：
+#   后复权价 = 不复权价 × 因子
+#   前复权价 = 不复权价 × 因子 / 最后一根K线的因子
+# 历史不复权价格不会因为新的除权除息变化，增量抓取只需在末尾追加K线和因子。
+FACTOR_COLUMN = 'factor'
+# 随复权变化的价格列，成交量、成交额、振幅、涨跌幅、换手率不变
+PRICE_COLUMNS = ('open', 'close', 'high', 'low', 'ups_downs')
+# 价格最小变动单位 0.001（ETF），参考前收盘价与上一日收盘价相差超过半个单位视为除权除息
+_TOLERANCE = 0.0005
+
+
+def ex_ratios(close, ups_downs, prev_close=None):
+    """
+    每根K线的复权比例（参考前收盘价 / 上一日收盘价），非除权除息日为 1。
+    :param prev_close: 第一根K线之前一日的收盘价，没有时第一根比例为 1
+    """
+    close = np.asarray(close, dtype=np.float64)
+    ups_downs = np.asarray(ups_downs, dtype=np.float64)
+    ratios = np.ones(len(close), dtype=np.float64)
+    if len(close) == 0:
+        return ratios
+    prev = np.empty(len(close), dtype=np.float64)
+    prev[0] = np.nan if prev_close is None else prev_close
+    prev[1:] = close[:-1]
+    ref_prev = close - ups_downs
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = ref_prev / prev
+    ex = (np.abs(ref_prev - prev) > _TOLERANCE) & (prev > 0) & (ref_prev > 0) & np.isfinite(ratio)
+    ratios[ex] = ratio[ex]
+    return ratios
+
+
+def factors(close, ups_downs, base=1.0, prev_close=None):
+    """后复权累计因子；base 为上一根K线的因子，用于在已有历史后追加"""
+    return base / np.cumprod(ex_ratios(close, ups_downs, prev_close))
+
+
+def with_factors(stock, base=1.0, prev_close=None):
+    """在不复权K线上加上因子列"""
+    stock[FACTOR_COLUMN] = factors(stock['close'].values, stock['ups_downs'].values, base, prev_close)
+    return stock
+
+
+def apply_adjust(stock, adjust='qfq'):
+    """
+    由不复权K线和因子列计算复权价格，返回不含因子列的新 DataFrame。
+    :param adjust: 'qfq' 前复权，'hfq' 后复权，'' 不复权
+    """
+    data = stock.drop(columns=[FACTOR_COLUMN])
+    if len(data.index) == 0 or not adjust:
+        return data
+    factor = stock[FACTOR_COLUMN].values
+    if adjust == 'qfq':
+        factor = factor / factor[-1]
+    elif adjust != 'hfq':
+        raise ValueError(f"不支持的复权方式：{adjust}")
+    for col in PRICE_COLUMNS:
+        data[col] = data[col].values * factor
+    return data
+
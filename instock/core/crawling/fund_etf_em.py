@@ -5,14 +5,12 @@ Date: 2023/1/4 12:18
 Desc: 东方财富-ETF 行情
 https://quote.eastmoney.com/sh513500.html
 """
-import random
-import time
 from functools import lru_cache
-import math
 import logging
 import pandas as pd
 import requests
-from instock.core.eastmoney_fetcher import eastmoney_fetcher
+from instock.core.eastmoney_fetcher import eastmoney_fetcher, PAGING_CLIST
+from instock.core.kline_parser import kline_frame
 from instock.core.singleton_proxy import proxys
 
 def fetch_popular_stocks_sorted() -> pd.DataFrame:
@@ -89,26 +87,10 @@ def fund_etf_spot_em() -> pd.DataFrame:
         "fields": "f1,f2,f3,f4,f5,f6,f7,f8,f9,f10,f12,f13,f14,f15,f16,f17,f18,f20,f21,f23,f24,f25,f22,f11,f62,f128,f136,f115,f152",
         "_": "1672806290972",
     }
-    r =  fetcher.make_request(url, params=params)
-    data_json = r.json()
-
-    data = data_json["data"]["diff"]
+    data = fetcher.fetch_all_pages(url, params, paging=PAGING_CLIST)
     if not data:
         return pd.DataFrame()
 
-    data_count = data_json["data"]["total"]
-    page_count = math.ceil(data_count/page_size)
-    while page_count > 1:
-        # 添加随机延迟，避免爬取过快
-        time.sleep(random.uniform(1, 1.5))
-        page_current = page_current + 1
-        params["pn"] = page_current
-        r =  fetcher.make_request(url, params=params)
-        data_json = r.json()
-        _data = data_json["data"]["diff"]
-        data.extend(_data)
-        page_count =page_count - 1
-
     temp_df = pd.DataFrame(data)
     temp_df.rename(
         columns={
@@ -233,8 +215,7 @@ def fund_etf_hist_em(
     data_json = r.json()
     if not (data_json["data"] and data_json["data"]["klines"]):
         return pd.DataFrame()
-    temp_df = pd.DataFrame([item.split(",") for item in data_json["data"]["klines"]])
-    temp_df.columns = [
+    temp_df = kline_frame(data_json["data"]["klines"], [
         "日期",
         "开盘",
         "收盘",
@@ -246,20 +227,7 @@ def fund_etf_hist_em(
         "涨跌幅",
         "涨跌额",
         "换手率",
-    ]
-    temp_df.index = pd.to_datetime(temp_df["日期"])
-    temp_df.reset_index(inplace=True, drop=True)
-
-    temp_df["开盘"] = pd.to_numeric(temp_df["开盘"])
-    temp_df["收盘"] = pd.to_numeric(temp_df["收盘"])
-    temp_df["最高"] = pd.to_numeric(temp_df["最高"])
-    temp_df["最低"] = pd.to_numeric(temp_df["最低"])
-    temp_df["成交量"] = pd.to_numeric(temp_df["成交量"])
-    temp_df["成交额"] = pd.to_numeric(temp_df["成交额"])
-    temp_df["振幅"] = pd.to_numeric(temp_df["振幅"])
-    temp_df["涨跌幅"] = pd.to_numeric(temp_df["涨跌幅"])
-    temp_df["涨跌额"] = pd.to_numeric(temp_df["涨跌额"])
-    temp_df["换手率"] = pd.to_numeric(temp_df["换手率"])
+    ])
     return temp_df
 
 
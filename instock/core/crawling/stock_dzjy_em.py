@@ -5,11 +5,9 @@ Date: 2022/5/16 15:31
 Desc: 东方财富网-数据中心-大宗交易-市场统计
 http://data.eastmoney.com/dzjy/dzjy_sctj.aspx
 """
-import random
-import time
 
 import pandas as pd
-from instock.core.eastmoney_fetcher import eastmoney_fetcher
+from instock.core.eastmoney_fetcher import eastmoney_fetcher, collect, PAGING_DATACENTER
 
 __author__ = 'myh '
 __date__ = '2025/12/31 '
@@ -35,18 +33,7 @@ def stock_dzjy_sctj() -> pd.DataFrame:
         'source': 'WEB',
         'client': 'WEB',
     }
-    r = fetcher.make_request(url, params=params)
-    data_json = r.json()
-    total_page = int(data_json['result']["pages"])
-    big_df = pd.DataFrame()
-    for page in range(1, total_page+1):
-        # 添加随机延迟，避免爬取过快
-        time.sleep(random.uniform(1, 1.5))
-        params.update({'pageNumber': page})
-        r = fetcher.make_request(url, params=params)
-        data_json = r.json()
-        temp_df = pd.DataFrame(data_json['result']["data"])
-        big_df = pd.concat([big_df, temp_df], ignore_index=True)
+    big_df = collect(fetcher.iter_pages(url, params, paging=PAGING_DATACENTER))
 
     big_df.reset_index(inplace=True)
     big_df['index'] = big_df['index'] + 1
@@ -103,11 +90,9 @@ def stock_dzjy_mrmx(symbol: str = '基金', start_date: str = '20220104', end_da
         'client': 'WEB',
         'filter': f"""(SECURITY_TYPE_WEB={symbol_map[symbol]})(TRADE_DATE>='{'-'.join([start_date[:4], start_date[4:6], start_date[6:]])}')(TRADE_DATE<='{'-'.join([end_date[:4], end_date[4:6], end_date[6:]])}')"""
     }
-    r = fetcher.make_request(url, params=params)
-    data_json = r.json()
-    if not data_json['result']["data"]:
+    temp_df = collect(fetcher.iter_pages(url, params, paging=PAGING_DATACENTER))
+    if temp_df.empty:
         return pd.DataFrame()
-    temp_df = pd.DataFrame(data_json['result']["data"])
     temp_df.reset_index(inplace=True)
     temp_df['index'] = temp_df.index + 1
     if symbol in {'A股'}:
@@ -220,9 +205,9 @@ def stock_dzjy_mrtj(start_date: str = '20220105', end_date: str = '20220105') ->
         'client': 'WEB',
         'filter': f"(TRADE_DATE>='{'-'.join([start_date[:4], start_date[4:6], start_date[6:]])}')(TRADE_DATE<='{'-'.join([end_date[:4], end_date[4:6], end_date[6:]])}')"
     }
-    r = fetcher.make_request(url, params=params)
-    data_json = r.json()
-    temp_df = pd.DataFrame(data_json['result']["data"])
+    temp_df = collect(fetcher.iter_pages(url, params, paging=PAGING_DATACENTER))
+    if temp_df.empty:
+        return pd.DataFrame()
     temp_df.reset_index(inplace=True)
     temp_df['index'] = temp_df.index + 1
     temp_df.columns = [
@@ -297,18 +282,7 @@ def stock_dzjy_hygtj(symbol: str = '近三月') -> pd.DataFrame:
         'client': 'WEB',
         'filter': f'(DATE_TYPE_CODE={period_map[symbol]})',
     }
-    r = fetcher.make_request(url, params=params)
-    data_json = r.json()
-    total_page = data_json['result']["pages"]
-    big_df = pd.DataFrame()
-    for page in range(1, int(total_page)+1):
-        # 添加随机延迟，避免爬取过快
-        time.sleep(random.uniform(1, 1.5))
-        params.update({"pageNumber": page})
-        r = fetcher.make_request(url, params=params)
-        data_json = r.json()
-        temp_df = pd.DataFrame(data_json['result']["data"])
-        big_df = pd.concat([big_df, temp_df], ignore_index=True)
+    big_df = collect(fetcher.iter_pages(url, params, paging=PAGING_DATACENTER))
 
     big_df.reset_index(inplace=True)
     big_df['index'] = big_df.index + 1
@@ -394,18 +368,7 @@ def stock_dzjy_hyyybtj(symbol: str = '近3日') -> pd.DataFrame:
         'client': 'WEB',
         'filter': f'(N_DATE=-{period_map[symbol]})',
     }
-    r = fetcher.make_request(url, params=params)
-    data_json = r.json()
-    total_page = data_json['result']["pages"]
-    big_df = pd.DataFrame()
-    for page in range(1, int(total_page)+1):
-        # 添加随机延迟，避免爬取过快
-        time.sleep(random.uniform(1, 1.5))
-        params.update({"pageNumber": page})
-        r = fetcher.make_request(url, params=params)
-        data_json = r.json()
-        temp_df = pd.DataFrame(data_json['result']["data"])
-        big_df = pd.concat([big_df, temp_df], ignore_index=True)
+    big_df = collect(fetcher.iter_pages(url, params, paging=PAGING_DATACENTER))
 
     big_df.reset_index(inplace=True)
     big_df['index'] = big_df.index + 1
@@ -469,18 +432,7 @@ def stock_dzjy_yybph(symbol: str = '近三月') -> pd.DataFrame:
         'client': 'WEB',
         'filter': f'(N_DATE=-{period_map[symbol]})',
     }
-    r = fetcher.make_request(url, params=params)
-    data_json = r.json()
-    total_page = data_json['result']["pages"]
-    big_df = pd.DataFrame()
-    for page in range(1, int(total_page)+1):
-        # 添加随机延迟，避免爬取过快
-        time.sleep(random.uniform(1, 1.5))
-        params.update({"pageNumber": page})
-        r = fetcher.make_request(url, params=params)
-        data_json = r.json()
-        temp_df = pd.DataFrame(data_json['result']["data"])
-        big_df = pd.concat([big_df, temp_df], ignore_index=True)
+    big_df = collect(fetcher.iter_pages(url, params, paging=PAGING_DATACENTER))
 
     big_df.reset_index(inplace=True)
     big_df['index'] = big_df.index + 1
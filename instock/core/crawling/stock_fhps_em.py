@@ -5,12 +5,9 @@ Date: 2023/4/7 15:22
 Desc: 东方财富网-数据中心-年报季报-分红送配
 https://data.eastmoney.com/yjfp/
 """
-import random
-import time
 
 import pandas as pd
-from tqdm import tqdm
-from instock.core.eastmoney_fetcher import eastmoney_fetcher
+from instock.core.eastmoney_fetcher import eastmoney_fetcher, collect, PAGING_DATACENTER
 
 __author__ = 'myh '
 __date__ = '2025/12/31 '
@@ -46,19 +43,7 @@ def stock_fhps_em(date: str = "20231231") -> pd.DataFrame:
         "filter": f"""(REPORT_DATE='{"-".join([date[:4], date[4:6], date[6:]])}')""",
     }
 
-    r = fetcher.make_request(url, params=params)
-    data_json = r.json()
-    total_pages = int(data_json["result"]["pages"])
-    big_df = pd.DataFrame()
-    for page in tqdm(range(1, total_pages + 1), leave=False):
-        # 添加随机延迟，避免爬取过快
-        time.sleep(random.uniform(1, 1.5))
-        params.update({"pageNumber": page})
-        r = fetcher.make_request(url, params=params)
-        data_json = r.json()
-        temp_df = pd.DataFrame(data_json["result"]["data"])
-        if not temp_df.empty:
-            big_df = pd.concat(objs=[big_df, temp_df], ignore_index=True)
+    big_df = collect(fetcher.iter_pages(url, params, paging=PAGING_DATACENTER))
 
     big_df.columns = [
         "_",
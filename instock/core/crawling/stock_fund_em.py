@@ -6,11 +6,10 @@ Desc: 东方财富网-数据中心-资金流向
 https://data.eastmoney.com/zjlx/detail.html
 """
 import json
-import random
 import time
 import math
 import pandas as pd
-from instock.core.eastmoney_fetcher import eastmoney_fetcher
+from instock.core.eastmoney_fetcher import eastmoney_fetcher, PAGING_CLIST
 
 __author__ = 'myh '
 __date__ = '2025/12/31 '
@@ -60,21 +59,7 @@ def stock_individual_fund_flow_rank(indicator: str = "5日") -> pd.DataFrame:
         "fs": "m:0+t:6+f:!2,m:0+t:13+f:!2,m:0+t:80+f:!2,m:1+t:2+f:!2,m:1+t:23+f:!2,m:0+t:7+f:!2,m:1+t:3+f:!2",
         "fields": indicator_map[indicator][1],
     }
-    r = fetcher.make_request(url, params=params)
-    data_json = r.json()
-    data = data_json["data"]["diff"]
-    data_count = data_json["data"]["total"]
-    page_count = math.ceil(data_count/page_size)
-    while page_count > 1:
-        # 添加随机延迟，避免爬取过快
-        time.sleep(random.uniform(1, 1.5))
-        page_current = page_current + 1
-        params["pn"] = page_current
-        r = fetcher.make_request(url, params=params)
-        data_json = r.json()
-        _data = data_json["data"]["diff"]
-        data.extend(_data)
-        page_count =page_count - 1
+    data = fetcher.fetch_all_pages(url, params, paging=PAGING_CLIST)
 
     temp_df = pd.DataFrame(data)
     temp_df = temp_df[~temp_df["f2"].isin(["-"])]
@@ -296,8 +281,6 @@ def stock_sector_fund_flow_rank(
     data_count = data_json["data"]["total"]
     page_count = math.ceil(data_count/page_size)
     while page_count > 1:
-        # 添加随机延迟，避免爬取过快
-        time.sleep(random.uniform(1, 1.5))
         page_current = page_current + 1
         params["pn"] = page_current
         r = fetcher.make_request(url, params=params)
@@ -5,13 +5,11 @@ Date: 2022/6/19 15:26
 Desc: 东方财富网-行情首页-沪深京 A 股
 """
 #%%
-import random
-import time
-
 import pandas as pd
-import math
 from functools import lru_cache
-from instock.core.eastmoney_fetcher import eastmoney_fetcher
+from instock.core.eastmoney_fetcher import eastmoney_fetcher, PAGING_CLIST
+from instock.core.kline_parser import kline_frame
+import instock.core.ref_cache as ref_cache
 
 __author__ = 'myh '
 __date__ = '2025/12/31 '
@@ -42,25 +40,10 @@ def stock_zh_a_spot_em() -> pd.DataFrame:
         "fields": "f2,f3,f4,f5,f6,f7,f8,f9,f10,f11,f12,f14,f15,f16,f17,f18,f20,f21,f22,f23,f24,f25,f26,f37,f38,f39,f40,f41,f45,f46,f48,f49,f57,f61,f100,f112,f113,f114,f115,f221",
         "_": "1623833739532",
     }
-    r =  fetcher.make_request(url, params=params)
-    data_json = r.json()
-    data = data_json["data"]["diff"]
+    data = fetcher.fetch_all_pages(url, params, paging=PAGING_CLIST)
     if not data:
         return pd.DataFrame()
 
-    data_count = data_json["data"]["total"]
-    page_count = math.ceil(data_count/page_size)
-    while page_count > 1:
-        # 添加随机延迟，避免爬取过快
-        time.sleep(random.uniform(1, 1.5))
-        page_current = page_current + 1
-        params["pn"] = page_current
-        r =  fetcher.make_request(url, params=params)
-        data_json = r.json()
-        _data = data_json["data"]["diff"]
-        data.extend(_data)
-        page_count =page_count - 1
-
     temp_df = pd.DataFrame(data)
     temp_df.columns = [
         "最新价",
@@ -192,7 +175,17 @@ def stock_zh_a_spot_em() -> pd.DataFrame:
 @lru_cache()
 def code_id_map_em() -> dict:
     """
-    东方财富-股票和市场代码
+    东方财富-股票和市场代码，优先读取磁盘缓存（见 instock.core.ref_cache）
+    http://quote.eastmoney.com/center/gridlist.html#hs_a_board
+    :return: 股票和市场代码
+    :rtype: dict
+    """
+    return ref_cache.cached("code_id_map_em", fetch_code_id_map_em)
+
+
+def fetch_code_id_map_em() -> dict:
+    """
+    东方财富-股票和市场代码，直接访问网络
     http://quote.eastmoney.com/center/gridlist.html#hs_a_board
     :return: 股票和市场代码
     :rtype: dict
@@ -213,25 +206,10 @@ def code_id_map_em() -> dict:
         "fields": "f12",
         "_": "1623833739532",
     }
-    r =  fetcher.make_request(url, params=params)
-    data_json = r.json()
-    data = data_json["data"]["diff"]
+    data = fetcher.fetch_all_pages(url, params, paging=PAGING_CLIST)
     if not data:
         return dict()
 
-    data_count = data_json["data"]["total"]
-    page_count = math.ceil(data_count/page_size)
-    while page_count > 1:
-        # 添加随机延迟，避免爬取过快
-        time.sleep(random.uniform(1, 1.5))
-        page_current = page_current + 1
-        params["pn"] = page_current
-        r =  fetcher.make_request(url, params=params)
-        data_json = r.json()
-        _data = data_json["data"]["diff"]
-        data.extend(_data)
-        page_count =page_count - 1
-
     temp_df = pd.DataFrame(data)
     temp_df["market_id"] = 1
     temp_df.columns = ["sh_code", "sh_id"]
@@ -250,25 +228,10 @@ def code_id_map_em() -> dict:
         "fields": "f12",
         "_": "1623833739532",
     }
-    r =  fetcher.make_request(url, params=params)
-    data_json = r.json()
-    data = data_json["data"]["diff"]
+    data = fetcher.fetch_all_pages(url, params, paging=PAGING_CLIST)
     if not data:
         return dict()
 
-    data_count = data_json["data"]["total"]
-    page_count = math.ceil(data_count/page_size)
-    while page_count > 1:
-        # 添加随机延迟，避免爬取过快
-        time.sleep(random.uniform(1, 1.5))
-        page_current = page_current + 1
-        params["pn"] = page_current
-        r =  fetcher.make_request(url, params=params)
-        data_json = r.json()
-        _data = data_json["data"]["diff"]
-        data.extend(_data)
-        page_count =page_count - 1
-
     temp_df_sz = pd.DataFrame(data)
     temp_df_sz["sz_id"] = 0
     code_id_dict.update(dict(zip(temp_df_sz["f12"], temp_df_sz["sz_id"])))
@@ -286,25 +249,10 @@ def code_id_map_em() -> dict:
         "fields": "f12",
         "_": "1623833739532",
     }
-    r =  fetcher.make_request(url, params=params)
-    data_json = r.json()
-    data = data_json["data"]["diff"]
+    data = fetcher.fetch_all_pages(url, params, paging=PAGING_CLIST)
     if not data:
         return dict()
 
-    data_count = data_json["data"]["total"]
-    page_count = math.ceil(data_count/page_size)
-    while page_count > 1:
-        # 添加随机延迟，避免爬取过快
-        time.sleep(random.uniform(1, 1.5))
-        page_current = page_current + 1
-        params["pn"] = page_current
-        r =  fetcher.make_request(url, params=params)
-        data_json = r.json()
-        _data = data_json["data"]["diff"]
-        data.extend(_data)
-        page_count =page_count - 1
-
     temp_df_sz = pd.DataFrame(data)
     temp_df_sz["bj_id"] = 0
     code_id_dict.update(dict(zip(temp_df_sz["f12"], temp_df_sz["bj_id"])))
@@ -353,10 +301,7 @@ def stock_zh_a_hist(
     data_json = r.json()
     if not (data_json["data"] and data_json["data"]["klines"]):
         return pd.DataFrame()
-    temp_df = pd.DataFrame(
-        [item.split(",") for item in data_json["data"]["klines"]]
-    )
-    temp_df.columns = [
+    temp_df = kline_frame(data_json["data"]["klines"], [
         "日期",
         "开盘",
         "收盘",
@@ -368,20 +313,7 @@ def stock_zh_a_hist(
         "涨跌幅",
         "涨跌额",
         "换手率",
-    ]
-    temp_df.index = pd.to_datetime(temp_df["日期"])
-    temp_df.reset_index(inplace=True, drop=True)
-
-    temp_df["开盘"] = pd.to_numeric(temp_df["开盘"])
-    temp_df["收盘"] = pd.to_numeric(temp_df["收盘"])
-    temp_df["最高"] = pd.to_numeric(temp_df["最高"])
-    temp_df["最低"] = pd.to_numeric(temp_df["最低"])
-    temp_df["成交量"] = pd.to_numeric(temp_df["成交量"])
-    temp_df["成交额"] = pd.to_numeric(temp_df["成交额"])
-    temp_df["振幅"] = pd.to_numeric(temp_df["振幅"])
-    temp_df["涨跌幅"] = pd.to_numeric(temp_df["涨跌幅"])
-    temp_df["涨跌额"] = pd.to_numeric(temp_df["涨跌额"])
-    temp_df["换手率"] = pd.to_numeric(temp_df["换手率"])
+    ])
 
     return temp_df
 
@@ -468,10 +400,7 @@ def stock_zh_a_hist_min_em(
         }
         r =  fetcher.make_request(url, params=params)
         data_json = r.json()
-        temp_df = pd.DataFrame(
-            [item.split(",") for item in data_json["data"]["klines"]]
-        )
-        temp_df.columns = [
+        temp_df = kline_frame(data_json["data"]["klines"], [
             "时间",
             "开盘",
             "收盘",
@@ -483,20 +412,10 @@ def stock_zh_a_hist_min_em(
             "涨跌幅",
             "涨跌额",
             "换手率",
-        ]
+        ])
         temp_df.index = pd.to_datetime(temp_df["时间"])
         temp_df = temp_df[start_date:end_date]
         temp_df.reset_index(drop=True, inplace=True)
-        temp_df["开盘"] = pd.to_numeric(temp_df["开盘"])
-        temp_df["收盘"] = pd.to_numeric(temp_df["收盘"])
-        temp_df["最高"] = pd.to_numeric(temp_df["最高"])
-        temp_df["最低"] = pd.to_numeric(temp_df["最低"])
-        temp_df["成交量"] = pd.to_numeric(temp_df["成交量"])
-        temp_df["成交额"] = pd.to_numeric(temp_df["成交额"])
-        temp_df["振幅"] = pd.to_numeric(temp_df["振幅"])
-        temp_df["涨跌幅"] = pd.to_numeric(temp_df["涨跌幅"])
-        temp_df["涨跌额"] = pd.to_numeric(temp_df["涨跌额"])
-        temp_df["换手率"] = pd.to_numeric(temp_df["换手率"])
         temp_df["时间"] = pd.to_datetime(temp_df["时间"]).astype(str)
         temp_df = temp_df[
             [
@@ -5,12 +5,9 @@ Date: 2022/3/15 17:32
 Desc: 东方财富网-数据中心-龙虎榜单
 https://data.eastmoney.com/stock/tradedetail.html
 """
-import random
-import time
 
 import pandas as pd
-from tqdm import tqdm
-from instock.core.eastmoney_fetcher import eastmoney_fetcher
+from instock.core.eastmoney_fetcher import eastmoney_fetcher, collect, PAGING_DATACENTER
 
 __author__ = 'myh '
 __date__ = '2025/12/31 '
@@ -18,6 +15,40 @@ __date__ = '2025/12/31 '
 # 创建全局实例，供所有函数使用
 fetcher = eastmoney_fetcher()
 
+_LHB_DETAIL_RENAME = {
+    "SECURITY_CODE": "代码",
+    "SECURITY_NAME_ABBR": "名称",
+    "TRADE_DATE": "上榜日",
+    "EXPLAIN": "解读",
+    "CLOSE_PRICE": "收盘价",
+    "CHANGE_RATE": "涨跌幅",
+    "BILLBOARD_NET_AMT": "龙虎榜净买额",
+    "BILLBOARD_BUY_AMT": "龙虎榜买入额",
+    "BILLBOARD_SELL_AMT": "龙虎榜卖出额",
+    "BILLBOARD_DEAL_AMT": "龙虎榜成交额",
+    "ACCUM_AMOUNT": "市场总成交额",
+    "DEAL_NET_RATIO": "净买额占总成交比",
+    "DEAL_AMOUNT_RATIO": "成交额占总成交比",
+    "TURNOVERRATE": "换手率",
+    "FREE_MARKET_CAP": "流通市值",
+    "EXPLANATION": "上榜原因",
+    "D1_CLOSE_ADJCHRATE": "上榜后1日",
+    "D2_CLOSE_ADJCHRATE": "上榜后2日",
+    "D5_CLOSE_ADJCHRATE": "上榜后5日",
+    "D10_CLOSE_ADJCHRATE": "上榜后10日",
+}
+LHB_DETAIL_COLUMNS = list(_LHB_DETAIL_RENAME.values())
+
+
+def _lhb_detail_frame(temp_df: pd.DataFrame) -> pd.DataFrame:
+    temp_df = temp_df.rename(columns=_LHB_DETAIL_RENAME)[LHB_DETAIL_COLUMNS]
+    temp_df["上榜日"] = pd.to_datetime(temp_df["上榜日"]).dt.date
+    for col in LHB_DETAIL_COLUMNS:
+        if col not in ("代码", "名称", "上榜日", "解读", "上榜原因"):
+            temp_df[col] = pd.to_numeric(temp_df[col], errors="coerce")
+    return temp_df
+
+
 def stock_lhb_detail_em(
     start_date: str = "20230403", end_date: str = "20230417"
 ) -> pd.DataFrame:
@@ -33,107 +64,16 @@ def stock_lhb_detail_em(
     """
     start_date = "-".join([start_date[:4], start_date[4:6], start_date[6:]])
     end_date = "-".join([end_date[:4], end_date[4:6], end_date[6:]])
-    url = "https://datacenter-web.eastmoney.com/api/data/v1/get"
-    params = {
-        "sortColumns": "SECURITY_CODE,TRADE_DATE",
-        "sortTypes": "1,-1",
-        "pageSize": "5000",
-        "pageNumber": "1",
-        "reportName": "RPT_DAILYBILLBOARD_DETAILSNEW",
-        "columns": "SECURITY_CODE,SECUCODE,SECURITY_NAME_ABBR,TRADE_DATE,EXPLAIN,CLOSE_PRICE,CHANGE_RATE,BILLBOARD_NET_AMT,BILLBOARD_BUY_AMT,BILLBOARD_SELL_AMT,BILLBOARD_DEAL_AMT,ACCUM_AMOUNT,DEAL_NET_RATIO,DEAL_AMOUNT_RATIO,TURNOVERRATE,FREE_MARKET_CAP,EXPLANATION,D1_CLOSE_ADJCHRATE,D2_CLOSE_ADJCHRATE,D5_CLOSE_ADJCHRATE,D10_CLOSE_ADJCHRATE,SECURITY_TYPE_CODE",
-        "source": "WEB",
-        "client": "WEB",
-        "filter": f"(TRADE_DATE<='{end_date}')(TRADE_DATE>='{start_date}')",
-    }
-    r = fetcher.make_request(url, params=params)
-    data_json = r.json()
-    total_page_num = data_json["result"]["pages"]
-    big_df = pd.DataFrame()
-    for page in range(1, total_page_num + 1):
-        # 添加随机延迟，避免爬取过快
-        time.sleep(random.uniform(1, 1.5))
-        params.update(
-            {
-                "pageNumber": page,
-            }
-        )
-        r = fetcher.make_request(url, params=params)
-        data_json = r.json()
-        temp_df = pd.DataFrame(data_json["result"]["data"])
-        big_df = pd.concat([big_df, temp_df], ignore_index=True)
-
-    big_df.reset_index(inplace=True)
-    big_df["index"] = big_df.index + 1
-    big_df.rename(
-        columns={
-            "index": "-",
-            "SECURITY_CODE": "代码",
-            "SECUCODE": "-",
-            "SECURITY_NAME_ABBR": "名称",
-            "TRADE_DATE": "上榜日",
-            "EXPLAIN": "解读",
-            "CLOSE_PRICE": "收盘价",
-            "CHANGE_RATE": "涨跌幅",
-            "BILLBOARD_NET_AMT": "龙虎榜净买额",
-            "BILLBOARD_BUY_AMT": "龙虎榜买入额",
-            "BILLBOARD_SELL_AMT": "龙虎榜卖出额",
-            "BILLBOARD_DEAL_AMT": "龙虎榜成交额",
-            "ACCUM_AMOUNT": "市场总成交额",
-            "DEAL_NET_RATIO": "净买额占总成交比",
-            "DEAL_AMOUNT_RATIO": "成交额占总成交比",
-            "TURNOVERRATE": "换手率",
-            "FREE_MARKET_CAP": "流通市值",
-            "EXPLANATION": "上榜原因",
-            "D1_CLOSE_ADJCHRATE": "上榜后1日",
-            "D2_CLOSE_ADJCHRATE": "上榜后2日",
-            "D5_CLOSE_ADJCHRATE": "上榜后5日",
-            "D10_CLOSE_ADJCHRATE": "上榜后10日",
-        },
-        inplace=True,
+    pages = fetcher.iter_report_pages(
+        "RPT_DAILYBILLBOARD_DETAILSNEW",
+        columns="SECURITY_CODE,SECUCODE,SECURITY_NAME_ABBR,TRADE_DATE,EXPLAIN,CLOSE_PRICE,CHANGE_RATE,BILLBOARD_NET_AMT,BILLBOARD_BUY_AMT,BILLBOARD_SELL_AMT,BILLBOARD_DEAL_AMT,ACCUM_AMOUNT,DEAL_NET_RATIO,DEAL_AMOUNT_RATIO,TURNOVERRATE,FREE_MARKET_CAP,EXPLANATION,D1_CLOSE_ADJCHRATE,D2_CLOSE_ADJCHRATE,D5_CLOSE_ADJCHRATE,D10_CLOSE_ADJCHRATE,SECURITY_TYPE_CODE",
+        filter=f"(TRADE_DATE<='{end_date}')(TRADE_DATE>='{start_date}')",
+        page_size=5000,
+        sort_columns="SECURITY_CODE,TRADE_DATE",
+        sort_types="1,-1",
+        transform=_lhb_detail_frame,
     )
-
-    big_df = big_df[
-        [
-            "代码",
-            "名称",
-            "上榜日",
-            "解读",
-            "收盘价",
-            "涨跌幅",
-            "龙虎榜净买额",
-            "龙虎榜买入额",
-            "龙虎榜卖出额",
-            "龙虎榜成交额",
-            "市场总成交额",
-            "净买额占总成交比",
-            "成交额占总成交比",
-            "换手率",
-            "流通市值",
-            "上榜原因",
-            "上榜后1日",
-            "上榜后2日",
-            "上榜后5日",
-            "上榜后10日",
-        ]
-    ]
-    big_df["上榜日"] = pd.to_datetime(big_df["上榜日"]).dt.date
-
-    big_df["收盘价"] = pd.to_numeric(big_df["收盘价"], errors="coerce")
-    big_df["涨跌幅"] = pd.to_numeric(big_df["涨跌幅"], errors="coerce")
-    big_df["龙虎榜净买额"] = pd.to_numeric(big_df["龙虎榜净买额"], errors="coerce")
-    big_df["龙虎榜买入额"] = pd.to_numeric(big_df["龙虎榜买入额"], errors="coerce")
-    big_df["龙虎榜卖出额"] = pd.to_numeric(big_df["龙虎榜卖出额"], errors="coerce")
-    big_df["龙虎榜成交额"] = pd.to_numeric(big_df["龙虎榜成交额"], errors="coerce")
-    big_df["市场总成交额"] = pd.to_numeric(big_df["市场总成交额"], errors="coerce")
-    big_df["净买额占总成交比"] = pd.to_numeric(big_df["净买额占总成交比"], errors="coerce")
-    big_df["成交额占总成交比"] = pd.to_numeric(big_df["成交额占总成交比"], errors="coerce")
-    big_df["换手率"] = pd.to_numeric(big_df["换手率"], errors="coerce")
-    big_df["流通市值"] = pd.to_numeric(big_df["流通市值"], errors="coerce")
-    big_df["上榜后1日"] = pd.to_numeric(big_df["上榜后1日"], errors="coerce")
-    big_df["上榜后2日"] = pd.to_numeric(big_df["上榜后2日"], errors="coerce")
-    big_df["上榜后5日"] = pd.to_numeric(big_df["上榜后5日"], errors="coerce")
-    big_df["上榜后10日"] = pd.to_numeric(big_df["上榜后10日"], errors="coerce")
-    return big_df
+    return collect(pages, columns=LHB_DETAIL_COLUMNS)
 
 
 def stock_lhb_stock_statistic_em(symbol: str = "近一月") -> pd.DataFrame:
@@ -346,18 +286,7 @@ def stock_lhb_jgstatistic_em(symbol: str = "近一月") -> pd.DataFrame:
         "client": "WEB",
         "filter": f'(STATISTICSCYCLE="{symbol_map[symbol]}")',
     }
-    r = fetcher.make_request(url, params=params)
-    data_json = r.json()
-    total_page = data_json["result"]["pages"]
-    big_df = pd.DataFrame()
-    for page in tqdm(range(1, total_page + 1), leave=False):
-        # 添加随机延迟，避免爬取过快
-        time.sleep(random.uniform(1, 1.5))
-        params.update({"pageNumber": page})
-        r = fetcher.make_request(url, params=params)
-        data_json = r.json()
-        temp_df = pd.DataFrame(data_json["result"]["data"])
-        big_df = pd.concat([big_df, temp_df], ignore_index=True)
+    big_df = collect(fetcher.iter_pages(url, params, paging=PAGING_DATACENTER))
 
     big_df.reset_index(inplace=True)
     big_df["index"] = big_df.index + 1
@@ -446,19 +375,7 @@ def stock_lhb_hyyyb_em(
         "client": "WEB",
         "filter": f"(ONLIST_DATE>='{start_date}')(ONLIST_DATE<='{end_date}')",
     }
-    r = fetcher.make_request(url, params=params)
-    data_json = r.json()
-    total_page = data_json["result"]["pages"]
-
-    big_df = pd.DataFrame()
-    for page in tqdm(range(1, total_page + 1), leave=False):
-        # 添加随机延迟，避免爬取过快
-        time.sleep(random.uniform(1, 1.5))
-        params.update({"pageNumber": page})
-        r = fetcher.make_request(url, params=params)
-        data_json = r.json()
-        temp_df = pd.DataFrame(data_json["result"]["data"])
-        big_df = pd.concat([big_df, temp_df], ignore_index=True)
+    big_df = collect(fetcher.iter_pages(url, params, paging=PAGING_DATACENTER))
 
     big_df.reset_index(inplace=True)
     big_df["index"] = big_df.index + 1
@@ -527,18 +444,7 @@ def stock_lhb_yybph_em(symbol: str = "近一月") -> pd.DataFrame:
         "client": "WEB",
         "filter": f'(STATISTICSCYCLE="{symbol_map[symbol]}")',
     }
-    r = fetcher.make_request(url, params=params)
-    data_json = r.json()
-    total_page = data_json["result"]["pages"]
-    big_df = pd.DataFrame()
-    for page in tqdm(range(1, total_page + 1), leave=False):
-        # 添加随机延迟，避免爬取过快
-        time.sleep(random.uniform(1, 1.5))
-        params.update({"pageNumber": page})
-        r = fetcher.make_request(url, params=params)
-        data_json = r.json()
-        temp_df = pd.DataFrame(data_json["result"]["data"])
-        big_df = pd.concat([big_df, temp_df], ignore_index=True)
+    big_df = collect(fetcher.iter_pages(url, params, paging=PAGING_DATACENTER))
 
     big_df.reset_index(inplace=True)
     big_df["index"] = big_df.index + 1
@@ -635,18 +541,7 @@ def stock_lhb_traderstatistic_em(symbol: str = "近一月") -> pd.DataFrame:
         "client": "WEB",
         "filter": f'(STATISTICSCYCLE="{symbol_map[symbol]}")',
     }
-    r = fetcher.make_request(url, params=params)
-    data_json = r.json()
-    total_page = data_json["result"]["pages"]
-    big_df = pd.DataFrame()
-    for page in tqdm(range(1, total_page + 1), leave=False):
-        # 添加随机延迟，避免爬取过快
-        time.sleep(random.uniform(1, 1.5))
-        params.update({"pageNumber": page})
-        r = fetcher.make_request(url, params=params)
-        data_json = r.json()
-        temp_df = pd.DataFrame(data_json["result"]["data"])
-        big_df = pd.concat([big_df, temp_df], ignore_index=True)
+    big_df = collect(fetcher.iter_pages(url, params, paging=PAGING_DATACENTER))
 
     big_df.reset_index(inplace=True)
     big_df["index"] = big_df.index + 1
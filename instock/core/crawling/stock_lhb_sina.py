@@ -8,10 +8,10 @@ https://vip.stock.finance.sina.com.cn/q/go.php/vInvestConsult/kind/lhb/index.pht
 
 from io import StringIO
 import pandas as pd
-import requests
 from bs4 import BeautifulSoup
 from tqdm import tqdm
 from instock.core.singleton_proxy import proxys
+import instock.core.http_replay as http_replay
 
 
 def stock_lhb_detail_daily_sina(date: str = "20240222") -> pd.DataFrame:
@@ -26,7 +26,7 @@ def stock_lhb_detail_daily_sina(date: str = "20240222") -> pd.DataFrame:
     date = "-".join([date[:4], date[4:6], date[6:]])
     url = "https://vip.stock.finance.sina.com.cn/q/go.php/vInvestConsult/kind/lhb/index.phtml"
     params = {"tradedate": date}
-    r = requests.get(url, proxies = proxys().get_proxies(), params=params)
+    r = http_replay.get(url, proxies = proxys().get_proxies(), params=params)
     soup = BeautifulSoup(r.text, features="lxml")
     selected_html = soup.find(name="div", attrs={"class": "list"}).find_all(
         name="table", attrs={"class": "list_table"}
@@ -64,7 +64,7 @@ def _find_last_page(
         "last": recent_day,
         "p": "1",
     }
-    r = requests.get(url, proxies = proxys().get_proxies(), params=params)
+    r = http_replay.get(url, proxies = proxys().get_proxies(), params=params)
     soup = BeautifulSoup(r.text, "lxml")
     try:
         previous_page = int(soup.find_all(attrs={"class": "page"})[-2].text)
@@ -76,7 +76,7 @@ def _find_last_page(
                 "last": recent_day,
                 "p": previous_page,
             }
-            r = requests.get(url, proxies = proxys().get_proxies(), params=params)
+            r = http_replay.get(url, proxies = proxys().get_proxies(), params=params)
             soup = BeautifulSoup(r.text, features="lxml")
             last_page = int(soup.find_all(attrs={"class": "page"})[-2].text)
             if last_page != previous_page:
@@ -106,7 +106,7 @@ def stock_lhb_ggtj_sina(symbol: str = "5") -> pd.DataFrame:
             "last": symbol,
             "p": page,
         }
-        r = requests.get(url, proxies = proxys().get_proxies(), params=params)
+        r = http_replay.get(url, proxies = proxys().get_proxies(), params=params)
         temp_df = pd.read_html(StringIO(r.text))[0].iloc[0:, :]
         big_df = pd.concat(objs=[big_df, temp_df], ignore_index=True)
     big_df["股票代码"] = big_df["股票代码"].astype(str).str.zfill(6)
@@ -142,7 +142,7 @@ def stock_lhb_yytj_sina(symbol: str = "5") -> pd.DataFrame:
             "last": "5",
             "p": page,
         }
-        r = requests.get(url, proxies = proxys().get_proxies(), params=params)
+        r = http_replay.get(url, proxies = proxys().get_proxies(), params=params)
         temp_df = pd.read_html(StringIO(r.text))[0].iloc[0:, :]
         big_df = pd.concat([big_df, temp_df], ignore_index=True)
     big_df.columns = [
@@ -179,7 +179,7 @@ def stock_lhb_jgzz_sina(symbol: str = "5") -> pd.DataFrame:
             "last": symbol,
             "p": page,
         }
-        r = requests.get(url, proxies = proxys().get_proxies(), params=params)
+        r = http_replay.get(url, proxies = proxys().get_proxies(), params=params)
         temp_df = pd.read_html(StringIO(r.text))[0].iloc[0:, :]
         if temp_df.empty:
             continue
@@ -214,7 +214,7 @@ def stock_lhb_jgmx_sina() -> pd.DataFrame:
     params = {
         "p": "1",
     }
-    r = requests.get(url, proxies = proxys().get_proxies(), params=params)
+    r = http_replay.get(url, proxies = proxys().get_proxies(), params=params)
     soup = BeautifulSoup(r.text, features="lxml")
     try:
         last_page_num = int(soup.find_all(attrs={"class": "page"})[-2].text)
@@ -225,7 +225,7 @@ def stock_lhb_jgmx_sina() -> pd.DataFrame:
         params = {
             "p": page,
         }
-        r = requests.get(url, proxies = proxys().get_proxies(), params=params)
+        r = http_replay.get(url, proxies = proxys().get_proxies(), params=params)
         temp_df = pd.read_html(StringIO(r.text))[0].iloc[0:, :]
         big_df = pd.concat(objs=[big_df, temp_df], ignore_index=True)
     big_df["股票代码"] = big_df["股票代码"].astype(str).str.zfill(6)
@@ -6,15 +6,38 @@ Desc: 同花顺涨停原因
 http://zx.10jqka.com.cn/event/api/getharden/date/2025-02-21/orderby/date/orderway/desc/charset/GBK/
 """
 
+import os
+import json
+import logging
+import threading
+import time
+import concurrent.futures
 import pandas as pd
 import requests
 import re
 import numpy as np
+from requests.adapters import HTTPAdapter
 from instock.core.singleton_proxy import proxys
+from instock.core.fetch_scheduler import fetch_scheduler
+import instock.core.http_replay as http_replay
 
 __author__ = 'myh '
 __date__ = '2025/5/9 '
 
+DETAIL_URL = "http://zx.10jqka.com.cn/event/harden/stockreason/id/{}"
+DETAIL_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/89.0.4389.82 Safari/537.36"
+}
+# 详因并发抓取线程数，实际在途请求数同时受调度器 zx.10jqka.com.cn 的主机名额限制
+DETAIL_WORKERS = 4
+
+# 详因按 日期/代码 缓存到磁盘，同一日期重跑不再请求
+cpath_current = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+detail_cache_path = os.path.join(cpath_current, 'cache', 'limitup')
+
+_session = None
+_session_lock = threading.Lock()
+
 def stock_limitup_reason(date: str = "2025-02-27") -> pd.DataFrame:
     """
     同花顺涨停原因
@@ -26,7 +49,7 @@ def stock_limitup_reason(date: str = "2025-02-27") -> pd.DataFrame:
     headers = {
         "User-Agent": "Mozilla/5.0 (Windows NT 6.1; WOW64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/81.0.4044.138 Safari/537.36 Thx"
     }
-    r = requests.get(url, proxies = proxys().get_proxies(), headers=headers)
+    r = _get_session().get(url, proxies = proxys().get_proxies(), headers=headers)
     data_json = r.json()
 
     data = data_json["data"]
@@ -67,7 +90,7 @@ def stock_limitup_reason(date: str = "2025-02-27") -> pd.DataFrame:
             "_",
         ]
 
-    temp_df["详因"] = temp_df.apply(stock_limitup_detail, axis=1)
+    temp_df["详因"] = stock_limitup_details(temp_df, date)
     temp_df["换手率"] = round(temp_df["换手率"], 2)
     temp_df = temp_df[
         [
@@ -89,34 +112,129 @@ def stock_limitup_reason(date: str = "2025-02-27") -> pd.DataFrame:
     return temp_df
 
 
-def stock_limitup_detail(row):
-    """
-    同花顺涨停详因
-    http://zx.10jqka.com.cn/event/harden/stockreason/id/70870005
-    :return: 涨停详因
-    :rtype: pandas.DataFrame
-    """
-    url = f"http://zx.10jqka.com.cn/event/harden/stockreason/id/{row['ID']}"
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/89.0.4389.82 Safari/537.36"
-    }
-    r = requests.get(url, proxies = proxys().get_proxies(), headers=headers)
-    data_text = r.text
+def _get_session():
+    """复用连接池的共享会话"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=DETAIL_WORKERS, pool_maxsize=DETAIL_WORKERS)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            session.headers.update(DETAIL_HEADERS)
+            _session = http_replay.install(session)
+        return _session
 
-    # match_title = re.search(r"var title = '(.*?)';", data_text)
-    # _title = ""
-    # if match_title:
-    #     _title = match_title.group(1)
 
+def _parse_detail(data_text):
     pattern_data = re.search(r"var data = '(.*?)';", data_text)
     _data = ""
     if pattern_data:
         _data = pattern_data.group(1).replace("&lt;spanclass=&quot;hl&quot;&gt;", "").replace("&lt;/span&gt;", "").replace("&amp;quot;", "\"")
     return _data
 
-    # reason = f"{_title}\r\n{_data}"
 
-    # return reason
+def fetch_limitup_detail(detail_id, timeout=10):
+    """
+    同花顺涨停详因
+    http://zx.10jqka.com.cn/event/harden/stockreason/id/70870005
+    优先使用代理，代理失败时直连；请求期间占用调度器的主机名额。
+    :return: 涨停详因
+    :rtype: str
+    """
+    url = DETAIL_URL.format(detail_id)
+    session = _get_session()
+    pool = proxys()
+    last_error = None
+    for current_proxies in (pool.get_proxies(), None):
+        started = time.monotonic()
+        try:
+            with fetch_scheduler().slot(url):
+                r = session.get(url, proxies=current_proxies, timeout=timeout)
+        except requests.exceptions.RequestException as e:
+            pool.report(current_proxies, False)
+            last_error = e
+            continue
+        pool.report(current_proxies, True, time.monotonic() - started)
+        r.raise_for_status()
+        return _parse_detail(r.text)
+    raise last_error
+
+
+def stock_limitup_detail(row):
+    """
+    同花顺涨停详因
+    :return: 涨停详因
+    :rtype: str
+    """
+    return fetch_limitup_detail(row['ID'])
+
+
+def _detail_cache_file(date):
+    return os.path.join(detail_cache_path, f"{date}.json")
+
+
+def load_detail_cache(date):
+    """读取某日已缓存的详因，代码 -> 详因"""
+    cache_file = _detail_cache_file(date)
+    if not os.path.isfile(cache_file):
+        return {}
+    try:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        logging.error(f"stock_limitup_reason.load_detail_cache处理异常：{date}{e}")
+    return {}
+
+
+def save_detail_cache(date, details):
+    """原子写入：先写临时文件再替换"""
+    cache_file = _detail_cache_file(date)
+    try:
+        os.makedirs(detail_cache_path, exist_ok=True)
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(details, f, ensure_ascii=False)
+        os.replace(tmp_file, cache_file)
+    except Exception as e:
+        logging.error(f"stock_limitup_reason.save_detail_cache处理异常：{date}{e}")
+
+
+def stock_limitup_details(temp_df, date, workers=DETAIL_WORKERS, timeout=10, total_timeout=120):
+    """
+    批量抓取涨停详因：先读磁盘缓存，未缓存的股票并发抓取。
+    单只股票超时或失败时详因留空且不写缓存，总耗时超过 total_timeout 时放弃剩余请求，返回部分结果。
+    :param temp_df: 含 ID、代码 列的涨停数据
+    :param date: 日期，作为缓存键
+    :return: 与 temp_df 行对齐的详因 Series
+    """
+    details = load_detail_cache(date)
+    todo = [(code, detail_id) for code, detail_id in zip(temp_df["代码"], temp_df["ID"]) if code not in details]
+    if todo:
+        fetched = {}
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, workers))
+        try:
+            future_to_code = {executor.submit(fetch_limitup_detail, detail_id, timeout): code
+                              for code, detail_id in todo}
+            done, not_done = concurrent.futures.wait(future_to_code, timeout=total_timeout)
+            for future in done:
+                code = future_to_code[future]
+                try:
+                    _data = future.result()
+                    # 空详因可能是页面未生成，不缓存，下次重跑再取
+                    if _data:
+                        fetched[code] = _data
+                except Exception as e:
+                    logging.error(f"stock_limitup_reason.stock_limitup_details处理异常：{code}代码{e}")
+            if not_done:
+                logging.error(f"stock_limitup_reason.stock_limitup_details处理异常：{len(not_done)}只股票详因超时未取到")
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+        if fetched:
+            details.update(fetched)
+            save_detail_cache(date, details)
+    return pd.Series([details.get(code, "") for code in temp_df["代码"]], index=temp_df.index, dtype=object)
+
 
 if __name__ == "__main__":
     stock_limitup_reason_df = stock_limitup_reason()
@@ -1,12 +1,9 @@
 # -*- coding:utf-8 -*-
 # !/usr/bin/env python
 
-import math
-import random
-import time
 import pandas as pd
 import instock.core.tablestructure as tbs
-from instock.core.eastmoney_fetcher import eastmoney_fetcher
+from instock.core.eastmoney_fetcher import eastmoney_fetcher, PAGING_XUANGU
 
 __author__ = 'myh '
 __date__ = '2025/12/31 '
@@ -37,25 +34,10 @@ def stock_selection() -> pd.DataFrame:
         "client": "WEB"
     }
 
-    r = fetcher.make_request(url, params=params)
-    data_json = r.json()
-    data = data_json["result"]["data"]
+    data = fetcher.fetch_all_pages(url, params, paging=PAGING_XUANGU)
     if not data:
         return pd.DataFrame()
 
-    data_count = data_json["result"]["count"]
-    page_count = math.ceil(data_count/page_size)
-    while page_count > 1:
-        # 添加随机延迟，避免爬取过快
-        time.sleep(random.uniform(1, 1.5))
-        page_current = page_current + 1
-        params["p"] = page_current
-        r = fetcher.make_request(url, params=params)
-        data_json = r.json()
-        _data = data_json["result"]["data"]
-        data.extend(_data)
-        page_count =page_count - 1
-
     temp_df = pd.DataFrame(data)
 
     mask = ~temp_df['CONCEPT'].isna()
@@ -8,9 +8,9 @@ https://finance.sina.com.cn/realstock/company/klc_td_sh.txt
 """
 import datetime
 import pandas as pd
-import requests
 from py_mini_racer import MiniRacer
 from instock.core.singleton_proxy import proxys
+import instock.core.http_replay as http_replay
 
 hk_js_decode = """
 function d(t) {
@@ -311,7 +311,7 @@ def tool_trade_date_hist_sina() -> pd.DataFrame:
     :rtype: pandas.DataFrame
     """
     url = "https://finance.sina.com.cn/realstock/company/klc_td_sh.txt"
-    r = requests.get(url, proxies = proxys().get_proxies())
+    r = http_replay.get(url, proxies = proxys().get_proxies())
     js_code = MiniRacer()
     js_code.eval(hk_js_decode)
     dict_list = js_code.call(
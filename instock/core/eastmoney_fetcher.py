@@ -2,7 +2,15 @@
 # -*- coding: utf-8 -*-
 
 import os
+import math
+import asyncio
+import concurrent.futures
+import functools
+import collections
+import contextvars
+import itertools
 import requests
+import pandas as pd
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 from pathlib import Path
@@ -10,10 +18,79 @@ import time
 import random
 from urllib.parse import urlparse, urlunparse
 from instock.core.singleton_proxy import proxys
+from instock.lib.rate_limiter import host_rate_limiter
+from instock.core.fetch_scheduler import fetch_scheduler
+import instock.core.http_replay as http_replay
 
 __author__ = 'myh '
 __date__ = '2025/12/31 '
 
+# 分页接口描述：页码参数名、每页条数参数名、数据行路径、总数路径、总数是否为总页数
+# push2 行情列表 /api/qt/clist/get
+PAGING_CLIST = {'page': 'pn', 'size': 'pz', 'rows': ('data', 'diff'), 'total': ('data', 'total'),
+                'total_is_pages': False}
+# 选股器 /dataapi/xuangu/list
+PAGING_XUANGU = {'page': 'p', 'size': 'ps', 'rows': ('result', 'data'), 'total': ('result', 'count'),
+                 'total_is_pages': False}
+# 数据中心 datacenter-web /api/data/v1/get
+DATACENTER_URL = "https://datacenter-web.eastmoney.com/api/data/v1/get"
+PAGING_DATACENTER = {'page': 'pageNumber', 'size': 'pageSize', 'rows': ('result', 'data'),
+                     'total': ('result', 'pages'), 'total_is_pages': True}
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, '').strip() or default)
+    except ValueError:
+        return default
+
+
+# 每个主机同时在途的分页请求数，设为 1 则退回顺序抓取
+def fetch_concurrency():
+    return max(1, _env_int('INSTOCK_FETCH_CONCURRENCY', 4))
+
+
+def _dig(data, path):
+    for key in path:
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+def _page_count(data_json, page_size, paging):
+    total = _dig(data_json, paging['total'])
+    if not total:
+        return 1
+    if paging['total_is_pages']:
+        return int(total)
+    return math.ceil(int(total) / page_size)
+
+
+def _page_frame(rows, transform=None):
+    frame = pd.DataFrame(rows)
+    return frame if transform is None else transform(frame)
+
+
+def collect(pages, columns=None):
+    """把 iter_pages/iter_report_pages 产出的各页一次性拼接，没有数据时返回只有列名的空表"""
+    frames = [frame for frame in pages if not frame.empty]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)
+
+
+def run_coroutine(coro):
+    """在同步代码中执行协程；若当前线程已有运行中的事件循环，则在新线程中执行。"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        # 带上当前上下文，使新线程中的请求沿用调用方的抓取优先级
+        return executor.submit(contextvars.copy_context().run, asyncio.run, coro).result()
+
+
 class eastmoney_fetcher:
     """
     东方财富网数据获取器
@@ -24,7 +101,9 @@ class eastmoney_fetcher:
         """初始化获取器"""
         self.base_dir = os.path.dirname(os.path.dirname(__file__))
         self.session = self._create_session()
-        self.proxies = proxys().get_proxies()
+        self.proxy_pool = proxys()
+        self.limiter = host_rate_limiter()
+        self.scheduler = fetch_scheduler()
         self.cookie_refresh_interval = 30 * 60
         self.last_cookie_refresh_at = 0
 
@@ -56,12 +135,14 @@ class eastmoney_fetcher:
         session = requests.Session()
 
         # 配置连接池
+        # 只在连接建立失败时由 urllib3 重试；429/5xx/读超时交给 _send_request，
+        # 以便反馈给按主机的自适应限流器
         retry_strategy = Retry(
             total=3,
             connect=3,
-            read=3,
+            read=0,
+            status=0,
             backoff_factor=0.5,
-            status_forcelist=[429, 500, 502, 503, 504],
             allowed_methods=["HEAD", "GET", "POST", "OPTIONS"],
             raise_on_status=False,
         )
@@ -74,6 +155,8 @@ class eastmoney_fetcher:
         # 为http和https请求添加适配器
         session.mount("http://", adapter)
         session.mount("https://", adapter)
+        # INSTOCK_HTTP_MODE=record/replay 时挂载录制/回放适配器
+        http_replay.install(session)
 
         # 设置请求头
         headers = {
@@ -105,13 +188,21 @@ class eastmoney_fetcher:
 
         refresh_url = "https://quote.eastmoney.com/"
         last_error = None
-        for current_proxies in (self.proxies, None):
+        for current_proxies in (self.proxy_pool.get_proxies(), None):
             try:
-                response = self.session.get(
-                    refresh_url,
-                    proxies=current_proxies,
-                    timeout=8,
-                )
+                self.limiter.acquire(refresh_url)
+                started = time.monotonic()
+                try:
+                    with self.scheduler.slot(refresh_url):
+                        response = self.session.get(
+                            refresh_url,
+                            proxies=current_proxies,
+                            timeout=8,
+                        )
+                except requests.exceptions.RequestException:
+                    self.proxy_pool.report(current_proxies, False)
+                    raise
+                self.proxy_pool.report(current_proxies, True, time.monotonic() - started)
                 response.raise_for_status()
                 cookie_header = self._build_cookie_header()
                 if cookie_header:
@@ -149,8 +240,13 @@ class eastmoney_fetcher:
 
         return [urlunparse(parsed._replace(netloc=host)) for host in hosts]
 
-    def _send_request(self, method, url, retry=3, timeout=10, **kwargs):
-        """发送请求，优先使用代理，连接异常时回退到直连。"""
+    def _send_request(self, method, url, retry=3, timeout=10, token_acquired=False, **kwargs):
+        """
+        发送请求，优先使用代理，连接异常时回退到直连。
+        每次发送前从按主机的令牌桶取令牌，并把 429/5xx/超时反馈给限流器；
+        发送期间占用调度器按主机的并发名额，名额按抓取优先级分配。
+        :param token_acquired: 调用方已为首次发送取得令牌（异步获取器使用）
+        """
         candidate_urls = self._candidate_urls(url)
         last_error = None
         is_eastmoney_request = any(self._is_eastmoney_url(request_url) for request_url in candidate_urls)
@@ -158,21 +254,36 @@ class eastmoney_fetcher:
         if is_eastmoney_request:
             self._refresh_cookie_from_site()
 
+        need_token = not token_acquired
         for i in range(retry):
             for request_url in candidate_urls:
-                for current_proxies in (self.proxies, None):
+                # 每次尝试按健康度重新选择代理，代理失败时回退直连
+                for current_proxies in (self.proxy_pool.get_proxies(), None):
+                    if need_token:
+                        self.limiter.acquire(request_url)
+                    need_token = True
                     try:
-                        response = self.session.request(
-                            method=method,
-                            url=request_url,
-                            proxies=current_proxies,
-                            timeout=timeout,
-                            **kwargs,
-                        )
+                        started = time.monotonic()
+                        try:
+                            with self.scheduler.slot(request_url):
+                                response = self.session.request(
+                                    method=method,
+                                    url=request_url,
+                                    proxies=current_proxies,
+                                    timeout=timeout,
+                                    **kwargs,
+                                )
+                        except requests.exceptions.RequestException:
+                            self.proxy_pool.report(current_proxies, False)
+                            raise
+                        self.proxy_pool.report(current_proxies, True, time.monotonic() - started)
+                        self.limiter.report(request_url, response=response)
                         response.raise_for_status()
                         return response
                     except requests.exceptions.RequestException as e:
                         last_error = e
+                        if not isinstance(e, (requests.exceptions.HTTPError, requests.exceptions.ProxyError)):
+                            self.limiter.report(request_url, exc=e)
                         if current_proxies is not None:
                             print(f"请求错误: {e}, 尝试直连")
                             continue
@@ -190,13 +301,14 @@ class eastmoney_fetcher:
 
         raise last_error
 
-    def make_request(self, url, params=None, retry=3, timeout=10):
+    def make_request(self, url, params=None, retry=3, timeout=10, token_acquired=False):
         """
         发送请求
         :param url: 请求URL
         :param params: 请求参数
         :param retry: 重试次数
         :param timeout: 超时时间
+        :param token_acquired: 调用方已为首次发送取得限流令牌
         :return: 响应对象
         """
         return self._send_request(
@@ -205,6 +317,7 @@ class eastmoney_fetcher:
             params=params,
             retry=retry,
             timeout=timeout,
+            token_acquired=token_acquired,
         )
 
     def make_post_request(self, url, data=None, json=None, params=None, retry=3, timeout=60):
@@ -228,9 +341,191 @@ class eastmoney_fetcher:
             timeout=timeout,
         )
 
+    def fetch_all_pages(self, url, params, paging=PAGING_CLIST, concurrency=None, retry=3, timeout=10):
+        """
+        抓取分页接口的全部数据行
+        先请求第1页获得总数，其余页按主机并发上限并发抓取，按页码顺序拼接返回
+        :param url: 请求URL
+        :param params: 请求参数（页码参数会被覆盖）
+        :param paging: 分页接口描述，见 PAGING_CLIST/PAGING_XUANGU/PAGING_DATACENTER
+        :param concurrency: 每个主机的并发上限，默认取 INSTOCK_FETCH_CONCURRENCY
+        :return: 数据行列表
+        """
+        if concurrency is None:
+            concurrency = fetch_concurrency()
+        if concurrency > 1:
+            return run_coroutine(async_eastmoney_fetcher(self, concurrency).fetch_all_pages(
+                url, params, paging=paging, retry=retry, timeout=timeout))
+
+        params = dict(params)
+        page_size = int(params[paging['size']])
+        params[paging['page']] = 1
+        data_json = self.make_request(url, params=params, retry=retry, timeout=timeout).json()
+        data = _dig(data_json, paging['rows'])
+        if not data:
+            return []
+        data = list(data)
+        for page in range(2, _page_count(data_json, page_size, paging) + 1):
+            params[paging['page']] = page
+            data_json = self.make_request(url, params=params, retry=retry, timeout=timeout).json()
+            data.extend(_dig(data_json, paging['rows']) or [])
+        return data
+
+    def iter_pages(self, url, params, paging=PAGING_DATACENTER, transform=None, prefetch=None, retry=3,
+                   timeout=10):
+        """
+        逐页抓取分页接口，每取到一页就产出该页的 DataFrame，不在内存中累积全部数据
+        第1页确定总页数后，后续页最多提前 prefetch 页并发抓取，仍按页码顺序产出
+        :param url: 请求URL
+        :param params: 请求参数（页码参数会被覆盖）
+        :param paging: 分页接口描述
+        :param transform: 对每页 DataFrame 的转换（列名、类型），返回新的 DataFrame
+        :param prefetch: 提前抓取的页数，默认取 INSTOCK_FETCH_CONCURRENCY，1 为顺序抓取
+        """
+        if prefetch is None:
+            prefetch = fetch_concurrency()
+        params = dict(params)
+        page_size = int(params[paging['size']])
+        params[paging['page']] = 1
+        data_json = self.make_request(url, params=params, retry=retry, timeout=timeout).json()
+        rows = _dig(data_json, paging['rows'])
+        if not rows:
+            return
+        page_count = _page_count(data_json, page_size, paging)
+        yield _page_frame(rows, transform)
+        del rows, data_json
+
+        def fetch(page):
+            page_json = self.make_request(url, params={**params, paging['page']: page}, retry=retry,
+                                          timeout=timeout).json()
+            return _dig(page_json, paging['rows'])
+
+        pages = iter(range(2, page_count + 1))
+        if prefetch <= 1:
+            for page in pages:
+                rows = fetch(page)
+                if rows:
+                    yield _page_frame(rows, transform)
+            return
+
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=prefetch)
+        try:
+            # 预取线程沿用调用方的抓取优先级
+            def submit(page):
+                return executor.submit(contextvars.copy_context().run, fetch, page)
+
+            window = collections.deque(submit(page) for page in itertools.islice(pages, prefetch))
+            while window:
+                rows = window.popleft().result()
+                page = next(pages, None)
+                if page is not None:
+                    window.append(submit(page))
+                if rows:
+                    yield _page_frame(rows, transform)
+        finally:
+            # 调用方提前停止迭代时不再等待剩余页
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def iter_report_pages(self, report_name, columns="ALL", filter=None, page_size=500, sort_columns=None,
+                          sort_types=None, params=None, transform=None, prefetch=None, retry=3, timeout=10):
+        """
+        数据中心 datacenter-web 报表逐页抓取
+        :param report_name: 报表名 reportName，如 RPT_DAILYBILLBOARD_DETAILSNEW
+        :param columns: 返回列，逗号分隔
+        :param filter: 过滤条件，如 (TRADE_DATE>='2024-01-02')
+        :param page_size: 每页条数
+        :param params: 其它请求参数
+        """
+        request_params = {
+            "reportName": report_name,
+            "columns": columns,
+            "pageSize": page_size,
+            "pageNumber": 1,
+            "source": "WEB",
+            "client": "WEB",
+        }
+        if sort_columns is not None:
+            request_params["sortColumns"] = sort_columns
+        if sort_types is not None:
+            request_params["sortTypes"] = sort_types
+        if filter:
+            request_params["filter"] = filter
+        if params:
+            request_params.update(params)
+        return self.iter_pages(DATACENTER_URL, request_params, paging=PAGING_DATACENTER, transform=transform,
+                               prefetch=prefetch, retry=retry, timeout=timeout)
+
     def update_cookie(self, new_cookie):
         """
         更新Cookie
         :param new_cookie: 新的Cookie值
         """
         self.session.headers.update({'Cookie': new_cookie})
+
+
+class async_eastmoney_fetcher:
+    """
+    东方财富网异步数据获取器
+    基于 asyncio 调度请求，底层复用 eastmoney_fetcher 的 keep-alive 连接池、Cookie 刷新、
+    备用主机和代理回退逻辑，并按主机限制同时在途的请求数。
+    限流令牌在事件循环中以协程方式获取，不占用工作线程。
+    """
+
+    def __init__(self, fetcher=None, max_per_host=None):
+        """
+        :param fetcher: 同步获取器，默认新建
+        :param max_per_host: 每个主机的并发上限，默认取 INSTOCK_FETCH_CONCURRENCY
+        """
+        self.fetcher = fetcher if fetcher is not None else eastmoney_fetcher()
+        self.max_per_host = max_per_host if max_per_host is not None else fetch_concurrency()
+        self._semaphores = {}
+
+    def _host_semaphore(self, url):
+        host = urlparse(url).netloc
+        semaphore = self._semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_per_host)
+            self._semaphores[host] = semaphore
+        return semaphore
+
+    async def make_request(self, url, params=None, retry=3, timeout=10):
+        """异步发送GET请求，返回响应对象"""
+        loop = asyncio.get_running_loop()
+        async with self._host_semaphore(url):
+            await self.fetcher.limiter.acquire_async(url)
+            # run_in_executor 不传递 contextvars，显式带上以沿用抓取优先级
+            return await loop.run_in_executor(None, contextvars.copy_context().run, functools.partial(
+                self.fetcher.make_request, url, params=params, retry=retry, timeout=timeout,
+                token_acquired=True))
+
+    async def fetch_json(self, url, params=None, retry=3, timeout=10):
+        response = await self.make_request(url, params=params, retry=retry, timeout=timeout)
+        return response.json()
+
+    async def fetch_all_pages(self, url, params, paging=PAGING_CLIST, retry=3, timeout=10):
+        """
+        抓取分页接口的全部数据行
+        :param url: 请求URL
+        :param params: 请求参数（页码参数会被覆盖）
+        :param paging: 分页接口描述
+        :return: 按页码顺序拼接的数据行列表
+        """
+        params = dict(params)
+        page_size = int(params[paging['size']])
+        params[paging['page']] = 1
+        data_json = await self.fetch_json(url, params=params, retry=retry, timeout=timeout)
+        data = _dig(data_json, paging['rows'])
+        if not data:
+            return []
+        data = list(data)
+        page_count = _page_count(data_json, page_size, paging)
+        if page_count <= 1:
+            return data
+
+        pages = await asyncio.gather(*[
+            self.fetch_json(url, params={**params, paging['page']: page}, retry=retry, timeout=timeout)
+            for page in range(2, page_count + 1)
+        ])
+        for page_json in pages:
+            data.extend(_dig(page_json, paging['rows']) or [])
+        return data
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import heapq
+import itertools
+import threading
+import time
+import contextvars
+import concurrent.futures
+from contextlib import contextmanager
+from instock.lib.singleton_type import singleton_type
+from instock.lib.rate_limiter import host_key
+
+__author__ = 'myh '
+__date__ = '2026/10/18 '
+
+# 进程内的统一抓取调度：
+# 1. 任务级：各任务按优先级进入同一个队列，由共享工作线程执行，相同 key 的在途任务合并，可设置截止时间；
+# 2. 请求级：每个 HTTP 请求发送前按主机占用并发名额，名额按优先级分配，
+#    因此实时行情请求只需等待正在进行的请求结束，不会排在几千个历史数据请求后面。
+# 优先级数值越小越优先。
+PRIORITY_SPOT = 0
+PRIORITY_DEFAULT = 5
+PRIORITY_BACKFILL = 9
+
+# 各主机同时在途的请求数，可通过 INSTOCK_HOST_BUDGETS="push2his.eastmoney.com=12,sina=2" 覆盖
+DEFAULT_HOST_BUDGETS = {
+    'push2.eastmoney.com': 6,
+    'push2his.eastmoney.com': 8,
+    'datacenter-web.eastmoney.com': 4,
+    'sina': 2,
+    'zx.10jqka.com.cn': 4,
+    'default': 6,
+}
+
+_priority = contextvars.ContextVar('instock_fetch_priority', default=PRIORITY_DEFAULT)
+
+
+def current_priority():
+    return _priority.get()
+
+
+@contextmanager
+def fetch_priority(priority):
+    """在该上下文（及其提交的任务、异步抓取）中发出的请求使用指定优先级，也可用作装饰器"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class DeadlineExceeded(TimeoutError):
+    """任务在截止时间之前没有开始执行"""
+
+
+def _parse_env_budgets():
+    budgets = {}
+    for item in os.environ.get('INSTOCK_HOST_BUDGETS', '').split(','):
+        if '=' not in item:
+            continue
+        host, value = item.split('=', 1)
+        try:
+            budgets[host.strip()] = max(1, int(value))
+        except ValueError:
+            continue
+    return budgets
+
+
+class _host_slots:
+    def __init__(self, budget):
+        self.budget = budget
+        self.in_use = 0
+        self.waiters = []
+
+
+class _timing:
+    def __init__(self):
+        self.count = 0
+        self.wait = 0.0
+        self.wait_max = 0.0
+        self.service = 0.0
+
+    def add(self, wait, service=0.0):
+        self.count += 1
+        self.wait += wait
+        self.wait_max = max(self.wait_max, wait)
+        self.service += service
+
+    def stats(self):
+        n = max(self.count, 1)
+        return {
+            'count': self.count,
+            'wait_avg': round(self.wait / n, 4),
+            'wait_max': round(self.wait_max, 4),
+            'service_avg': round(self.service / n, 4),
+        }
+
+
+class fetch_scheduler(metaclass=singleton_type):
+    def __init__(self, workers=None):
+        if workers is None:
+            try:
+                workers = int(os.environ.get('INSTOCK_FETCH_WORKERS', '') or 16)
+            except ValueError:
+                workers = 16
+        self.workers = max(1, workers)
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._hosts = {}
+        self._budgets = dict(DEFAULT_HOST_BUDGETS, **_parse_env_budgets())
+        self._queue = []
+        self._inflight = {}
+        self._threads = []
+        self._task_stats = {}
+        self._slot_stats = {}
+        self._deduped = 0
+        self._expired = 0
+
+    # ---------- 请求级：按主机的并发名额 ----------
+    def _host(self, key):
+        slots = self._hosts.get(key)
+        if slots is None:
+            slots = _host_slots(self._budgets.get(key, self._budgets['default']))
+            self._hosts[key] = slots
+        return slots
+
+    @contextmanager
+    def slot(self, url_or_host, priority=None):
+        """占用一个主机并发名额直到请求结束；名额紧张时按优先级、先来后到分配"""
+        key = host_key(url_or_host)
+        if priority is None:
+            priority = current_priority()
+        entry = (priority, next(self._seq))
+        started = time.monotonic()
+        with self._cond:
+            slots = self._host(key)
+            heapq.heappush(slots.waiters, entry)
+            while slots.in_use >= slots.budget or slots.waiters[0] != entry:
+                self._cond.wait()
+            heapq.heappop(slots.waiters)
+            slots.in_use += 1
+            acquired = time.monotonic()
+        try:
+            yield
+        finally:
+            finished = time.monotonic()
+            with self._cond:
+                slots.in_use -= 1
+                self._slot_stats.setdefault((key, priority), _timing()).add(acquired - started, finished - acquired)
+                self._cond.notify_all()
+
+    # ---------- 任务级：优先级队列 ----------
+    def submit(self, fn, *args, priority=PRIORITY_DEFAULT, deadline=None, key=None, **kwargs):
+        """
+        提交抓取任务
+        :param priority: 优先级，数值越小越优先，任务内发出的请求沿用该优先级
+        :param deadline: time.monotonic() 时间点，到点仍未开始则以 DeadlineExceeded 结束
+        :param key: 去重键，相同 key 的任务在途时直接返回同一个 Future
+        :return: concurrent.futures.Future
+        """
+        with self._cond:
+            if key is not None and key in self._inflight:
+                self._deduped += 1
+                return self._inflight[key]
+            future = concurrent.futures.Future()
+            ctx = contextvars.copy_context()
+            task = (fn, args, kwargs, ctx, future, key, deadline, time.monotonic())
+            heapq.heappush(self._queue, (priority, next(self._seq), task))
+            if key is not None:
+                self._inflight[key] = future
+            self._ensure_workers()
+            self._cond.notify_all()
+        return future
+
+    def map(self, fn, iterable, priority=PRIORITY_DEFAULT, key=None):
+        """对每个元素提交任务，返回 Future 列表；key 为生成去重键的函数"""
+        return [self.submit(fn, item, priority=priority, key=None if key is None else key(item))
+                for item in iterable]
+
+    def _ensure_workers(self):
+        self._threads = [t for t in self._threads if t.is_alive()]
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name=f"fetch-scheduler-{len(self._threads)}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                priority, _, task = heapq.heappop(self._queue)
+            fn, args, kwargs, ctx, future, key, deadline, submitted = task
+            started = time.monotonic()
+            try:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                if deadline is not None and started > deadline:
+                    self._expired += 1
+                    future.set_exception(DeadlineExceeded(f"任务等待{started - submitted:.1f}秒后超过截止时间"))
+                    continue
+                try:
+                    result = ctx.run(self._run, fn, args, kwargs, priority)
+                except BaseException as e:
+                    future.set_exception(e)
+                else:
+                    future.set_result(result)
+            finally:
+                finished = time.monotonic()
+                with self._cond:
+                    if key is not None and self._inflight.get(key) is future:
+                        del self._inflight[key]
+                    self._task_stats.setdefault(priority, _timing()).add(started - submitted, finished - started)
+
+    @staticmethod
+    def _run(fn, args, kwargs, priority):
+        _priority.set(priority)
+        return fn(*args, **kwargs)
+
+    def stats(self):
+        """任务按优先级、请求按 (主机, 优先级) 统计排队等待与服务耗时"""
+        with self._cond:
+            return {
+                'queued': len(self._queue),
+                'inflight_keys': len(self._inflight),
+                'deduped': self._deduped,
+                'expired': self._expired,
+                'tasks': {priority: t.stats() for priority, t in sorted(self._task_stats.items())},
+                'hosts': {f"{host}@{priority}": t.stats() for (host, priority), t in sorted(self._slot_stats.items())},
+                'host_in_use': {host: slots.in_use for host, slots in self._hosts.items()},
+            }
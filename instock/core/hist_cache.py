@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import time
+import atexit
+import shutil
+import logging
+import threading
+from instock.lib.byte_size import parse_size
+from instock.lib.file_lock import locked
+
+__author__ = 'myh '
+__date__ = '2026/10/18 '
+
+# 历史数据 pickle 缓存目录的容量管理。
+# 旧缓存按抓取起始日分目录 cache/hist/<yyyymm>/<起始日>/，每个交易日会新增一整份全市场数据，
+# 这里按起始日目录记账（字节数、文件数、最近访问时间），记账保存在 cache/hist/cache_index.json，
+# 检查容量时不需要遍历目录树。
+# 多个进程（抓取任务、web 服务）共用同一个记账文件：每个进程只记录自己的增量（新写入的字节数、文件数、
+# 访问时间、删除的目录），保存时在文件锁 cache_index.json.lock 下读出磁盘上的记账合并增量后再写回，
+# 不会互相覆盖。增量在距上次保存超过 _SAVE_INTERVAL 秒的写入时、回收时和进程退出时保存。
+# 回收策略：最新的 N 个起始日目录和当前使用的目录始终保留，
+# 其余目录按最近访问时间从旧到新删除，直到总量不超过预算。
+# INSTOCK_HIST_CACHE_BUDGET  容量预算，支持 K/M/G 后缀，默认 5G
+# INSTOCK_HIST_CACHE_KEEP    始终保留的最新起始日目录数，默认 2
+INDEX_FILE = 'cache_index.json'
+DEFAULT_BUDGET = '5G'
+DEFAULT_KEEP = 2
+# 读取时最近访问时间的更新间隔（秒），避免每次读取都标记记账需要保存
+_TOUCH_INTERVAL = 60
+# 写入后自动保存记账的最小间隔（秒）
+_SAVE_INTERVAL = 60
+
+
+def default_budget():
+    try:
+        return parse_size(os.environ.get('INSTOCK_HIST_CACHE_BUDGET') or DEFAULT_BUDGET)
+    except ValueError:
+        return parse_size(DEFAULT_BUDGET)
+
+
+def default_keep():
+    try:
+        return max(0, int(os.environ.get('INSTOCK_HIST_CACHE_KEEP') or DEFAULT_KEEP))
+    except ValueError:
+        return DEFAULT_KEEP
+
+
+def _is_start(name):
+    return len(name) == 8 and name.isdigit()
+
+
+class hist_cache_manager:
+    def __init__(self, root):
+        self.root = root
+        self.index_file = os.path.join(root, INDEX_FILE)
+        self.lock_file = f"{self.index_file}.lock"
+        self._lock = threading.Lock()
+        self._entries = None
+        self._dirty = False
+        # 上次保存以来本进程的增量，保存时合并到磁盘上的记账
+        self._delta = {}
+        self._removed = set()
+        self._replace = False
+        self._saved_at = time.time()
+
+    def _start_dir(self, start):
+        return os.path.join(self.root, start[0:6], start)
+
+    def _read_index(self):
+        """磁盘上的记账，文件缺失或损坏返回 None"""
+        try:
+            with open(self.index_file, 'r') as f:
+                return json.load(f)['starts']
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.error(f"hist_cache.hist_cache_manager._read_index处理异常：{self.index_file}{e}")
+            return None
+
+    def _load(self):
+        if self._entries is not None:
+            return self._entries
+        self._entries = self._read_index()
+        if self._entries is None:
+            self._entries = self._scan()
+            self._dirty = True
+        return self._entries
+
+    def _scan(self):
+        """遍历目录树重新记账，只在记账文件缺失、损坏或手动重建时执行"""
+        entries = {}
+        if not os.path.isdir(self.root):
+            return entries
+        for month in os.listdir(self.root):
+            month_dir = os.path.join(self.root, month)
+            if not (len(month) == 6 and month.isdigit() and os.path.isdir(month_dir)):
+                continue
+            for start in os.listdir(month_dir):
+                start_dir = os.path.join(month_dir, start)
+                if not (_is_start(start) and os.path.isdir(start_dir)):
+                    continue
+                size, files, accessed = 0, 0, os.path.getmtime(start_dir)
+                with os.scandir(start_dir) as it:
+                    for item in it:
+                        if item.is_file():
+                            stat = item.stat()
+                            size += stat.st_size
+                            files += 1
+                            accessed = max(accessed, stat.st_atime, stat.st_mtime)
+                entries[start] = {'bytes': size, 'files': files, 'accessed': accessed}
+        return entries
+
+    def rebuild(self):
+        with self._lock:
+            self._entries = self._scan()
+            self._delta.clear()
+            self._removed.clear()
+            self._replace = True
+            self._dirty = True
+            self._save()
+            return dict(self._entries)
+
+    def _delta_entry(self, start):
+        self._removed.discard(start)
+        return self._delta.setdefault(start, {'bytes': 0, 'files': 0, 'accessed': 0})
+
+    def record_write(self, start, nbytes):
+        now = time.time()
+        with self._lock:
+            entry = self._load().setdefault(start, {'bytes': 0, 'files': 0, 'accessed': 0})
+            entry['bytes'] += nbytes
+            entry['files'] += 1
+            entry['accessed'] = now
+            delta = self._delta_entry(start)
+            delta['bytes'] += nbytes
+            delta['files'] += 1
+            delta['accessed'] = now
+            self._dirty = True
+            if now - self._saved_at >= _SAVE_INTERVAL:
+                self._save()
+
+    def record_read(self, start):
+        now = time.time()
+        with self._lock:
+            entry = self._load().get(start)
+            if entry is not None and now - entry['accessed'] > _TOUCH_INTERVAL:
+                entry['accessed'] = now
+                self._delta_entry(start)['accessed'] = now
+                self._dirty = True
+
+    def total_bytes(self):
+        with self._lock:
+            return sum(entry['bytes'] for entry in self._load().values())
+
+    def plan(self, budget=None, keep=None, protect=()):
+        """按回收策略计算需要删除的起始日目录，不修改磁盘"""
+        budget = default_budget() if budget is None else budget
+        keep = default_keep() if keep is None else keep
+        with self._lock:
+            entries = self._load()
+            kept = set(sorted(entries, reverse=True)[:keep]) | set(protect)
+            total = sum(entry['bytes'] for entry in entries.values())
+            evict = []
+            for start in sorted((s for s in entries if s not in kept), key=lambda s: (entries[s]['accessed'], s)):
+                if total <= budget:
+                    break
+                evict.append(start)
+                total -= entries[start]['bytes']
+            return evict
+
+    def enforce(self, budget=None, keep=None, protect=(), dry_run=False):
+        """
+        删除超出预算的起始日目录
+        :param protect: 当前正在使用的起始日，不会被删除
+        :return: {'evicted': [起始日], 'freed': 字节数, 'total': 剩余字节数}
+        """
+        # 先合并其他进程保存的记账，按全局的用量计算回收
+        self.refresh()
+        evict = self.plan(budget, keep, protect)
+        freed = 0
+        with self._lock:
+            entries = self._load()
+            if dry_run:
+                freed = sum(entries[start]['bytes'] for start in evict)
+                total = sum(entry['bytes'] for entry in entries.values()) - freed
+                return {'evicted': evict, 'freed': freed, 'total': total}
+            evicted = []
+            for start in evict:
+                start_dir = self._start_dir(start)
+                shutil.rmtree(start_dir, ignore_errors=True)
+                if os.path.isdir(start_dir):
+                    logging.error(f"hist_cache.enforce处理异常：{start_dir}无法删除")
+                    continue
+                try:
+                    os.rmdir(os.path.dirname(start_dir))  # 月目录已空时一并删除
+                except OSError:
+                    pass
+                freed += entries.pop(start)['bytes']
+                self._delta.pop(start, None)
+                self._removed.add(start)
+                evicted.append(start)
+                self._dirty = True
+            self._save()
+            total = sum(entry['bytes'] for entry in entries.values())
+        return {'evicted': evicted, 'freed': freed, 'total': total}
+
+    def save(self):
+        with self._lock:
+            self._save()
+
+    def refresh(self):
+        """保存本进程的增量并读入其他进程保存的记账"""
+        with self._lock:
+            self._load()
+            self._dirty = True
+            self._save()
+
+    def _merge(self, entries):
+        for start in self._removed:
+            entries.pop(start, None)
+        for start, delta in self._delta.items():
+            entry = entries.setdefault(start, {'bytes': 0, 'files': 0, 'accessed': 0})
+            entry['bytes'] += delta['bytes']
+            entry['files'] += delta['files']
+            entry['accessed'] = max(entry['accessed'], delta['accessed'])
+        return entries
+
+    def _save(self):
+        if not self._dirty or self._entries is None:
+            return
+        try:
+            with locked(self.lock_file):
+                entries = None if self._replace else self._read_index()
+                # 磁盘上没有记账时，本进程的记账（扫描结果加增量）就是全部
+                entries = dict(self._entries) if entries is None else self._merge(entries)
+                tmp_file = f"{self.index_file}.{os.getpid()}.tmp"
+                with open(tmp_file, 'w') as f:
+                    json.dump({'starts': entries}, f)
+                os.replace(tmp_file, self.index_file)
+            self._entries = entries
+            self._delta.clear()
+            self._removed.clear()
+            self._replace = False
+            self._dirty = False
+            self._saved_at = time.time()
+        except Exception as e:
+            logging.error(f"hist_cache.hist_cache_manager._save处理异常：{self.index_file}{e}")
+
+    def stats(self):
+        with self._lock:
+            entries = self._load()
+            return {
+                'starts': len(entries),
+                'files': sum(entry['files'] for entry in entries.values()),
+                'bytes': sum(entry['bytes'] for entry in entries.values()),
+                'newest': max(entries) if entries else None,
+                'oldest': min(entries) if entries else None,
+            }
+
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+
+def get_manager(root):
+    root = os.path.abspath(root)
+    with _managers_lock:
+        manager = _managers.get(root)
+        if manager is None:
+            manager = hist_cache_manager(root)
+            _managers[root] = manager
+        return manager
+
+
+@atexit.register
+def save_all():
+    """进程退出时保存所有记账的增量"""
+    with _managers_lock:
+        managers = list(_managers.values())
+    for manager in managers:
+        manager.save()
+
+
+def _split(cache_file):
+    # cache/hist/<yyyymm>/<起始日>/<文件>
+    start_dir = os.path.dirname(cache_file)
+    start = os.path.basename(start_dir)
+    if not _is_start(start):
+        return None, None
+    return os.path.dirname(os.path.dirname(start_dir)), start
+
+
+def record_write(cache_file):
+    root, start = _split(cache_file)
+    if start is not None:
+        try:
+            get_manager(root).record_write(start, os.path.getsize(cache_file))
+        except OSError:
+            pass
+
+
+def record_read(cache_file):
+    root, start = _split(cache_file)
+    if start is not None:
+        get_manager(root).record_read(start)
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import threading
+from collections.abc import Mapping
+import numpy as np
+import pandas as pd
+import instock.core.kline_parser as kline_parser
+
+__author__ = 'myh '
+__date__ = '2026/10/18 '
+
+# 紧凑的股票历史数据容器，替代 stock_hist_data 中 {(日期,代码,名称): DataFrame} 的字典。
+# 所有股票的K线按代码连续存放在列数组中（结构数组）：
+#   day        int32   自 1970-01-01 起的天数
+#   价格等列    float32
+#   volume/amount float64（成交量、成交额数值大，float32 精度不够）
+#   offsets    int64   第 i 只股票的K线为 [offsets[i], offsets[i+1])
+# 每只股票 30 多个 Python 对象（字符串日期、Series、索引等）变成 12 个数组切片，
+# 常驻内存只剩数值本身。按字典方式访问时现场生成与原来相同列、相同 dtype（float64、
+# date 为 YYYY-MM-DD 字符串）的 DataFrame，策略代码不用修改；生成的 DataFrame 是副本，
+# 调用方可以随意修改，不会影响容器中的数据。
+# frame(key, end_date, tail) 先用 searchsorted 按日期截取再生成，避免整段字符串比较。
+WIDE_COLUMNS = ('volume', 'amount')
+
+
+# stock_hist_data 是否使用紧凑容器，INSTOCK_HIST_COMPACT=1 开启。
+# 价格以 float32 保存（约 7 位有效数字），对价格精度敏感的场景保持关闭。
+def is_hist_compact():
+    return str(os.getenv("INSTOCK_HIST_COMPACT", "")).lower() not in ("", "0", "false", "no", "off")
+
+
+def _day(value):
+    """YYYY-MM-DD 字符串、date 或 datetime 转换成天数"""
+    if isinstance(value, str):
+        return int(np.datetime64(value[0:10], 'D').astype(np.int32))
+    return int(np.datetime64(pd.Timestamp(value).date(), 'D').astype(np.int32))
+
+
+class hist_panel(Mapping):
+    def __init__(self):
+        self._keys = []
+        self._pos = {}
+        self._columns = None
+        self._chunks = {}
+        self._lengths = []
+        self._arrays = None
+        self._offsets = None
+        self._lock = threading.Lock()
+
+    # ---------- 构建 ----------
+    def add(self, key, data):
+        """加入一只股票的K线（date 升序），数据立即转换成紧凑数组，原 DataFrame 可释放"""
+        if data is None or key in self._pos:
+            return
+        with self._lock:
+            if self._columns is None:
+                self._columns = [col for col in data.columns if col != 'date']
+            chunk = {'day': kline_parser.day_numbers(data['date'].values)}
+            for col in self._columns:
+                dtype = np.float64 if col in WIDE_COLUMNS else np.float32
+                chunk[col] = np.asarray(data[col].values, dtype=dtype)
+            self._pos[key] = len(self._keys)
+            self._keys.append(key)
+            self._lengths.append(len(chunk['day']))
+            self._chunks.setdefault('day', []).append(chunk['day'])
+            for col in self._columns:
+                self._chunks.setdefault(col, []).append(chunk[col])
+            self._arrays = None
+
+    def _finish(self):
+        # 逐列拼接成连续数组，按需在第一次读取时进行
+        with self._lock:
+            if self._arrays is not None:
+                return self._arrays, self._offsets
+            if not self._keys:
+                self._arrays, self._offsets = {}, np.zeros(1, dtype=np.int64)
+                return self._arrays, self._offsets
+            self._offsets = np.concatenate(([0], np.cumsum(self._lengths))).astype(np.int64)
+            arrays = {}
+            for col in list(self._chunks):
+                arrays[col] = np.concatenate(self._chunks.pop(col))
+                arrays[col].setflags(write=False)
+            self._arrays = arrays
+            # 之后再 add 时从已拼接的数组继续
+            self._chunks = {col: [values] for col, values in arrays.items()}
+            return self._arrays, self._offsets
+
+    @classmethod
+    def from_frames(cls, frames):
+        panel = cls()
+        for key, data in frames.items():
+            panel.add(key, data)
+        return panel
+
+    # ---------- Mapping ----------
+    def __len__(self):
+        return len(self._keys)
+
+    def __iter__(self):
+        return iter(list(self._keys))
+
+    def __contains__(self, key):
+        return key in self._pos
+
+    def __getitem__(self, key):
+        return self.frame(key)
+
+    # ---------- 读取 ----------
+    def bars(self, key):
+        """某只股票的只读列数组视图（day 为天数），不复制"""
+        i = self._pos[key]
+        arrays, offsets = self._finish()
+        begin, end = offsets[i], offsets[i + 1]
+        return {col: values[begin:end] for col, values in arrays.items()}
+
+    def frame(self, key, end_date=None, tail=None):
+        """
+        生成与原 DataFrame 相同结构的副本
+        :param end_date: 只保留该日期（含）之前的K线
+        :param tail: 只保留最后 tail 根K线
+        """
+        bars = self.bars(key)
+        days = bars['day']
+        end = len(days)
+        if end_date is not None:
+            end = int(np.searchsorted(days, _day(end_date), side='right'))
+        begin = 0 if tail is None else max(0, end - tail)
+        data = {'date': np.datetime_as_string(days[begin:end].astype('datetime64[D]'), unit='D').astype(object)}
+        for col in self._columns or ():
+            data[col] = bars[col][begin:end].astype(np.float64)
+        return pd.DataFrame(data)
+
+    def memory_report(self):
+        """紧凑容器占用与等价 DataFrame 字典占用（按首只股票估算）的对比"""
+        arrays, offsets = self._finish()
+        rows = int(offsets[-1])
+        columns = {col: int(values.nbytes) for col, values in arrays.items()}
+        nbytes = sum(columns.values()) + int(offsets.nbytes) + sys.getsizeof(self._pos) + sys.getsizeof(self._keys)
+        frames_bytes = None
+        if self._keys:
+            sample = self.frame(self._keys[0])
+            if len(sample.index) > 0:
+                per_row = sample.memory_usage(deep=True, index=True).sum() / len(sample.index)
+                frames_bytes = int(per_row * rows)
+        return {
+            'codes': len(self._keys),
+            'rows': rows,
+            'bytes': nbytes,
+            'columns': columns,
+            'frames_bytes_estimate': frames_bytes,
+            'ratio': round(frames_bytes / nbytes, 1) if frames_bytes and nbytes else None,
+        }
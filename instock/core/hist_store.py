@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import time
+import atexit
+import shutil
+import logging
+import threading
+import numpy as np
+import pandas as pd
+import instock.core.kline_parser as kline_parser
+import instock.core.adjust_factor as adjust_factor
+from instock.lib.file_lock import locked
+
+__author__ = 'myh '
+__date__ = '2026/10/18 '
+
+# 列式股票历史数据存储，替代每只股票一个 gzip pickle。
+# 每种复权方式一个目录，每列一个 .npy 文件，所有股票的K线按代码连续存放，
+# index.json 记录 代码 -> [起始行, 结束行, 抓取起始日, 数据截至的运行日期]。
+# 读取时以 mmap 方式打开，任一股票的K线都是 numpy 零拷贝视图，多个作业进程共享操作系统页缓存。
+#   cache/hist/store/qfq/CURRENT            当前版本目录名
+#   cache/hist/store/qfq/<版本>/date.npy    int32，自 1970-01-01 起的天数
+#   cache/hist/store/qfq/<版本>/open.npy    float64，其余数值列同理
+#   cache/hist/store/qfq/<版本>/index.json
+# 写入先缓存在内存，flush() 合并当前版本写出新版本目录，再原子替换 CURRENT，
+# 读方始终看到完整的版本；保留上一个版本，避免正在打开的进程读到被删除的目录。
+# 多个作业进程和 web 进程会同时 flush：整个 flush 在文件锁 <存储目录>/LOCK 下进行，
+# 取得锁后重新读取 CURRENT 再合并，不会丢掉其他进程刚写入的代码。
+# raw 存储保存不复权K线，多一列 factor.npy（后复权累计因子），复权价格读取时计算，见 adjust_factor。
+cpath_current = os.path.dirname(os.path.dirname(__file__))
+store_root = os.path.join(cpath_current, 'cache', 'hist', 'store')
+
+HIST_COLUMNS = kline_parser.HIST_COLUMNS
+VALUE_COLUMNS = HIST_COLUMNS[1:]
+INDEX_FILE = 'index.json'
+CURRENT_FILE = 'CURRENT'
+LOCK_FILE = 'LOCK'
+KEEP_VERSIONS = 2
+RAW = 'raw'
+
+
+def store_columns(adjust):
+    """存储的列，raw 存储附带复权因子列"""
+    if adjust == RAW:
+        return HIST_COLUMNS + (adjust_factor.FACTOR_COLUMN,)
+    return HIST_COLUMNS
+
+
+def _days_to_dates(days):
+    return np.datetime_as_string(np.asarray(days, dtype=np.int32).astype('datetime64[D]'), unit='D')
+
+
+class hist_store:
+    def __init__(self, adjust='qfq', root=None):
+        self.adjust = adjust
+        self.path = os.path.join(root or store_root, adjust or 'none')
+        self.columns = store_columns(adjust)
+        self._lock = threading.RLock()
+        self._version = None
+        self._columns = {}
+        self._index = {}
+        self._pending = {}
+
+    # ---------- 读取 ----------
+    def _current_version(self):
+        try:
+            with open(os.path.join(self.path, CURRENT_FILE), 'r') as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _open(self):
+        with self._lock:
+            for _ in range(3):
+                version = self._current_version()
+                if version is None:
+                    self._version, self._columns, self._index = None, {}, {}
+                    return
+                if version == self._version:
+                    return
+                version_dir = os.path.join(self.path, version)
+                try:
+                    with open(os.path.join(version_dir, INDEX_FILE), 'r') as f:
+                        index = json.load(f)['codes']
+                    columns = {col: np.load(os.path.join(version_dir, f"{col}.npy"), mmap_mode='r')
+                               for col in self.columns}
+                except FileNotFoundError:
+                    # 刚被其他进程替换并清理，重新读取 CURRENT
+                    continue
+                self._version, self._columns, self._index = version, columns, index
+                return
+            raise RuntimeError(f"hist_store无法打开{self.path}")
+
+    def refresh(self):
+        """重新打开最新版本（其他进程 flush 之后调用）"""
+        with self._lock:
+            self._version = None
+            self._open()
+
+    def entry(self, code):
+        """代码的存储信息 {'start': 抓取起始日YYYYMMDD, 'through': 运行日期YYYY-MM-DD, 'rows': 行数}，没有返回 None"""
+        with self._lock:
+            pending = self._pending.get(code)
+            if pending is not None:
+                return {'start': pending[1], 'through': pending[2], 'rows': len(pending[0]['date'])}
+            self._open()
+            item = self._index.get(code)
+        if item is None:
+            return None
+        begin, end, start, through = item
+        return {'start': start, 'through': through, 'rows': end - begin}
+
+    def covers(self, code, date_start, through=None):
+        """存储的数据是否覆盖从 date_start 开始、截至 through 运行日期的历史"""
+        entry = self.entry(code)
+        if entry is None or entry['start'] > date_start:
+            return False
+        return through is None or entry['through'] >= through
+
+    def codes(self):
+        with self._lock:
+            self._open()
+            return sorted(set(self._index) | set(self._pending))
+
+    def bars(self, code):
+        """
+        某只股票的K线列数组，date 为 int32 天数，其余为 float64。
+        已落盘的数据是只读 mmap 视图，不复制。
+        :return: {列名: ndarray}，没有该代码返回 None
+        """
+        with self._lock:
+            pending = self._pending.get(code)
+            if pending is not None:
+                return pending[0]
+            self._open()
+            item = self._index.get(code)
+            columns = self._columns
+        if item is None:
+            return None
+        begin, end = item[0], item[1]
+        return {col: columns[col][begin:end] for col in self.columns}
+
+    def get(self, code):
+        """与原 pickle 缓存相同结构的 DataFrame（date 为 YYYY-MM-DD 字符串），可写"""
+        bars = self.bars(code)
+        if bars is None:
+            return None
+        data = {'date': _days_to_dates(bars['date']).astype(object)}
+        for col in self.columns[1:]:
+            data[col] = np.array(bars[col], dtype=np.float64)
+        return pd.DataFrame(data)
+
+    # ---------- 写入 ----------
+    def put(self, code, stock, start, through):
+        """
+        缓存一只股票的完整历史，flush() 时落盘
+        :param stock: CN_STOCK_HIST_DATA 列（raw 存储另加 factor 列）的 DataFrame，按日期升序
+        :param start: 抓取起始日 YYYYMMDD
+        :param through: 运行日期 YYYY-MM-DD
+        """
+        bars = {'date': kline_parser.day_numbers(stock['date'].values)}
+        for col in self.columns[1:]:
+            bars[col] = np.asarray(stock[col].values, dtype=np.float64)
+        with self._lock:
+            self._pending[code] = (bars, start, through)
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self):
+        """把内存中的写入与当前版本合并写出新版本，返回写入的代码数"""
+        with self._lock:
+            if not self._pending:
+                return 0
+            with locked(os.path.join(self.path, LOCK_FILE)):
+                return self._flush()
+
+    def _flush(self):
+        # 调用方持有进程内锁和文件锁；_open() 重新读取 CURRENT，合并的是其他进程最新写出的版本
+        pending = dict(self._pending)
+        self._open()
+        old_index, old_columns = self._index, self._columns
+        order = sorted(set(old_index) | set(pending))
+
+        version = f"{time.time_ns()}"
+        version_dir = os.path.join(self.path, version)
+        os.makedirs(version_dir, exist_ok=True)
+        index = {}
+        offset = 0
+        for code in order:
+            if code in pending:
+                bars, start, through = pending[code]
+                rows = len(bars['date'])
+            else:
+                begin, end, start, through = old_index[code]
+                rows = end - begin
+            index[code] = [offset, offset + rows, start, through]
+            offset += rows
+
+        # 逐列拼接写出，峰值内存只有一列
+        for col in self.columns:
+            pieces = []
+            for code in order:
+                if code in pending:
+                    pieces.append(pending[code][0][col])
+                else:
+                    begin, end = old_index[code][0], old_index[code][1]
+                    pieces.append(old_columns[col][begin:end])
+            dtype = np.int32 if col == 'date' else np.float64
+            values = np.concatenate(pieces).astype(dtype, copy=False) if pieces else np.empty(0, dtype=dtype)
+            np.save(os.path.join(version_dir, f"{col}.npy"), values)
+        with open(os.path.join(version_dir, INDEX_FILE), 'w') as f:
+            json.dump({'adjust': self.adjust, 'rows': offset, 'codes': index}, f)
+
+        tmp_file = os.path.join(self.path, f"{CURRENT_FILE}.{os.getpid()}.tmp")
+        with open(tmp_file, 'w') as f:
+            f.write(version)
+        os.replace(tmp_file, os.path.join(self.path, CURRENT_FILE))
+
+        for code, value in pending.items():
+            if self._pending.get(code) is value:
+                del self._pending[code]
+        self._open()
+        self._cleanup(version)
+        return len(pending)
+
+    def _cleanup(self, current):
+        versions = sorted(name for name in os.listdir(self.path)
+                          if name.isdigit() and os.path.isdir(os.path.join(self.path, name)))
+        keep = set(versions[-KEEP_VERSIONS:]) | {current}
+        for name in versions:
+            if name not in keep:
+                # Windows 下仍被映射的文件删除会失败，下次再清理
+                shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
+
+    def stats(self):
+        with self._lock:
+            self._open()
+            size = 0
+            if self._version is not None:
+                version_dir = os.path.join(self.path, self._version)
+                size = sum(os.path.getsize(os.path.join(version_dir, name)) for name in os.listdir(version_dir))
+            return {
+                'adjust': self.adjust,
+                'version': self._version,
+                'codes': len(self._index),
+                'rows': sum(end - begin for begin, end, _, _ in self._index.values()),
+                'bytes': size,
+                'pending': len(self._pending),
+            }
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(adjust='qfq'):
+    """进程内每种复权方式共享一个存储实例"""
+    with _stores_lock:
+        store = _stores.get(adjust)
+        if store is None or os.path.dirname(store.path) != store_root:
+            store = hist_store(adjust)
+            _stores[adjust] = store
+        return store
+
+
+def flush_all():
+    with _stores_lock:
+        stores = list(_stores.values())
+    written = 0
+    for store in stores:
+        try:
+            written += store.flush()
+        except Exception as e:
+            logging.error(f"hist_store.flush_all处理异常：{store.path}{e}")
+    return written
+
+
+# 进程退出时把未落盘的写入（如 web 服务单只股票的抓取）写出
+atexit.register(flush_all)
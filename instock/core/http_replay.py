@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from urllib.parse import urlparse, parse_qsl, urlencode
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+__author__ = 'myh '
+__date__ = '2026/10/18 '
+
+# HTTP 录制/回放，用于离线压测抓取吞吐、调整并发和限流参数。
+# INSTOCK_HTTP_MODE=record  真实访问网络，同时把 请求->响应 追加写入压缩归档
+# INSTOCK_HTTP_MODE=replay  不访问网络，从归档回放响应
+# INSTOCK_HTTP_ARCHIVE      归档文件路径，默认 instock/cache/http/archive.jsonl.gz
+# 回放时可注入：
+# INSTOCK_HTTP_REPLAY_LATENCY     每个请求的延迟（毫秒），默认 0
+# INSTOCK_HTTP_REPLAY_ERROR_RATE  返回 503 的概率，默认 0
+# INSTOCK_HTTP_REPLAY_429_RATE    返回 429 的概率，默认 0
+# INSTOCK_HTTP_REPLAY_SEED        随机种子，保证压测可复现
+cpath_current = os.path.dirname(os.path.dirname(__file__))
+
+# 不参与匹配的易变参数（时间戳、jsonp 回调名）
+VOLATILE_PARAMS = ('_', 'cb', 'callback')
+# 录制时不保存的响应头，回放的 body 已经解压
+_DROP_HEADERS = ('content-encoding', 'content-length', 'transfer-encoding', 'set-cookie')
+
+
+def mode():
+    value = str(os.environ.get("INSTOCK_HTTP_MODE", "")).lower()
+    return value if value in ('record', 'replay') else None
+
+
+def archive_path():
+    return os.environ.get("INSTOCK_HTTP_ARCHIVE") or os.path.join(cpath_current, 'cache', 'http', 'archive.jsonl.gz')
+
+
+def _env_float(name, default=0.0):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def request_key(method, url, body=None):
+    """
+    请求匹配键：方法 + 主机 + 路径 + 排序后的查询参数。
+    忽略协议、东方财富的数字镜像前缀（80.push2 -> push2）和易变参数。
+    """
+    parsed = urlparse(url)
+    host = parsed.netloc.split(':')[0].lower()
+    head, _, rest = host.partition('.')
+    if head.isdigit() and rest:
+        host = rest
+    query = sorted((k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True) if k not in VOLATILE_PARAMS)
+    key = f"{method.upper()} {host}{parsed.path}?{urlencode(query)}"
+    if body:
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        key = f"{key}#{hashlib.sha1(body).hexdigest()}"
+    return key
+
+
+class http_archive:
+    """gzip 压缩的 JSON Lines 归档，每行一个 请求->响应；同一键以最后一次录制为准"""
+
+    def __init__(self, path=None):
+        self.path = path or archive_path()
+        self._lock = threading.Lock()
+        self._entries = None
+
+    def load(self):
+        with self._lock:
+            if self._entries is None:
+                entries = {}
+                if os.path.isfile(self.path):
+                    with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+                        for line in f:
+                            line = line.strip()
+                            if line:
+                                entry = json.loads(line)
+                                entries[entry['key']] = entry
+                self._entries = entries
+            return self._entries
+
+    def get(self, key):
+        return self.load().get(key)
+
+    def append(self, key, url, response):
+        entry = {
+            'key': key,
+            'url': url,
+            'status': response.status_code,
+            'reason': response.reason,
+            'encoding': response.encoding,
+            'headers': {k: v for k, v in response.headers.items() if k.lower() not in _DROP_HEADERS},
+            'body': base64.b64encode(response.content).decode('ascii'),
+        }
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            # gzip 支持多成员拼接，追加写入不需要重写整个文件
+            with gzip.open(self.path, 'at', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            if self._entries is not None:
+                self._entries[key] = entry
+
+
+class recording_adapter(BaseAdapter):
+    """包装原有适配器，真实发送请求并把成功拿到的响应写入归档"""
+
+    def __init__(self, inner, archive):
+        super().__init__()
+        self.inner = inner
+        self.archive = archive
+
+    def send(self, request, **kwargs):
+        response = self.inner.send(request, **kwargs)
+        try:
+            self.archive.append(request_key(request.method, request.url, request.body), request.url, response)
+        except Exception as e:
+            logging.error(f"http_replay.recording_adapter处理异常：{request.url}{e}")
+        return response
+
+    def close(self):
+        self.inner.close()
+
+
+class replay_adapter(BaseAdapter):
+    """从归档回放响应，可注入延迟、503 和 429"""
+
+    def __init__(self, archive, latency=None, error_rate=None, throttle_rate=None, seed=None):
+        super().__init__()
+        self.archive = archive
+        self.latency = _env_float("INSTOCK_HTTP_REPLAY_LATENCY") / 1000 if latency is None else latency
+        self.error_rate = _env_float("INSTOCK_HTTP_REPLAY_ERROR_RATE") if error_rate is None else error_rate
+        self.throttle_rate = _env_float("INSTOCK_HTTP_REPLAY_429_RATE") if throttle_rate is None else throttle_rate
+        if seed is None and os.environ.get("INSTOCK_HTTP_REPLAY_SEED"):
+            seed = int(os.environ["INSTOCK_HTTP_REPLAY_SEED"])
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _roll(self):
+        with self._lock:
+            return self._random.random()
+
+    def send(self, request, **kwargs):
+        if self.latency > 0:
+            time.sleep(self.latency)
+        roll = self._roll()
+        if roll < self.throttle_rate:
+            return self._build(request, 429, b'', {'Retry-After': '1'})
+        if roll < self.throttle_rate + self.error_rate:
+            return self._build(request, 503, b'')
+
+        entry = self.archive.get(request_key(request.method, request.url, request.body))
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if entry is None:
+            raise requests.exceptions.ConnectionError(f"http_replay：归档中没有该请求 {request.url}", request=request)
+        return self._build(request, entry['status'], base64.b64decode(entry['body']), entry.get('headers'),
+                           entry.get('reason'), entry.get('encoding'))
+
+    def _build(self, request, status, body, headers=None, reason=None, encoding=None):
+        response = requests.Response()
+        response.status_code = status
+        response.reason = reason or ''
+        response.headers = CaseInsensitiveDict(headers or {})
+        response._content = body
+        response.encoding = encoding
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+_archive = None
+_archive_lock = threading.Lock()
+
+
+def shared_archive():
+    global _archive
+    with _archive_lock:
+        if _archive is None or _archive.path != archive_path():
+            _archive = http_archive()
+        return _archive
+
+
+def install(session):
+    """按 INSTOCK_HTTP_MODE 给会话挂载录制/回放适配器，未开启时原样返回"""
+    current = mode()
+    if current is None:
+        return session
+    archive = shared_archive()
+    if current == 'replay':
+        adapter = replay_adapter(archive)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+    else:
+        for prefix in ("http://", "https://"):
+            session.mount(prefix, recording_adapter(session.get_adapter(prefix), archive))
+    return session
+
+
+_session = None
+_session_mode = None
+_session_lock = threading.Lock()
+
+
+def get(url, **kwargs):
+    """替代模块级 requests.get，开启录制/回放时走共享会话"""
+    global _session, _session_mode
+    current = mode()
+    if current is None:
+        return requests.get(url, **kwargs)
+    with _session_lock:
+        if _session is None or _session_mode != current:
+            _session = install(requests.Session())
+            _session_mode = current
+        session = _session
+    return session.get(url, **kwargs)
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pandas as pd
+import instock.core.tablestructure as tbs
+
+__author__ = 'myh '
+__date__ = '2026/10/18 '
+
+# 东方财富 kline 接口 fields2=f51..f61 的字段顺序，与 CN_STOCK_HIST_DATA 一致：
+# 日期,开盘,收盘,最高,最低,成交量(手),成交额,振幅,涨跌幅,涨跌额,换手率
+HIST_COLUMNS = tuple(tbs.CN_STOCK_HIST_DATA['columns'])
+
+
+def parse_klines(klines):
+    """
+    一次性把 "2024-01-02,10.0,10.5,..." 形式的 kline 字符串列表转换成列数组。
+    所有行拼成一个缓冲区后整体切分，数值列一次 astype 成 float64，不逐列 to_numeric。
+    :param klines: kline 字符串列表
+    :return: (时间列字符串数组, 数值二维数组 shape=(行数, 字段数-1))
+    """
+    n = len(klines)
+    if n == 0:
+        return np.empty(0, dtype=object), np.empty((0, 0), dtype=np.float64)
+    width = klines[0].count(',') + 1
+    cells = np.array(','.join(klines).split(','), dtype=object)
+    if cells.size != n * width:
+        raise ValueError(f"kline字段数不一致：{cells.size}个字段，{n}行")
+    cells = cells.reshape(n, width)
+    raw = cells[:, 1:]
+    try:
+        values = raw.astype(np.float64)
+    except ValueError:
+        # 停牌等情况接口会返回 "-"，退回逐个容错转换。
+        values = pd.to_numeric(pd.Series(raw.ravel()), errors='coerce').to_numpy(np.float64).reshape(raw.shape)
+    return cells[:, 0], values
+
+
+def day_numbers(dates):
+    """把 YYYY-MM-DD 字符串数组转换成自 1970-01-01 起的 int32 天数"""
+    return np.asarray(dates, dtype='datetime64[D]').astype(np.int32)
+
+
+def kline_frame(klines, columns):
+    """
+    kline 字符串列表转换成 DataFrame
+    :param columns: 列名，第一列为时间（保持字符串），其余为数值列
+    """
+    dates, values = parse_klines(klines)
+    if len(dates) == 0:
+        return pd.DataFrame(columns=list(columns))
+    data = {columns[0]: dates}
+    for i, col in enumerate(columns[1:]):
+        data[col] = values[:, i]
+    return pd.DataFrame(data)
+
+
+def p_change(close):
+    """日涨跌幅（%），与 talib.ROC(close, 1) 一致，首行及前收盘为 0 时为 0"""
+    close = np.asarray(close, dtype=np.float64)
+    out = np.zeros(len(close), dtype=np.float64)
+    if len(close) > 1:
+        prev = close[:-1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rate = (close[1:] / prev - 1.0) * 100
+        out[1:] = np.where(prev != 0, rate, 0.0)
+        out[np.isnan(out)] = 0.0
+    return out
+
+
+def add_hist_derived(data):
+    """在 CN_STOCK_HIST_DATA 列的数据上计算 p_change，并把成交量单位从手变成股"""
+    data.loc[:, 'p_change'] = p_change(data['close'].values)
+    data['volume'] = data['volume'].values.astype('double') * 100
+    return data
+
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import logging
+import os
+import time
+import pandas as pd
+
+__author__ = 'myh '
+__date__ = '2026/10/18 '
+
+# 参考数据（股票市场代码表、交易日历等）磁盘缓存，跨进程复用，避免每个任务启动都访问网络。
+# 缓存目录可通过 INSTOCK_REF_CACHE_ROOT 指定，有效期（秒）通过 INSTOCK_REF_CACHE_TTL 指定，默认一天。
+cpath_current = os.path.dirname(os.path.dirname(__file__))
+DEFAULT_TTL = 24 * 60 * 60
+
+
+def cache_root():
+    return os.environ.get("INSTOCK_REF_CACHE_ROOT") or os.path.join(cpath_current, 'cache', 'ref')
+
+
+def default_ttl():
+    try:
+        return float(os.environ.get("INSTOCK_REF_CACHE_TTL", DEFAULT_TTL))
+    except ValueError:
+        return DEFAULT_TTL
+
+
+def cache_file(name):
+    return os.path.join(cache_root(), f"{name}.pickle")
+
+
+def age(name):
+    """返回缓存已存在的秒数，不存在返回 None"""
+    path = cache_file(name)
+    if not os.path.isfile(path):
+        return None
+    return max(0.0, time.time() - os.path.getmtime(path))
+
+
+def load(name):
+    path = cache_file(name)
+    if not os.path.isfile(path):
+        return None
+    try:
+        return pd.read_pickle(path)
+    except Exception as e:
+        logging.error(f"ref_cache.load处理异常：{name}{e}")
+    return None
+
+
+def save(name, value):
+    """原子写入：先写临时文件再替换，读方不会读到半个文件"""
+    path = cache_file(name)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_file = f"{path}.{os.getpid()}.tmp"
+        pd.to_pickle(value, tmp_file)
+        os.replace(tmp_file, path)
+    except Exception as e:
+        logging.error(f"ref_cache.save处理异常：{name}{e}")
+
+
+def _is_empty(value):
+    if value is None:
+        return True
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.empty
+    try:
+        return len(value) == 0
+    except TypeError:
+        return False
+
+
+def cached(name, loader, ttl=None, refresh=False):
+    """
+    读取参考数据：缓存未过期直接返回，否则调用 loader 重新获取并写入缓存。
+    loader 失败或返回空时退回使用已过期的缓存。
+    :param name: 缓存名
+    :param loader: 无参函数，返回要缓存的数据
+    :param ttl: 有效期秒数，默认 default_ttl()
+    :param refresh: 强制重新获取
+    """
+    if ttl is None:
+        ttl = default_ttl()
+    if not refresh:
+        cache_age = age(name)
+        if cache_age is not None and cache_age < ttl:
+            value = load(name)
+            if not _is_empty(value):
+                return value
+
+    value = None
+    try:
+        value = loader()
+    except Exception as e:
+        logging.error(f"ref_cache.cached处理异常：{name}{e}")
+    if _is_empty(value):
+        stale = load(name)
+        if not _is_empty(stale):
+            logging.warning(f"ref_cache.cached：{name}获取失败，使用过期缓存")
+            return stale
+        return value
+    save(name, value)
+    return value
@@ -4,6 +4,8 @@
 import os.path
 import sys
 import random
+import threading
+import time
 from instock.lib.singleton_type import singleton_type
 
 # 在项目运行时，临时将项目路径添加到环境变量
@@ -15,50 +17,151 @@ proxy_filename = os.path.join(cpath_current, 'config', 'proxy.txt')
 __author__ = 'myh '
 __date__ = '2025/1/6 '
 
+# 熔断器状态
+CLOSED = 'closed'        # 正常使用
+OPEN = 'open'            # 已剔除，冷却中
+HALF_OPEN = 'half_open'  # 冷却结束，放行一个探测请求
 
-# 读取代理
+
+class proxy_health:
+    """
+    单个代理的健康状态：延迟 EWMA、成功率、连续失败次数和熔断器。
+    连续失败达到阈值后熔断（剔除），冷却结束进入半开状态只放行一个探测请求，
+    探测成功恢复，失败则再次熔断且冷却时间加倍。
+    拿到探测的调用方可能不调用 report()，探测超过一个冷却时间没有结果时放行下一个探测。
+    """
+
+    def __init__(self, proxy, failure_threshold=3, cooldown=30.0, cooldown_max=300.0, alpha=0.3):
+        self.proxy = proxy
+        self.failure_threshold = failure_threshold
+        self.cooldown_base = cooldown
+        self.cooldown_max = cooldown_max
+        self.alpha = alpha
+        self.latency = None
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.cooldown = cooldown
+        self.opened_at = 0.0
+        self.probing = False
+        self.probe_started = 0.0
+
+    def available(self, now):
+        """是否可以被选中；冷却结束的熔断代理转为半开并放行一个探测"""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and now - self.opened_at >= self.cooldown:
+            self.state = HALF_OPEN
+            self.probing = False
+        if self.state == HALF_OPEN and self.probing and now - self.probe_started >= self.cooldown:
+            self.probing = False
+        return self.state == HALF_OPEN and not self.probing
+
+    def start_probe(self, now):
+        self.probing = True
+        self.probe_started = now
+
+    def weight(self):
+        # 平滑后的成功率 / 延迟，新代理按 1 秒延迟估计
+        success_rate = (self.successes + 1) / (self.successes + self.failures + 2)
+        return success_rate / max(self.latency if self.latency is not None else 1.0, 0.05)
+
+    def on_success(self, latency=None):
+        self.successes += 1
+        self.consecutive_failures = 0
+        if latency is not None:
+            self.latency = latency if self.latency is None else self.alpha * latency + (1 - self.alpha) * self.latency
+        if self.state != CLOSED:
+            self.state = CLOSED
+            self.cooldown = self.cooldown_base
+        self.probing = False
+
+    def on_failure(self, now):
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN:
+            self.cooldown = min(self.cooldown_max, self.cooldown * 2)
+            self._open(now)
+        elif self.state == CLOSED and self.consecutive_failures >= self.failure_threshold:
+            self._open(now)
+        self.probing = False
+
+    def _open(self, now):
+        self.state = OPEN
+        self.opened_at = now
+
+    def stats(self, now):
+        total = self.successes + self.failures
+        return {
+            'state': self.state,
+            'latency_ewma': None if self.latency is None else round(self.latency, 3),
+            'success_rate': None if total == 0 else round(self.successes / total, 3),
+            'successes': self.successes,
+            'failures': self.failures,
+            'consecutive_failures': self.consecutive_failures,
+            'cooldown_remaining': round(max(0.0, self.opened_at + self.cooldown - now), 1) if self.state == OPEN else 0.0,
+        }
+
+
+# 读取代理，按健康度加权为每个请求选择代理
 class proxys(metaclass=singleton_type):
     def __init__(self):
+        self.data = []
         try:
             with open(proxy_filename, "r") as file:
                 self.data = list(set(line.strip() for line in file.readlines() if line.strip()))
         except Exception:
-           pass
+            pass
+        self._lock = threading.Lock()
+        self._health = {proxy: proxy_health(proxy) for proxy in self.data}
+        self._random = random.Random()
 
     def get_data(self):
         return self.data
 
+    def pick(self):
+        """按健康度加权选择一个可用代理，全部熔断时返回 None（直连）"""
+        with self._lock:
+            now = time.monotonic()
+            candidates = [h for h in self._health.values() if h.available(now)]
+            if not candidates:
+                return None
+            # 半开代理优先放行探测请求，尽快确认是否恢复
+            probes = [h for h in candidates if h.state == HALF_OPEN]
+            if probes:
+                chosen = probes[0]
+                chosen.start_probe(now)
+            else:
+                chosen = self._random.choices(candidates, weights=[h.weight() for h in candidates])[0]
+            return chosen.proxy
+
     def get_proxies(self):
-        if self.data is None or len(self.data)==0:
+        proxy = self.pick()
+        if proxy is None:
             return None
-
-        proxy = random.choice(self.data)
         return {"http": proxy, "https": proxy}
 
-"""
-    def get_proxies(self):
-        if self.data is None:
-            return None
+    def report(self, proxies, ok, latency=None):
+        """
+        反馈代理请求结果
+        :param proxies: get_proxies() 的返回值
+        :param ok: 是否经代理拿到了响应（目标站点返回错误码也算代理可用）
+        :param latency: 请求耗时（秒）
+        """
+        if not proxies:
+            return
+        proxy = proxies.get("https") or proxies.get("http")
+        with self._lock:
+            health = self._health.get(proxy)
+            if health is None:
+                return
+            if ok:
+                health.on_success(latency)
+            else:
+                health.on_failure(time.monotonic())
 
-        while len(self.data) > 0:
-            proxy = random.choice(self.data)
-            if https_validator(proxy):
-                return {"http": proxy, "https": proxy}
-            self.data.remove(proxy)
-
-        return None
-
-
-from requests import head
-def https_validator(proxy):
-    headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 6.1; WOW64; rv:34.0) Gecko/20100101 Firefox/34.0',
-               'Accept': '*/*',
-               'Connection': 'keep-alive',
-               'Accept-Language': 'zh-CN,zh;q=0.8'}
-    proxies = {"http": f"{proxy}", "https": f"{proxy}"}
-    try:
-        r = head("https://data.eastmoney.com", headers=headers, proxies=proxies, timeout=3, verify=False)
-        return True if r.status_code == 200 else False
-    except Exception as e:
-        return False
-"""
\ No newline at end of file
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            return {proxy: health.stats(now) for proxy, health in self._health.items()}
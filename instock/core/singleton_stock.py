@@ -4,9 +4,12 @@
 import logging
 import concurrent.futures
 import instock.core.stockfetch as stf
+import instock.core.hist_store as hist_store
+import instock.core.hist_panel as hist_panel
 import instock.core.tablestructure as tbs
 import instock.lib.trade_time as trd
 from instock.lib.singleton_type import singleton_type
+from instock.core.fetch_scheduler import fetch_scheduler, PRIORITY_BACKFILL
 
 __author__ = 'myh '
 __date__ = '2023/3/10 '
@@ -34,26 +37,47 @@ class stock_hist_data(metaclass=singleton_type):
             self.data = None
             return
         date_start, is_cache = trd.get_trade_hist_interval(stocks[0][0])  # 提高运行效率，只运行一次
-        _data = {}
+        # 增量模式下读取一次除权除息日，只对发生除权除息的股票重新全量抓取。
+        ex_dividend = stf.fetch_stocks_ex_dividend_dates() if stf.is_hist_incremental() else None
+        # 紧凑模式下每只股票的数据到达后立即转换成列数组，不保留 DataFrame。
+        _data = hist_panel.hist_panel() if hist_panel.is_hist_compact() else {}
+        _add = _data.add if isinstance(_data, hist_panel.hist_panel) else _data.__setitem__
         try:
-            # max_workers是None还是没有给出，将默认为机器cup个数*5
-            with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
-                future_to_stock = {executor.submit(stf.fetch_stock_hist, stock, date_start, is_cache): stock for stock
-                                   in stocks}
-                for future in concurrent.futures.as_completed(future_to_stock):
-                    stock = future_to_stock[future]
-                    try:
-                        __data = future.result()
-                        if __data is not None:
-                            _data[stock] = __data
-                    except Exception as e:
-                        logging.error(f"singleton.stock_hist_data处理异常：{stock[1]}代码{e}")
+            # 以回补优先级提交到统一调度器，与其他作业共享按主机的并发名额，
+            # 同一股票同一区间的在途任务会被合并；并发线程数由调度器控制，workers 仅保留兼容。
+            # 列式存储中已是最新的股票直接以 mmap 读取，只有未命中的才提交抓取。
+            pending = []
+            for stock in stocks:
+                __data = stf.fetch_stock_hist_stored(stock, date_start)
+                if __data is not None:
+                    _add(stock, __data)
+                else:
+                    pending.append(stock)
+            scheduler = fetch_scheduler()
+            future_to_stock = {scheduler.submit(stf.fetch_stock_hist, stock, date_start, is_cache, ex_dividend,
+                                                priority=PRIORITY_BACKFILL,
+                                                key=('hist', stock[1], date_start, is_cache)): stock
+                               for stock in pending}
+            for future in concurrent.futures.as_completed(future_to_stock):
+                stock = future_to_stock[future]
+                try:
+                    __data = future.result()
+                    if __data is not None:
+                        _add(stock, __data)
+                except Exception as e:
+                    logging.error(f"singleton.stock_hist_data处理异常：{stock[1]}代码{e}")
         except Exception as e:
             logging.error(f"singleton.stock_hist_data处理异常：{e}")
+        # 新抓取的数据一次性写入列式存储，后续作业进程直接读取。
+        hist_store.flush_all()
+        # 旧的按起始日分目录的 pickle 缓存按容量预算回收，保留本次使用的目录。
+        stf.gc_hist_cache(protect=(date_start,))
         if not _data:
             self.data = None
         else:
             self.data = _data
+            if isinstance(_data, hist_panel.hist_panel):
+                logging.info(f"singleton.stock_hist_data紧凑容器：{_data.memory_report()}")
 
     def get_data(self):
         return self.data
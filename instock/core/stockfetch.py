@@ -6,9 +6,13 @@ import os.path
 import datetime
 import numpy as np
 import pandas as pd
-import talib as tl
 import instock.core.tablestructure as tbs
 import instock.lib.trade_time as trd
+import instock.core.ref_cache as ref_cache
+import instock.core.kline_parser as kline_parser
+import instock.core.hist_store as hist_store
+import instock.core.adjust_factor as adjust_factor
+import instock.core.hist_cache as hist_cache
 import instock.core.crawling.trade_date_hist as tdh
 import instock.core.crawling.fund_etf_em as fee
 import instock.core.crawling.stock_selection as sst
@@ -20,6 +24,7 @@ import instock.core.crawling.stock_fund_em as sff
 import instock.core.crawling.stock_fhps_em as sfe
 import instock.core.crawling.stock_chip_race as scr
 import instock.core.crawling.stock_limitup_reason as slr
+from instock.core.fetch_scheduler import fetch_priority, PRIORITY_SPOT
 
 __author__ = 'myh '
 __date__ = '2023/3/10 '
@@ -85,7 +90,11 @@ def _ensure_schema_columns(df: pd.DataFrame, schema_columns, rename_map=None) ->
 
 
 # 读取股票交易日历数据
-def fetch_stocks_trade_date():
+def fetch_stocks_trade_date(refresh=False):
+    return ref_cache.cached("trade_date", _fetch_stocks_trade_date, refresh=refresh)
+
+
+def _fetch_stocks_trade_date():
     try:
         data = tdh.tool_trade_date_hist_sina()
         if data is None or len(data.index) == 0:
@@ -97,7 +106,8 @@ def fetch_stocks_trade_date():
     return None
 
 
-# 读取当天股票数据
+# 读取当天股票数据，实时行情优先于历史数据回补获得请求名额
+@fetch_priority(PRIORITY_SPOT)
 def fetch_etfs(date):
     try:
         data = fee.fund_etf_spot_em()
@@ -161,7 +171,8 @@ def fetch_popular_stocks_sorted():
         logging.error(f"stockfetch.fetch_popular_stocks处理异常：{e}")
     return None
 
-# 读取当天股票数据
+# 读取当天股票数据，实时行情优先于历史数据回补获得请求名额
+@fetch_priority(PRIORITY_SPOT)
 def fetch_stocks(date):
     try:
         data = she.stock_zh_a_spot_em()
@@ -192,6 +203,20 @@ def fetch_stock_selection():
     return None
 
 
+# 读取最近一期分红送配的除权除息日，返回 代码 -> 除权除息日(YYYY-MM-DD)
+def fetch_stocks_ex_dividend_dates():
+    try:
+        data = sfe.stock_fhps_em(date=trd.get_bonus_report_date())
+        if data is None or len(data.index) == 0:
+            return {}
+        ex_dates = pd.to_datetime(data['除权除息日'], errors='coerce')
+        mask = ex_dates.notna()
+        return dict(zip(data.loc[mask, '代码'], ex_dates[mask].dt.strftime("%Y-%m-%d")))
+    except Exception as e:
+        logging.error(f"stockfetch.fetch_stocks_ex_dividend_dates处理异常：{e}")
+    return {}
+
+
 # 读取股票资金流向
 def fetch_stocks_fund_flow(index):
     try:
@@ -449,9 +474,16 @@ def fetch_etf_hist(data_base, date_start=None, date_end=None, adjust='qfq'):
     date = data_base[0]
     code = data_base[1]
 
+    is_cache = True
     if date_start is None:
         date_start, is_cache = trd.get_trade_hist_interval(date)  # 提高运行效率，只运行一次
     try:
+        if date_end is None and is_hist_store() and is_hist_raw():
+            # 与股票共用不复权存储，复权价格读取时计算
+            data = stock_hist_raw(code, date, date_start, is_cache, adjust, fee.fund_etf_hist_em)
+            if data is not None:
+                kline_parser.add_hist_derived(data)  # 计算p_change，成交量单位从手变成股。
+            return data
         if date_end is not None:
             data = fee.fund_etf_hist_em(symbol=code, period="daily", start_date=date_start, end_date=date_end,
                                         adjust=adjust)
@@ -463,9 +495,7 @@ def fetch_etf_hist(data_base, date_start=None, date_end=None, adjust='qfq'):
         data.columns = tuple(tbs.CN_STOCK_HIST_DATA['columns'])
         data = data.sort_index()  # 将数据按照日期排序下。
         if data is not None:
-            data.loc[:, 'p_change'] = tl.ROC(data['close'].values, 1)
-            data['p_change'].values[np.isnan(data['p_change'].values)] = 0.0
-            data["volume"] = data['volume'].values.astype('double') * 100  # 成交量单位从手变成股。
+            kline_parser.add_hist_derived(data)  # 计算p_change，成交量单位从手变成股。
         return data
     except Exception as e:
         logging.error(f"stockfetch.fetch_etf_hist处理异常：{e}")
@@ -473,7 +503,8 @@ def fetch_etf_hist(data_base, date_start=None, date_end=None, adjust='qfq'):
 
 
 # 读取股票历史数据
-def fetch_stock_hist(data_base, date_start=None, is_cache=True):
+# ex_dividend: 代码 -> 最近除权除息日，增量模式下用于判断是否需要重新全量抓取
+def fetch_stock_hist(data_base, date_start=None, is_cache=True, ex_dividend=None):
     date = data_base[0]
     code = data_base[1]
 
@@ -481,17 +512,44 @@ def fetch_stock_hist(data_base, date_start=None, is_cache=True):
         date_start, is_cache = trd.get_trade_hist_interval(date)  # 提高运行效率，只运行一次
         # date_end = date_end.strftime("%Y%m%d")
     try:
-        data = stock_hist_cache(code, date_start, None, is_cache, 'qfq')
+        ex_date = None if ex_dividend is None else ex_dividend.get(code)
+        if is_hist_store() and is_hist_raw():
+            data = stock_hist_raw(code, date, date_start, is_cache, 'qfq')
+        elif is_hist_store():
+            data = stock_hist_store(code, date, date_start, is_cache, 'qfq', ex_date)
+        elif is_hist_incremental():
+            data = stock_hist_cache_incremental(code, date_start, is_cache, 'qfq', ex_date, date)
+        else:
+            data = stock_hist_cache(code, date_start, None, is_cache, 'qfq')
         if data is not None:
-            data.loc[:, 'p_change'] = tl.ROC(data['close'].values, 1)
-            data['p_change'].values[np.isnan(data['p_change'].values)] = 0.0
-            data["volume"] = data['volume'].values.astype('double') * 100  # 成交量单位从手变成股。
+            kline_parser.add_hist_derived(data)  # 计算p_change，成交量单位从手变成股。
         return data
     except Exception as e:
         logging.error(f"stockfetch.fetch_stock_hist处理异常：{e}")
     return None
 
 
+# 只从列式存储读取股票历史数据，未命中返回 None，用于批量读取时跳过抓取线程。
+def fetch_stock_hist_stored(data_base, date_start):
+    if not is_hist_store():
+        return None
+    date = data_base[0]
+    code = data_base[1]
+    try:
+        raw = is_hist_raw()
+        store = hist_store.get_store(hist_store.RAW if raw else 'qfq')
+        if not _store_fresh(store, code, date_start, date):
+            return None
+        data = _slice_hist(store.get(code), date_start)
+        if raw:
+            data = adjust_factor.apply_adjust(data, 'qfq')
+        kline_parser.add_hist_derived(data)  # 计算p_change，成交量单位从手变成股。
+        return data
+    except Exception as e:
+        logging.error(f"stockfetch.fetch_stock_hist_stored处理异常：{code}代码{e}")
+    return None
+
+
 # 增加读取股票缓存方法。加快处理速度。多线程解决效率
 def stock_hist_cache(code, date_start, date_end=None, is_cache=True, adjust=''):
     cache_dir = os.path.join(stock_hist_cache_path, date_start[0:6], date_start)
@@ -505,6 +563,7 @@ def stock_hist_cache(code, date_start, date_end=None, is_cache=True, adjust=''):
     # 如果缓存存在就直接返回缓存数据。压缩方式。
     try:
         if os.path.isfile(cache_file):
+            hist_cache.record_read(cache_file)
             return pd.read_pickle(cache_file, compression="gzip")
         else:
             if date_end is not None:
@@ -520,6 +579,7 @@ def stock_hist_cache(code, date_start, date_end=None, is_cache=True, adjust=''):
             try:
                 if is_cache:
                     stock.to_pickle(cache_file, compression="gzip")
+                    hist_cache.record_write(cache_file)
             except Exception:
                 pass
             # time.sleep(1)
@@ -527,3 +587,194 @@ def stock_hist_cache(code, date_start, date_end=None, is_cache=True, adjust=''):
     except Exception as e:
         logging.error(f"stockfetch.stock_hist_cache处理异常：{code}代码{e}")
     return None
+
+
+# 按容量预算回收历史数据 pickle 缓存的起始日目录，protect 为当前使用的起始日。
+def gc_hist_cache(protect=(), budget=None, keep=None, dry_run=False):
+    try:
+        return hist_cache.get_manager(stock_hist_cache_path).enforce(budget, keep, protect, dry_run)
+    except Exception as e:
+        logging.error(f"stockfetch.gc_hist_cache处理异常：{e}")
+    return None
+
+
+# 是否启用历史数据增量模式：每个代码只保留一份历史，每天只抓取最后一根K线之后的数据。
+def is_hist_incremental():
+    return str(os.getenv("INSTOCK_HIST_INCREMENTAL", "")).lower() not in ("", "0", "false", "no", "off")
+
+
+def _fetch_hist(code, start, adjust, fetch=None):
+    # fetch 为东方财富K线抓取函数，默认股票，ETF 传 fund_etf_hist_em
+    fetch = fetch or she.stock_zh_a_hist
+    stock = fetch(symbol=code, period="daily", start_date=start, adjust=adjust)
+    if stock is None or len(stock.index) == 0:
+        return None
+    stock.columns = tuple(tbs.CN_STOCK_HIST_DATA['columns'])
+    return stock.sort_index()
+
+
+def _is_adjusted(cached_bar, fresh_bar):
+    # 复权价格只保留两位小数，重叠K线价格不一致说明发生了除权除息，前复权历史已整体变化。
+    for col in ('open', 'close', 'high', 'low'):
+        if abs(float(cached_bar[col]) - float(fresh_bar[col])) > 0.001:
+            return True
+    return False
+
+
+def _extend_hist(code, cached, adjust, ex_dividend_date=None, date=None):
+    """在已缓存历史后追加增量K线；发生除权除息需要全量抓取时返回 None"""
+    last_date = cached['date'].iloc[-1]
+    if ex_dividend_date is not None and last_date < ex_dividend_date:
+        # 已公告但还没到的除权除息日（晚于运行日期）不影响已缓存的复权价格
+        run_date = date.strftime("%Y-%m-%d") if hasattr(date, "strftime") else date
+        if run_date is None or ex_dividend_date <= run_date:
+            return None
+    delta = _fetch_hist(code, last_date.replace('-', ''), adjust)
+    if delta is None:
+        return cached
+    if delta['date'].iloc[0] == last_date and not _is_adjusted(cached.iloc[-1], delta.iloc[0]):
+        return pd.concat([cached, delta.iloc[1:]], ignore_index=True)
+    logging.info(f"stockfetch.stock_hist_cache_incremental：{code}代码复权价格变化，重新抓取")
+    return None
+
+
+def _slice_hist(stock, date_start):
+    stock = stock.loc[stock['date'] >= f"{date_start[0:4]}-{date_start[4:6]}-{date_start[6:8]}"]
+    return stock.reset_index(drop=True)
+
+
+# 增量读取股票历史数据。
+# 每个代码一份规范历史 cache/hist/canonical/<code><adjust>.gzip.pickle，
+# 只抓取最后一根已缓存K线之后的数据（包含最后一根用于校验），
+# 遇到除权除息（重叠K线价格不一致或除权除息日晚于最后缓存日且不晚于运行日期）时重新全量抓取该代码。
+def stock_hist_cache_incremental(code, date_start, is_cache=True, adjust='', ex_dividend_date=None, date=None):
+    cache_dir = os.path.join(stock_hist_cache_path, 'canonical')
+    try:
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+    except Exception:
+        pass
+    cache_file = os.path.join(cache_dir, "%s%s.gzip.pickle" % (code, adjust))
+    try:
+        cached = None
+        if os.path.isfile(cache_file):
+            cached = pd.read_pickle(cache_file, compression="gzip")
+            if len(cached.index) == 0 or cached.attrs.get('date_start', date_start) > date_start:
+                # 缓存起始日晚于所需起始日，需要全量抓取。
+                cached = None
+
+        stock = None
+        if cached is not None:
+            stock = _extend_hist(code, cached, adjust, ex_dividend_date, date)
+            if stock is not None and stock is not cached:
+                stock.attrs['date_start'] = cached.attrs['date_start']
+
+        if stock is None:
+            stock = _fetch_hist(code, date_start, adjust)
+            if stock is None:
+                return None
+            stock.attrs['date_start'] = date_start
+
+        try:
+            if is_cache and stock is not cached:
+                tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+                stock.to_pickle(tmp_file, compression="gzip")
+                os.replace(tmp_file, cache_file)
+        except Exception:
+            pass
+        return _slice_hist(stock, date_start)
+    except Exception as e:
+        logging.error(f"stockfetch.stock_hist_cache_incremental处理异常：{code}代码{e}")
+    return None
+
+
+# 是否使用列式历史存储（默认开启），INSTOCK_HIST_STORE=0 时退回每只股票一个 gzip pickle 的旧缓存。
+def is_hist_store():
+    return str(os.getenv("INSTOCK_HIST_STORE", "1")).lower() not in ("", "0", "false", "no", "off")
+
+
+def _store_fresh(store, code, date_start, date):
+    # 只补缺失缓存模式下与旧缓存一致：只要覆盖起始日就复用，不按运行日期刷新。
+    return store.covers(code, date_start, None if trd.is_only_missing_cache() else date)
+
+
+# 从列式存储读取股票历史数据。
+# 存储中每个代码一份完整历史，记录抓取起始日和运行日期；
+# 覆盖所需起始日且是本运行日期（或之后）抓取的直接返回，
+# 否则增量模式下在已存储历史后追加增量K线，非增量模式下全量抓取，结果写回存储。
+def stock_hist_store(code, date, date_start, is_cache=True, adjust='', ex_dividend_date=None):
+    store = hist_store.get_store(adjust)
+    try:
+        if _store_fresh(store, code, date_start, date):
+            return _slice_hist(store.get(code), date_start)
+
+        stock = None
+        start = date_start
+        if is_hist_incremental() and store.covers(code, date_start):
+            start = store.entry(code)['start']
+            stock = _extend_hist(code, store.get(code), adjust, ex_dividend_date, date)
+        if stock is None:
+            start = date_start
+            stock = _fetch_hist(code, date_start, adjust)
+            if stock is None:
+                return None
+
+        if is_cache:
+            store.put(code, stock, start, date)
+        return _slice_hist(stock, date_start)
+    except Exception as e:
+        logging.error(f"stockfetch.stock_hist_store处理异常：{code}代码{e}")
+    return None
+
+
+# 是否以不复权K线 + 复权因子保存历史，INSTOCK_HIST_RAW=1 开启，前复权/后复权读取时计算，
+# 除权除息只会在末尾追加一个因子变化，不再需要重新全量抓取。
+# 计算出的复权价格是按因子等比例缩放、未取整的，与东方财富的复权K线不完全一致，
+# 用真实复权数据核对之前默认关闭，按复权方式保存东方财富复权后的K线。
+def is_hist_raw():
+    return str(os.getenv("INSTOCK_HIST_RAW", "")).lower() not in ("", "0", "false", "no", "off")
+
+
+def _extend_raw(code, cached, fetch=None):
+    """在已存储的不复权K线后追加增量K线和因子；重叠K线不一致（数据源修正）时返回 None"""
+    last = cached.iloc[-1]
+    delta = _fetch_hist(code, last['date'].replace('-', ''), '', fetch)
+    if delta is None:
+        return cached
+    if delta['date'].iloc[0] != last['date'] or _is_adjusted(last, delta.iloc[0]):
+        logging.info(f"stockfetch.stock_hist_raw：{code}代码不复权K线不一致，重新抓取")
+        return None
+    delta = delta.iloc[1:].reset_index(drop=True)
+    if len(delta.index) == 0:
+        return cached
+    adjust_factor.with_factors(delta, last[adjust_factor.FACTOR_COLUMN], last['close'])
+    return pd.concat([cached, delta], ignore_index=True)
+
+
+# 从不复权存储读取历史数据并按 adjust 复权。
+# 已存储的历史不会因除权除息失效，未到本运行日期时总是只抓取最后一根K线之后的数据；
+# 只有所需起始日早于存储的起始日时才全量抓取。
+def stock_hist_raw(code, date, date_start, is_cache=True, adjust='qfq', fetch=None):
+    store = hist_store.get_store(hist_store.RAW)
+    try:
+        if _store_fresh(store, code, date_start, date):
+            return adjust_factor.apply_adjust(_slice_hist(store.get(code), date_start), adjust)
+
+        stock = None
+        start = date_start
+        if store.covers(code, date_start):
+            start = store.entry(code)['start']
+            stock = _extend_raw(code, store.get(code), fetch)
+        if stock is None:
+            start = date_start
+            stock = _fetch_hist(code, date_start, '', fetch)
+            if stock is None:
+                return None
+            adjust_factor.with_factors(stock)
+
+        if is_cache:
+            store.put(code, stock, start, date)
+        return adjust_factor.apply_adjust(_slice_hist(stock, date_start), adjust)
+    except Exception as e:
+        logging.error(f"stockfetch.stock_hist_raw处理异常：{code}代码{e}")
+    return None
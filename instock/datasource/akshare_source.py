@@ -2,16 +2,26 @@
 from __future__ import annotations
 
 from datetime import date
-from typing import Any
+from typing import Any, Callable, TypeVar
 
 import akshare as ak
 import pandas as pd
 import pandera.errors as pa_errors
 
+from instock.lib.rate_limiter import host_rate_limiter
+
 from .base import IDataSource, DataSourceError, SchemaValidationError
-from .io import RateLimiter, with_retry
+from .io import with_retry
 from . import schemas
 
+T = TypeVar("T")
+
+# Upstream host behind each akshare call, used as the shared rate-limit key.
+_PUSH2 = "push2.eastmoney.com"
+_PUSH2HIS = "push2his.eastmoney.com"
+_DATACENTER = "datacenter-web.eastmoney.com"
+_SINA = "sina"
+
 
 _OHLCV_RENAME = {
     "日期": "date", "开盘": "open", "收盘": "close",
@@ -64,7 +74,22 @@ _FLOW_RENAME = {
 
 class AkShareSource(IDataSource):
     def __init__(self) -> None:
-        self._limiter = RateLimiter(min_interval=0.2)
+        self._limiter = host_rate_limiter()
+
+    def _call(self, host: str, fn: Callable[..., T], **kwargs) -> T:
+        """Run one akshare call under the process-wide per-host limiter.
+
+        Throttle-like failures (429/5xx/timeouts) shrink the host's rate;
+        successes let it grow back.
+        """
+        self._limiter.acquire(host)
+        try:
+            result = fn(**kwargs)
+        except Exception as exc:
+            self._limiter.report(host, exc=exc)
+            raise
+        self._limiter.on_success(host)
+        return result
 
     # ---------- OHLCV ----------
     def get_ohlcv(
@@ -87,8 +112,8 @@ class AkShareSource(IDataSource):
     def _fetch_ohlcv(
         self, code: str, start: date, end: date, adjust: str
     ) -> pd.DataFrame:
-        self._limiter.wait()
-        return ak.stock_zh_a_hist(
+        return self._call(
+            _PUSH2HIS, ak.stock_zh_a_hist,
             symbol=code,
             period="daily",
             start_date=start.strftime("%Y%m%d"),
@@ -114,8 +139,7 @@ class AkShareSource(IDataSource):
 
     @with_retry(max_attempts=3, base_delay=0.5)
     def _fetch_fundamentals_pit(self, code: str) -> pd.DataFrame:
-        self._limiter.wait()
-        return ak.stock_financial_abstract(symbol=code)
+        return self._call(_DATACENTER, ak.stock_financial_abstract, symbol=code)
 
     # ---------- LHB ----------
     def get_lhb(self, start: date, end: date) -> pd.DataFrame:
@@ -135,8 +159,8 @@ class AkShareSource(IDataSource):
 
     @with_retry(max_attempts=3, base_delay=0.5)
     def _fetch_lhb(self, start: date, end: date) -> pd.DataFrame:
-        self._limiter.wait()
-        return ak.stock_lhb_detail_em(
+        return self._call(
+            _DATACENTER, ak.stock_lhb_detail_em,
             start_date=start.strftime("%Y%m%d"),
             end_date=end.strftime("%Y%m%d"),
         )
@@ -161,8 +185,7 @@ class AkShareSource(IDataSource):
 
     @with_retry(max_attempts=3, base_delay=0.5)
     def _fetch_north_bound(self) -> pd.DataFrame:
-        self._limiter.wait()
-        return ak.stock_hsgt_hold_stock_em()
+        return self._call(_DATACENTER, ak.stock_hsgt_hold_stock_em)
 
     # ---------- Money flow ----------
     def get_money_flow(self, code: str, start: date, end: date) -> pd.DataFrame:
@@ -184,9 +207,10 @@ class AkShareSource(IDataSource):
 
     @with_retry(max_attempts=3, base_delay=0.5)
     def _fetch_money_flow(self, code: str) -> pd.DataFrame:
-        self._limiter.wait()
         market = "sh" if code.startswith(("6", "9")) else "sz"
-        return ak.stock_individual_fund_flow(stock=code, market=market)
+        return self._call(
+            _PUSH2HIS, ak.stock_individual_fund_flow, stock=code, market=market
+        )
 
     # ---------- Index member ----------
     def get_index_member(self, index_code: str, at: date) -> list[str]:
@@ -198,8 +222,7 @@ class AkShareSource(IDataSource):
 
     @with_retry(max_attempts=3, base_delay=0.5)
     def _fetch_index_member(self, index_code: str) -> pd.DataFrame:
-        self._limiter.wait()
-        return ak.index_stock_cons(symbol=index_code)
+        return self._call(_SINA, ak.index_stock_cons, symbol=index_code)
 
     # ---------- Trade calendar ----------
     def get_trade_calendar(self, start: date, end: date) -> list[date]:
@@ -212,31 +235,26 @@ class AkShareSource(IDataSource):
 
     @with_retry(max_attempts=3, base_delay=0.5)
     def _fetch_trade_calendar(self) -> pd.DataFrame:
-        self._limiter.wait()
-        return ak.tool_trade_date_hist_sina()
+        return self._call(_SINA, ak.tool_trade_date_hist_sina)
 
     # ---------- Board industry ----------
     @with_retry(max_attempts=3, base_delay=0.5)
     def _fetch_board_industry_names(self) -> pd.DataFrame:
-        self._limiter.wait()
-        return ak.stock_board_industry_name_em()
+        return self._call(_PUSH2, ak.stock_board_industry_name_em)
 
     @with_retry(max_attempts=3, base_delay=0.5)
     def _fetch_board_industry_cons(self, board: str) -> pd.DataFrame:
-        self._limiter.wait()
-        return ak.stock_board_industry_cons_em(symbol=board)
+        return self._call(_PUSH2, ak.stock_board_industry_cons_em, symbol=board)
 
     # ---------- Individual info (listing date) ----------
     @with_retry(max_attempts=3, base_delay=0.5)
     def _fetch_individual_info(self, code: str) -> pd.DataFrame:
-        self._limiter.wait()
-        return ak.stock_individual_info_em(symbol=code)
+        return self._call(_PUSH2, ak.stock_individual_info_em, symbol=code)
 
     # ---------- ST snapshot ----------
     @with_retry(max_attempts=3, base_delay=0.5)
     def _fetch_st_snapshot(self) -> pd.DataFrame:
-        self._limiter.wait()
-        return ak.stock_zh_a_st_em()
+        return self._call(_PUSH2, ak.stock_zh_a_st_em)
 
 
 def _empty_like(schema: Any) -> pd.DataFrame:
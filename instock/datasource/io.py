@@ -3,6 +3,7 @@ from __future__ import annotations
 
 import functools
 import logging
+import threading
 import time
 from typing import Callable, TypeVar
 
@@ -42,15 +43,21 @@ def with_retry(max_attempts: int = 3, base_delay: float = 0.5) -> Callable:
 
 
 class RateLimiter:
-    """Simple monotonic-time min-interval limiter."""
+    """Simple monotonic-time min-interval limiter (thread-safe).
+
+    Per-instance only; network sources should prefer the process-wide
+    per-host limiter in instock.lib.rate_limiter.
+    """
 
     def __init__(self, min_interval: float = 0.2) -> None:
         self._min = min_interval
-        self._last = 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
 
     def wait(self) -> None:
-        now = time.perf_counter()
-        delta = now - self._last
-        if delta < self._min:
-            time.sleep(self._min - delta)
-        self._last = time.perf_counter()
+        with self._lock:
+            now = time.perf_counter()
+            slot = max(now, self._next)
+            self._next = slot + self._min
+        if slot > now:
+            time.sleep(slot - now)
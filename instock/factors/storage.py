@@ -4,6 +4,9 @@ import os
 from pathlib import Path
 import pandas as pd
 
+from instock.lib import panel_cache
+from instock.lib.segment_table import SegmentTable
+
 
 def _root() -> Path:
     root = os.environ.get("INSTOCK_FACTOR_ROOT", "data/factors")
@@ -18,38 +21,31 @@ def _factor_dir(name: str) -> Path:
     return d
 
 
+def _table(name: str) -> SegmentTable:
+    return SegmentTable(
+        _factor_dir(name), keys=["date", "code"],
+        partition_by=lambda df: df["date"].dt.year,
+    )
+
+
 def write_factor(name: str, df: pd.DataFrame) -> None:
-    """Append-and-dedup writer, partitioned by year of `date`."""
+    """Append-only writer, partitioned by year of `date`.
+
+    Each call adds one segment per year; (date, code) duplicates resolve to
+    the latest write when read.
+    """
     if df.empty:
         return
     df = df.copy()
     df["date"] = pd.to_datetime(df["date"])
-    df["year"] = df["date"].dt.year
-    for year, group in df.groupby("year"):
-        target = _factor_dir(name) / f"{year}.parquet"
-        payload = group.drop(columns=["year"])
-        if target.exists():
-            old = pd.read_parquet(target)
-            payload = pd.concat([old, payload], ignore_index=True)
-        payload = (
-            payload.drop_duplicates(subset=["date", "code"], keep="last")
-                   .sort_values(["date", "code"])
-                   .reset_index(drop=True)
-        )
-        payload.to_parquet(target, index=False)
+    _table(name).append(df)
 
 
 def read_factor(
     name: str, start: pd.Timestamp, end: pd.Timestamp
 ) -> pd.DataFrame:
-    d = _factor_dir(name)
-    frames = []
-    for year in range(start.year, end.year + 1):
-        target = d / f"{year}.parquet"
-        if target.exists():
-            frames.append(pd.read_parquet(target))
-    if not frames:
+    """Rows with start <= date <= end; year partitions come from the panel cache."""
+    df = panel_cache.read_date_range(_table(name), start, end)
+    if df.empty:
         return pd.DataFrame(columns=["date", "code", "value"])
-    df = pd.concat(frames, ignore_index=True)
-    mask = (df["date"] >= start) & (df["date"] <= end)
-    return df.loc[mask].reset_index(drop=True)
+    return df
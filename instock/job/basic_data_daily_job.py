@@ -29,15 +29,9 @@ def save_nph_stock_spot_data(date, before=True):
             return
 
         table_name = tbs.TABLE_CN_STOCK_SPOT['name']
-        # 删除老数据。
-        if mdb.checkTableIsExist(table_name):
-            del_sql = f"DELETE FROM `{table_name}` where `date` = '{date}'"
-            mdb.executeSql(del_sql)
-            cols_type = None
-        else:
-            cols_type = tbs.get_field_types(tbs.TABLE_CN_STOCK_SPOT['columns'])
+        cols_type = tbs.get_field_types(tbs.TABLE_CN_STOCK_SPOT['columns'])
 
-        mdb.insert_db_from_df(data, table_name, cols_type, False, "`date`,`code`")
+        mdb.replace_partition(table_name, date, data, cols_type, "`date`,`code`")
 
     except Exception as e:
         logging.error(f"basic_data_daily_job.save_stock_spot_data处理异常：{e}")
@@ -54,15 +48,9 @@ def save_nph_etf_spot_data(date, before=True):
             return
 
         table_name = tbs.TABLE_CN_ETF_SPOT['name']
-        # 删除老数据。
-        if mdb.checkTableIsExist(table_name):
-            del_sql = f"DELETE FROM `{table_name}` where `date` = '{date}'"
-            mdb.executeSql(del_sql)
-            cols_type = None
-        else:
-            cols_type = tbs.get_field_types(tbs.TABLE_CN_ETF_SPOT['columns'])
-
-        mdb.insert_db_from_df(data, table_name, cols_type, False, "`date`,`code`")
+        cols_type = tbs.get_field_types(tbs.TABLE_CN_ETF_SPOT['columns'])
+
+        mdb.replace_partition(table_name, date, data, cols_type, "`date`,`code`")
     except Exception as e:
         logging.error(f"basic_data_daily_job.save_nph_etf_spot_data处理异常：{e}")
 
@@ -77,14 +65,9 @@ def save_nph_popular_spot_data(date, before=True):
             return
 
         table_name = tbs.TABLE_CN_POPULAR_STOCK['name']
-        if mdb.checkTableIsExist(table_name):
-            del_sql = f"DELETE FROM `{table_name}` where `date` = '{date}'"
-            mdb.executeSql(del_sql)
-            cols_type = None
-        else:
-            cols_type = tbs.get_field_types(tbs.TABLE_CN_POPULAR_STOCK['columns'])
-
-        mdb.insert_db_from_df(data, table_name, cols_type, False, "`date`,`SECURITY_CODE`")
+        cols_type = tbs.get_field_types(tbs.TABLE_CN_POPULAR_STOCK['columns'])
+
+        mdb.replace_partition(table_name, date, data, cols_type, "`date`,`SECURITY_CODE`")
     except Exception as e:
         logging.error(f"basic_data_daily_job.save_nph_etf_spot_data处理异常：{e}")
 
@@ -29,14 +29,8 @@ def save_nph_stock_lhb_data(date, before=True):
             return
 
         table_name = tbs.TABLE_CN_STOCK_lHB['name']
-        # 删除老数据。
-        if mdb.checkTableIsExist(table_name):
-            del_sql = f"DELETE FROM `{table_name}` where `date` = '{date}'"
-            mdb.executeSql(del_sql)
-            cols_type = None
-        else:
-            cols_type = tbs.get_field_types(tbs.TABLE_CN_STOCK_lHB['columns'])
-        mdb.insert_db_from_df(data, table_name, cols_type, False, "`date`,`code`")
+        cols_type = tbs.get_field_types(tbs.TABLE_CN_STOCK_lHB['columns'])
+        mdb.replace_partition(table_name, date, data, cols_type, "`date`,`code`")
     except Exception as e:
         logging.error(f"basic_data_other_daily_job.save_stock_lhb_data处理异常：{e}")
     stock_spot_buy(date)
@@ -52,14 +46,8 @@ def save_nph_stock_top_data(date, before=True):
             return
 
         table_name = tbs.TABLE_CN_STOCK_TOP['name']
-        # 删除老数据。
-        if mdb.checkTableIsExist(table_name):
-            del_sql = f"DELETE FROM `{table_name}` where `date` = '{date}'"
-            mdb.executeSql(del_sql)
-            cols_type = None
-        else:
-            cols_type = tbs.get_field_types(tbs.TABLE_CN_STOCK_TOP['columns'])
-        mdb.insert_db_from_df(data, table_name, cols_type, False, "`date`,`code`")
+        cols_type = tbs.get_field_types(tbs.TABLE_CN_STOCK_TOP['columns'])
+        mdb.replace_partition(table_name, date, data, cols_type, "`date`,`code`")
 
         # Sina LHB "个股上榜统计" does not provide daily change_rate.
         # After inserting, backfill change_rate from our daily spot table (TABLE_CN_STOCK_SPOT).
@@ -107,15 +95,9 @@ def save_nph_stock_fund_flow_data(date, before=True):
         data.insert(0, 'date', date.strftime("%Y-%m-%d"))
 
         table_name = tbs.TABLE_CN_STOCK_FUND_FLOW['name']
-        # 删除老数据。
-        if mdb.checkTableIsExist(table_name):
-            del_sql = f"DELETE FROM `{table_name}` where `date` = '{date}'"
-            mdb.executeSql(del_sql)
-            cols_type = None
-        else:
-            cols_type = tbs.get_field_types(tbs.TABLE_CN_STOCK_FUND_FLOW['columns'])
+        cols_type = tbs.get_field_types(tbs.TABLE_CN_STOCK_FUND_FLOW['columns'])
 
-        mdb.insert_db_from_df(data, table_name, cols_type, False, "`date`,`code`")
+        mdb.replace_partition(table_name, date, data, cols_type, "`date`,`code`")
     except Exception as e:
         logging.error(f"basic_data_other_daily_job.save_nph_stock_fund_flow_data处理异常：{e}")
 
@@ -184,15 +166,9 @@ def stock_sector_fund_flow_data(date, index_sector):
         else:
             tbs_table = tbs.TABLE_CN_STOCK_FUND_FLOW_CONCEPT
         table_name = tbs_table['name']
-        # 删除老数据。
-        if mdb.checkTableIsExist(table_name):
-            del_sql = f"DELETE FROM `{table_name}` where `date` = '{date}'"
-            mdb.executeSql(del_sql)
-            cols_type = None
-        else:
-            cols_type = tbs.get_field_types(tbs_table['columns'])
+        cols_type = tbs.get_field_types(tbs_table['columns'])
 
-        mdb.insert_db_from_df(data, table_name, cols_type, False, "`date`,`name`")
+        mdb.replace_partition(table_name, date, data, cols_type, "`date`,`name`")
     except Exception as e:
         logging.error(f"basic_data_other_daily_job.stock_sector_fund_flow_data处理异常：{e}")
 
@@ -229,14 +205,8 @@ def save_nph_stock_bonus(date, before=True):
             return
 
         table_name = tbs.TABLE_CN_STOCK_BONUS['name']
-        # 删除老数据。
-        if mdb.checkTableIsExist(table_name):
-            del_sql = f"DELETE FROM `{table_name}` where `date` = '{date}'"
-            mdb.executeSql(del_sql)
-            cols_type = None
-        else:
-            cols_type = tbs.get_field_types(tbs.TABLE_CN_STOCK_BONUS['columns'])
-        mdb.insert_db_from_df(data, table_name, cols_type, False, "`date`,`code`")
+        cols_type = tbs.get_field_types(tbs.TABLE_CN_STOCK_BONUS['columns'])
+        mdb.replace_partition(table_name, date, data, cols_type, "`date`,`code`")
     except Exception as e:
         logging.error(f"basic_data_other_daily_job.save_nph_stock_bonus处理异常：{e}")
 
@@ -256,15 +226,9 @@ def stock_spot_buy(date):
             return
 
         table_name = tbs.TABLE_CN_STOCK_SPOT_BUY['name']
-        # 删除老数据。
-        if mdb.checkTableIsExist(table_name):
-            del_sql = f"DELETE FROM `{table_name}` where `date` = '{date}'"
-            mdb.executeSql(del_sql)
-            cols_type = None
-        else:
-            cols_type = tbs.get_field_types(tbs.TABLE_CN_STOCK_SPOT_BUY['columns'])
+        cols_type = tbs.get_field_types(tbs.TABLE_CN_STOCK_SPOT_BUY['columns'])
 
-        mdb.insert_db_from_df(data, table_name, cols_type, False, "`date`,`code`")
+        mdb.replace_partition(table_name, date, data, cols_type, "`date`,`code`")
     except Exception as e:
         logging.error(f"basic_data_other_daily_job.stock_spot_buy处理异常：{e}")
 
@@ -277,15 +241,9 @@ def stock_chip_race_open_data(date):
             return
 
         table_name = tbs.TABLE_CN_STOCK_CHIP_RACE_OPEN['name']
-        # 删除老数据。
-        if mdb.checkTableIsExist(table_name):
-            del_sql = f"DELETE FROM `{table_name}` where `date` = '{date}'"
-            mdb.executeSql(del_sql)
-            cols_type = None
-        else:
-            cols_type = tbs.get_field_types(tbs.TABLE_CN_STOCK_CHIP_RACE_OPEN['columns'])
+        cols_type = tbs.get_field_types(tbs.TABLE_CN_STOCK_CHIP_RACE_OPEN['columns'])
 
-        mdb.insert_db_from_df(data, table_name, cols_type, False, "`date`,`code`")
+        mdb.replace_partition(table_name, date, data, cols_type, "`date`,`code`")
     except Exception as e:
         logging.error(f"basic_data_other_daily_job.stock_chip_race_open_data：{e}")
 
@@ -298,15 +256,9 @@ def stock_limitup_reason_data(date):
             return
 
         table_name = tbs.TABLE_CN_STOCK_LIMITUP_REASON['name']
-        # 删除老数据。
-        if mdb.checkTableIsExist(table_name):
-            del_sql = f"DELETE FROM `{table_name}` where `date` = '{date}'"
-            mdb.executeSql(del_sql)
-            cols_type = None
-        else:
-            cols_type = tbs.get_field_types(tbs.TABLE_CN_STOCK_LIMITUP_REASON['columns'])
+        cols_type = tbs.get_field_types(tbs.TABLE_CN_STOCK_LIMITUP_REASON['columns'])
 
-        mdb.insert_db_from_df(data, table_name, cols_type, False, "`date`,`code`")
+        mdb.replace_partition(table_name, date, data, cols_type, "`date`,`code`")
     except Exception as e:
         logging.error(f"basic_data_other_daily_job.stock_limitup_reason_data：{e}")
 
@@ -31,6 +31,11 @@ def _parse_args(argv=None):
         action="store_true",
         help="Use a stable history start date so cached hist data is reused across days (skip re-downloading due to shifting start_date)",
     )
+    parser.add_argument(
+        "--incremental-hist",
+        action="store_true",
+        help="Keep one history per code and only download bars after the last cached bar (full refetch on ex-dividend)",
+    )
     args, _ = parser.parse_known_args()
     return args
 
@@ -40,6 +45,8 @@ def main(argv=None):
 
     if getattr(args, "only_missing_cache", False):
         os.environ["INSTOCK_ONLY_MISSING_CACHE"] = "1"
+    if getattr(args, "incremental_hist", False):
+        os.environ["INSTOCK_HIST_INCREMENTAL"] = "1"
 
     # Delay imports until env vars are set.
     import init_job as bj
@@ -0,0 +1,137 @@
+"""Manage the stock history cache: the columnar hist store and the legacy pickle tree.
+
+Usage: python -m instock.job.hist_store_job migrate [--adjust qfq] [--source DIR]
+       python -m instock.job.hist_store_job status [--adjust qfq]
+       python -m instock.job.hist_store_job gc [--budget 5G] [--keep 2] [--dry-run] [--rebuild]
+
+migrate scans DIR (default cache/hist) for <code><adjust>.gzip.pickle files,
+from both the dated layout (<yyyymm>/<start>/) and the incremental canonical/
+layout. When a code has several pickles, the most recently written one wins.
+Codes already in the store are left alone unless --overwrite is given.
+
+gc deletes whole <yyyymm>/<start>/ pickle folders, least recently used first,
+until the tree fits the byte budget; the newest --keep start dates are never
+deleted. Sizes come from the accounting index (cache_index.json); --rebuild
+re-walks the tree first. Defaults: INSTOCK_HIST_CACHE_BUDGET / _KEEP.
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import re
+import sys
+
+import pandas as pd
+
+from instock.core import hist_cache, hist_store
+from instock.lib.byte_size import parse_size
+
+log = logging.getLogger(__name__)
+
+_PICKLE_RE = re.compile(r"^(\d{6})(qfq|hfq|)\.gzip\.pickle$")
+_START_RE = re.compile(r"^\d{8}$")
+
+
+def _default_source() -> str:
+    return os.path.dirname(hist_store.store_root)
+
+
+def scan(source: str, adjust: str = "qfq") -> dict:
+    """Map code -> (path, start) of the newest pickle for this adjust type."""
+    store_dir = os.path.abspath(hist_store.store_root)
+    found: dict = {}
+    for dirpath, dirnames, filenames in os.walk(source):
+        if os.path.abspath(dirpath).startswith(store_dir):
+            dirnames[:] = []
+            continue
+        parent = os.path.basename(dirpath)
+        for name in filenames:
+            match = _PICKLE_RE.match(name)
+            if match is None or match.group(2) != adjust:
+                continue
+            path = os.path.join(dirpath, name)
+            mtime = os.path.getmtime(path)
+            start = parent if _START_RE.match(parent) else None
+            current = found.get(match.group(1))
+            if current is None or mtime > current[2]:
+                found[match.group(1)] = (path, start, mtime)
+    return {code: (path, start) for code, (path, start, _) in found.items()}
+
+
+def migrate(source: str | None = None, adjust: str = "qfq", overwrite: bool = False) -> dict:
+    source = source or _default_source()
+    store = hist_store.get_store(adjust)
+    counts = {"migrated": 0, "skipped": 0, "failed": 0}
+    for code, (path, start) in sorted(scan(source, adjust).items()):
+        if not overwrite and store.entry(code) is not None:
+            counts["skipped"] += 1
+            continue
+        try:
+            stock = pd.read_pickle(path, compression="gzip")
+            if stock.empty:
+                counts["skipped"] += 1
+                continue
+            stock = stock.sort_values("date").reset_index(drop=True)
+            first = stock["date"].iloc[0]
+            # canonical pickles carry their start in attrs; fall back to the first bar
+            start = start or stock.attrs.get("date_start") or first.replace("-", "")
+            store.put(code, stock, start, stock["date"].iloc[-1])
+            counts["migrated"] += 1
+        except Exception as exc:  # noqa: BLE001
+            log.warning("hist store migrate: %s failed: %s", path, exc)
+            counts["failed"] += 1
+    store.flush()
+    return counts
+
+
+def gc(source: str | None = None, budget: int | None = None, keep: int | None = None,
+       dry_run: bool = False, rebuild: bool = False) -> dict:
+    manager = hist_cache.get_manager(source or _default_source())
+    if rebuild:
+        manager.rebuild()
+    result = manager.enforce(budget, keep, dry_run=dry_run)
+    log.info("hist cache gc: evicted %d start dates, freed %d bytes, %d bytes left",
+             len(result["evicted"]), result["freed"], result["total"])
+    return result
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Manage the stock history cache")
+    commands = parser.add_subparsers(dest="command", required=True)
+    migrate_cmd = commands.add_parser("migrate", help="import the gzip pickle cache")
+    migrate_cmd.add_argument("--adjust", default="qfq", help="adjust type suffix (default: qfq)")
+    migrate_cmd.add_argument("--source", default=None, help="pickle cache root (default: cache/hist)")
+    migrate_cmd.add_argument("--overwrite", action="store_true", help="replace codes already in the store")
+    status_cmd = commands.add_parser("status", help="print store size")
+    status_cmd.add_argument("--adjust", default="qfq", help="adjust type suffix (default: qfq)")
+    gc_cmd = commands.add_parser("gc", help="delete old pickle cache folders over the byte budget")
+    gc_cmd.add_argument("--source", default=None, help="pickle cache root (default: cache/hist)")
+    gc_cmd.add_argument("--budget", default=None, help="byte budget, K/M/G suffixes allowed")
+    gc_cmd.add_argument("--keep", type=int, default=None, help="newest start dates never deleted")
+    gc_cmd.add_argument("--dry-run", action="store_true", help="only print what would be deleted")
+    gc_cmd.add_argument("--rebuild", action="store_true", help="re-walk the tree before collecting")
+    args = parser.parse_args(argv)
+
+    if args.command == "gc":
+        try:
+            budget = None if args.budget is None else parse_size(args.budget)
+        except ValueError:
+            parser.error(f"invalid budget: {args.budget}")
+        result = gc(args.source, budget, args.keep, args.dry_run, args.rebuild)
+        action = "would evict" if args.dry_run else "evicted"
+        print(f"{action} {', '.join(result['evicted']) or 'nothing'}; "
+              f"freed={result['freed']} total={result['total']}")
+        return 0
+    if args.command == "status":
+        for key, value in hist_store.get_store(args.adjust).stats().items():
+            print(f"{key}: {value}")
+        return 0
+    counts = migrate(args.source, args.adjust, args.overwrite)
+    print(", ".join(f"{key}={value}" for key, value in counts.items()))
+    return 0 if counts["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main(sys.argv[1:]))
@@ -31,13 +31,7 @@ def prepare(date):
             return
 
         table_name = tbs.TABLE_CN_STOCK_INDICATORS['name']
-        # 删除老数据。
-        if mdb.checkTableIsExist(table_name):
-            del_sql = f"DELETE FROM `{table_name}` where `date` = '{date}'"
-            mdb.executeSql(del_sql)
-            cols_type = None
-        else:
-            cols_type = tbs.get_field_types(tbs.TABLE_CN_STOCK_INDICATORS['columns'])
+        cols_type = tbs.get_field_types(tbs.TABLE_CN_STOCK_INDICATORS['columns'])
 
         dataKey = pd.DataFrame(results.keys())
         _columns = tuple(tbs.TABLE_CN_STOCK_FOREIGN_KEY['columns'])
@@ -52,7 +46,7 @@ def prepare(date):
         date_str = date.strftime("%Y-%m-%d")
         if date.strftime("%Y-%m-%d") != data.iloc[0]['date']:
             data['date'] = date_str
-        mdb.insert_db_from_df(data, table_name, cols_type, False, "`date`,`code`")
+        mdb.replace_partition(table_name, date, data, cols_type, "`date`,`code`")
 
     except Exception as e:
         logging.error(f"indicators_data_daily_job.prepare处理异常：{e}")
@@ -104,17 +98,11 @@ def guess_buy(date):
             return
 
         table_name = tbs.TABLE_CN_STOCK_INDICATORS_BUY['name']
-        # 删除老数据。
-        if mdb.checkTableIsExist(table_name):
-            del_sql = f"DELETE FROM `{table_name}` where `date` = '{date}'"
-            mdb.executeSql(del_sql)
-            cols_type = None
-        else:
-            cols_type = tbs.get_field_types(tbs.TABLE_CN_STOCK_INDICATORS_BUY['columns'])
+        cols_type = tbs.get_field_types(tbs.TABLE_CN_STOCK_INDICATORS_BUY['columns'])
 
         _columns_backtest = tuple(tbs.TABLE_CN_STOCK_BACKTEST_DATA['columns'])
         data = pd.concat([data, pd.DataFrame(columns=_columns_backtest)])
-        mdb.insert_db_from_df(data, table_name, cols_type, False, "`date`,`code`")
+        mdb.replace_partition(table_name, date, data, cols_type, "`date`,`code`")
     except Exception as e:
         logging.error(f"indicators_data_daily_job.guess_buy处理异常：{e}")
 
@@ -138,17 +126,11 @@ def guess_sell(date):
             return
 
         table_name = tbs.TABLE_CN_STOCK_INDICATORS_SELL['name']
-        # 删除老数据。
-        if mdb.checkTableIsExist(table_name):
-            del_sql = f"DELETE FROM `{table_name}` where `date` = '{date}'"
-            mdb.executeSql(del_sql)
-            cols_type = None
-        else:
-            cols_type = tbs.get_field_types(tbs.TABLE_CN_STOCK_INDICATORS_SELL['columns'])
+        cols_type = tbs.get_field_types(tbs.TABLE_CN_STOCK_INDICATORS_SELL['columns'])
 
         _columns_backtest = tuple(tbs.TABLE_CN_STOCK_BACKTEST_DATA['columns'])
         data = pd.concat([data, pd.DataFrame(columns=_columns_backtest)])
-        mdb.insert_db_from_df(data, table_name, cols_type, False, "`date`,`code`")
+        mdb.replace_partition(table_name, date, data, cols_type, "`date`,`code`")
     except Exception as e:
         logging.error(f"indicators_data_daily_job.guess_sell处理异常：{e}")
 
@@ -31,13 +31,7 @@ def prepare(date):
             return
 
         table_name = tbs.TABLE_CN_STOCK_KLINE_PATTERN['name']
-        # 删除老数据。
-        if mdb.checkTableIsExist(table_name):
-            del_sql = f"DELETE FROM `{table_name}` where `date` = '{date}'"
-            mdb.executeSql(del_sql)
-            cols_type = None
-        else:
-            cols_type = tbs.get_field_types(tbs.TABLE_CN_STOCK_KLINE_PATTERN['columns'])
+        cols_type = tbs.get_field_types(tbs.TABLE_CN_STOCK_KLINE_PATTERN['columns'])
 
         dataKey = pd.DataFrame(results.keys())
         _columns = tuple(tbs.TABLE_CN_STOCK_FOREIGN_KEY['columns'])
@@ -50,7 +44,7 @@ def prepare(date):
         date_str = date.strftime("%Y-%m-%d")
         if date.strftime("%Y-%m-%d") != data.iloc[0]['date']:
             data['date'] = date_str
-        mdb.insert_db_from_df(data, table_name, cols_type, False, "`date`,`code`")
+        mdb.replace_partition(table_name, date, data, cols_type, "`date`,`code`")
 
     except Exception as e:
         logging.error(f"klinepattern_data_daily_job.prepare处理异常：{e}")
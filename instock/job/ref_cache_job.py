@@ -0,0 +1,67 @@
+"""Refresh or inspect the on-disk reference-data cache.
+
+Usage: python -m instock.job.ref_cache_job [--refresh] [--status] [NAME ...]
+NAME is one of: code_id_map_em, trade_date. With no names: all of them.
+Without --refresh, only missing or expired entries are fetched.
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+
+from instock.core import ref_cache
+
+log = logging.getLogger(__name__)
+
+NAMES = ("code_id_map_em", "trade_date")
+
+
+def _loaders() -> dict:
+    # Imported lazily: the crawler modules build HTTP sessions at import time.
+    import instock.core.crawling.stock_hist_em as she
+    import instock.core.stockfetch as stf
+
+    return {
+        "code_id_map_em": she.fetch_code_id_map_em,
+        "trade_date": stf._fetch_stocks_trade_date,
+    }
+
+
+def status(names: list[str]) -> dict:
+    return {name: ref_cache.age(name) for name in names}
+
+
+def run(names: list[str] | None = None, refresh: bool = False) -> dict:
+    loaders = _loaders()
+    names = names or list(loaders)
+    sizes = {}
+    for name in names:
+        value = ref_cache.cached(name, loaders[name], refresh=refresh)
+        sizes[name] = 0 if value is None else len(value)
+        log.info("ref cache %s: %s entries", name, sizes[name])
+    return sizes
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Refresh the instock reference-data cache")
+    parser.add_argument("names", nargs="*", help="cache entries to refresh (default: all)")
+    parser.add_argument("--refresh", action="store_true", help="ignore the TTL and re-download")
+    parser.add_argument("--status", action="store_true", help="print cache ages and exit")
+    args = parser.parse_args(argv)
+    unknown = sorted(set(args.names) - set(NAMES))
+    if unknown:
+        parser.error(f"unknown cache entries: {', '.join(unknown)}")
+
+    names = args.names or list(NAMES)
+    if args.status:
+        for name, cache_age in status(names).items():
+            print(f"{name}: {'missing' if cache_age is None else f'{cache_age:.0f}s old'}")
+        return 0
+    sizes = run(names, refresh=args.refresh)
+    return 0 if all(sizes.values()) else 1
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main(sys.argv[1:]))
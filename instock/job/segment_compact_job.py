@@ -0,0 +1,60 @@
+"""Compact the append-only parquet segment tables.
+
+Usage: python -m instock.job.segment_compact_job [STORE ...] [--root DIR ...]
+STORE is one of: factors, holdings, ohlcv, refdata. With no stores and no
+--root: all of them. Every partition with more than one segment is merged
+into a single sorted segment; readers keep working during compaction.
+"""
+from __future__ import annotations
+
+import argparse
+import logging
+import os
+import sys
+from pathlib import Path
+
+from instock.lib.segment_table import compact_tree
+
+log = logging.getLogger(__name__)
+
+# store name -> (env var, default root), matching the storage modules
+ROOTS = {
+    "factors": ("INSTOCK_FACTOR_ROOT", "data/factors"),
+    "holdings": ("INSTOCK_HOLDING_ROOT", "data/holdings"),
+    "ohlcv": ("INSTOCK_OHLCV_ROOT", "data/ohlcv"),
+    "refdata": ("INSTOCK_REFDATA_ROOT", "data/refdata"),
+}
+
+
+def store_root(name: str) -> Path:
+    env, default = ROOTS[name]
+    return Path(os.environ.get(env, default))
+
+
+def run(roots: list[Path]) -> dict:
+    compacted = {}
+    for root in roots:
+        compacted[str(root)] = compact_tree(root)
+        log.info("segment compaction %s: %d partitions", root, compacted[str(root)])
+    return compacted
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Compact instock parquet segment tables")
+    parser.add_argument("stores", nargs="*", help="stores to compact (default: all)")
+    parser.add_argument("--root", action="append", default=[], help="extra table root to compact")
+    args = parser.parse_args(argv)
+    unknown = sorted(set(args.stores) - set(ROOTS))
+    if unknown:
+        parser.error(f"unknown stores: {', '.join(unknown)}")
+
+    names = args.stores or ([] if args.root else list(ROOTS))
+    roots = [store_root(name) for name in names] + [Path(root) for root in args.root]
+    for root, count in run(roots).items():
+        print(f"{root}: {count} partitions compacted")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main(sys.argv[1:]))
@@ -20,6 +20,7 @@ import instock.core.tablestructure as tbs
 import instock.lib.database as mdb
 import instock.lib.trade_time as trd
 from instock.core.singleton_stock import stock_hist_data
+from instock.core.hist_panel import hist_panel
 from instock.core.stockfetch import fetch_stock_top_entity_data
 
 __author__ = 'myh '
@@ -118,16 +119,7 @@ def _prepare_one_strategy(date, strategy, stocks_data, stock_tops=None):
             )
             return
 
-        # 删除老数据。
-        if mdb.checkTableIsExist(table_name):
-            t_del0 = time.perf_counter()
-            del_sql = f"DELETE FROM `{table_name}` where `date` = '{date}'"
-            mdb.executeSql(del_sql)
-            t_del = time.perf_counter() - t_del0
-            cols_type = None
-        else:
-            t_del = 0.0
-            cols_type = tbs.get_field_types(tbs.TABLE_CN_STOCK_STRATEGIES[0]['columns'])
+        cols_type = tbs.get_field_types(tbs.TABLE_CN_STOCK_STRATEGIES[0]['columns'])
 
         data = pd.DataFrame(results)
         columns = tuple(tbs.TABLE_CN_STOCK_FOREIGN_KEY['columns'])
@@ -141,16 +133,15 @@ def _prepare_one_strategy(date, strategy, stocks_data, stock_tops=None):
         if date.strftime("%Y-%m-%d") != data.iloc[0]['date']:
             data['date'] = date_str
         t_ins0 = time.perf_counter()
-        mdb.insert_db_from_df(data, table_name, cols_type, False, "`date`,`code`")
+        mdb.replace_partition(table_name, date, data, cols_type, "`date`,`code`")
         t_ins = time.perf_counter() - t_ins0
 
         logger.info(
-            "strategy=%s date=%s stocks=%d matched=%d delete=%.3fs insert=%.3fs total=%.3fs",
+            "strategy=%s date=%s stocks=%d matched=%d replace=%.3fs total=%.3fs",
             table_name,
             date.strftime('%Y-%m-%d'),
             len(stocks_data),
             len(results),
-            t_del,
             t_ins,
             time.perf_counter() - t0,
         )
@@ -230,13 +221,17 @@ def run_check(strategy_fun, table_name, stocks, date, workers=None, stock_tops=N
         with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
             t_submit0 = time.perf_counter()
 
+            # The compact container slices by date with searchsorted before building the frame.
+            is_panel = isinstance(stocks, hist_panel)
+
             def _call_one(k):
                 t1 = time.perf_counter()
                 try:
+                    stock = stocks.frame(k, end_date=date) if is_panel else stocks[k]
                     if is_check_high_tight:
-                        ok = strategy_fun(k, stocks[k], date=date, istop=(k[1] in stock_tops))
+                        ok = strategy_fun(k, stock, date=date, istop=(k[1] in stock_tops))
                     else:
-                        ok = strategy_fun(k, stocks[k], date=date)
+                        ok = strategy_fun(k, stock, date=date)
                     return k, bool(ok), (time.perf_counter() - t1) * 1000.0, None
                 except Exception as e:
                     return k, False, (time.perf_counter() - t1) * 1000.0, e
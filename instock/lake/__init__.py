@@ -0,0 +1,4 @@
+"""Embedded SQL over the parquet lake; see instock.lake.engine."""
+from .engine import Lake, get_lake, query, query_arrow
+
+__all__ = ["Lake", "get_lake", "query", "query_arrow"]
@@ -0,0 +1,204 @@
+"""Lake: embedded DuckDB views over the parquet stores under data/.
+
+Views (one per store, created from the live files on disk):
+
+    ohlcv               <INSTOCK_OHLCV_ROOT>/<year>.parquet              keys (date, code)
+    factors             <INSTOCK_FACTOR_ROOT>/<name>/<year>.parquet      keys (date, code), plus factor = <name>
+    holdings            <INSTOCK_HOLDING_ROOT>/<strategy>/<year>.parquet keys (date, code, strategy)
+    listing_dates       <INSTOCK_REFDATA_ROOT>/listing_dates.parquet     key code
+    industry_snapshots  <INSTOCK_REFDATA_ROOT>/industry/YYYYMMDD.parquet
+    st_snapshots        <INSTOCK_REFDATA_ROOT>/st/YYYYMMDD.parquet
+
+Segment-table partitions (see instock.lib.segment_table) are read from their
+manifests, so uncommitted or compacted-away files are never visible.
+Partitions holding a single segment are scanned directly; only partitions
+with several segments go through the latest-segment-wins dedup, so date and
+code predicates reach the parquet row-group statistics of compacted years
+and whole row groups are skipped. Views are rebuilt when the set of live
+files changes, checked on every query. A compaction that removes segments
+between that check and the scan makes DuckDB raise ``IOException``; the query
+is then retried on freshly built views, like ``SegmentTable.read``.
+
+A store with no files has no view; querying it raises duckdb.CatalogException.
+DuckDB runs scans and joins on ``INSTOCK_LAKE_THREADS`` threads (default:
+all cores).
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Optional, Sequence, Union
+
+import duckdb
+import pandas as pd
+import pyarrow as pa
+
+from instock.lib.segment_table import partition_files
+
+log = logging.getLogger(__name__)
+
+Params = Union[Sequence[Any], dict, None]
+
+# store -> (env var, default root), same defaults as the storage modules
+ROOTS = {
+    "factors": ("INSTOCK_FACTOR_ROOT", "data/factors"),
+    "holdings": ("INSTOCK_HOLDING_ROOT", "data/holdings"),
+    "ohlcv": ("INSTOCK_OHLCV_ROOT", "data/ohlcv"),
+    "refdata": ("INSTOCK_REFDATA_ROOT", "data/refdata"),
+}
+_SEQ = "__seq"
+_ATTEMPTS = 3
+
+
+def _root(store: str) -> Path:
+    env, default = ROOTS[store]
+    return Path(os.environ.get(env, default))
+
+
+def _lit(value: Any) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _files_sql(files: Sequence[Path]) -> str:
+    return "[" + ", ".join(_lit(f) for f in files) + "]"
+
+
+def _partitions(directory: Path) -> list[list[tuple[Path, int]]]:
+    if not directory.is_dir():
+        return []
+    parts = [partition_files(p) for p in sorted(directory.glob("*.parquet"))]
+    return [p for p in parts if p]
+
+
+def _segment_sql(
+    partitions: list[list[tuple[Path, int]]], keys: Sequence[str], extras: str = "",
+) -> Optional[str]:
+    """SELECT over segment-table partitions; only multi-segment ones are deduplicated."""
+    single = [files[0][0] for files in partitions if len(files) == 1]
+    multi = [f for files in partitions if len(files) > 1 for f, _ in files]
+    selects = []
+    if single:
+        selects.append(f"SELECT *{extras} FROM read_parquet({_files_sql(single)}, union_by_name = true)")
+    if multi:
+        selects.append(
+            f"SELECT * EXCLUDE (filename, {_SEQ}){extras} FROM ("
+            f"SELECT *, CAST(regexp_extract(filename, 'seg-([0-9]+)\\.parquet$', 1) AS BIGINT) AS {_SEQ} "
+            f"FROM read_parquet({_files_sql(multi)}, filename = true, union_by_name = true)) "
+            f"QUALIFY row_number() OVER (PARTITION BY {', '.join(keys)} ORDER BY {_SEQ} DESC) = 1"
+        )
+    if not selects:
+        return None
+    return " UNION ALL BY NAME ".join(selects)
+
+
+def _snapshot_sql(directory: Path) -> Optional[str]:
+    files = sorted(directory.glob("*.parquet")) if directory.is_dir() else []
+    if not files:
+        return None
+    return f"SELECT * FROM read_parquet({_files_sql(files)}, union_by_name = true)"
+
+
+def view_sql() -> dict[str, Optional[str]]:
+    """View name -> defining SELECT for the current files (None: no files)."""
+    factors_root = _root("factors")
+    factor_selects = []
+    if factors_root.is_dir():
+        for d in sorted(p for p in factors_root.iterdir() if p.is_dir()):
+            sql = _segment_sql(_partitions(d), ["date", "code"], f", {_lit(d.name)} AS factor")
+            if sql is not None:
+                factor_selects.append(sql)
+
+    holdings_root = _root("holdings")
+    holding_parts = []
+    if holdings_root.is_dir():
+        for d in sorted(p for p in holdings_root.iterdir() if p.is_dir()):
+            holding_parts.extend(_partitions(d))
+
+    refdata = _root("refdata")
+    listing = partition_files(refdata / "listing_dates.parquet")
+    return {
+        "ohlcv": _segment_sql(_partitions(_root("ohlcv")), ["date", "code"]),
+        "factors": " UNION ALL BY NAME ".join(factor_selects) or None,
+        "holdings": _segment_sql(holding_parts, ["date", "code", "strategy"]),
+        "listing_dates": _segment_sql([listing] if listing else [], ["code"]),
+        "industry_snapshots": _snapshot_sql(refdata / "industry"),
+        "st_snapshots": _snapshot_sql(refdata / "st"),
+    }
+
+
+class Lake:
+    def __init__(self, threads: Optional[int] = None) -> None:
+        config = {}
+        threads = threads or int(os.environ.get("INSTOCK_LAKE_THREADS") or 0)
+        if threads > 0:
+            config["threads"] = threads
+        self._con = duckdb.connect(":memory:", config=config)
+        self._lock = threading.Lock()
+        self._views: dict[str, str] = {}
+
+    def refresh(self, force: bool = False) -> dict[str, str]:
+        """(Re)create views whose file set changed (all views if ``force``); returns the current view SQL."""
+        wanted = view_sql()
+        with self._lock:
+            for name, sql in wanted.items():
+                if sql == self._views.get(name) and not force:
+                    continue
+                if sql is None:
+                    self._con.execute(f"DROP VIEW IF EXISTS {name}")
+                    self._views.pop(name, None)
+                else:
+                    self._con.execute(f"CREATE OR REPLACE VIEW {name} AS {sql}")
+                    self._views[name] = sql
+                log.debug("lake: view %s %s", name, "dropped" if sql is None else "refreshed")
+            return dict(self._views)
+
+    def views(self) -> list[str]:
+        return sorted(self.refresh())
+
+    def _execute(self, sql: str, params: Params, fetch):
+        for attempt in range(_ATTEMPTS):
+            self.refresh(force=attempt > 0)
+            cursor = self._con.cursor()
+            try:
+                return fetch(cursor.execute(sql, params))
+            except duckdb.IOException as exc:
+                # a compaction swapped the manifest and removed segments the views still list
+                if attempt == _ATTEMPTS - 1:
+                    raise
+                log.debug("lake: retrying after missing files: %s", exc)
+            finally:
+                cursor.close()
+
+    def query_arrow(self, sql: str, params: Params = None) -> pa.Table:
+        return self._execute(sql, params, lambda result: result.to_arrow_table())
+
+    def query(self, sql: str, params: Params = None) -> pd.DataFrame:
+        return self._execute(sql, params, lambda result: result.df())
+
+    def close(self) -> None:
+        self._con.close()
+
+
+_lake: Optional[Lake] = None
+_lake_lock = threading.Lock()
+
+
+def get_lake() -> Lake:
+    """The process-wide lake connection."""
+    global _lake
+    with _lake_lock:
+        if _lake is None:
+            _lake = Lake()
+        return _lake
+
+
+def query(sql: str, params: Params = None) -> pd.DataFrame:
+    """Run ``sql`` against the lake views; ``params`` binds ``?`` (list) or ``$name`` (dict)."""
+    return get_lake().query(sql, params)
+
+
+def query_arrow(sql: str, params: Params = None) -> pa.Table:
+    """Same as ``query`` but returns a pyarrow.Table without a pandas conversion."""
+    return get_lake().query_arrow(sql, params)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import asyncio
+import logging
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pymysql
+import instock.lib.database as mdb
+from instock.lib.torndb import Row
+
+__author__ = 'myh '
+__date__ = '2026/10/18 '
+
+# web 服务的非阻塞数据库访问，替代全局共享的单个 torndb.Connection。
+# 查询在有界线程池（INSTOCK_WEB_DB_WORKERS，默认10）中执行，每个请求从 database 模块的连接池借出连接，
+# 用完归还，IOLoop 只等待结果，一个慢查询不再阻塞其他用户。
+# 不再每个请求先执行 SELECT 1：空闲连接由连接池按 INSTOCK_DB_POOL_RECYCLE 回收，
+# 借出的连接已被服务器断开（2006/2013）时作废并换一个连接重试一次（写操作只在 2006 时重试，此时语句未发出）。
+# 超时 INSTOCK_WEB_DB_TIMEOUT 秒（默认30）：SELECT 加 MAX_EXECUTION_TIME 提示由 MySQL 终止查询，
+# 等待结果超时抛出 TimeoutError。
+_DISCONNECTED = (2006, 2013)
+_MAX_EXECUTION_TIME_EXCEEDED = 3024
+_SELECT_RE = re.compile(r"^(\s*SELECT\b)", re.IGNORECASE)
+
+
+def _with_timeout_hint(sql, timeout):
+    # MySQL 5.7.8+ 的优化器提示，其他数据库视为注释
+    return _SELECT_RE.sub(rf"\1 /*+ MAX_EXECUTION_TIME({int(timeout * 1000)}) */", sql, count=1)
+
+
+def _rollback(conn):
+    # 连接可能已断开，回滚失败不掩盖原来的异常
+    try:
+        conn.rollback()
+    except Exception:
+        pass
+
+
+class async_database:
+    def __init__(self, max_workers=None, timeout=None, to_db=None):
+        self.max_workers = max_workers or int(os.environ.get('INSTOCK_WEB_DB_WORKERS', '').strip() or 10)
+        if timeout is None:
+            timeout = float(os.environ.get('INSTOCK_WEB_DB_TIMEOUT', '').strip() or 30)
+        self.timeout = timeout
+        self.to_db = to_db
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='instock-db')
+
+    def _engine(self):
+        return mdb.engine() if self.to_db is None else mdb.engine_to_db(self.to_db)
+
+    # ---------- 线程池中执行 ----------
+    def _run(self, work, read):
+        for attempt in (0, 1):
+            conn = self._engine().raw_connection()
+            try:
+                cursor = conn.cursor()
+                try:
+                    result = work(cursor)
+                finally:
+                    cursor.close()
+                conn.commit()
+                return result
+            except pymysql.err.OperationalError as e:
+                code = e.args[0] if e.args else None
+                if attempt == 0 and (code == 2006 or (read and code in _DISCONNECTED)):
+                    logging.info(f"async_database连接已断开，重试：{e}")
+                    conn.invalidate()
+                    continue
+                _rollback(conn)
+                if code == _MAX_EXECUTION_TIME_EXCEEDED:
+                    raise TimeoutError(f"数据库操作超过{self.timeout}秒：{e}") from e
+                raise
+            except BaseException:
+                _rollback(conn)
+                raise
+            finally:
+                conn.close()
+
+    async def _submit(self, work, read=True):
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, self._run, work, read)
+        try:
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"数据库操作超过{self.timeout}秒")
+
+    # ---------- 接口，与 torndb.Connection 的同名方法返回值相同 ----------
+    async def query(self, sql, *parameters):
+        """返回 Row 列表（dict，可按属性访问）"""
+        sql = _with_timeout_hint(sql, self.timeout)
+
+        def work(cursor):
+            t0 = time.perf_counter()
+            cursor.execute(sql, parameters)
+            if cursor.description is None:
+                return []
+            column_names = [d[0] for d in cursor.description]
+            rows = [Row(zip(column_names, row)) for row in cursor.fetchall()]
+            logging.debug("async_database.query rows=%s cost=%.3fs", len(rows), time.perf_counter() - t0)
+            return rows
+
+        return await self._submit(work, read=True)
+
+    async def get(self, sql, *parameters):
+        """唯一一行，没有返回 None"""
+        rows = await self.query(sql, *parameters)
+        if not rows:
+            return None
+        elif len(rows) > 1:
+            raise Exception("Multiple rows returned for async_database.get() query")
+        return rows[0]
+
+    async def execute_rowcount(self, sql, *parameters):
+        """增删改，返回影响的行数"""
+
+        def work(cursor):
+            cursor.execute(sql, parameters)
+            return cursor.rowcount
+
+        return await self._submit(work, read=False)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
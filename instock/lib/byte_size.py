@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = 'myh '
+__date__ = '2026/10/18 '
+
+# 容量配置（INSTOCK_HIST_CACHE_BUDGET、INSTOCK_PANEL_CACHE_BYTES 等）的解析，支持 K/M/G/T 后缀。
+_UNITS = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+
+
+def parse_size(value):
+    """'5G' / '500M' / '1048576' -> 字节数"""
+    text = str(value).strip().upper().rstrip('B')
+    if text and text[-1] in _UNITS:
+        return int(float(text[:-1]) * _UNITS[text[-1]])
+    return int(float(text))
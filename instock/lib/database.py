@@ -3,13 +3,19 @@
 
 import logging
 import os
+import re
+import tempfile
+import threading
 import pymysql
+import numpy as np
 import pandas as pd
 import time
+from contextlib import contextmanager
 from sqlalchemy import create_engine
 from sqlalchemy import text
 from sqlalchemy.types import NVARCHAR
 from sqlalchemy import inspect
+from sqlalchemy.dialects.mysql import BIT as SABit
 from sqlalchemy.sql.sqltypes import Float as SAFloat, Integer as SAInteger, Numeric as SANumeric, BigInteger as SABigInteger, SmallInteger as SASmallInteger
 
 __author__ = 'myh '
@@ -50,17 +56,80 @@ MYSQL_CONN_TORNDB = {'host': f'{db_host}:{str(db_port)}', 'user': db_user, 'pass
                      'database': db_database, 'charset': db_charset, 'max_idle_time': 3600, 'connect_timeout': 1000}
 
 
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, '').strip() or default)
+    except ValueError:
+        return default
+
+
+def _env_flag(name, default=''):
+    return str(os.environ.get(name, default)).lower() not in ("", "0", "false", "no", "off")
+
+
+# 每个数据库 URL 一个进程内共享的 engine（带连接池），不再每次调用都新建 engine 和连接池。
+# 连接池参数：INSTOCK_DB_POOL_SIZE（默认5）、INSTOCK_DB_MAX_OVERFLOW（默认10）、
+# INSTOCK_DB_POOL_RECYCLE（秒，默认3600，早于 MySQL wait_timeout 回收空闲连接）、
+# INSTOCK_DB_POOL_TIMEOUT（秒，默认30）、INSTOCK_DB_POOL_PRE_PING（默认关闭，开启后每次借出前 ping）。
+# INSTOCK_DB_LOCAL_INFILE（默认开启）：MySQL 连接默认打开客户端 local_infile，供 bulk_insert 的 LOAD DATA LOCAL INFILE 使用；
+# 开启后连接的服务器可以要求客户端上传本地文件，不信任数据库服务器时设为0关闭，bulk_insert 改用 executemany。
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def _pool_options():
+    return {
+        'pool_size': _env_int('INSTOCK_DB_POOL_SIZE', 5),
+        'max_overflow': _env_int('INSTOCK_DB_MAX_OVERFLOW', 10),
+        'pool_recycle': _env_int('INSTOCK_DB_POOL_RECYCLE', 3600),
+        'pool_timeout': _env_int('INSTOCK_DB_POOL_TIMEOUT', 30),
+        'pool_pre_ping': _env_flag('INSTOCK_DB_POOL_PRE_PING'),
+    }
+
+
+def _get_engine(url):
+    with _engines_lock:
+        _engine = _engines.get(url)
+        if _engine is None:
+            options = _pool_options()
+            # 批量写入使用 LOAD DATA LOCAL INFILE，需要客户端允许，INSTOCK_DB_LOCAL_INFILE=0 关闭
+            if url.startswith('mysql') and _env_flag('INSTOCK_DB_LOCAL_INFILE', '1'):
+                options['connect_args'] = {'local_infile': True}
+            _engine = create_engine(url, **options)
+            _engines[url] = _engine
+        return _engine
+
+
+def dispose_engines():
+    """关闭所有连接池（测试或切换数据库配置时使用）"""
+    with _engines_lock:
+        engines = list(_engines.values())
+        _engines.clear()
+    for _engine in engines:
+        _engine.dispose()
+    invalidate_schema()
+
+
+def _after_fork():
+    # 子进程不能复用父进程的连接，丢弃连接池但不关闭父进程仍在使用的连接
+    for _engine in list(_engines.values()):
+        _engine.dispose(close=False)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
 # 通过数据库链接 engine
 def engine():
-    return create_engine(MYSQL_CONN_URL)
+    return _get_engine(MYSQL_CONN_URL)
 
 
 def engine_to_db(to_db):
-    _engine = create_engine(MYSQL_CONN_URL.replace(f'/{db_database}?', f'/{to_db}?'))
-    return _engine
+    return _get_engine(MYSQL_CONN_URL.replace(f'/{db_database}?', f'/{to_db}?'))
 
 
-# DB Api -数据库连接对象connection
+# DB Api -数据库连接对象connection，新建独立连接（不经过连接池），调用方负责关闭。
 def get_connection():
     try:
         return pymysql.connect(**MYSQL_CONN_DBAPI)
@@ -69,6 +138,72 @@ def get_connection():
     return None
 
 
+# 从连接池借出一个 DB-API 连接，正常结束提交、异常回滚，退出时归还连接池。
+@contextmanager
+def borrow_connection(to_db=None):
+    conn = (engine() if to_db is None else engine_to_db(to_db)).raw_connection()
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+# 借出连接并打开游标
+@contextmanager
+def borrow_cursor(to_db=None):
+    with borrow_connection(to_db) as conn:
+        cursor = conn.cursor()
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+
+
+# 表结构缓存：是否存在、字段、主键，避免每次插入都查询 information_schema。
+# 本模块执行的 DDL（新增字段、主键、建表、executeSql 中的 CREATE/ALTER/DROP 等）会使缓存失效；
+# 其他进程的 DDL 在 INSTOCK_DB_SCHEMA_TTL 秒（默认300）后可见。
+_schema = {}
+_schema_lock = threading.Lock()
+_DDL_RE = re.compile(r"^\s*(CREATE|ALTER|DROP|TRUNCATE|RENAME)\b", re.IGNORECASE)
+
+
+def invalidate_schema(table_name=None, to_db=None):
+    with _schema_lock:
+        if table_name is None:
+            _schema.clear()
+        else:
+            _schema.pop((to_db, table_name), None)
+
+
+def table_schema(table_name, to_db=None):
+    """
+    表结构信息 {'exists': bool, 'columns': 字段名集合, 'types': {字段名: 类型}, 'primary_key': 主键字段列表}
+    """
+    key = (to_db, table_name)
+    now = time.monotonic()
+    with _schema_lock:
+        cached = _schema.get(key)
+        if cached is not None and now - cached[0] < _env_int('INSTOCK_DB_SCHEMA_TTL', 300):
+            return cached[1]
+    ipt = inspect(engine() if to_db is None else engine_to_db(to_db))
+    info = {'exists': False, 'columns': set(), 'types': {}, 'primary_key': []}
+    if ipt.has_table(table_name, schema=to_db):
+        columns = ipt.get_columns(table_name, schema=to_db)
+        info = {
+            'exists': True,
+            'columns': {c.get('name') for c in columns},
+            'types': {c.get('name'): c.get('type') for c in columns},
+            'primary_key': list(ipt.get_pk_constraint(table_name, schema=to_db)['constrained_columns'] or []),
+        }
+    with _schema_lock:
+        _schema[key] = (now, info)
+    return info
+
+
 def read_sql(sql, params=None):
     try:
         query = text(sql) if isinstance(sql, str) else sql
@@ -79,52 +214,304 @@ def read_sql(sql, params=None):
     return None
 
 
+# 数值列的空值占位符
+_NUMERIC_TYPES = (SAFloat, SAInteger, SANumeric, SABigInteger, SASmallInteger)
+_PLACEHOLDERS = {'-': np.nan, '—': np.nan, '': np.nan}
+# 服务器未开启 local_infile 时的错误码：1148 ER_NOT_ALLOWED_COMMAND、3948/3950 local infile 被禁用
+_LOCAL_INFILE_DISABLED = (1148, 3948, 3950)
+_local_infile_off = set()
+
+
+def _type_class(col_type):
+    # col_type may be a SQLAlchemy type class or instance.
+    return col_type if isinstance(col_type, type) else type(col_type)
+
+
+def _numeric_columns(data, cols_type):
+    return [col for col, col_type in cols_type.items()
+            if col in data.columns and issubclass(_type_class(col_type), _NUMERIC_TYPES)]
+
+
+def _clean_numeric(data, cols_type):
+    """
+    数值列的占位符（'-' 等）和无法解析的值转为 NaN、inf 转为 NaN，一次处理所有列。
+    只转换 object 类型的列，已是数值的列不复制。
+    """
+    numeric_cols = _numeric_columns(data, cols_type)
+    if not numeric_cols:
+        return data
+    object_cols = [col for col in numeric_cols if not pd.api.types.is_numeric_dtype(data[col].dtype)]
+    float_cols = [col for col in numeric_cols if pd.api.types.is_float_dtype(data[col].dtype)]
+    if not object_cols and not (float_cols and np.isinf(data[float_cols].to_numpy()).any()):
+        return data
+    data = data.copy()
+    if object_cols:
+        data[object_cols] = data[object_cols].replace(_PLACEHOLDERS).apply(pd.to_numeric, errors='coerce')
+    data[numeric_cols] = data[numeric_cols].replace([np.inf, -np.inf], np.nan)
+    return data
+
+
+def _bulk_method():
+    return os.environ.get('INSTOCK_DB_INSERT_METHOD', 'bulk').strip() or 'bulk'
+
+
+def _to_sql_method(method):
+    # bulk 不适用时（建表、非 MySQL）to_sql 用多行 INSERT
+    if method == 'bulk':
+        return 'multi'
+    return None if method.lower() == 'none' else method
+
+
+def _batch_bytes():
+    return max(_env_int('INSTOCK_DB_BULK_BATCH_BYTES', 8 << 20), 1024)
+
+
+def _bulk_columns(data, cols_type):
+    """按表结构类型整理各列：整数、BIT 列转为可空整数，其余保持原值"""
+    columns = {}
+    bits = set()
+    for col in data.columns:
+        values = data[col]
+        t = _type_class(cols_type[col]) if cols_type and col in cols_type else None
+        if t is not None and issubclass(t, SABit):
+            bits.add(col)
+        if (t is not None and issubclass(t, (SAInteger, SABit))) or pd.api.types.is_bool_dtype(values.dtype):
+            values = pd.to_numeric(values, errors='coerce').astype('float64').round().astype('Int64')
+        columns[col] = values
+    return columns, bits
+
+
+def _tsv_lines(columns):
+    """
+    每行一条 LOAD DATA 默认格式的文本（制表符分隔、反斜杠转义、\\N 为空值）
+    """
+    parts = []
+    for values in columns.values():
+        missing = values.isna().to_numpy()
+        text_values = values.astype(str)
+        if not pd.api.types.is_numeric_dtype(values.dtype):
+            text_values = (text_values.str.replace('\\', '\\\\', regex=False)
+                           .str.replace('\t', '\\t', regex=False)
+                           .str.replace('\n', '\\n', regex=False)
+                           .str.replace('\r', '\\r', regex=False))
+        parts.append(text_values.where(~missing, '\\N').reset_index(drop=True))
+    if not parts:
+        return pd.Series([], dtype=object)
+    return parts[0].str.cat(parts[1:], sep='\t') if len(parts) > 1 else parts[0]
+
+
+def _rows(columns):
+    """executemany 的参数行，空值为 None"""
+    frame = pd.DataFrame(columns).astype(object)
+    return frame.where(frame.notna(), None).values.tolist()
+
+
+def _batches(sizes, limit):
+    """按累计字节数切分为连续的行区间 [(起始, 结束)]，单行超过上限时自成一批"""
+    bounds = []
+    begin, total = 0, 0
+    for i, size in enumerate(sizes):
+        if total and total + size > limit:
+            bounds.append((begin, i))
+            begin, total = i, 0
+        total += size
+    if begin < len(sizes):
+        bounds.append((begin, len(sizes)))
+    return bounds
+
+
+def _load_data_sql(path, table_name, cols, bits):
+    targets = [f'@`{col}`' if col in bits else f'`{col}`' for col in cols]
+    sql = (f"LOAD DATA LOCAL INFILE '{path}' INTO TABLE `{table_name}` CHARACTER SET utf8mb4 "
+           f"FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' "
+           f"({', '.join(targets)})")
+    if bits:
+        # BIT 列不能直接从文本 '1' 装载，经用户变量转成整数
+        sql = f"{sql} SET " + ', '.join(f'`{col}` = CAST(@`{col}` AS UNSIGNED)' for col in cols if col in bits)
+    return sql
+
+
+def bulk_insert(db, table_name, data, cols_type=None, url=None):
+    """
+    把 DataFrame 批量写入已存在的 MySQL 表。
+    按 INSTOCK_DB_BULK_BATCH_BYTES（默认 8M）字节切分批次，每批写成临时文件用 LOAD DATA LOCAL INFILE 装载；
+    服务器未开启 local_infile 时改用 executemany（pymysql 合并成多行 INSERT IGNORE），之后同一数据库不再尝试 LOAD DATA。
+    两种方式对主键重复的行都是忽略而不是报错，忽略的行数记录警告日志。
+    :param db: DB-API 游标，所有批次在同一事务中
+    :return: 写入的行数（不含忽略的重复行）
+    """
+    if data is None or len(data.index) == 0:
+        return 0
+    cols = data.columns.tolist()
+    columns, bits = _bulk_columns(data, cols_type)
+    lines = _tsv_lines(columns)
+    sizes = lines.str.encode('utf-8').str.len().to_numpy() + 1
+    # 与 LOAD DATA LOCAL 一致，主键重复的行忽略
+    insert_sql = (f"INSERT IGNORE INTO `{table_name}` ({', '.join(f'`{col}`' for col in cols)}) "
+                  f"VALUES ({', '.join(['%s'] * len(cols))})")
+    rows = None
+    skipped = 0
+    for begin, end in _batches(sizes, _batch_bytes()):
+        t0 = time.perf_counter()
+        method = 'load'
+        if url not in _local_infile_off:
+            try:
+                with tempfile.NamedTemporaryFile('w', encoding='utf-8', newline='\n', suffix='.tsv',
+                                                 delete=False) as f:
+                    f.write('\n'.join(lines.iloc[begin:end]))
+                    f.write('\n')
+                try:
+                    db.execute(_load_data_sql(f.name.replace('\\', '/'), table_name, cols, bits))
+                finally:
+                    os.unlink(f.name)
+            except (pymysql.err.OperationalError, pymysql.err.InternalError, pymysql.err.NotSupportedError) as e:
+                if not e.args or e.args[0] not in _LOCAL_INFILE_DISABLED:
+                    raise
+                logging.info(f"database.bulk_insert未开启local_infile，改用executemany：{e}")
+                _local_infile_off.add(url)
+        if url in _local_infile_off:
+            method = 'executemany'
+            if rows is None:
+                rows = _rows(columns)
+            db.executemany(insert_sql, rows[begin:end])
+        # 影响的行数即写入的行数，驱动不提供时为 -1
+        rowcount = getattr(db, 'rowcount', -1)
+        if rowcount is not None and 0 <= rowcount < end - begin:
+            skipped += end - begin - rowcount
+        logging.info(
+            "database.bulk_insert table=%s rows=%s bytes=%s cost=%.3fs method=%s",
+            table_name, end - begin, int(sizes[begin:end].sum()), time.perf_counter() - t0, method,
+        )
+    if skipped:
+        logging.warning(f"database.bulk_insert：{table_name}表忽略了{skipped}行主键重复的数据")
+    return len(data.index) - skipped
+
+
+def _upsert_rows(db, table_name, data, keys, cols_type=None):
+    """INSERT ... ON DUPLICATE KEY UPDATE，按字节切分批次 executemany"""
+    cols = data.columns.tolist()
+    columns, _ = _bulk_columns(data, cols_type)
+    sizes = _tsv_lines(columns).str.encode('utf-8').str.len().to_numpy() + 1
+    rows = _rows(columns)
+    updates = [col for col in cols if col not in keys] or cols[:1]
+    sql = (f"INSERT INTO `{table_name}` ({', '.join(f'`{col}`' for col in cols)}) "
+           f"VALUES ({', '.join(['%s'] * len(cols))}) ON DUPLICATE KEY UPDATE "
+           + ', '.join(f'`{col}` = VALUES(`{col}`)' for col in updates))
+    for begin, end in _batches(sizes, _batch_bytes()):
+        t0 = time.perf_counter()
+        db.executemany(sql, rows[begin:end])
+        logging.info(
+            "database.upsert table=%s rows=%s bytes=%s cost=%.3fs",
+            table_name, end - begin, int(sizes[begin:end].sum()), time.perf_counter() - t0,
+        )
+    return len(rows)
+
+
+def _delete_stale(db, table_name, date, data, keys, date_column):
+    """删除该日期下数据中已不存在的主键行，返回删除的行数"""
+    other = [k for k in keys if k != date_column]
+    if not other:
+        return 0
+    db.execute(f"SELECT {', '.join(f'`{k}`' for k in other)} FROM `{table_name}` WHERE `{date_column}` = %s",
+               (date,))
+    existing = db.fetchall()
+    current = set(map(tuple, data[other].astype(str).values.tolist()))
+    stale = [tuple(row) for row in existing if tuple(str(v) for v in row) not in current]
+    if len(other) == 1:
+        target, placeholder = f'`{other[0]}`', '%s'
+    else:
+        target = f"({', '.join(f'`{k}`' for k in other)})"
+        placeholder = f"({', '.join(['%s'] * len(other))})"
+    for begin in range(0, len(stale), 1000):
+        chunk = stale[begin:begin + 1000]
+        params = [date] + [v for row in chunk for v in row]
+        db.execute(f"DELETE FROM `{table_name}` WHERE `{date_column}` = %s AND {target} IN "
+                   f"({', '.join([placeholder] * len(chunk))})", params)
+    return len(stale)
+
+
+def upsert_df(table_name, data, keys, cols_type=None, to_db=None):
+    """
+    按主键插入或更新，一个事务内分批 INSERT ... ON DUPLICATE KEY UPDATE；表不存在时建表并以 keys 为主键。
+    :param keys: 主键字段列表
+    :return: 写入的行数
+    """
+    if data is None or len(data.index) == 0:
+        return 0
+    if not table_schema(table_name, to_db)['exists']:
+        insert_other_db_from_df(to_db, data, table_name, cols_type, False, ','.join(f'`{k}`' for k in keys))
+        return len(data.index)
+    data, schema, types = _prepare_frame(to_db, data, table_name, cols_type)
+    try:
+        with borrow_cursor(to_db) as db:
+            return _upsert_rows(db, table_name, data, keys, types)
+    except Exception as e:
+        logging.error(f"database.upsert_df处理异常：{table_name}表{e}")
+    return 0
+
+
+def replace_partition(table_name, date, data, cols_type=None, primary_keys="`date`,`code`", indexs=None,
+                      date_column='date', to_db=None):
+    """
+    用 data 替换表中某一日期的全部数据，在一个事务内完成，读方在提交前看到的始终是旧数据，写入失败时回滚不留空洞。
+    有包含日期的主键时：按主键 INSERT ... ON DUPLICATE KEY UPDATE，再删除该日期下 data 中已没有的行，
+    未变化的行原地更新，不再整批删除后重建索引；没有主键时：DELETE 该日期后 bulk_insert。
+    表不存在时与 insert_db_from_df 相同（建表、加主键和索引）。
+    :return: 写入的行数
+    """
+    if data is None or len(data.index) == 0:
+        return 0
+    if not table_schema(table_name, to_db)['exists']:
+        insert_other_db_from_df(to_db, data, table_name, cols_type, False, primary_keys, indexs)
+        return len(data.index)
+    data, schema, types = _prepare_frame(to_db, data, table_name, cols_type)
+    keys = schema['primary_key']
+    t0 = time.perf_counter()
+    try:
+        with borrow_cursor(to_db) as db:
+            if date_column in keys:
+                rows = _upsert_rows(db, table_name, data, keys, types)
+                deleted = _delete_stale(db, table_name, date, data, keys, date_column)
+            else:
+                db.execute(f"DELETE FROM `{table_name}` WHERE `{date_column}` = %s", (date,))
+                deleted = db.rowcount
+                url = str((engine() if to_db is None else engine_to_db(to_db)).url)
+                rows = bulk_insert(db, table_name, data, types, url)
+        logging.info(
+            "database.replace_partition table=%s date=%s rows=%s deleted=%s cost=%.3fs",
+            table_name, date, rows, deleted, time.perf_counter() - t0,
+        )
+        return rows
+    except Exception as e:
+        logging.error(f"database.replace_partition处理异常：{table_name}表{date}{e}")
+    return 0
+
+
 # 定义通用方法函数，插入数据库表，并创建数据库主键，保证重跑数据的时候索引唯一。
 def insert_db_from_df(data, table_name, cols_type, write_index, primary_keys, indexs=None):
     # 插入默认的数据库。
     insert_other_db_from_df(None, data, table_name, cols_type, write_index, primary_keys, indexs)
 
 
-# 增加一个插入到其他数据库的方法。
-def insert_other_db_from_df(to_db, data, table_name, cols_type, write_index, primary_keys, indexs=None):
+# 写入前的准备：数值列清理、已存在的表补齐缺少的字段。
+# 返回 (清理后的数据, 表结构, 列类型)；调用方未给列类型时（表已存在）使用表结构中的类型。
+def _prepare_frame(to_db, data, table_name, cols_type):
+    schema = table_schema(table_name, to_db)
+    types = cols_type or schema.get('types') or None
     # Defensive cleanup: upstream providers sometimes return placeholders like '-'
     # for numeric fields. Coerce numeric columns to numbers/NULL before insert.
-    if isinstance(data, pd.DataFrame) and cols_type:
+    if isinstance(data, pd.DataFrame) and types:
         try:
-            numeric_cols = []
-            for col_name, col_type in cols_type.items():
-                # col_type may be a SQLAlchemy type class or instance.
-                t = col_type if isinstance(col_type, type) else type(col_type)
-                if issubclass(t, (SAFloat, SAInteger, SANumeric, SABigInteger, SASmallInteger)):
-                    numeric_cols.append(col_name)
-
-            if numeric_cols:
-                data = data.copy()
-                for col in numeric_cols:
-                    if col not in data.columns:
-                        continue
-                    # Common placeholders -> NULL.
-                    data[col] = data[col].replace({'-': None, '—': None, '': None})
-                    data[col] = pd.to_numeric(data[col], errors='coerce')
-                    data[col] = data[col].where(pd.notnull(data[col]), None)
+            data = _clean_numeric(data, types)
         except Exception:
             # Never block ingestion due to cleanup errors.
             pass
 
-    # 定义engine
-    if to_db is None:
-        engine_mysql = engine()
-    else:
-        engine_mysql = engine_to_db(to_db)
-    # 使用 http://docs.sqlalchemy.org/en/latest/core/reflection.html
-    # 使用检查检查数据库表是否有主键。
-    ipt = inspect(engine_mysql)
-
     # If table already exists, ensure it has all required columns.
     # This prevents failures when upstream schemas add new fields.
     try:
-        if ipt.has_table(table_name, schema=to_db):
-            existing_cols = {c.get('name') for c in ipt.get_columns(table_name, schema=to_db)}
+        if schema['exists']:
+            existing_cols = schema['columns']
             df_cols = set(data.columns.tolist()) if isinstance(data, pd.DataFrame) else set()
             missing = [c for c in df_cols if c not in existing_cols]
             if missing:
@@ -158,16 +545,32 @@ def insert_other_db_from_df(to_db, data, table_name, cols_type, write_index, pri
                             return "bit(1)"
                     return "varchar(255)"
 
-                with get_connection() as conn:
-                    with conn.cursor() as db:
+                try:
+                    with borrow_cursor(to_db) as db:
                         for col in missing:
                             ddl_type = _mysql_type(col)
                             try:
                                 db.execute(f"ALTER TABLE `{table_name}` ADD COLUMN `{col}` {ddl_type} NULL")
                             except Exception as e:
                                 logging.error(f"database.insert_other_db_from_df处理异常：{table_name}表新增字段{col}失败：{e}")
+                finally:
+                    invalidate_schema(table_name, to_db)
+                schema = table_schema(table_name, to_db)
+                types = cols_type or schema.get('types') or None
     except Exception as e:
         logging.error(f"database.insert_other_db_from_df处理异常：{table_name}表字段检查失败：{e}")
+    return data, schema, types
+
+
+# 增加一个插入到其他数据库的方法。
+def insert_other_db_from_df(to_db, data, table_name, cols_type, write_index, primary_keys, indexs=None):
+    # 定义engine
+    if to_db is None:
+        engine_mysql = engine()
+    else:
+        engine_mysql = engine_to_db(to_db)
+    # 表结构（是否存在、字段、主键）从缓存读取，见 table_schema。
+    data, schema, types = _prepare_frame(to_db, data, table_name, cols_type)
 
     col_name_list = data.columns.tolist()
     # 如果有索引，把索引增加到varchar上面。
@@ -185,18 +588,24 @@ def insert_other_db_from_df(to_db, data, table_name, cols_type, write_index, pri
         except Exception:
             chunksize = None
 
-        method = os.environ.get('INSTOCK_DB_INSERT_METHOD', 'multi').strip() or 'multi'
+        # 写入方式 INSTOCK_DB_INSERT_METHOD：bulk（默认，MySQL 已存在的表走 bulk_insert，
+        # 建表和其他数据库仍用 to_sql）、multi 或 None（DataFrame.to_sql 的 method）。
+        method = _bulk_method()
         t0 = time.perf_counter()
-        if cols_type is None:
+        if method == 'bulk' and schema['exists'] and engine_mysql.dialect.name == 'mysql':
+            frame = data.reset_index() if write_index else data
+            with borrow_cursor(to_db) as db:
+                bulk_insert(db, table_name, frame, types, str(engine_mysql.url))
+        elif cols_type is None:
             data.to_sql(name=table_name, con=engine_mysql, schema=to_db, if_exists='append',
-                        index=write_index, method=method, chunksize=chunksize)
+                        index=write_index, method=_to_sql_method(method), chunksize=chunksize)
         elif not cols_type:
             data.to_sql(name=table_name, con=engine_mysql, schema=to_db, if_exists='append',
                         dtype={col_name: NVARCHAR(255) for col_name in col_name_list}, index=write_index,
-                        method=method, chunksize=chunksize)
+                        method=_to_sql_method(method), chunksize=chunksize)
         else:
             data.to_sql(name=table_name, con=engine_mysql, schema=to_db, if_exists='append',
-                        dtype=cols_type, index=write_index, method=method, chunksize=chunksize)
+                        dtype=cols_type, index=write_index, method=_to_sql_method(method), chunksize=chunksize)
 
         logging.info(
             "database.insert_other_db_from_df inserted table=%s rows=%s cost=%.3fs method=%s chunksize=%s",
@@ -209,108 +618,126 @@ def insert_other_db_from_df(to_db, data, table_name, cols_type, write_index, pri
     except Exception as e:
         logging.error(f"database.insert_other_db_from_df处理异常：{table_name}表{e}")
 
+    # to_sql 可能刚建表
+    if not schema['exists']:
+        invalidate_schema(table_name, to_db)
+        schema = table_schema(table_name, to_db)
     # 判断是否存在主键
-    if not ipt.get_pk_constraint(table_name)['constrained_columns']:
+    if schema['exists'] and not schema['primary_key']:
         try:
             # 执行数据库插入数据。
-            with get_connection() as conn:
-                with conn.cursor() as db:
-                    db.execute(f'ALTER TABLE `{table_name}` ADD PRIMARY KEY ({primary_keys});')
-                    if indexs is not None:
-                        for k in indexs:
-                            db.execute(f'ALTER TABLE `{table_name}` ADD INDEX IN{k}({indexs[k]});')
+            with borrow_cursor(to_db) as db:
+                db.execute(f'ALTER TABLE `{table_name}` ADD PRIMARY KEY ({primary_keys});')
+                if indexs is not None:
+                    for k in indexs:
+                        db.execute(f'ALTER TABLE `{table_name}` ADD INDEX IN{k}({indexs[k]});')
         except Exception as e:
             logging.error(f"database.insert_other_db_from_df处理异常：{table_name}表{e}")
+        finally:
+            invalidate_schema(table_name, to_db)
 
 
-# 更新数据
+# 更新数据，按 where 中的字段定位行，见 bulk_update_df。
 def update_db_from_df(data, table_name, where):
-    data = data.where(data.notnull(), None)
-    update_string = f'UPDATE `{table_name}` set '
-    where_string = ' where '
-    cols = tuple(data.columns)
-    with get_connection() as conn:
-        with conn.cursor() as db:
+    bulk_update_df(data, table_name, where)
+
+
+def bulk_update_df(data, table_name, keys, to_db=None):
+    """
+    集合方式批量更新：新值批量写入临时表（bulk_insert），再用一条 UPDATE ... JOIN 更新目标表，
+    不再逐行拼接 UPDATE 语句。按 INSTOCK_DB_UPDATE_CHUNK_ROWS（默认50000）行分块，每块一个事务。
+    :param data: 包含 keys 和待更新字段的 DataFrame，空值更新为 NULL
+    :param keys: 定位行的字段，如 ('date', 'code')
+    :return: 受影响的行数
+    """
+    if data is None or len(data.index) == 0:
+        return 0
+    keys = list(keys)
+    cols = [col for col in data.columns if col not in keys]
+    if not cols:
+        return 0
+    data = data.drop_duplicates(subset=keys, keep='last')
+    types = table_schema(table_name, to_db).get('types') or None
+    if types:
+        data = _clean_numeric(data, types)
+    tmp = f"_upd_{table_name}"[:64]
+    url = str((engine() if to_db is None else engine_to_db(to_db)).url)
+    chunk = max(_env_int('INSTOCK_DB_UPDATE_CHUNK_ROWS', 50000), 1)
+    on = ' AND '.join(f't.`{k}` = s.`{k}`' for k in keys)
+    sets = ', '.join(f't.`{col}` = s.`{col}`' for col in cols)
+    updated = 0
+    t0 = time.perf_counter()
+    try:
+        with borrow_connection(to_db) as conn:
+            db = conn.cursor()
             try:
-                for row in data.values:
-                    sql = update_string
-                    sql_where = where_string
-                    for index, col in enumerate(cols):
-                        if col in where:
-                            if len(sql_where) == len(where_string):
-                                if type(row[index]) == str:
-                                    sql_where = f'''{sql_where}`{col}` = '{row[index]}' '''
-                                else:
-                                    sql_where = f'''{sql_where}`{col}` = {row[index]} '''
-                            else:
-                                if type(row[index]) == str:
-                                    sql_where = f'''{sql_where} and `{col}` = '{row[index]}' '''
-                                else:
-                                    sql_where = f'''{sql_where} and `{col}` = {row[index]} '''
-                        else:
-                            if type(row[index]) == str:
-                                if row[index] is None or row[index] != row[index]:
-                                    sql = f'''{sql}`{col}` = NULL, '''
-                                else:
-                                    sql = f'''{sql}`{col}` = '{row[index]}', '''
-                            else:
-                                if row[index] is None or row[index] != row[index]:
-                                    sql = f'''{sql}`{col}` = NULL, '''
-                                else:
-                                    sql = f'''{sql}`{col}` = {row[index]}, '''
-                    sql = f'{sql[:-2]}{sql_where}'
-                    db.execute(sql)
-            except Exception as e:
-                logging.error(f"database.update_db_from_df处理异常：{sql}{e}")
+                db.execute(f"DROP TEMPORARY TABLE IF EXISTS `{tmp}`")
+                db.execute(f"CREATE TEMPORARY TABLE `{tmp}` AS SELECT "
+                           f"{', '.join(f'`{col}`' for col in keys + cols)} FROM `{table_name}` WHERE 1 = 0")
+                db.execute(f"ALTER TABLE `{tmp}` ADD PRIMARY KEY ({', '.join(f'`{k}`' for k in keys)})")
+                for begin in range(0, len(data.index), chunk):
+                    if begin:
+                        db.execute(f"DELETE FROM `{tmp}`")
+                    bulk_insert(db, tmp, data.iloc[begin:begin + chunk][keys + cols], types, url)
+                    db.execute(f"UPDATE `{table_name}` AS t JOIN `{tmp}` AS s ON {on} SET {sets}")
+                    updated += db.rowcount
+                    conn.commit()
+            finally:
+                try:
+                    db.execute(f"DROP TEMPORARY TABLE IF EXISTS `{tmp}`")
+                finally:
+                    db.close()
+        logging.info(
+            "database.bulk_update_df table=%s rows=%s updated=%s cost=%.3fs",
+            table_name, len(data.index), updated, time.perf_counter() - t0,
+        )
+    except Exception as e:
+        logging.error(f"database.bulk_update_df处理异常：{table_name}表{e}")
+    return updated
 
 
 # 检查表是否存在
 def checkTableIsExist(tableName):
-    with get_connection() as conn:
-        with conn.cursor() as db:
-            db.execute("""
-                SELECT COUNT(*)
-                FROM information_schema.tables
-                WHERE table_name = '{0}'
-                """.format(tableName.replace('\'', '\'\'')))
-            if db.fetchone()[0] == 1:
-                return True
+    try:
+        return table_schema(tableName)['exists']
+    except Exception as e:
+        logging.error(f"database.checkTableIsExist处理异常：{tableName}{e}")
     return False
 
 
 # 增删改数据
 def executeSql(sql, params=()):
-    with get_connection() as conn:
-        with conn.cursor() as db:
-            try:
-                db.execute(sql, params)
-            except Exception as e:
-                logging.error(f"database.executeSql处理异常：{sql}{e}")
+    try:
+        with borrow_cursor() as db:
+            db.execute(sql, params)
+    except Exception as e:
+        logging.error(f"database.executeSql处理异常：{sql}{e}")
+    finally:
+        if _DDL_RE.match(sql):
+            invalidate_schema()
 
 
 # 查询数据
 def executeSqlFetch(sql, params=()):
-    with get_connection() as conn:
-        with conn.cursor() as db:
-            try:
-                db.execute(sql, params)
-                return db.fetchall()
-            except Exception as e:
-                logging.error(f"database.executeSqlFetch处理异常：{sql}{e}")
+    try:
+        with borrow_cursor() as db:
+            db.execute(sql, params)
+            return db.fetchall()
+    except Exception as e:
+        logging.error(f"database.executeSqlFetch处理异常：{sql}{e}")
     return None
 
 
 # 计算数量
 def executeSqlCount(sql, params=()):
-    with get_connection() as conn:
-        with conn.cursor() as db:
-            try:
-                db.execute(sql, params)
-                result = db.fetchall()
-                if len(result) == 1:
-                    return int(result[0][0])
-                else:
-                    return 0
-            except Exception as e:
-                logging.error(f"database.select_count计算数量处理异常：{e}")
+    try:
+        with borrow_cursor() as db:
+            db.execute(sql, params)
+            result = db.fetchall()
+            if len(result) == 1:
+                return int(result[0][0])
+            else:
+                return 0
+    except Exception as e:
+        logging.error(f"database.select_count计算数量处理异常：{e}")
     return 0
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 fcntl，只能依赖进程内的锁
+    fcntl = None
+
+__author__ = 'myh '
+__date__ = '2026/10/18 '
+
+
+# 跨进程的文件锁（fcntl.flock 排他锁），保护多个进程对同一个索引/清单文件的读-改-写。
+# 锁文件本身只用于加锁，不写内容；进程退出时内核自动释放锁。
+@contextmanager
+def locked(lock_file):
+    os.makedirs(os.path.dirname(lock_file) or '.', exist_ok=True)
+    with open(lock_file, 'a') as f:
+        if fcntl is None:
+            yield
+            return
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
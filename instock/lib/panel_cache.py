@@ -0,0 +1,184 @@
+"""PanelCache: process-level, byte-bounded LRU cache for parquet-backed readers.
+
+Entries are keyed by what was read (e.g. ``("segment", <partition path>)``)
+and tagged with a version derived from the backing file: inode, mtime and
+size of a parquet file or index, plus ``next_seq`` for a
+segment table's manifest. A version mismatch is a miss, so a rewritten
+snapshot, a new segment or a compaction is picked up on the next read
+without explicit invalidation.
+
+The shared instance is bounded by ``INSTOCK_PANEL_CACHE_BYTES`` (default
+512M, K/M/G suffixes allowed); least recently used entries are evicted
+first. Cached values are shared: callers must treat them as read-only or
+copy them.
+"""
+from __future__ import annotations
+
+import json
+import os
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Hashable, Iterable, Optional
+
+import pandas as pd
+
+from instock.lib.byte_size import parse_size
+
+DEFAULT_MAX_BYTES = "512M"
+MANIFEST = "_manifest.json"
+
+
+def path_version(path: Path) -> Optional[tuple]:
+    """Version tag of a file, segment-table directory or plain directory; None if missing."""
+    path = Path(path)
+    try:
+        if path.is_dir() and (path / MANIFEST).exists():
+            stat = (path / MANIFEST).stat()
+            with open(path / MANIFEST, "r") as f:
+                seq = json.load(f)["next_seq"]
+            return (stat.st_ino, stat.st_mtime_ns, stat.st_size, seq)
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def sizeof(value: Any) -> int:
+    """Approximate in-memory size of a cached value."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in value.items())
+    if isinstance(value, (set, frozenset, list, tuple)):
+        return sys.getsizeof(value) + sum(sys.getsizeof(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class PanelCache:
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[Hashable, tuple[Any, Any, int]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_load(
+        self,
+        key: Hashable,
+        version: Any,
+        loader: Callable[[], Any],
+    ) -> Any:
+        """Return the cached value for ``key`` if its version matches, else load it."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        value = loader()
+        nbytes = sizeof(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[2]
+            if nbytes <= self.max_bytes:
+                self._entries[key] = (version, value, nbytes)
+                self.bytes += nbytes
+                self._evict()
+        return value
+
+    def _evict(self) -> None:
+        while self.bytes > self.max_bytes and self._entries:
+            _, (_, _, nbytes) = self._entries.popitem(last=False)
+            self.bytes -= nbytes
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[2]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 3) if total else None,
+            }
+
+
+def _default_max_bytes() -> int:
+    try:
+        return parse_size(os.environ.get("INSTOCK_PANEL_CACHE_BYTES") or DEFAULT_MAX_BYTES)
+    except ValueError:
+        return parse_size(DEFAULT_MAX_BYTES)
+
+
+_shared: Optional[PanelCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_cache() -> PanelCache:
+    """The process-wide cache used by the factor, portfolio and refdata readers."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = PanelCache(_default_max_bytes())
+        return _shared
+
+
+def cached(key: Hashable, path: Path, loader: Callable[[], Any]) -> Any:
+    """Shortcut: cache ``loader()`` under ``key``, versioned by ``path``."""
+    return get_cache().get_or_load(key, path_version(path), loader)
+
+
+def read_partitions(table, partitions: Iterable[str]) -> list[pd.DataFrame]:
+    """Cached, deduplicated frames of a SegmentTable's partitions (missing ones skipped).
+
+    Each partition is cached whole under its manifest version, so an append
+    or compaction invalidates just that partition.
+    """
+    frames = []
+    for partition in partitions:
+        path = table.path(str(partition))
+        version = path_version(path)
+        if version is None:
+            continue
+        frame = get_cache().get_or_load(
+            ("segment", str(path)), version, lambda p=str(partition): table.read([p]),
+        )
+        if not frame.empty:
+            frames.append(frame)
+    return frames
+
+
+def read_date_range(table, start: pd.Timestamp, end: pd.Timestamp, column: str = "date") -> pd.DataFrame:
+    """Rows of a year-partitioned SegmentTable with ``start <= column <= end``, via the cache."""
+    years = [str(y) for y in range(start.year, end.year + 1)]
+    frames = read_partitions(table, years)
+    if not frames:
+        return pd.DataFrame()
+    df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    dates = df[column]
+    mask = (dates >= pd.Timestamp(start)) & (dates <= pd.Timestamp(end))
+    return df.loc[mask].reset_index(drop=True)
+
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import time
+import asyncio
+import threading
+from urllib.parse import urlparse
+import requests
+from instock.lib.singleton_type import singleton_type
+
+__author__ = 'myh '
+__date__ = '2026/10/18 '
+
+# 各主机默认速率（每秒请求数）、突发容量、速率上下限。
+# 可通过环境变量覆盖，例如 INSTOCK_RATE_LIMITS="push2his.eastmoney.com=12,sina=2"
+DEFAULT_HOST_RATES = {
+    'push2.eastmoney.com': {'rate': 5.0, 'burst': 5, 'min_rate': 0.5, 'max_rate': 20.0},
+    'push2his.eastmoney.com': {'rate': 8.0, 'burst': 8, 'min_rate': 0.5, 'max_rate': 30.0},
+    'datacenter-web.eastmoney.com': {'rate': 3.0, 'burst': 3, 'min_rate': 0.3, 'max_rate': 10.0},
+    'sina': {'rate': 2.0, 'burst': 2, 'min_rate': 0.2, 'max_rate': 5.0},
+    'default': {'rate': 5.0, 'burst': 5, 'min_rate': 0.5, 'max_rate': 20.0},
+}
+
+# 视为限流/过载信号的 HTTP 状态码
+THROTTLE_STATUS = (429, 500, 502, 503, 504)
+
+_HOST_PREFIX_RE = re.compile(r'^\d+\.')
+
+
+def host_key(url_or_host):
+    """
+    把 URL 或主机名归一为限流键
+    80.push2.eastmoney.com -> push2.eastmoney.com，*.sina.com.cn -> sina
+    """
+    host = urlparse(url_or_host).netloc if '//' in url_or_host else url_or_host
+    host = host.split(':')[0].lower()
+    if host.endswith('sina.com.cn') or host.endswith('sina.cn'):
+        return 'sina'
+    return _HOST_PREFIX_RE.sub('', host)
+
+
+def is_throttle_error(exc):
+    """判断异常是否为限流/过载信号（429、5xx、超时、连接失败）"""
+    if isinstance(exc, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+        return True
+    if isinstance(exc, requests.exceptions.HTTPError):
+        response = getattr(exc, 'response', None)
+        return response is not None and response.status_code in THROTTLE_STATUS
+    return False
+
+
+class token_bucket:
+    """
+    线程安全的令牌桶，速率按 AIMD 自适应：
+    成功时加性增加速率，遇到 429/5xx/超时时乘性降低速率并进入指数退避窗口。
+    同步调用 acquire()，协程中调用 acquire_async()，二者共享同一个桶。
+    """
+
+    def __init__(self, rate, burst, min_rate, max_rate, increase=0.05, decrease=0.5,
+                 backoff_base=1.0, backoff_max=30.0):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.min_rate = float(min_rate)
+        self.max_rate = float(max_rate)
+        self.increase = increase
+        self.decrease = decrease
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._backoff_until = 0.0
+        self._consecutive_throttles = 0
+        self._acquired = 0
+        self._waited = 0.0
+        self._successes = 0
+        self._throttles = 0
+
+    def _reserve(self, tokens=1):
+        """预占令牌，返回调用方需要等待的秒数（令牌可透支，保证先到先得）"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= tokens
+            wait = 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+            wait = max(wait, self._backoff_until - now)
+            self._acquired += 1
+            self._waited += wait
+            return wait
+
+    def acquire(self, tokens=1):
+        """阻塞直到获得令牌，返回等待秒数"""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self, tokens=1):
+        """协程版本的 acquire"""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def on_success(self):
+        with self._lock:
+            self._successes += 1
+            self._consecutive_throttles = 0
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_throttle(self, retry_after=None):
+        """
+        遇到限流/过载：速率减半并进入退避窗口
+        :param retry_after: 服务端给出的 Retry-After 秒数，优先使用
+        """
+        with self._lock:
+            self._throttles += 1
+            self._consecutive_throttles += 1
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            if retry_after is None:
+                backoff = min(self.backoff_max, self.backoff_base * (2 ** (self._consecutive_throttles - 1)))
+            else:
+                backoff = min(self.backoff_max, float(retry_after))
+            self._backoff_until = max(self._backoff_until, time.monotonic() + backoff)
+            self._tokens = min(self._tokens, 0.0)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rate': round(self.rate, 3),
+                'tokens': round(self._tokens, 3),
+                'backoff_remaining': round(max(0.0, self._backoff_until - time.monotonic()), 3),
+                'acquired': self._acquired,
+                'waited_seconds': round(self._waited, 3),
+                'successes': self._successes,
+                'throttles': self._throttles,
+                'consecutive_throttles': self._consecutive_throttles,
+            }
+
+
+def _parse_env_rates():
+    overrides = {}
+    raw = os.environ.get('INSTOCK_RATE_LIMITS', '')
+    for item in raw.split(','):
+        if '=' not in item:
+            continue
+        host, rate = item.split('=', 1)
+        try:
+            overrides[host.strip()] = float(rate)
+        except ValueError:
+            continue
+    return overrides
+
+
+# 进程级的按主机限流器，所有爬虫共享
+class host_rate_limiter(metaclass=singleton_type):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+        self._overrides = _parse_env_rates()
+
+    def bucket(self, url_or_host):
+        key = host_key(url_or_host)
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                conf = dict(DEFAULT_HOST_RATES.get(key, DEFAULT_HOST_RATES['default']))
+                if key in self._overrides:
+                    conf['rate'] = self._overrides[key]
+                    conf['max_rate'] = max(conf['max_rate'], conf['rate'])
+                bucket = token_bucket(**conf)
+                self._buckets[key] = bucket
+            return bucket
+
+    def acquire(self, url_or_host):
+        return self.bucket(url_or_host).acquire()
+
+    async def acquire_async(self, url_or_host):
+        return await self.bucket(url_or_host).acquire_async()
+
+    def on_success(self, url_or_host):
+        self.bucket(url_or_host).on_success()
+
+    def on_throttle(self, url_or_host, retry_after=None):
+        self.bucket(url_or_host).on_throttle(retry_after)
+
+    def report(self, url_or_host, exc=None, response=None):
+        """
+        根据请求结果反馈给对应主机的令牌桶
+        :param exc: 请求抛出的异常
+        :param response: 响应对象
+        """
+        if response is not None and response.status_code in THROTTLE_STATUS:
+            self.on_throttle(url_or_host, _retry_after(response))
+        elif exc is not None:
+            if is_throttle_error(exc):
+                self.on_throttle(url_or_host, _retry_after(getattr(exc, 'response', None)))
+        elif response is not None:
+            self.on_success(url_or_host)
+
+    def stats(self):
+        with self._lock:
+            buckets = dict(self._buckets)
+        return {key: bucket.stats() for key, bucket in buckets.items()}
+
+
+def _retry_after(response):
+    if response is None:
+        return None
+    value = response.headers.get('Retry-After') if response.headers is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
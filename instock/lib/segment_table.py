@@ -0,0 +1,353 @@
+"""SegmentTable: append-only parquet partitions with read-time dedup and compaction.
+
+Each partition ``<root>/<name>.parquet`` is a directory holding immutable
+segment files plus a manifest::
+
+    2024.parquet/_manifest.json        {"keys": [...], "next_seq": 7, "segments": [...]}
+    2024.parquet/seg-000000000005.parquet
+    2024.parquet/seg-000000000006.parquet
+
+An append writes one new segment and swaps the manifest (write to a dot-file,
+then ``os.replace``), so it costs O(rows appended) instead of rewriting the
+year. Readers only open files listed in the manifest; a half-written segment
+is never visible. Duplicate keys are resolved at read time: the row from the
+segment with the highest sequence number wins, same as the old
+``drop_duplicates(keep="last")`` on rewrite.
+
+Compaction merges a partition's segments into one sorted segment (optionally
+row-grouped) and swaps the manifest; it runs in a background thread once a
+partition reaches ``INSTOCK_SEGMENT_COMPACT_AT`` segments (default 16), or
+via ``python -m instock.job.segment_compact_job``.
+
+A partition that is still a plain parquet file from the old layout is read
+as-is and converted to a directory on its first append. Appends and
+compactions are serialised per partition: by a thread lock within a process
+and by an ``flock`` on ``<partition>/.lock`` across processes, so several
+writer processes can share a table. Converting a legacy file takes an
+``flock`` on the sibling ``.<name>.parquet.convert.lock`` instead, since the
+partition directory does not exist yet.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterable, Optional, Sequence
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from instock.lib.file_lock import locked
+
+log = logging.getLogger(__name__)
+
+MANIFEST = "_manifest.json"
+LOCK_FILE = ".lock"
+_SEQ = "__seq"
+
+_locks: dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+_compacting: set[str] = set()
+
+
+def _lock(path: Path) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(str(path), threading.Lock())
+
+
+@contextmanager
+def _partition_lock(path: Path):
+    """Hold the partition's thread lock and its cross-process file lock."""
+    with _lock(path), locked(str(path / LOCK_FILE)):
+        yield
+
+
+def default_compact_at() -> int:
+    try:
+        return max(2, int(os.environ.get("INSTOCK_SEGMENT_COMPACT_AT") or 16))
+    except ValueError:
+        return 16
+
+
+def _segment_name(seq: int) -> str:
+    return f"seg-{seq:012d}.parquet"
+
+
+def _read_manifest(path: Path) -> Optional[dict]:
+    try:
+        with open(path / MANIFEST, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_manifest(path: Path, manifest: dict) -> None:
+    tmp = path / f".{MANIFEST}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, path / MANIFEST)
+
+
+def _write_segment(path: Path, seq: int, df: pd.DataFrame, row_group_size: Optional[int]) -> str:
+    name = _segment_name(seq)
+    tmp = path / f".{name}.tmp"
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp, row_group_size=row_group_size)
+    os.replace(tmp, path / name)
+    return name
+
+
+def _read_frames(
+    files: Sequence[tuple[Path, int]], columns: Optional[list[str]], filter,
+) -> list[pd.DataFrame]:
+    frames = []
+    for file, seq in files:
+        dataset = ds.dataset(str(file), format="parquet")
+        cols = None if columns is None else [c for c in columns if c in dataset.schema.names]
+        frame = dataset.to_table(columns=cols, filter=filter).to_pandas()
+        if not frame.empty:
+            frame[_SEQ] = seq
+            frames.append(frame)
+    return frames
+
+
+def _dedup(frames: list[pd.DataFrame], keys: Sequence[str]) -> pd.DataFrame:
+    df = pd.concat(frames, ignore_index=True)
+    if len(frames) > 1:
+        df = (
+            df.sort_values(_SEQ, kind="stable")
+            .drop_duplicates(subset=list(keys), keep="last")
+        )
+    return df.drop(columns=[_SEQ])
+
+
+def _sorted(df: pd.DataFrame, sort_by: Sequence[str]) -> pd.DataFrame:
+    sort_by = [c for c in sort_by if c in df.columns]
+    if sort_by:
+        df = df.sort_values(sort_by, kind="stable")
+    return df.reset_index(drop=True)
+
+
+class SegmentTable:
+    def __init__(
+        self,
+        root: Path,
+        keys: Sequence[str],
+        partition_by: Optional[Callable[[pd.DataFrame], pd.Series]] = None,
+        sort_by: Optional[Sequence[str]] = None,
+        row_group_size: Optional[int] = None,
+        compact_at: Optional[int] = None,
+    ) -> None:
+        """
+        :param root: directory holding the ``<partition>.parquet`` entries
+        :param keys: unique row key; later appends win on duplicates
+        :param partition_by: maps a frame to partition names (e.g. its year);
+            None keeps a single partition named by ``root``'s file name
+        :param sort_by: row order of compacted segments and of read results
+        :param row_group_size: parquet row group size for compacted segments
+        :param compact_at: segment count that triggers background compaction
+        """
+        self.root = Path(root)
+        self.keys = list(keys)
+        self.partition_by = partition_by
+        self.sort_by = list(sort_by or keys)
+        self.row_group_size = row_group_size
+        self.compact_at = default_compact_at() if compact_at is None else compact_at
+
+    # ---------- layout ----------
+    def path(self, partition: str) -> Path:
+        if self.partition_by is None:
+            return self.root
+        return self.root / f"{partition}.parquet"
+
+    def _single_name(self) -> str:
+        return self.root.name
+
+    def partitions(self) -> list[str]:
+        if self.partition_by is None:
+            return [self._single_name()] if self.root.exists() else []
+        if not self.root.is_dir():
+            return []
+        return sorted(p.name[: -len(".parquet")] for p in self.root.glob("*.parquet"))
+
+    def _files(self, path: Path) -> list[tuple[Path, int]]:
+        return partition_files(path)
+
+    def segment_count(self, partition: str) -> int:
+        return len(self._files(self.path(partition)))
+
+    # ---------- read ----------
+    def read(
+        self,
+        partitions: Optional[Iterable[str]] = None,
+        columns: Optional[list[str]] = None,
+        filter=None,
+    ) -> pd.DataFrame:
+        """Deduplicated rows of the given partitions (default: all).
+
+        ``columns`` and ``filter`` (a pyarrow.dataset expression) are pushed
+        down to every segment; key columns are always read for dedup.
+        """
+        if partitions is None:
+            partitions = self.partitions()
+        read_cols = None
+        if columns is not None:
+            read_cols = list(dict.fromkeys(list(columns) + self.keys))
+        frames = []
+        for partition in partitions:
+            path = self.path(str(partition))
+            for attempt in range(3):
+                try:
+                    part = _read_frames(self._files(path), read_cols, filter)
+                except FileNotFoundError:
+                    # a compaction swapped the manifest and removed old segments
+                    if attempt == 2:
+                        raise
+                    continue
+                frames.extend(part)
+                break
+        if not frames:
+            return pd.DataFrame(columns=columns) if columns is not None else pd.DataFrame()
+        df = _dedup(frames, self.keys)
+        if columns is not None:
+            df = df[[c for c in columns if c in df.columns]]
+        return _sorted(df, self.sort_by)
+
+    # ---------- write ----------
+    def append(self, df: pd.DataFrame) -> None:
+        """Write ``df`` as one new segment per partition it touches."""
+        if df.empty:
+            return
+        if self.partition_by is None:
+            groups = [(self._single_name(), df)]
+        else:
+            names = self.partition_by(df).astype(str)
+            groups = [(name, group) for name, group in df.groupby(names, sort=True)]
+        for name, group in groups:
+            path = self.path(name)
+            if path.is_file():
+                self._convert_legacy(path)
+            with _partition_lock(path):
+                manifest = self._open_for_write(path)
+                seq = manifest["next_seq"]
+                segment = _write_segment(path, seq, _sorted(group, self.sort_by), None)
+                manifest["segments"].append({"file": segment, "seq": seq, "rows": len(group)})
+                manifest["next_seq"] = seq + 1
+                _write_manifest(path, manifest)
+                count = len(manifest["segments"])
+            if count >= self.compact_at:
+                self.compact_async(name)
+
+    def _open_for_write(self, path: Path) -> dict:
+        manifest = _read_manifest(path)
+        if manifest is None:
+            manifest = {"keys": self.keys, "sort_by": self.sort_by,
+                        "row_group_size": self.row_group_size, "next_seq": 1, "segments": []}
+        return manifest
+
+    def _convert_legacy(self, path: Path) -> None:
+        """Turn an old single-file partition into a directory with it as segment 0."""
+        with _lock(path), locked(str(path.with_name(f".{path.name}.convert.lock"))):
+            if not path.is_file():  # another process converted it while we waited
+                return
+            staging = path.with_name(f".{path.name}.convert")
+            staging.mkdir(parents=True, exist_ok=True)
+            os.replace(path, staging / _segment_name(0))
+            rows = pq.ParquetFile(staging / _segment_name(0)).metadata.num_rows
+            _write_manifest(staging, {"keys": self.keys, "sort_by": self.sort_by,
+                                      "row_group_size": self.row_group_size, "next_seq": 1,
+                                      "segments": [{"file": _segment_name(0), "seq": 0, "rows": rows}]})
+            os.replace(staging, path)
+
+    # ---------- compaction ----------
+    def compact(self, partition: Optional[str] = None) -> int:
+        """Merge each partition's segments into one; returns partitions compacted."""
+        names = [partition] if partition is not None else self.partitions()
+        done = 0
+        for name in names:
+            if compact_partition(self.path(name), self.keys, self.sort_by, self.row_group_size):
+                done += 1
+        return done
+
+    def compact_async(self, partition: str) -> None:
+        key = str(self.path(partition))
+        with _locks_guard:
+            if key in _compacting:
+                return
+            _compacting.add(key)
+
+        def run() -> None:
+            try:
+                self.compact(partition)
+            except Exception as exc:  # noqa: BLE001
+                log.warning("SegmentTable: background compaction of %s failed: %s", key, exc)
+            finally:
+                with _locks_guard:
+                    _compacting.discard(key)
+
+        threading.Thread(target=run, name=f"compact-{partition}", daemon=True).start()
+
+
+def partition_files(path: Path) -> list[tuple[Path, int]]:
+    """(file, seq) of a partition's live segments; a legacy single file is seq 0."""
+    path = Path(path)
+    if path.is_file():
+        return [(path, 0)]
+    manifest = _read_manifest(path)
+    if manifest is None:
+        return []
+    return [(path / seg["file"], seg["seq"]) for seg in manifest["segments"]]
+
+
+def compact_partition(
+    path: Path,
+    keys: Optional[Sequence[str]] = None,
+    sort_by: Optional[Sequence[str]] = None,
+    row_group_size: Optional[int] = None,
+) -> bool:
+    """Compact one partition directory; key/sort settings default to its manifest."""
+    path = Path(path)
+    if not path.is_dir():
+        return False
+    with _partition_lock(path):
+        manifest = _read_manifest(path)
+        if manifest is None or len(manifest["segments"]) <= 1:
+            return False
+        keys = list(keys or manifest["keys"])
+        sort_by = list(sort_by or manifest.get("sort_by") or keys)
+        if row_group_size is None:
+            row_group_size = manifest.get("row_group_size")
+        files = [(path / seg["file"], seg["seq"]) for seg in manifest["segments"]]
+        frames = _read_frames(files, None, None)
+        if not frames:
+            return False
+        df = _sorted(_dedup(frames, keys), sort_by)
+        seq = manifest["next_seq"]
+        segment = _write_segment(path, seq, df, row_group_size)
+        old = [file for file, _ in files]
+        manifest["segments"] = [{"file": segment, "seq": seq, "rows": len(df)}]
+        manifest["next_seq"] = seq + 1
+        _write_manifest(path, manifest)
+        for file in old:
+            try:
+                file.unlink()
+            except OSError:
+                pass
+    log.info("SegmentTable: compacted %s (%d segments -> 1, %d rows)", path, len(old), len(df))
+    return True
+
+
+def compact_tree(root: Path) -> int:
+    """Compact every partition directory with a manifest under ``root``."""
+    root = Path(root)
+    if not root.exists():
+        return 0
+    done = 0
+    for manifest in sorted(root.rglob(MANIFEST)):
+        if compact_partition(manifest.parent):
+            done += 1
+    return done
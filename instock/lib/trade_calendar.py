@@ -0,0 +1,68 @@
+"""TradeCalendar: sorted trade-date index with bisect-based navigation.
+
+Every lookup is O(log n) on a sorted list, so walking back N trading days or
+counting trading days in a window no longer steps through calendar days.
+Dates must all be the same type (``datetime.date``); ``datetime.datetime``
+values are compared by their date part.
+"""
+from __future__ import annotations
+
+import datetime
+from bisect import bisect_left, bisect_right
+from typing import Iterable, Optional
+
+
+def _as_date(d):
+    return d.date() if isinstance(d, datetime.datetime) else d
+
+
+class TradeCalendar:
+    def __init__(self, dates: Iterable[datetime.date]) -> None:
+        self.dates: list[datetime.date] = sorted({_as_date(d) for d in dates})
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def __bool__(self) -> bool:
+        return bool(self.dates)
+
+    def __contains__(self, d) -> bool:
+        d = _as_date(d)
+        i = bisect_left(self.dates, d)
+        return i < len(self.dates) and self.dates[i] == d
+
+    def prev(self, d, n: int = 1) -> Optional[datetime.date]:
+        """The n-th trading day strictly before ``d``; None if out of range."""
+        i = bisect_left(self.dates, _as_date(d)) - n
+        return self.dates[i] if 0 <= i < len(self.dates) else None
+
+    def next(self, d, n: int = 1) -> Optional[datetime.date]:
+        """The n-th trading day strictly after ``d``; None if out of range."""
+        i = bisect_right(self.dates, _as_date(d)) + n - 1
+        return self.dates[i] if 0 <= i < len(self.dates) else None
+
+    def floor(self, d) -> Optional[datetime.date]:
+        """The latest trading day <= ``d``."""
+        i = bisect_right(self.dates, _as_date(d)) - 1
+        return self.dates[i] if i >= 0 else None
+
+    def ceil(self, d) -> Optional[datetime.date]:
+        """The earliest trading day >= ``d``."""
+        i = bisect_left(self.dates, _as_date(d))
+        return self.dates[i] if i < len(self.dates) else None
+
+    def offset(self, d, k: int) -> Optional[datetime.date]:
+        """Shift by ``k`` trading days; ``k == 0`` returns ``d`` only if it trades."""
+        if k > 0:
+            return self.next(d, k)
+        if k < 0:
+            return self.prev(d, -k)
+        return _as_date(d) if d in self else None
+
+    def range(self, start, end) -> list[datetime.date]:
+        """Trading days in the closed interval [start, end]."""
+        return self.dates[bisect_left(self.dates, _as_date(start)):bisect_right(self.dates, _as_date(end))]
+
+    def count_between(self, start, end) -> int:
+        """Number of trading days in the closed interval [start, end]."""
+        return max(0, bisect_right(self.dates, _as_date(end)) - bisect_left(self.dates, _as_date(start)))
@@ -4,6 +4,7 @@
 import datetime
 import os
 from instock.core.singleton_trade_date import stock_trade_date
+from instock.lib.trade_calendar import TradeCalendar
 
 __author__ = 'myh '
 __date__ = '2023/4/10 '
@@ -19,42 +20,33 @@ def is_trade_date(date=None):
         return False
 
 
+_calendar = None
+
+
+# 交易日历索引，交易日数据变化时重建
+def get_trade_calendar():
+    global _calendar
+    trade_date = stock_trade_date().get_data()
+    calendar = _calendar
+    if calendar is None or calendar.source is not trade_date:
+        calendar = TradeCalendar(trade_date or ())
+        calendar.source = trade_date
+        _calendar = calendar
+    return calendar
+
+
 def get_previous_trade_date(date, count=1):
-    while True:
-        date =  get_one_previous_trade_date(date)
-        count -= 1
-        if count == 0:
-            break
-    return date
+    tmp_date = get_trade_calendar().prev(date, count)
+    return date if tmp_date is None else tmp_date
+
 
 def get_one_previous_trade_date(date):
-    trade_date = stock_trade_date().get_data()
-    if not trade_date:
-        return date
-    tmp_date = date
-    # Safety: if trade_date is unexpectedly missing dates, don't loop forever.
-    for _ in range(3660):  # ~10 years
-        tmp_date += datetime.timedelta(days=-1)
-        if tmp_date in trade_date:
-            break
-    else:
-        return date
-    return tmp_date
+    return get_previous_trade_date(date, 1)
 
 
-def get_next_trade_date(date):
-    trade_date = stock_trade_date().get_data()
-    if not trade_date:
-        return date
-    tmp_date = date
-    # Safety: if trade_date is unexpectedly missing dates, don't loop forever.
-    for _ in range(3660):  # ~10 years
-        tmp_date += datetime.timedelta(days=1)
-        if tmp_date in trade_date:
-            break
-    else:
-        return date
-    return tmp_date
+def get_next_trade_date(date, count=1):
+    tmp_date = get_trade_calendar().next(date, count)
+    return date if tmp_date is None else tmp_date
 
 
 OPEN_TIME = (
@@ -125,6 +117,16 @@ def is_open(now_time):
     return False
 
 
+def is_only_missing_cache():
+    return str(os.getenv("INSTOCK_ONLY_MISSING_CACHE", "")).lower() not in (
+        "",
+        "0",
+        "false",
+        "no",
+        "off",
+    )
+
+
 def get_trade_hist_interval(date):
     tmp_year, tmp_month, tmp_day = date.split("-")
     date_end = datetime.datetime(int(tmp_year), int(tmp_month), int(tmp_day))
@@ -133,14 +135,7 @@ def get_trade_hist_interval(date):
 
     # When enabled, use a stable start date (Jan 1, 3 years ago) to avoid
     # generating a new cache folder for each run date.
-    only_missing_cache = str(os.getenv("INSTOCK_ONLY_MISSING_CACHE", "")).lower() not in (
-        "",
-        "0",
-        "false",
-        "no",
-        "off",
-    )
-    if only_missing_cache:
+    if is_only_missing_cache():
         date_start = f"{date_end.year - 3}0101"
 
     now_time = datetime.datetime.now()
@@ -8,7 +8,7 @@ name cap, weekly-Friday rebalance).
 from __future__ import annotations
 
 import logging
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
 from datetime import date, timedelta
 from typing import Callable
 
@@ -16,6 +16,7 @@ import pandas as pd
 
 from instock.datasource.registry import get_source
 from instock.factors.storage import read_factor
+from instock.lib import panel_cache
 from instock.refdata import industry as refdata_industry
 from instock.refdata import listing as refdata_listing
 from instock.refdata import st as refdata_st
@@ -85,7 +86,11 @@ class StrategyPipeline:
             st_flags=st_flags,
         )
 
-    def _build_constraint_context(self, at: date) -> ConstraintContext:
+    def _build_constraint_context(
+        self, at: date, industry_maps: dict[date, dict[str, str]] | None = None
+    ) -> ConstraintContext:
+        if industry_maps is not None:
+            return ConstraintContext(industry_map=industry_maps.get(at))
         try:
             industry_map = refdata_industry.read_industry_map(at)
         except RefdataNotAvailable:
@@ -114,12 +119,17 @@ class StrategyPipeline:
 
         ohlcv = self._load_ohlcv_panel(start, end)
         fctx = self._build_filter_context(ohlcv, start)
+        # point-in-time refdata for every rebalance day, from one interval pass
+        st_sets = refdata_st.read_st_flag_sets(rebal)
+        industry_maps = refdata_industry.read_industry_maps(rebal)
 
         rows = []
         for d in rebal:
             ts = pd.Timestamp(d)
             universe = resolver(d)
             chain = FilterChain(config.filters)
+            if st_sets:
+                fctx = replace(fctx, st_flags=st_sets.get(d))
             filtered = chain.apply(universe, ts, fctx)
             if not filtered:
                 log.warning("strategy %s %s: empty after filters",
@@ -141,7 +151,7 @@ class StrategyPipeline:
             )
             weights = config.weighter.weigh(selected, wctx)
 
-            cctx = self._build_constraint_context(d)
+            cctx = self._build_constraint_context(d, industry_maps)
             for c in config.constraints:
                 weights = c.apply(weights, cctx)
 
@@ -157,6 +167,7 @@ class StrategyPipeline:
                     "strategy": config.name,
                 })
 
+        log.debug("strategy %s: panel cache %s", config.name, panel_cache.get_cache().stats())
         if not rows:
             return pd.DataFrame(columns=_OUTPUT_COLUMNS)
         return pd.DataFrame(rows, columns=_OUTPUT_COLUMNS)
@@ -4,6 +4,8 @@ from __future__ import annotations
 from abc import ABC, abstractmethod
 from datetime import date, timedelta
 
+from instock.lib.trade_calendar import TradeCalendar
+
 
 _WEEKDAYS = {"MON": 0, "TUE": 1, "WED": 2, "THU": 3, "FRI": 4,
              "SAT": 5, "SUN": 6}
@@ -33,23 +35,14 @@ class WeeklyRebalance(RebalanceSchedule):
         self.weekday = _WEEKDAYS[key]
 
     def rebalance_dates(self, start, end, trade_calendar):
-        cal_set = set(trade_calendar)
+        cal = (trade_calendar if isinstance(trade_calendar, TradeCalendar)
+               else TradeCalendar(trade_calendar))
         out: list[date] = []
         cur = start - timedelta(days=start.weekday())
         while cur <= end:
-            target = cur + timedelta(days=self.weekday)
-            picked = None
-            for i in range(self.weekday + 1):
-                candidate = target - timedelta(days=i)
-                if candidate < cur:
-                    break
-                if (
-                    start <= candidate <= end
-                    and candidate in cal_set
-                ):
-                    picked = candidate
-                    break
-            if picked is not None:
+            target = min(cur + timedelta(days=self.weekday), end)
+            picked = cal.floor(target)
+            if picked is not None and picked >= max(cur, start):
                 out.append(picked)
             cur += timedelta(days=7)
         return out
@@ -2,7 +2,8 @@
 
 Mirrors instock/factors/storage.py:
   <INSTOCK_HOLDING_ROOT>/<strategy>/<year>.parquet
-  (date, code, strategy) unique per file via drop_duplicates keep="last".
+  Append-only segments (see instock.lib.segment_table); (date, code, strategy)
+  duplicates resolve to the latest write when read.
 """
 from __future__ import annotations
 
@@ -11,6 +12,9 @@ from pathlib import Path
 
 import pandas as pd
 
+from instock.lib import panel_cache
+from instock.lib.segment_table import SegmentTable
+
 from .schemas import (
     HOLDING_SCHEDULE_SCHEMA,
     validate_holding_invariants,
@@ -32,40 +36,27 @@ def _strategy_dir(strategy: str) -> Path:
     return d
 
 
+def _table(strategy: str) -> SegmentTable:
+    return SegmentTable(
+        _strategy_dir(strategy), keys=["date", "code", "strategy"],
+        partition_by=lambda df: df["date"].dt.year,
+        sort_by=["date", "code"],
+    )
+
+
 def write_holding(strategy: str, df: pd.DataFrame) -> None:
-    """Validate + append-and-dedup writer, partitioned by year(date)."""
+    """Validate + append-only writer, partitioned by year(date)."""
     if df.empty:
         return
     df = HOLDING_SCHEDULE_SCHEMA.validate(df.copy())
     validate_holding_invariants(df)
-    df["year"] = df["date"].dt.year
-    for year, group in df.groupby("year"):
-        target = _strategy_dir(strategy) / f"{year}.parquet"
-        payload = group.drop(columns=["year"])
-        if target.exists():
-            old = pd.read_parquet(target)
-            payload = pd.concat([old, payload], ignore_index=True)
-        payload = (
-            payload.drop_duplicates(
-                subset=["date", "code", "strategy"], keep="last"
-            )
-            .sort_values(["date", "code"])
-            .reset_index(drop=True)
-        )
-        payload.to_parquet(target, index=False)
+    _table(strategy).append(df)
 
 
 def read_holding(
     strategy: str, start: pd.Timestamp, end: pd.Timestamp
 ) -> pd.DataFrame:
-    d = _strategy_dir(strategy)
-    frames = []
-    for year in range(start.year, end.year + 1):
-        target = d / f"{year}.parquet"
-        if target.exists():
-            frames.append(pd.read_parquet(target))
-    if not frames:
+    df = panel_cache.read_date_range(_table(strategy), start, end)
+    if df.empty:
         return pd.DataFrame(columns=_COLUMNS)
-    df = pd.concat(frames, ignore_index=True)
-    mask = (df["date"] >= start) & (df["date"] <= end)
-    return df.loc[mask].reset_index(drop=True)
+    return df
@@ -2,12 +2,15 @@
 from __future__ import annotations
 
 import os
-from datetime import date, datetime
+from datetime import date
 from pathlib import Path
 
 import pandas as pd
 
+from instock.lib import panel_cache
+
 from .schemas import INDUSTRY_SNAPSHOT_SCHEMA, RefdataNotAvailable
+from .snapshots import SnapshotIndex, materialize, read_intervals
 
 
 def _root() -> Path:
@@ -30,6 +33,7 @@ def write_industry_snapshot(df: pd.DataFrame) -> None:
     snap = df["snapshot_date"].iloc[0]
     path = _root() / f"{snap.strftime('%Y%m%d')}.parquet"
     df.to_parquet(path, index=False)
+    SnapshotIndex(_root()).add(snap)
 
 
 def read_industry_map(at: date) -> dict[str, str]:
@@ -37,20 +41,43 @@ def read_industry_map(at: date) -> dict[str, str]:
 
     Raises RefdataNotAvailable if no such file exists.
     """
-    d = _root()
-    ts_at = pd.Timestamp(at)
-    candidates = []
-    for p in d.glob("*.parquet"):
-        try:
-            snap = pd.Timestamp(datetime.strptime(p.stem, "%Y%m%d"))
-        except ValueError:
-            continue
-        if snap <= ts_at:
-            candidates.append((snap, p))
-    if not candidates:
+    latest = SnapshotIndex(_root()).as_of(at)
+    if latest is None:
         raise RefdataNotAvailable(
             f"no industry snapshot on or before {at}"
         )
-    _, latest = max(candidates, key=lambda x: x[0])
-    df = pd.read_parquet(latest)
-    return dict(zip(df["code"].astype(str), df["industry"].astype(str)))
+
+    def load() -> dict[str, str]:
+        df = pd.read_parquet(latest)
+        return dict(zip(df["code"].astype(str), df["industry"].astype(str)))
+
+    # cached snapshots are shared between callers; hand out a copy
+    return dict(panel_cache.cached(("industry", str(latest)), latest, load))
+
+
+def _industry_values(df: pd.DataFrame) -> pd.DataFrame:
+    return pd.DataFrame({
+        "code": df["code"].astype(str), "value": df["industry"].astype(str),
+    })
+
+
+def read_industry_intervals(start: date, end: date) -> pd.DataFrame:
+    """(code, industry, valid_from, valid_to) runs of the snapshots in effect over [start, end]."""
+    df = read_intervals(_root(), start, end, _industry_values)
+    return df.rename(columns={"value": "industry"})
+
+
+def read_industry_maps(dates: list[date]) -> dict[date, dict[str, str]]:
+    """read_industry_map for many dates from one interval pass.
+
+    Dates with no snapshot on or before them are left out.
+    """
+    if not dates:
+        return {}
+    stamps = {pd.Timestamp(d): d for d in dates}
+    intervals = read_intervals(_root(), min(stamps), max(stamps), _industry_values)
+    rows = materialize(intervals, stamps)
+    return {
+        stamps[ts]: dict(zip(group["code"], group["value"]))
+        for ts, group in rows.groupby("date", sort=True)
+    }
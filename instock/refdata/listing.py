@@ -1,4 +1,4 @@
-"""Listing-date storage (single parquet, upsert-by-code)."""
+"""Listing-date storage (single append-only segment table, upsert-by-code)."""
 from __future__ import annotations
 
 import os
@@ -7,6 +7,9 @@ from pathlib import Path
 
 import pandas as pd
 
+from instock.lib import panel_cache
+from instock.lib.segment_table import SegmentTable
+
 from .schemas import LISTING_DATES_SCHEMA, RefdataNotAvailable
 
 
@@ -16,24 +19,16 @@ def _path() -> Path:
     return root / "listing_dates.parquet"
 
 
+def _table() -> SegmentTable:
+    return SegmentTable(_path(), keys=["code"])
+
+
 def upsert_listing_dates(df: pd.DataFrame) -> None:
-    """Merge incoming (code, listing_date) into the single parquet file."""
+    """Append incoming (code, listing_date); the latest row per code wins on read."""
     if df.empty:
         return
     df = LISTING_DATES_SCHEMA.validate(df.copy())
-    path = _path()
-    if path.exists():
-        old = pd.read_parquet(path)
-        merged = (
-            pd.concat([old, df], ignore_index=True)
-            .drop_duplicates(subset=["code"], keep="last")
-            .sort_values("code")
-            .reset_index(drop=True)
-        )
-    else:
-        merged = df.sort_values("code").reset_index(drop=True)
-    merged = LISTING_DATES_SCHEMA.validate(merged)
-    merged.to_parquet(path, index=False)
+    _table().append(df)
 
 
 def read_listing_dates() -> dict[str, date]:
@@ -41,8 +36,12 @@ def read_listing_dates() -> dict[str, date]:
     path = _path()
     if not path.exists():
         raise RefdataNotAvailable(f"listing_dates.parquet not found at {path}")
-    df = pd.read_parquet(path)
-    return {
-        str(c): d.date()
-        for c, d in zip(df["code"], pd.to_datetime(df["listing_date"]))
-    }
+
+    def load() -> dict[str, date]:
+        df = _table().read()
+        return {
+            str(c): d.date()
+            for c, d in zip(df["code"], pd.to_datetime(df["listing_date"]))
+        }
+
+    return dict(panel_cache.cached(("listing", str(path)), path, load))
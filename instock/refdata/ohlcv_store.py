@@ -1,6 +1,13 @@
 """OHLCV panel cache with on-demand fill from IDataSource.
 
 Layout: <INSTOCK_OHLCV_ROOT>/<year>.parquet, row keys (date, code).
+Each year is an append-only segment table (see instock.lib.segment_table):
+a fetch appends a small segment instead of rewriting the year. Compaction
+sorts the year by (code, date) into small row groups, so each row group
+covers a narrow code range and its min/max statistics let the reader skip
+it. Reads push the code/date predicate and column projection down to every
+segment; the cost of get_panel scales with the requested slice rather than
+the year file size.
 Gap-detection uses IDataSource.get_trade_calendar — NOT date.range —
 so weekends/holidays never trigger spurious refetch.
 """
@@ -13,14 +20,19 @@ from pathlib import Path
 from typing import Optional
 
 import pandas as pd
+import pyarrow.dataset as ds
 
 from instock.datasource.base import IDataSource
+from instock.lib.segment_table import SegmentTable
 
 log = logging.getLogger(__name__)
 
 _COLUMNS = [
     "date", "code", "open", "high", "low", "close", "volume", "amount"
 ]
+_KEYS = ["date", "code"]
+# ~30 codes per row group for a full A-share year (~250 rows per code).
+ROW_GROUP_SIZE = 8192
 
 
 class OhlcvPanelStore:
@@ -32,45 +44,41 @@ class OhlcvPanelStore:
             root = Path(os.environ.get("INSTOCK_OHLCV_ROOT", "data/ohlcv"))
         root.mkdir(parents=True, exist_ok=True)
         self.root = root
+        self.table = SegmentTable(
+            root, keys=_KEYS, partition_by=lambda df: df["date"].dt.year,
+            sort_by=["code", "date"], row_group_size=ROW_GROUP_SIZE,
+        )
 
     def _path(self, year: int) -> Path:
-        return self.root / f"{year}.parquet"
+        return self.table.path(str(year))
 
     def _load_cache(
-        self, start: date, end: date
+        self, start: date, end: date,
+        codes: Optional[list[str]] = None,
+        columns: Optional[list[str]] = None,
     ) -> pd.DataFrame:
-        frames = []
-        for y in range(start.year, end.year + 1):
-            p = self._path(y)
-            if p.exists():
-                frames.append(pd.read_parquet(p))
-        if not frames:
-            return pd.DataFrame(columns=_COLUMNS)
-        df = pd.concat(frames, ignore_index=True)
         ts_s, ts_e = pd.Timestamp(start), pd.Timestamp(end)
-        return df.loc[
-            (df["date"] >= ts_s) & (df["date"] <= ts_e)
-        ].reset_index(drop=True)
+        predicate = (ds.field("date") >= ts_s) & (ds.field("date") <= ts_e)
+        if codes is not None:
+            wanted = sorted(set(codes))
+            if not wanted:
+                return pd.DataFrame(columns=columns or _COLUMNS)
+            # The range bounds prune row groups by their code statistics;
+            # isin keeps only the requested codes inside them.
+            predicate = (
+                predicate
+                & (ds.field("code") >= wanted[0])
+                & (ds.field("code") <= wanted[-1])
+                & ds.field("code").isin(wanted)
+            )
+        years = [str(y) for y in range(start.year, end.year + 1)]
+        df = self.table.read(years, columns=columns, filter=predicate)
+        if df.empty:
+            return pd.DataFrame(columns=columns or _COLUMNS)
+        return df.sort_values(_KEYS).reset_index(drop=True)
 
     def _write_cache(self, df: pd.DataFrame) -> None:
-        if df.empty:
-            return
-        df = df.copy()
-        df["year"] = df["date"].dt.year
-        for year, group in df.groupby("year"):
-            path = self._path(int(year))
-            payload = group.drop(columns=["year"])
-            if path.exists():
-                old = pd.read_parquet(path)
-                payload = pd.concat([old, payload], ignore_index=True)
-            payload = (
-                payload.drop_duplicates(
-                    subset=["date", "code"], keep="last"
-                )
-                .sort_values(["date", "code"])
-                .reset_index(drop=True)
-            )
-            payload.to_parquet(path, index=False)
+        self.table.append(df)
 
     def _missing_codes(
         self, cached: pd.DataFrame, codes: list[str],
@@ -91,11 +99,18 @@ class OhlcvPanelStore:
 
     def get_panel(
         self, codes: list[str], start: date, end: date,
-        adjust: str = "qfq",
+        adjust: str = "qfq", columns: Optional[list[str]] = None,
     ) -> pd.DataFrame:
+        """Rows for ``codes`` in [start, end], sorted by (date, code).
+
+        ``columns`` projects the value columns read from disk; date and
+        code are always included.
+        """
+        if columns is not None:
+            columns = _KEYS + [c for c in columns if c not in _KEYS]
         if not codes:
-            return pd.DataFrame(columns=_COLUMNS)
-        cached = self._load_cache(start, end)
+            return pd.DataFrame(columns=columns or _COLUMNS)
+        cached = self._load_cache(start, end, codes, columns)
         cal = self.source.get_trade_calendar(start, end)
         missing = self._missing_codes(cached, codes, cal)
         new_frames = []
@@ -108,12 +123,27 @@ class OhlcvPanelStore:
                 log.warning(
                     "OhlcvPanelStore: fetch failed for %s: %s", c, exc
                 )
-        if new_frames:
-            fetched = pd.concat(new_frames, ignore_index=True)
-            self._write_cache(fetched)
-        # Reload after possibly writing new rows.
-        merged = self._load_cache(start, end)
-        return merged[merged["code"].isin(codes)].reset_index(drop=True)
+        if not new_frames:
+            return cached
+        fetched = pd.concat(new_frames, ignore_index=True)
+        self._write_cache(fetched)
+        # Merge in memory instead of re-reading the year files.
+        ts_s, ts_e = pd.Timestamp(start), pd.Timestamp(end)
+        fetched = fetched.loc[
+            (fetched["date"] >= ts_s) & (fetched["date"] <= ts_e)
+            & fetched["code"].isin(codes)
+        ]
+        if columns is not None:
+            fetched = fetched[[c for c in columns if c in fetched.columns]]
+        merged = pd.concat(
+            [df for df in (cached, fetched) if not df.empty],
+            ignore_index=True,
+        )
+        return (
+            merged.drop_duplicates(subset=_KEYS, keep="last")
+            .sort_values(_KEYS)
+            .reset_index(drop=True)
+        )
 
     def warm_cache(
         self, codes: list[str], start: date, end: date,
@@ -0,0 +1,186 @@
+"""As-of index and interval view over dated refdata snapshot directories.
+
+A snapshot directory holds one ``YYYYMMDD.parquet`` per snapshot day plus
+``_index.json``, a sorted list of those days written by the snapshot
+writers. ``SnapshotIndex.as_of`` is a bisect over that list instead of a
+glob + filename parse per call. A directory without an index (written by
+an older version, or copied in by hand) is indexed on first use; call
+``rebuild`` after adding files behind the writers' back.
+
+``read_intervals`` collapses the snapshots covering a date range into
+``(code, value, valid_from, valid_to)`` rows, one per run of identical
+values; ``valid_to`` is exclusive and NaT while the run is still current.
+``materialize`` expands intervals onto a list of dates in one vectorized
+pass, so a backtest resolves every rebalance day without per-day reads.
+"""
+from __future__ import annotations
+
+import bisect
+import json
+import os
+from datetime import date, datetime
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from instock.lib import panel_cache
+
+INDEX = "_index.json"
+_FMT = "%Y%m%d"
+
+INTERVAL_COLUMNS = ["code", "value", "valid_from", "valid_to"]
+
+
+def _scan(directory: Path) -> list[str]:
+    days = []
+    for p in directory.glob("*.parquet"):
+        try:
+            datetime.strptime(p.stem, _FMT)
+        except ValueError:
+            continue
+        days.append(p.stem)
+    return sorted(days)
+
+
+class SnapshotIndex:
+    def __init__(self, directory: Path) -> None:
+        self.directory = Path(directory)
+
+    # ---------- persistence ----------
+    def _load(self) -> list[str]:
+        try:
+            with open(self.directory / INDEX, "r") as f:
+                return list(json.load(f)["dates"])
+        except FileNotFoundError:
+            days = _scan(self.directory) if self.directory.is_dir() else []
+            if days:
+                self._save(days)
+            return days
+
+    def _save(self, days: list[str]) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp = self.directory / f".{INDEX}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"dates": days}, f)
+        os.replace(tmp, self.directory / INDEX)
+
+    def dates(self) -> list[str]:
+        """Sorted snapshot days (YYYYMMDD); cached per index version."""
+        index = self.directory / INDEX
+        if not index.exists():
+            return self._load()
+        return panel_cache.cached(("snapshot-index", str(index)), index, self._load)
+
+    def rebuild(self) -> list[str]:
+        days = _scan(self.directory)
+        self._save(days)
+        return days
+
+    def add(self, snap: date) -> None:
+        """Record a snapshot just written by a writer."""
+        day = pd.Timestamp(snap).strftime(_FMT)
+        days = self._load()
+        if day not in days:
+            bisect.insort(days, day)
+            self._save(days)
+
+    # ---------- lookup ----------
+    def path(self, day: str) -> Path:
+        return self.directory / f"{day}.parquet"
+
+    def as_of(self, at: date) -> Optional[Path]:
+        """Newest snapshot dated on or before ``at``; None if there is none."""
+        days = self.dates()
+        i = bisect.bisect_right(days, pd.Timestamp(at).strftime(_FMT))
+        return self.path(days[i - 1]) if i else None
+
+    def covering(self, start: date, end: date) -> list[str]:
+        """Snapshot days in effect somewhere in [start, end]: the as-of one plus later ones."""
+        days = self.dates()
+        lo = bisect.bisect_right(days, pd.Timestamp(start).strftime(_FMT))
+        hi = bisect.bisect_right(days, pd.Timestamp(end).strftime(_FMT))
+        return days[max(lo - 1, 0):hi]
+
+
+def read_intervals(
+    directory: Path,
+    start: date,
+    end: date,
+    values: Callable[[pd.DataFrame], pd.DataFrame],
+) -> pd.DataFrame:
+    """Interval rows for the snapshots in effect over [start, end].
+
+    ``values`` maps one snapshot frame to its ``(code, value)`` rows; codes
+    it drops are absent from that snapshot. A run ends where the value
+    changes, the code disappears, or at the next snapshot after the last
+    one in range (NaT if that snapshot is the newest).
+    """
+    index = SnapshotIndex(directory)
+    days = index.dates()
+    covering = index.covering(start, end)
+    if not covering:
+        return pd.DataFrame(columns=INTERVAL_COLUMNS)
+
+    frames = []
+    for pos, day in enumerate(covering):
+        path = index.path(day)
+        frame = panel_cache.cached(
+            ("snapshot-values", str(path), values), path,
+            lambda p=path: values(pd.read_parquet(p))[["code", "value"]],
+        )
+        frames.append(frame.assign(pos=pos))
+    df = pd.concat(frames, ignore_index=True)
+    if df.empty:
+        return pd.DataFrame(columns=INTERVAL_COLUMNS)
+    df["code"] = df["code"].astype(str)
+    df = df.sort_values(["code", "pos"], kind="stable").reset_index(drop=True)
+
+    new_run = (
+        (df["code"] != df["code"].shift())
+        | (df["value"] != df["value"].shift())
+        | (df["pos"] != df["pos"].shift() + 1)
+    )
+    runs = df.groupby(new_run.cumsum(), sort=False).agg(
+        code=("code", "first"), value=("value", "first"),
+        first=("pos", "min"), last=("pos", "max"),
+    )
+
+    # boundaries[i] is the start of covering[i]; one past the end is the next
+    # snapshot after the range, if any
+    bounds = [pd.Timestamp(datetime.strptime(d, _FMT)) for d in covering]
+    after = days.index(covering[-1]) + 1
+    bounds.append(
+        pd.Timestamp(datetime.strptime(days[after], _FMT)) if after < len(days) else pd.NaT
+    )
+    bounds = pd.DatetimeIndex(bounds)
+    out = pd.DataFrame({
+        "code": runs["code"].to_numpy(),
+        "value": runs["value"].to_numpy(),
+        "valid_from": bounds[runs["first"].to_numpy()],
+        "valid_to": bounds[runs["last"].to_numpy() + 1],
+    })
+    return out.sort_values(["valid_from", "code"], kind="stable").reset_index(drop=True)
+
+
+def materialize(intervals: pd.DataFrame, dates: Iterable[date]) -> pd.DataFrame:
+    """Expand intervals to ``(date, code, value)`` rows for each of ``dates``."""
+    dates = pd.DatetimeIndex(sorted({pd.Timestamp(d) for d in dates}))
+    if intervals.empty or dates.empty:
+        return pd.DataFrame(columns=["date", "code", "value"])
+    grid = dates.asi8
+    lo = np.searchsorted(grid, pd.DatetimeIndex(intervals["valid_from"]).asi8, side="left")
+    valid_to = pd.DatetimeIndex(intervals["valid_to"])
+    hi = np.where(
+        valid_to.isna(), len(grid), np.searchsorted(grid, valid_to.asi8, side="left"),
+    )
+    counts = np.maximum(hi - lo, 0)
+    rows = np.repeat(np.arange(len(intervals)), counts)
+    # position of each expanded row inside its interval, offset by the interval start
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return pd.DataFrame({
+        "date": dates[np.repeat(lo, counts) + offsets],
+        "code": intervals["code"].to_numpy()[rows],
+        "value": intervals["value"].to_numpy()[rows],
+    })
@@ -2,12 +2,15 @@
 from __future__ import annotations
 
 import os
-from datetime import date, datetime
+from datetime import date
 from pathlib import Path
 
 import pandas as pd
 
+from instock.lib import panel_cache
+
 from .schemas import ST_SNAPSHOT_SCHEMA, RefdataNotAvailable
+from .snapshots import SnapshotIndex, materialize, read_intervals
 
 
 def _root() -> Path:
@@ -28,23 +31,48 @@ def write_st_snapshot(df: pd.DataFrame) -> Path:
     d.mkdir(parents=True, exist_ok=True)
     path = d / f"{snap.strftime('%Y%m%d')}.parquet"
     df.to_parquet(path, index=False)
+    SnapshotIndex(d).add(snap)
     return path
 
 
 def read_st_flags(at: date) -> set[str]:
     """Return set of ST codes from the most recent snapshot with date <= at."""
-    d = _root()
-    ts_at = pd.Timestamp(at)
-    candidates = []
-    for p in d.glob("*.parquet"):
-        try:
-            snap = pd.Timestamp(datetime.strptime(p.stem, "%Y%m%d"))
-        except ValueError:
-            continue
-        if snap <= ts_at:
-            candidates.append((snap, p))
-    if not candidates:
+    latest = SnapshotIndex(_root()).as_of(at)
+    if latest is None:
         raise RefdataNotAvailable(f"no st snapshot <= {at}")
-    _, latest = max(candidates, key=lambda x: x[0])
-    df = pd.read_parquet(latest)
-    return set(df.loc[df["is_st"], "code"].astype(str))
+
+    def load() -> frozenset[str]:
+        df = pd.read_parquet(latest)
+        return frozenset(df.loc[df["is_st"], "code"].astype(str))
+
+    return set(panel_cache.cached(("st", str(latest)), latest, load))
+
+
+def _st_values(df: pd.DataFrame) -> pd.DataFrame:
+    st = df.loc[df["is_st"], "code"].astype(str)
+    return pd.DataFrame({"code": st, "value": True})
+
+
+def read_st_intervals(start: date, end: date) -> pd.DataFrame:
+    """(code, valid_from, valid_to) ST runs of the snapshots in effect over [start, end]."""
+    df = read_intervals(_root(), start, end, _st_values)
+    return df.drop(columns=["value"])
+
+
+def read_st_flag_sets(dates: list[date]) -> dict[date, set[str]]:
+    """read_st_flags for many dates from one interval pass.
+
+    Dates with no snapshot on or before them are left out; a date covered by
+    a snapshot with no ST codes maps to an empty set.
+    """
+    if not dates:
+        return {}
+    stamps = {pd.Timestamp(d): d for d in dates}
+    index = SnapshotIndex(_root())
+    intervals = read_intervals(_root(), min(stamps), max(stamps), _st_values)
+    rows = materialize(intervals, stamps)
+    flags = {stamps[ts]: set(group["code"]) for ts, group in rows.groupby("date", sort=True)}
+    for ts, d in stamps.items():
+        if d not in flags and index.as_of(ts) is not None:
+            flags[d] = set()
+    return flags
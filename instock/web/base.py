@@ -9,18 +9,25 @@ __author__ = 'myh '
 __date__ = '2023/3/10 '
 
 
-# 基础handler，主要负责检查mysql的数据库链接。
+# 基础handler，数据库访问见 instock.lib.async_database，连接的检查由连接池负责。
 class BaseHandler(tornado.web.RequestHandler, ABC):
     @property
     def db(self):
-        try:
-            # check every time。
-            self.application.db.query("SELECT 1 ")
-        except Exception as e:
-            print(e)
-            self.application.db.reconnect()
         return self.application.db
 
+    # 数据库操作超时返回 504，其他异常照常处理
+    async def query(self, sql, *parameters):
+        try:
+            return await self.db.query(sql, *parameters)
+        except TimeoutError as e:
+            raise tornado.web.HTTPError(504, str(e))
+
+    async def execute(self, sql, *parameters):
+        try:
+            return await self.db.execute_rowcount(sql, *parameters)
+        except TimeoutError as e:
+            raise tornado.web.HTTPError(504, str(e))
+
 
 class LeftMenu:
     def __init__(self, url):
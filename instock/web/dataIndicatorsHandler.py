@@ -2,7 +2,7 @@
 # -*- coding: utf-8 -*-
 
 from abc import ABC
-from tornado import gen
+from tornado.ioloop import IOLoop
 import logging
 import instock.core.stockfetch as stf
 import instock.core.kline.visualization as vis
@@ -12,23 +12,26 @@ __author__ = 'myh '
 __date__ = '2023/3/10 '
 
 
+# 抓取K线并生成图表，阻塞操作，在线程池中执行。
+def get_plot(code, date, name):
+    if code.startswith(('1', '5')):
+        stock = stf.fetch_etf_hist((date, code))
+    else:
+        stock = stf.fetch_stock_hist((date, code))
+    if stock is None:
+        return None
+    return vis.get_plot_kline(code, stock, date, name)
+
+
 # 获得页面数据。
 class GetDataIndicatorsHandler(webBase.BaseHandler, ABC):
-    @gen.coroutine
-    def get(self):
+    async def get(self):
         code = self.get_argument("code", default=None, strip=False)
         date = self.get_argument("date", default=None, strip=False)
         name = self.get_argument("name", default=None, strip=False)
         comp_list = []
         try:
-            if code.startswith(('1', '5')):
-                stock = stf.fetch_etf_hist((date, code))
-            else:
-                stock = stf.fetch_stock_hist((date, code))
-            if stock is None:
-                return
-
-            pk = vis.get_plot_kline(code, stock, date, name)
+            pk = await IOLoop.current().run_in_executor(None, get_plot, code, date, name)
             if pk is None:
                 return
 
@@ -42,8 +45,7 @@ class GetDataIndicatorsHandler(webBase.BaseHandler, ABC):
 
 # 关注股票。
 class SaveCollectHandler(webBase.BaseHandler, ABC):
-    @gen.coroutine
-    def get(self):
+    async def get(self):
         import datetime
         import instock.core.tablestructure as tbs
         code = self.get_argument("code", default=None, strip=False)
@@ -53,11 +55,11 @@ class SaveCollectHandler(webBase.BaseHandler, ABC):
             if otype == '1':
                 # sql = f"DELETE FROM `{table_name}` WHERE `code` = '{code}'"
                 sql = f"DELETE FROM `{table_name}` WHERE `code` = %s"
-                self.db.query(sql,code)
+                await self.execute(sql, code)
             else:
                 # sql = f"INSERT INTO `{table_name}`(`datetime`, `code`) VALUE('{datetime.datetime.now()}','{code}')"
                 sql = f"INSERT INTO `{table_name}`(`datetime`, `code`) VALUE(%s, %s)"
-                self.db.query(sql,datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f"),code)
+                await self.execute(sql, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f"), code)
         except Exception as e:
             err = {"error": str(e)}
             # logging.info(err)
@@ -46,7 +46,7 @@ class GetStockHtmlHandler(webBase.BaseHandler, ABC):
 
 # 获得股票数据内容。
 class GetStockDataHandler(webBase.BaseHandler, ABC):
-    def get(self):
+    async def get(self):
         name = self.get_argument("name", default=None, strip=False)
         date = self.get_argument("date", default=None, strip=False)
         web_module_data = sswmd.stock_web_module_data().get_data(name)
@@ -71,9 +71,9 @@ class GetStockDataHandler(webBase.BaseHandler, ABC):
 
         try:
             if params is None:
-                data = self.db.query(sql)
+                data = await self.query(sql)
             else:
-                data = self.db.query(sql, *params)
+                data = await self.query(sql, *params)
         except pymysql.err.ProgrammingError as e:
             # 1146: table doesn't exist
             if getattr(e, 'args', None) and len(e.args) > 0 and e.args[0] == 1146:
@@ -2,15 +2,13 @@
 # -*- coding: utf-8 -*-
 
 from abc import ABC
-from tornado import gen
 import instock.web.base as webBase
 import instock.lib.trade_time as trd
 import instock.core.singleton_stock_web_module_data as sswmd
 
 
 class LimitupReasonMindmapHandler(webBase.BaseHandler, ABC):
-    @gen.coroutine
-    def get(self):
+    async def get(self):
         # Default date: latest trade day (same behavior as other pages).
         date = self.get_argument("date", default=None, strip=False)
         if not date:
@@ -27,7 +25,7 @@ class LimitupReasonMindmapHandler(webBase.BaseHandler, ABC):
                 WHERE `date` = %s AND `code` = %s
                 ORDER BY `TITLE` ASC
             """
-            rows = self.db.query(sql, date, code)
+            rows = await self.query(sql, date, code)
         else:
             sql = """
                 SELECT `date`, `code`, `name`, `TITLE`, `reason`
@@ -35,7 +33,7 @@ class LimitupReasonMindmapHandler(webBase.BaseHandler, ABC):
                 WHERE `date` = %s
                 ORDER BY `name` ASC, `code` ASC
             """
-            rows = self.db.query(sql, date)
+            rows = await self.query(sql, date)
 
         def split_reason(text: str):
             if not text:
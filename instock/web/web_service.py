@@ -21,8 +21,7 @@ if not os.path.exists(log_path):
     os.makedirs(log_path)
 logging.basicConfig(format='%(asctime)s %(message)s', filename=os.path.join(log_path, 'stock_web.log'))
 logging.getLogger().setLevel(logging.ERROR)
-import instock.lib.torndb as torndb
-import instock.lib.database as mdb
+import instock.lib.async_database as adb
 import instock.lib.version as version
 import instock.job.init_job as init_job
 import instock.web.dataTableHandler as dataTableHandler
@@ -76,8 +75,8 @@ class Application(tornado.web.Application):
             init_job.main()
         except Exception as e:
             logging.error(f"web_service.Application 初始化数据库表异常：{e}")
-        # Have one global connection to the blog DB across all handlers
-        self.db = torndb.Connection(**mdb.MYSQL_CONN_TORNDB)
+        # 所有handler共享的异步数据库访问（有界线程池 + 连接池）
+        self.db = adb.async_database()
 
 
 # 首页handler。
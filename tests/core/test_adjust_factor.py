@@ -0,0 +1,98 @@
+import pandas as pd
+import pytest
+
+import instock.core.stockfetch as stf
+import instock.core.tablestructure as tbs
+from instock.core import adjust_factor, hist_store
+
+
+def _raw(rows):
+    """rows: (date, close, prev_close_reference)；涨跌额 = 收盘 - 参考前收盘"""
+    cols = list(tbs.CN_STOCK_HIST_DATA["columns"])
+    data = [[d, c, c, c, c, 100.0, 1000.0, 1.0, 0.0, round(c - ref, 2), 0.2] for d, c, ref in rows]
+    return pd.DataFrame(data, columns=cols)
+
+
+def test_ex_ratios_detect_reference_price_gap():
+    # 第三天 10 派 1：参考前收盘 9.5，上一日收盘 10.5
+    close = [10.0, 10.5, 9.6, 9.7]
+    ups_downs = [0.0, 0.5, 0.1, 0.1]
+    ratios = adjust_factor.ex_ratios(close, ups_downs)
+    assert ratios[[0, 1, 3]].tolist() == [1.0, 1.0, 1.0]
+    assert ratios[2] == pytest.approx(9.5 / 10.5)
+    f = adjust_factor.factors(close, ups_downs)
+    assert f.tolist() == pytest.approx([1.0, 1.0, 10.5 / 9.5, 10.5 / 9.5])
+
+
+def test_qfq_and_hfq_views():
+    stock = adjust_factor.with_factors(_raw([
+        ("2024-01-02", 10.0, 10.0), ("2024-01-03", 10.5, 10.0),
+        ("2024-01-04", 9.6, 9.5), ("2024-01-05", 9.7, 9.6),
+    ]))
+    qfq = adjust_factor.apply_adjust(stock, "qfq")
+    hfq = adjust_factor.apply_adjust(stock, "hfq")
+    raw = adjust_factor.apply_adjust(stock, "")
+    assert "factor" not in qfq.columns
+    assert raw["close"].tolist() == stock["close"].tolist()
+    # 前复权：除权日之后不变，之前按比例缩小；后复权反之
+    assert qfq["close"].iloc[2:].tolist() == [9.6, 9.7]
+    assert qfq["close"].iloc[1] == pytest.approx(9.5)
+    assert hfq["close"].iloc[:2].tolist() == [10.0, 10.5]
+    assert hfq["close"].iloc[2] == pytest.approx(9.6 * 10.5 / 9.5)
+    # 复权后的涨跌额与收盘价连续
+    assert (qfq["close"].iloc[2] - qfq["ups_downs"].iloc[2]) == pytest.approx(qfq["close"].iloc[1])
+    with pytest.raises(ValueError):
+        adjust_factor.apply_adjust(stock, "xfq")
+
+
+class _FakeRaw:
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.calls = []
+
+    def __call__(self, symbol, period="daily", start_date="19700101", adjust=""):
+        self.calls.append((start_date, adjust))
+        start = f"{start_date[0:4]}-{start_date[4:6]}-{start_date[6:8]}"
+        rows = [r for r in self.rows if r[0] >= start]
+        if not rows:
+            return pd.DataFrame()
+        return _raw(rows).rename(columns={"date": "日期"})
+
+
+@pytest.fixture
+def root(tmp_path, monkeypatch):
+    monkeypatch.setattr(hist_store, "store_root", str(tmp_path / "store"))
+    monkeypatch.setattr(hist_store, "_stores", {})
+    monkeypatch.setenv("INSTOCK_HIST_RAW", "1")
+    monkeypatch.delenv("INSTOCK_ONLY_MISSING_CACHE", raising=False)
+    return tmp_path / "store"
+
+
+def test_ex_dividend_appends_factor_instead_of_refetching(root, monkeypatch):
+    fake = _FakeRaw([("2024-01-02", 10.0, 10.0), ("2024-01-03", 10.5, 10.0)])
+    monkeypatch.setattr(stf.she, "stock_zh_a_hist", fake)
+
+    first = stf.fetch_stock_hist(("2024-01-03", "000001"), "20240101", True)
+    assert first["close"].tolist() == [10.0, 10.5]
+    fake.rows.append(("2024-01-04", 9.6, 9.5))
+    data = stf.fetch_stock_hist(("2024-01-04", "000001"), "20240101", True)
+    assert fake.calls == [("20240101", ""), ("20240103", "")]
+    assert data["close"].tolist() == pytest.approx([10.0 * 9.5 / 10.5, 9.5, 9.6])
+    assert data["p_change"].round(2).tolist()[1:] == [5.0, 1.05]
+
+    stored = hist_store.get_store(hist_store.RAW).get("000001")
+    assert stored["close"].tolist() == [10.0, 10.5, 9.6]
+    assert stored["factor"].tolist() == pytest.approx([1.0, 1.0, 10.5 / 9.5])
+    hist_store.flush_all()
+    monkeypatch.setattr(hist_store, "_stores", {})
+    cached = stf.fetch_stock_hist_stored(("2024-01-04", "000001"), "20240101")
+    pd.testing.assert_frame_equal(cached, data)
+
+
+def test_etf_hist_shares_raw_store(root, monkeypatch):
+    fake = _FakeRaw([("2024-01-02", 1.0, 1.0), ("2024-01-03", 1.1, 1.0)])
+    monkeypatch.setattr(stf.fee, "fund_etf_hist_em", fake)
+    data = stf.fetch_etf_hist(("2024-01-03", "510300"), "20240101")
+    assert data["close"].tolist() == [1.0, 1.1]
+    assert fake.calls == [("20240101", "")]
+    assert hist_store.get_store(hist_store.RAW).entry("510300")["rows"] == 2
@@ -0,0 +1,174 @@
+import threading
+
+import pytest
+
+import pandas as pd
+
+from instock.core.eastmoney_fetcher import (
+    DATACENTER_URL,
+    PAGING_CLIST,
+    PAGING_DATACENTER,
+    async_eastmoney_fetcher,
+    collect,
+    eastmoney_fetcher,
+    run_coroutine,
+)
+
+
+class _Resp:
+    def __init__(self, payload):
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+
+def _clist_pages(total, page_size):
+    def _make_request(url, params=None, **kwargs):
+        pn = params["pn"]
+        start = (pn - 1) * page_size
+        rows = [{"f12": f"{i:06d}"} for i in range(start, min(start + page_size, total))]
+        return _Resp({"data": {"total": total, "diff": rows}})
+    return _make_request
+
+
+@pytest.fixture
+def fetcher(monkeypatch):
+    f = eastmoney_fetcher()
+    monkeypatch.setattr("instock.core.eastmoney_fetcher.time.sleep", lambda s: None)
+    return f
+
+
+@pytest.mark.parametrize("concurrency", [1, 4])
+def test_fetch_all_pages_concatenates_in_page_order(fetcher, concurrency):
+    fetcher.make_request = _clist_pages(total=23, page_size=5)
+    rows = fetcher.fetch_all_pages(
+        "https://push2.eastmoney.com/api/qt/clist/get",
+        {"pn": 1, "pz": 5}, paging=PAGING_CLIST, concurrency=concurrency,
+    )
+    assert [r["f12"] for r in rows] == [f"{i:06d}" for i in range(23)]
+
+
+def test_fetch_all_pages_empty_first_page(fetcher):
+    fetcher.make_request = lambda url, params=None, **kwargs: \
+        _Resp({"data": {"total": 0, "diff": None}})
+    assert fetcher.fetch_all_pages("u", {"pn": 1, "pz": 50}, concurrency=4) == []
+
+
+def test_fetch_all_pages_datacenter_uses_page_count(fetcher):
+    seen = []
+
+    def _make_request(url, params=None, **kwargs):
+        seen.append(params["pageNumber"])
+        return _Resp({"result": {"pages": 3, "data": [params["pageNumber"]]}})
+
+    fetcher.make_request = _make_request
+    rows = fetcher.fetch_all_pages(
+        "u", {"pageNumber": 1, "pageSize": 500},
+        paging=PAGING_DATACENTER, concurrency=2,
+    )
+    assert rows == [1, 2, 3]
+    assert sorted(seen) == [1, 2, 3]
+
+
+def test_async_fetcher_respects_per_host_cap(fetcher):
+    lock = threading.Lock()
+    state = {"now": 0, "peak": 0}
+    inner = _clist_pages(total=60, page_size=5)
+
+    def _make_request(url, params=None, **kwargs):
+        with lock:
+            state["now"] += 1
+            state["peak"] = max(state["peak"], state["now"])
+        threading.Event().wait(0.01)
+        with lock:
+            state["now"] -= 1
+        return inner(url, params)
+
+    fetcher.make_request = _make_request
+    engine = async_eastmoney_fetcher(fetcher, max_per_host=2)
+    rows = run_coroutine(engine.fetch_all_pages("u", {"pn": 1, "pz": 5}))
+    assert len(rows) == 60
+    assert state["peak"] <= 2
+
+
+def _report_pages(pages, per_page=2, seen=None):
+    def _make_request(url, params=None, **kwargs):
+        page = params["pageNumber"]
+        if seen is not None:
+            seen.append((page, dict(params)))
+        threading.Event().wait(0.002 * (pages - page))  # later pages answer faster
+        rows = [{"CODE": f"{page:02d}{i}", "VAL": str(page)} for i in range(per_page)]
+        return _Resp({"result": {"pages": pages, "data": rows}})
+    return _make_request
+
+
+@pytest.mark.parametrize("prefetch", [1, 3])
+def test_iter_pages_yields_typed_frames_in_order(fetcher, prefetch):
+    fetcher.make_request = _report_pages(5)
+
+    def _typed(df):
+        df["VAL"] = pd.to_numeric(df["VAL"])
+        return df
+
+    frames = list(fetcher.iter_pages("u", {"pageNumber": 1, "pageSize": 2},
+                                     transform=_typed, prefetch=prefetch))
+    assert [f["VAL"].iloc[0] for f in frames] == [1, 2, 3, 4, 5]
+    assert all(f["VAL"].dtype.kind == "i" for f in frames)
+
+
+def test_iter_pages_bounds_prefetch_and_stops_early(fetcher):
+    seen = []
+    fetcher.make_request = _report_pages(20, seen=seen)
+    pages = fetcher.iter_pages("u", {"pageNumber": 1, "pageSize": 2}, prefetch=2)
+    next(pages)
+    next(pages)
+    pages.close()
+    # page 1, the consumed page 2 and at most two pages fetched ahead
+    assert len(seen) <= 5
+
+
+def test_iter_report_pages_builds_datacenter_params(fetcher):
+    seen = []
+    urls = []
+    inner = _report_pages(2, seen=seen)
+
+    def _make_request(url, params=None, **kwargs):
+        urls.append(url)
+        return inner(url, params)
+
+    fetcher.make_request = _make_request
+    df = collect(fetcher.iter_report_pages("RPT_X", columns="A,B", filter="(A>1)", page_size=2,
+                                           sort_columns="A", sort_types="-1", prefetch=1))
+    assert len(df) == 4
+    assert list(df.index) == [0, 1, 2, 3]
+    assert set(urls) == {DATACENTER_URL}
+    params = seen[0][1]
+    assert params["reportName"] == "RPT_X"
+    assert params["filter"] == "(A>1)"
+    assert params["sortColumns"] == "A"
+    assert params["pageSize"] == 2
+
+
+def test_collect_empty_keeps_columns(fetcher):
+    fetcher.make_request = lambda url, params=None, **kwargs: _Resp({"result": None})
+    df = collect(fetcher.iter_report_pages("RPT_X"), columns=["代码", "名称"])
+    assert df.empty
+    assert list(df.columns) == ["代码", "名称"]
+
+
+def test_lhb_detail_collects_typed_pages(monkeypatch):
+    from instock.core.crawling import stock_lhb_em
+
+    def _make_request(url, params=None, **kwargs):
+        page = params["pageNumber"]
+        row = {k: "1.5" for k in stock_lhb_em._LHB_DETAIL_RENAME}
+        row.update({"SECURITY_CODE": f"00000{page}", "SECUCODE": "x", "TRADE_DATE": "2024-01-02 00:00:00",
+                    "SECURITY_TYPE_CODE": "058001001"})
+        return _Resp({"result": {"pages": 2, "data": [row]}})
+
+    monkeypatch.setattr(stock_lhb_em.fetcher, "make_request", _make_request)
+    df = stock_lhb_em.stock_lhb_detail_em("20240101", "20240131")
+    assert list(df.columns) == stock_lhb_em.LHB_DETAIL_COLUMNS
+    assert list(df["代码"]) == ["000001", "000002"]
+    assert df["收盘价"].dtype.kind == "f"
@@ -0,0 +1,145 @@
+import threading
+import time
+
+import pytest
+
+from instock.core import fetch_scheduler as fs
+from instock.core.fetch_scheduler import (
+    PRIORITY_BACKFILL, PRIORITY_DEFAULT, PRIORITY_SPOT, DeadlineExceeded, current_priority, fetch_priority,
+    fetch_scheduler,
+)
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    monkeypatch.delattr(fetch_scheduler, "_instance", raising=False)
+    monkeypatch.setenv("INSTOCK_HOST_BUDGETS", "push2his.eastmoney.com=1")
+    s = fetch_scheduler(workers=1)
+    yield s
+    monkeypatch.delattr(fetch_scheduler, "_instance", raising=False)
+
+
+def test_fetch_priority_context_and_decorator():
+    assert current_priority() == PRIORITY_DEFAULT
+    with fetch_priority(PRIORITY_SPOT):
+        assert current_priority() == PRIORITY_SPOT
+    assert current_priority() == PRIORITY_DEFAULT
+
+    @fetch_priority(PRIORITY_BACKFILL)
+    def inner():
+        return current_priority()
+
+    assert inner() == PRIORITY_BACKFILL
+    assert current_priority() == PRIORITY_DEFAULT
+
+
+def test_env_budget_override(scheduler, monkeypatch):
+    assert scheduler._host("push2his.eastmoney.com").budget == 1
+    assert scheduler._host("unknown.example.com").budget == fs.DEFAULT_HOST_BUDGETS["default"]
+
+
+def test_tasks_run_in_priority_order(scheduler):
+    gate = threading.Event()
+    order = []
+    blocker = scheduler.submit(gate.wait)
+    futures = [scheduler.submit(order.append, name, priority=priority)
+               for name, priority in (("backfill", PRIORITY_BACKFILL), ("default", PRIORITY_DEFAULT),
+                                      ("spot", PRIORITY_SPOT))]
+    gate.set()
+    for future in [blocker] + futures:
+        future.result(timeout=5)
+    assert order == ["spot", "default", "backfill"]
+
+
+def test_task_runs_with_its_priority(scheduler):
+    assert scheduler.submit(current_priority, priority=PRIORITY_BACKFILL).result(timeout=5) == PRIORITY_BACKFILL
+
+
+def test_inflight_tasks_are_deduplicated(scheduler):
+    gate = threading.Event()
+    calls = []
+
+    def fetch(code):
+        calls.append(code)
+        gate.wait()
+        return code
+
+    first = scheduler.submit(fetch, "000001", key=("hist", "000001"))
+    second = scheduler.submit(fetch, "000001", key=("hist", "000001"))
+    assert first is second
+    gate.set()
+    assert first.result(timeout=5) == "000001"
+    assert calls == ["000001"]
+    assert scheduler.stats()["deduped"] == 1
+    # 完成后同一 key 可以再次提交
+    assert scheduler.submit(fetch, "000001", key=("hist", "000001")) is not first
+
+
+def test_deadline_exceeded(scheduler):
+    gate = threading.Event()
+    blocker = scheduler.submit(gate.wait)
+    late = scheduler.submit(lambda: "never", deadline=time.monotonic() + 0.01)
+    time.sleep(0.05)
+    gate.set()
+    blocker.result(timeout=5)
+    with pytest.raises(DeadlineExceeded):
+        late.result(timeout=5)
+    assert scheduler.stats()["expired"] == 1
+
+
+def test_task_exception_propagates(scheduler):
+    def boom():
+        raise ValueError("bad")
+
+    with pytest.raises(ValueError):
+        scheduler.submit(boom).result(timeout=5)
+
+
+def test_slot_grants_waiting_spot_before_backfill(scheduler):
+    url = "https://push2his.eastmoney.com/api/qt/stock/kline/get"
+    order = []
+    release = threading.Event()
+    holding = threading.Event()
+
+    def hold():
+        with scheduler.slot(url, PRIORITY_BACKFILL):
+            holding.set()
+            release.wait()
+
+    def request(name, priority):
+        with scheduler.slot(url, priority):
+            order.append(name)
+
+    threads = [threading.Thread(target=hold)]
+    threads[0].start()
+    holding.wait(5)
+    for name, priority in (("backfill", PRIORITY_BACKFILL), ("spot", PRIORITY_SPOT)):
+        thread = threading.Thread(target=request, args=(name, priority))
+        thread.start()
+        threads.append(thread)
+        # 等待线程进入名额等待队列，保证 backfill 先到
+        while len(scheduler._host("push2his.eastmoney.com").waiters) < len(threads) - 1:
+            time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert order == ["spot", "backfill"]
+    stats = scheduler.stats()
+    assert stats["host_in_use"]["push2his.eastmoney.com"] == 0
+    assert stats["hosts"]["push2his.eastmoney.com@0"]["count"] == 1
+    assert stats["hosts"]["push2his.eastmoney.com@9"]["count"] == 2
+
+
+def test_slot_uses_context_priority(scheduler):
+    with fetch_priority(PRIORITY_SPOT):
+        with scheduler.slot("https://80.push2.eastmoney.com/api/qt/clist/get"):
+            pass
+    assert "push2.eastmoney.com@0" in scheduler.stats()["hosts"]
+
+
+def test_stats_report_wait_and_service(scheduler):
+    scheduler.submit(time.sleep, 0.02, priority=PRIORITY_BACKFILL).result(timeout=5)
+    task_stats = scheduler.stats()["tasks"][PRIORITY_BACKFILL]
+    assert task_stats["count"] == 1
+    assert task_stats["service_avg"] >= 0.015
+    assert task_stats["wait_avg"] >= 0
@@ -0,0 +1,144 @@
+import json
+import os
+import time
+
+import pytest
+
+from instock.core import hist_cache
+
+
+def _fill(root, start, sizes, atime=None):
+    folder = root / start[0:6] / start
+    folder.mkdir(parents=True, exist_ok=True)
+    for i, size in enumerate(sizes):
+        path = folder / f"{i:06d}qfq.gzip.pickle"
+        path.write_bytes(b"x" * size)
+        if atime is not None:
+            os.utime(path, (atime, atime))
+    if atime is not None:
+        os.utime(folder, (atime, atime))
+    return folder
+
+
+@pytest.fixture
+def root(tmp_path, monkeypatch):
+    monkeypatch.setattr(hist_cache, "_managers", {})
+    monkeypatch.delenv("INSTOCK_HIST_CACHE_BUDGET", raising=False)
+    monkeypatch.delenv("INSTOCK_HIST_CACHE_KEEP", raising=False)
+    return tmp_path
+
+
+def test_env_defaults(monkeypatch):
+    monkeypatch.setenv("INSTOCK_HIST_CACHE_BUDGET", "10M")
+    monkeypatch.setenv("INSTOCK_HIST_CACHE_KEEP", "3")
+    assert hist_cache.default_budget() == 10 << 20
+    assert hist_cache.default_keep() == 3
+    monkeypatch.setenv("INSTOCK_HIST_CACHE_BUDGET", "bad")
+    assert hist_cache.default_budget() == 5 << 30
+
+
+def test_scan_builds_index_once(root):
+    _fill(root, "20210101", [100, 50])
+    _fill(root, "20210102", [10])
+    (root / "canonical").mkdir()
+    (root / "canonical" / "000001qfq.gzip.pickle").write_bytes(b"x" * 999)
+    manager = hist_cache.get_manager(str(root))
+    assert manager.stats()["bytes"] == 160
+    assert manager.stats()["files"] == 3
+    manager.save()
+    index = json.loads((root / hist_cache.INDEX_FILE).read_text())
+    assert set(index["starts"]) == {"20210101", "20210102"}
+
+    # 记账文件存在时不再遍历目录
+    _fill(root, "20210103", [1000])
+    fresh = hist_cache.hist_cache_manager(str(root))
+    assert fresh.total_bytes() == 160
+    assert fresh.rebuild()["20210103"]["bytes"] == 1000
+
+
+def test_record_write_and_read(root):
+    folder = _fill(root, "20210101", [])
+    manager = hist_cache.get_manager(str(root))
+    assert manager.total_bytes() == 0
+    path = folder / "000001qfq.gzip.pickle"
+    path.write_bytes(b"x" * 42)
+    hist_cache.record_write(str(path))
+    assert manager.total_bytes() == 42
+    entry = manager._load()["20210101"]
+    entry["accessed"] = 0
+    hist_cache.record_read(str(path))
+    assert entry["accessed"] > 0
+    # 非起始日目录下的文件不记账
+    hist_cache.record_write(str(root / "canonical" / "000001qfq.gzip.pickle"))
+    assert manager.total_bytes() == 42
+
+
+def test_enforce_keeps_newest_and_evicts_lru(root):
+    now = time.time()
+    _fill(root, "20210101", [100], atime=now - 10)   # 较新访问
+    _fill(root, "20210102", [100], atime=now - 1000)  # 最久未访问
+    _fill(root, "20210103", [100], atime=now - 500)
+    _fill(root, "20210104", [100], atime=now - 2000)  # 最新起始日，保留
+    manager = hist_cache.get_manager(str(root))
+
+    dry = manager.enforce(budget=250, keep=1, dry_run=True)
+    assert dry["evicted"] == ["20210102", "20210103"]
+    assert (root / "202101" / "20210102").is_dir()
+
+    result = manager.enforce(budget=250, keep=1)
+    assert result == {"evicted": ["20210102", "20210103"], "freed": 200, "total": 200}
+    assert not (root / "202101" / "20210102").exists()
+    assert (root / "202101" / "20210101").is_dir()
+    assert (root / "202101" / "20210104").is_dir()
+    index = json.loads((root / hist_cache.INDEX_FILE).read_text())
+    assert set(index["starts"]) == {"20210101", "20210104"}
+
+
+def test_enforce_respects_protect_and_removes_empty_month(root):
+    _fill(root, "20201231", [100], atime=time.time() - 1000)
+    _fill(root, "20210101", [100], atime=time.time() - 2000)
+    _fill(root, "20210102", [100])
+    manager = hist_cache.get_manager(str(root))
+    result = manager.enforce(budget=0, keep=1, protect=("20210101",))
+    assert result["evicted"] == ["20201231"]
+    assert not (root / "202012").exists()
+    assert manager.enforce(budget=10 << 20, keep=0)["evicted"] == []
+
+
+def test_concurrent_managers_merge_records(root, monkeypatch):
+    _fill(root, "20210101", [100])
+    first = hist_cache.hist_cache_manager(str(root))
+    first.save()
+    second = hist_cache.hist_cache_manager(str(root))
+    first.record_write("20210101", 10)
+    second.record_write("20210102", 20)
+    first.save()
+    second.save()
+    index = json.loads((root / hist_cache.INDEX_FILE).read_text())["starts"]
+    assert (index["20210101"]["bytes"], index["20210101"]["files"]) == (110, 2)
+    assert index["20210102"]["bytes"] == 20
+    # 一个进程回收的目录不会被另一个进程的旧记账写回
+    second.enforce(budget=0, keep=0, protect=("20210102",))
+    first.record_write("20210102", 5)
+    first.save()
+    index = json.loads((root / hist_cache.INDEX_FILE).read_text())["starts"]
+    assert set(index) == {"20210102"}
+    assert index["20210102"]["bytes"] == 25
+
+
+def test_record_write_persists_without_enforce(root, monkeypatch):
+    monkeypatch.setattr(hist_cache, "_SAVE_INTERVAL", 0)
+    folder = _fill(root, "20210101", [])
+    manager = hist_cache.get_manager(str(root))
+    assert manager.total_bytes() == 0
+    path = folder / "000001qfq.gzip.pickle"
+    path.write_bytes(b"x" * 42)
+    hist_cache.record_write(str(path))
+    index = json.loads((root / hist_cache.INDEX_FILE).read_text())["starts"]
+    assert index["20210101"]["bytes"] == 42
+    # 未到保存间隔的写入在进程退出时保存
+    monkeypatch.setattr(hist_cache, "_SAVE_INTERVAL", 3600)
+    manager.record_write("20210102", 8)
+    hist_cache.save_all()
+    index = json.loads((root / hist_cache.INDEX_FILE).read_text())["starts"]
+    assert index["20210102"]["bytes"] == 8
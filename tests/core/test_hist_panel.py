@@ -0,0 +1,90 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import instock.core.kline_parser as kline_parser
+import instock.core.tablestructure as tbs
+from instock.core.hist_panel import hist_panel
+
+
+def _stock(n, seed, start="2023-01-02"):
+    rng = np.random.default_rng(seed)
+    close = np.round(10 + np.cumsum(rng.normal(0, 0.2, n)), 2)
+    dates = pd.bdate_range(start, periods=n).strftime("%Y-%m-%d")
+    data = pd.DataFrame({
+        "date": dates.astype(object), "open": close, "close": close,
+        "high": close + 0.1, "low": close - 0.1,
+        "volume": rng.integers(10_000, 5_000_000, n).astype(float),
+        "amount": rng.integers(10_000_000, 900_000_000, n).astype(float),
+        "amplitude": 1.0, "quote_change": 0.5, "ups_downs": 0.05, "turnover": 0.2,
+    }, columns=list(tbs.CN_STOCK_HIST_DATA["columns"]))
+    return kline_parser.add_hist_derived(data)
+
+
+@pytest.fixture
+def frames():
+    return {("2024-03-01", f"{i:06d}", f"s{i}"): _stock(300 + i, i) for i in range(5)}
+
+
+def test_mapping_roundtrip(frames):
+    panel = hist_panel.from_frames(frames)
+    assert len(panel) == 5
+    assert list(panel) == list(frames)
+    assert ("2024-03-01", "000000", "s0") in panel
+    assert panel.get(("x", "y", "z")) is None
+    for key, expected in frames.items():
+        got = panel[key]
+        assert list(got.columns) == list(expected.columns)
+        assert got["date"].tolist() == expected["date"].tolist()
+        assert got["close"].dtype == np.float64
+        pd.testing.assert_frame_equal(got, expected, rtol=1e-6)
+
+
+def test_frames_are_private_copies(frames):
+    panel = hist_panel.from_frames(frames)
+    key = next(iter(frames))
+    data = panel[key]
+    data.loc[:, "close"] = 0.0
+    assert panel[key]["close"].iloc[0] != 0.0
+    with pytest.raises(ValueError):
+        panel.bars(key)["close"][0] = 1.0
+
+
+def test_frame_slices_by_date(frames):
+    panel = hist_panel.from_frames(frames)
+    key = next(iter(frames))
+    expected = frames[key]
+    end = expected["date"].iloc[100]
+    got = panel.frame(key, end_date=end)
+    assert got["date"].tolist() == expected.loc[expected["date"] <= end, "date"].tolist()
+    got = panel.frame(key, end_date=datetime.date.fromisoformat(end), tail=20)
+    assert got["date"].tolist() == expected["date"].iloc[81:101].tolist()
+    assert panel.frame(key, end_date="2000-01-01").empty
+
+
+def test_add_after_read_and_memory_report(frames):
+    keys = list(frames)
+    panel = hist_panel()
+    for key in keys[:3]:
+        panel.add(key, frames[key])
+    assert len(panel[keys[0]].index) == 300
+    for key in keys[3:]:
+        panel.add(key, frames[key])
+    assert len(panel[keys[4]].index) == 304
+    report = panel.memory_report()
+    assert report["codes"] == 5
+    assert report["rows"] == sum(len(f.index) for f in frames.values())
+    assert report["ratio"] > 2
+
+
+def test_strategies_accept_panel_frames(frames):
+    from instock.core.strategy import enter, keep_increasing, turtle_trade
+
+    panel = hist_panel.from_frames(frames)
+    date = datetime.date(2024, 3, 1)
+    for key in frames:
+        for check in (enter.check_volume, keep_increasing.check, turtle_trade.check_enter):
+            assert check(key, panel.frame(key, end_date=date), date=date) == \
+                check(key, frames[key], date=date)
@@ -0,0 +1,194 @@
+import multiprocessing
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import instock.core.stockfetch as stf
+import instock.core.tablestructure as tbs
+from instock.core import hist_store
+
+
+def _stock(dates, closes):
+    cols = list(tbs.CN_STOCK_HIST_DATA["columns"])
+    rows = [[d, c, c, c + 0.1, c - 0.1, 100.0, 1000.0, 1.0, 0.5, 0.1, 0.2] for d, c in zip(dates, closes)]
+    return pd.DataFrame(rows, columns=cols)
+
+
+@pytest.fixture
+def root(tmp_path, monkeypatch):
+    monkeypatch.setattr(hist_store, "store_root", str(tmp_path / "store"))
+    monkeypatch.setattr(hist_store, "_stores", {})
+    return tmp_path / "store"
+
+
+def test_put_is_visible_before_flush(root):
+    store = hist_store.hist_store("qfq")
+    store.put("000001", _stock(["2024-01-02", "2024-01-03"], [10.0, 10.5]), "20240101", "2024-01-03")
+    assert store.entry("000001") == {"start": "20240101", "through": "2024-01-03", "rows": 2}
+    assert list(store.get("000001")["close"]) == [10.0, 10.5]
+    assert store.pending() == 1
+    assert not (root / "qfq" / "CURRENT").exists()
+
+
+def test_flush_roundtrip_and_mmap_views(root):
+    store = hist_store.hist_store("qfq")
+    a = _stock(["2024-01-02", "2024-01-03"], [10.0, 10.5])
+    b = _stock(["2024-01-03"], [20.0])
+    store.put("000002", b, "20240101", "2024-01-03")
+    store.put("000001", a, "20240101", "2024-01-03")
+    assert store.flush() == 2
+    assert store.pending() == 0
+
+    reader = hist_store.hist_store("qfq")
+    bars = reader.bars("000001")
+    assert isinstance(bars["close"], np.memmap) or isinstance(bars["close"].base, np.memmap)
+    assert not bars["close"].flags.writeable
+    assert bars["date"].dtype == np.int32
+    pd.testing.assert_frame_equal(reader.get("000001"), a)
+    pd.testing.assert_frame_equal(reader.get("000002"), b)
+    assert reader.codes() == ["000001", "000002"]
+    assert reader.bars("600000") is None
+    assert reader.stats()["rows"] == 3
+
+
+def test_flush_merges_with_existing_version(root):
+    store = hist_store.hist_store("qfq")
+    store.put("000001", _stock(["2024-01-02"], [10.0]), "20240101", "2024-01-02")
+    store.put("000002", _stock(["2024-01-02"], [20.0]), "20240101", "2024-01-02")
+    store.flush()
+    store.put("000001", _stock(["2024-01-02", "2024-01-03"], [10.0, 11.0]), "20240101", "2024-01-03")
+    store.flush()
+
+    reader = hist_store.hist_store("qfq")
+    assert list(reader.get("000001")["close"]) == [10.0, 11.0]
+    assert list(reader.get("000002")["close"]) == [20.0]
+    assert reader.entry("000001")["through"] == "2024-01-03"
+
+
+def test_old_versions_are_cleaned(root):
+    store = hist_store.hist_store("qfq")
+    for i in range(4):
+        store.put("000001", _stock(["2024-01-02"], [10.0 + i]), "20240101", "2024-01-02")
+        store.flush()
+    versions = [name for name in os.listdir(root / "qfq") if name.isdigit()]
+    assert len(versions) == hist_store.KEEP_VERSIONS
+    assert (root / "qfq" / "CURRENT").read_text() == max(versions)
+
+
+def test_refresh_sees_other_writer(root):
+    reader = hist_store.hist_store("qfq")
+    assert reader.entry("000001") is None
+    writer = hist_store.hist_store("qfq")
+    writer.put("000001", _stock(["2024-01-02"], [10.0]), "20240101", "2024-01-02")
+    writer.flush()
+    reader.refresh()
+    assert reader.entry("000001")["rows"] == 1
+
+
+def _flush_codes(root, codes):
+    store = hist_store.hist_store("qfq", root=str(root))
+    for code in codes:
+        store.put(code, _stock(["2024-01-02"], [10.0]), "20240101", "2024-01-02")
+        store.flush()
+
+
+def test_concurrent_flushes_keep_every_code(root):
+    first = hist_store.hist_store("qfq")
+    second = hist_store.hist_store("qfq")
+    first.put("000001", _stock(["2024-01-02"], [10.0]), "20240101", "2024-01-02")
+    second.put("000002", _stock(["2024-01-02"], [20.0]), "20240101", "2024-01-02")
+    first.flush()
+    second.flush()
+    assert hist_store.hist_store("qfq").codes() == ["000001", "000002"]
+
+    # 多个进程同时 flush，后替换 CURRENT 的进程不会丢掉其他进程写入的代码
+    ctx = multiprocessing.get_context("fork")
+    workers = [ctx.Process(target=_flush_codes, args=(root, [f"{w}{i:05d}" for i in range(8)])) for w in range(1, 4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert len(hist_store.hist_store("qfq").codes()) == 2 + 3 * 8
+    assert (root / "qfq" / hist_store.LOCK_FILE).exists()
+
+
+def test_covers(root):
+    store = hist_store.hist_store("qfq")
+    store.put("000001", _stock(["2024-01-02"], [10.0]), "20240101", "2024-01-02")
+    assert store.covers("000001", "20240101")
+    assert store.covers("000001", "20240201", "2024-01-02")
+    assert not store.covers("000001", "20231201")
+    assert not store.covers("000001", "20240101", "2024-01-03")
+    assert not store.covers("000002", "20240101")
+
+
+class _FakeHist:
+    def __init__(self, dates, closes):
+        self.dates = list(dates)
+        self.closes = list(closes)
+        self.calls = []
+
+    def __call__(self, symbol, period="daily", start_date="19700101", adjust=""):
+        self.calls.append(start_date)
+        start = f"{start_date[0:4]}-{start_date[4:6]}-{start_date[6:8]}"
+        pairs = [(d, c) for d, c in zip(self.dates, self.closes) if d >= start]
+        if not pairs:
+            return pd.DataFrame()
+        frame = _stock(*zip(*pairs))
+        return frame.rename(columns={"date": "日期"})
+
+
+def test_fetch_stock_hist_reads_store_after_first_run(root, monkeypatch):
+    monkeypatch.delenv("INSTOCK_HIST_RAW", raising=False)
+    monkeypatch.delenv("INSTOCK_HIST_INCREMENTAL", raising=False)
+    monkeypatch.delenv("INSTOCK_ONLY_MISSING_CACHE", raising=False)
+    fake = _FakeHist(["2024-01-02", "2024-01-03"], [10.0, 10.5])
+    monkeypatch.setattr(stf.she, "stock_zh_a_hist", fake)
+
+    first = stf.fetch_stock_hist(("2024-01-03", "000001"), "20240101", True)
+    assert fake.calls == ["20240101"]
+    assert list(first["p_change"].round(2)) == [0.0, 5.0]
+    assert stf.fetch_stock_hist_stored(("2024-01-03", "000001"), "20240101") is not None
+
+    hist_store.flush_all()
+    monkeypatch.setattr(hist_store, "_stores", {})
+    again = stf.fetch_stock_hist(("2024-01-03", "000001"), "20240101", True)
+    assert fake.calls == ["20240101"]
+    pd.testing.assert_frame_equal(again, first)
+
+    # 新的运行日期重新抓取
+    stf.fetch_stock_hist(("2024-01-04", "000001"), "20240101", True)
+    assert fake.calls == ["20240101", "20240101"]
+
+
+def test_store_incremental_appends_delta(root, monkeypatch):
+    monkeypatch.setenv("INSTOCK_HIST_INCREMENTAL", "1")
+    monkeypatch.delenv("INSTOCK_ONLY_MISSING_CACHE", raising=False)
+    fake = _FakeHist(["2024-01-02", "2024-01-03"], [10.0, 10.5])
+    monkeypatch.setattr(stf.she, "stock_zh_a_hist", fake)
+
+    stf.stock_hist_store("000001", "2024-01-03", "20240101", True, "qfq")
+    fake.dates.append("2024-01-04")
+    fake.closes.append(10.8)
+    data = stf.stock_hist_store("000001", "2024-01-04", "20240101", True, "qfq")
+    assert fake.calls == ["20240101", "20240103"]
+    assert list(data["date"]) == ["2024-01-02", "2024-01-03", "2024-01-04"]
+    assert hist_store.get_store("qfq").entry("000001")["through"] == "2024-01-04"
+
+
+def test_intraday_run_does_not_write_store(root, monkeypatch):
+    monkeypatch.delenv("INSTOCK_HIST_INCREMENTAL", raising=False)
+    fake = _FakeHist(["2024-01-02"], [10.0])
+    monkeypatch.setattr(stf.she, "stock_zh_a_hist", fake)
+    assert stf.stock_hist_store("000001", "2024-01-02", "20240101", False, "qfq") is not None
+    assert hist_store.get_store("qfq").entry("000001") is None
+
+
+def test_store_can_be_disabled(monkeypatch):
+    monkeypatch.setenv("INSTOCK_HIST_STORE", "0")
+    assert not stf.is_hist_store()
+    assert stf.fetch_stock_hist_stored(("2024-01-03", "000001"), "20240101") is None
+    monkeypatch.delenv("INSTOCK_HIST_STORE")
+    assert stf.is_hist_store()
@@ -0,0 +1,114 @@
+import json
+
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+from instock.core import http_replay
+from instock.core.eastmoney_fetcher import eastmoney_fetcher
+
+
+class _FakeUpstream(BaseAdapter):
+    """Plays the live site: echoes the query string back as JSON."""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def send(self, request, **kwargs):
+        self.calls += 1
+        response = requests.Response()
+        response.status_code = 200
+        response.headers["Content-Type"] = "application/json"
+        response._content = json.dumps({"url": request.url, "data": {"total": 1, "diff": [{"f12": "000001"}]}}).encode()
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def archive(tmp_path, monkeypatch):
+    path = tmp_path / "archive.jsonl.gz"
+    monkeypatch.setenv("INSTOCK_HTTP_ARCHIVE", str(path))
+    for name in ("INSTOCK_HTTP_REPLAY_LATENCY", "INSTOCK_HTTP_REPLAY_ERROR_RATE", "INSTOCK_HTTP_REPLAY_429_RATE"):
+        monkeypatch.delenv(name, raising=False)
+    return path
+
+
+def _record(monkeypatch, url, params):
+    monkeypatch.setenv("INSTOCK_HTTP_MODE", "record")
+    session = requests.Session()
+    upstream = _FakeUpstream()
+    session.mount("http://", upstream)
+    session.mount("https://", upstream)
+    http_replay.install(session)
+    session.get(url, params=params)
+    return upstream
+
+
+def test_request_key_ignores_volatile_params_and_mirrors():
+    a = http_replay.request_key("GET", "https://80.push2.eastmoney.com/api/qt/clist/get?pn=2&pz=50&_=1")
+    b = http_replay.request_key("get", "http://push2.eastmoney.com/api/qt/clist/get?pz=50&pn=2&_=999")
+    c = http_replay.request_key("GET", "http://push2.eastmoney.com/api/qt/clist/get?pz=50&pn=3")
+    assert a == b
+    assert a != c
+    assert http_replay.request_key("POST", "http://x.com/a", b"1") != http_replay.request_key("POST", "http://x.com/a", b"2")
+
+
+def test_mode_off_leaves_session_untouched(monkeypatch):
+    monkeypatch.delenv("INSTOCK_HTTP_MODE", raising=False)
+    session = requests.Session()
+    adapter = session.get_adapter("https://")
+    http_replay.install(session)
+    assert session.get_adapter("https://") is adapter
+
+
+def test_record_then_replay_offline(archive, monkeypatch):
+    upstream = _record(monkeypatch, "https://push2.eastmoney.com/api/qt/clist/get", {"pn": 1, "_": 1})
+    assert upstream.calls == 1
+    assert archive.is_file()
+
+    monkeypatch.setenv("INSTOCK_HTTP_MODE", "replay")
+    session = http_replay.install(requests.Session())
+    r = session.get("https://82.push2.eastmoney.com/api/qt/clist/get", params={"pn": 1, "_": 2})
+    assert r.status_code == 200
+    assert r.json()["data"]["diff"] == [{"f12": "000001"}]
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        session.get("https://push2.eastmoney.com/api/qt/clist/get", params={"pn": 2})
+
+
+def test_replay_injects_throttle_and_errors(archive, monkeypatch):
+    _record(monkeypatch, "https://push2.eastmoney.com/api/x", None)
+    adapter = http_replay.replay_adapter(http_replay.http_archive(str(archive)), latency=0,
+                                         error_rate=0.3, throttle_rate=0.3, seed=7)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    codes = [session.get("https://push2.eastmoney.com/api/x").status_code for _ in range(200)]
+    assert set(codes) == {200, 429, 503}
+    assert 30 < codes.count(429) < 90
+    assert 30 < codes.count(503) < 90
+
+    again = requests.Session()
+    again.mount("https://", http_replay.replay_adapter(http_replay.http_archive(str(archive)), latency=0,
+                                                       error_rate=0.3, throttle_rate=0.3, seed=7))
+    assert [again.get("https://push2.eastmoney.com/api/x").status_code for _ in range(200)] == codes
+
+
+def test_eastmoney_fetcher_replays_pages(archive, monkeypatch):
+    url = "https://push2.eastmoney.com/api/qt/clist/get"
+    _record(monkeypatch, url, {"pn": 1, "pz": 50})
+    monkeypatch.setenv("INSTOCK_HTTP_MODE", "replay")
+    fetcher = eastmoney_fetcher()
+    rows = fetcher.fetch_all_pages(url, {"pn": 1, "pz": 50}, concurrency=1)
+    assert rows == [{"f12": "000001"}]
+
+
+def test_module_get_uses_replay(archive, monkeypatch):
+    _record(monkeypatch, "https://finance.sina.com.cn/realstock/company/klc_td_sh.txt", None)
+    monkeypatch.setenv("INSTOCK_HTTP_MODE", "replay")
+    r = http_replay.get("https://finance.sina.com.cn/realstock/company/klc_td_sh.txt", proxies=None)
+    assert r.status_code == 200
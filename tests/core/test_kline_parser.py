@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+import talib as tl
+
+from instock.core import kline_parser
+
+_KLINES = [
+    "2024-01-02,10.00,10.50,10.80,9.90,1000,1050000.0,9.00,5.00,0.50,1.20",
+    "2024-01-03,10.50,10.29,10.60,10.20,2000,2080000.0,3.81,-2.00,-0.21,2.40",
+    "2024-01-04,10.29,10.80,10.90,10.25,1500,1600000.0,6.32,4.96,0.51,1.80",
+]
+
+
+def test_parse_klines_one_pass():
+    dates, values = kline_parser.parse_klines(_KLINES)
+    assert list(dates) == ["2024-01-02", "2024-01-03", "2024-01-04"]
+    assert values.dtype == np.float64
+    assert values.shape == (3, 10)
+    assert values[1, 1] == pytest.approx(10.29)
+
+
+def test_parse_klines_tolerates_dash():
+    dates, values = kline_parser.parse_klines(["2024-01-02,10.0,-,10.8"])
+    assert np.isnan(values[0, 1])
+    assert values[0, 2] == 10.8
+
+
+def test_parse_klines_rejects_ragged_rows():
+    with pytest.raises(ValueError):
+        kline_parser.parse_klines(["2024-01-02,1,2", "2024-01-03,1"])
+
+
+def test_kline_frame_matches_legacy_parser():
+    cols = ["日期", "开盘", "收盘", "最高", "最低", "成交量", "成交额", "振幅", "涨跌幅", "涨跌额", "换手率"]
+    legacy = pd.DataFrame([item.split(",") for item in _KLINES])
+    legacy.columns = cols
+    for col in cols[1:]:
+        legacy[col] = pd.to_numeric(legacy[col])
+    got = kline_parser.kline_frame(_KLINES, cols)
+    pd.testing.assert_frame_equal(got, legacy, check_dtype=False)
+    assert kline_parser.kline_frame([], cols).columns.tolist() == cols
+
+
+def test_add_hist_derived_and_day_numbers():
+    df = kline_parser.add_hist_derived(kline_parser.kline_frame(_KLINES, kline_parser.HIST_COLUMNS))
+    expected = tl.ROC(df["close"].values, 1)
+    expected[np.isnan(expected)] = 0.0
+    np.testing.assert_allclose(df["p_change"].values, expected)
+    assert list(df["volume"]) == [100000.0, 200000.0, 150000.0]
+    day = kline_parser.day_numbers(df["date"].values)
+    assert day.dtype == np.int32
+    assert day[0] == (pd.Timestamp("2024-01-02") - pd.Timestamp("1970-01-01")).days
+
+
+def test_p_change_zero_previous_close():
+    assert list(kline_parser.p_change([0.0, 1.0, 2.0])) == [0.0, 0.0, 100.0]
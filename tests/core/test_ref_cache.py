@@ -0,0 +1,75 @@
+import os
+import time
+
+import pytest
+
+from instock.core import ref_cache
+from instock.job import ref_cache_job
+
+
+@pytest.fixture
+def ref_root(tmp_path, monkeypatch):
+    root = tmp_path / "ref"
+    monkeypatch.setenv("INSTOCK_REF_CACHE_ROOT", str(root))
+    monkeypatch.delenv("INSTOCK_REF_CACHE_TTL", raising=False)
+    return root
+
+
+class _Loader:
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if isinstance(self.value, Exception):
+            raise self.value
+        return self.value
+
+
+def test_fresh_cache_skips_loader(ref_root):
+    loader = _Loader({"000001": 0})
+    assert ref_cache.cached("codes", loader) == {"000001": 0}
+    assert ref_cache.cached("codes", loader) == {"000001": 0}
+    assert loader.calls == 1
+    assert (ref_root / "codes.pickle").is_file()
+    assert not [p for p in os.listdir(ref_root) if p.endswith(".tmp")]
+
+
+def test_expired_or_forced_refresh_reloads(ref_root):
+    loader = _Loader({"2024-01-02"})
+    ref_cache.cached("trade_date", loader)
+    old = time.time() - ref_cache.DEFAULT_TTL - 1
+    os.utime(ref_cache.cache_file("trade_date"), (old, old))
+    ref_cache.cached("trade_date", loader)
+    ref_cache.cached("trade_date", loader, refresh=True)
+    assert loader.calls == 3
+
+
+def test_failed_loader_falls_back_to_stale_copy(ref_root):
+    ref_cache.cached("codes", _Loader({"000001": 0}))
+    failing = _Loader(RuntimeError("offline"))
+    assert ref_cache.cached("codes", failing, refresh=True) == {"000001": 0}
+    assert ref_cache.cached("codes", _Loader({}), refresh=True) == {"000001": 0}
+
+
+def test_empty_result_is_not_cached(ref_root):
+    assert ref_cache.cached("codes", _Loader({})) == {}
+    assert ref_cache.age("codes") is None
+
+
+def test_job_refresh_and_status(ref_root, monkeypatch, capsys):
+    codes = _Loader({"000001": 0, "600000": 1})
+    dates = _Loader({"2024-01-02", "2024-01-03"})
+    monkeypatch.setattr(ref_cache_job, "_loaders", lambda: {"code_id_map_em": codes, "trade_date": dates})
+
+    assert ref_cache_job.main([]) == 0
+    assert ref_cache_job.main(["trade_date", "--refresh"]) == 0
+    assert (codes.calls, dates.calls) == (1, 2)
+
+    ref_cache_job.main(["--status"])
+    out = capsys.readouterr().out
+    assert "code_id_map_em:" in out and "trade_date:" in out
+
+    with pytest.raises(SystemExit):
+        ref_cache_job.main(["bogus"])
@@ -0,0 +1,148 @@
+import collections
+import types
+
+import pytest
+import requests
+
+from instock.core import singleton_proxy
+from instock.core.singleton_proxy import CLOSED, HALF_OPEN, OPEN, proxy_health, proxys
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = _Clock()
+    monkeypatch.setattr(singleton_proxy, "time", types.SimpleNamespace(monotonic=c.monotonic))
+    return c
+
+
+@pytest.fixture
+def pool(tmp_path, monkeypatch, clock):
+    path = tmp_path / "proxy.txt"
+    path.write_text("http://a:1\nhttp://b:1\n\nhttp://a:1\n")
+    monkeypatch.setattr(singleton_proxy, "proxy_filename", str(path))
+    monkeypatch.delattr(proxys, "_instance", raising=False)
+    p = proxys()
+    p._random.seed(3)
+    yield p
+    monkeypatch.delattr(proxys, "_instance", raising=False)
+
+
+def test_loads_unique_proxies(pool):
+    assert sorted(pool.get_data()) == ["http://a:1", "http://b:1"]
+    assert pool.get_proxies()["https"] in pool.get_data()
+
+
+def test_missing_file_means_direct(tmp_path, monkeypatch):
+    monkeypatch.setattr(singleton_proxy, "proxy_filename", str(tmp_path / "none.txt"))
+    monkeypatch.delattr(proxys, "_instance", raising=False)
+    try:
+        assert proxys().get_data() == []
+        assert proxys().get_proxies() is None
+    finally:
+        monkeypatch.delattr(proxys, "_instance", raising=False)
+
+
+def test_healthier_proxy_is_picked_more_often(pool):
+    fast, slow = {"https": "http://a:1"}, {"https": "http://b:1"}
+    for _ in range(5):
+        pool.report(fast, True, 0.05)
+        pool.report(slow, True, 1.0)
+    picks = collections.Counter(pool.pick() for _ in range(500))
+    assert picks["http://a:1"] > 4 * picks["http://b:1"]
+
+
+def test_circuit_breaker_ejects_then_probes(pool, clock):
+    bad = {"https": "http://b:1"}
+    for _ in range(3):
+        pool.report(bad, False)
+    assert pool.stats()["http://b:1"]["state"] == OPEN
+    assert {pool.pick() for _ in range(50)} == {"http://a:1"}
+
+    clock.now += 31
+    # half-open: exactly one probe is let through
+    assert pool.pick() == "http://b:1"
+    assert pool.stats()["http://b:1"]["state"] == HALF_OPEN
+    assert {pool.pick() for _ in range(20)} == {"http://a:1"}
+
+    pool.report(bad, False)
+    stats = pool.stats()["http://b:1"]
+    assert stats["state"] == OPEN
+    assert stats["cooldown_remaining"] == 60.0
+
+    clock.now += 61
+    assert pool.pick() == "http://b:1"
+    pool.report(bad, True, 0.2)
+    assert pool.stats()["http://b:1"]["state"] == CLOSED
+
+
+def test_all_ejected_falls_back_to_direct(pool):
+    for proxy in pool.get_data():
+        for _ in range(3):
+            pool.report({"https": proxy}, False)
+    assert pool.get_proxies() is None
+
+
+def test_health_ewma_and_stats(clock):
+    h = proxy_health("p", alpha=0.5)
+    h.on_success(1.0)
+    h.on_success(0.0)
+    h.on_failure(clock.now)
+    s = h.stats(clock.now)
+    assert s["latency_ewma"] == 0.5
+    assert s["success_rate"] == pytest.approx(0.667)
+    assert s["state"] == CLOSED
+
+
+def test_fetcher_reports_proxy_failures(pool, monkeypatch):
+    from instock.core.eastmoney_fetcher import eastmoney_fetcher
+
+    fetcher = eastmoney_fetcher()
+    fetcher.last_cookie_refresh_at = float("inf")
+
+    class _Ok:
+        status_code = 200
+        headers = {}
+
+        def raise_for_status(self):
+            pass
+
+    def _request(method, url, proxies=None, **kwargs):
+        if proxies and proxies["https"] == "http://b:1":
+            raise requests.exceptions.ProxyError("dead proxy")
+        return _Ok()
+
+    monkeypatch.setattr(fetcher.session, "request", _request)
+    monkeypatch.setattr("builtins.print", lambda *a, **k: None)
+    monkeypatch.setattr(fetcher.limiter, "acquire", lambda url: 0.0)
+    # always prefer the dead proxy while it is still in rotation
+    pool._random.choices = lambda seq, weights: sorted(seq, key=lambda h: h.proxy != "http://b:1")[:1]
+    for _ in range(5):
+        fetcher.make_request("https://example.com/x")
+    stats = pool.stats()
+    assert stats["http://b:1"]["state"] == OPEN
+    assert stats["http://b:1"]["failures"] == 3
+    assert stats["http://a:1"]["failures"] == 0
+
+
+def test_unreported_probe_expires_after_cooldown(pool, clock):
+    bad = {"https": "http://b:1"}
+    for _ in range(3):
+        pool.report(bad, False)
+    clock.now += 31
+    # the probe goes to a caller that never reports
+    assert pool.pick() == "http://b:1"
+    clock.now += 10
+    assert "http://b:1" not in {pool.pick() for _ in range(20)}
+    clock.now += 21
+    assert pool.pick() == "http://b:1"
+    assert pool.stats()["http://b:1"]["state"] == HALF_OPEN
+    pool.report(bad, True, 0.1)
+    assert pool.stats()["http://b:1"]["state"] == CLOSED
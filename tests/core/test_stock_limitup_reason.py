@@ -0,0 +1,99 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+import requests
+
+from instock.core.crawling import stock_limitup_reason as slr
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(slr, "detail_cache_path", str(tmp_path))
+    return tmp_path
+
+
+def _frame(codes):
+    return pd.DataFrame({"ID": [f"id{c}" for c in codes], "代码": codes}, index=range(10, 10 + len(codes)))
+
+
+def test_parse_detail_strips_markup():
+    text = "var title = 'x';\nvar data = '&lt;spanclass=&quot;hl&quot;&gt;机器人&lt;/span&gt;概念&amp;quot;';"
+    assert slr._parse_detail(text) == '机器人概念"'
+    assert slr._parse_detail("no data") == ""
+
+
+def test_details_fetched_concurrently_and_cached(cache_dir, monkeypatch):
+    calls = []
+    lock = threading.Lock()
+    active = [0, 0]
+
+    def fake_fetch(detail_id, timeout=10):
+        with lock:
+            calls.append(detail_id)
+            active[0] += 1
+            active[1] = max(active[1], active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+        return f"detail-{detail_id}"
+
+    monkeypatch.setattr(slr, "fetch_limitup_detail", fake_fetch)
+    df = _frame(["000001", "000002", "000003", "000004"])
+    details = slr.stock_limitup_details(df, "2025-02-27", workers=4)
+    assert list(details.index) == list(df.index)
+    assert list(details) == [f"detail-id{c}" for c in df["代码"]]
+    assert active[1] > 1
+    assert (cache_dir / "2025-02-27.json").is_file()
+
+    calls.clear()
+    again = slr.stock_limitup_details(df, "2025-02-27")
+    assert calls == []
+    assert list(again) == list(details)
+
+
+def test_only_missing_codes_are_fetched(cache_dir, monkeypatch):
+    slr.save_detail_cache("2025-02-27", {"000001": "cached"})
+    calls = []
+    monkeypatch.setattr(slr, "fetch_limitup_detail", lambda detail_id, timeout=10: calls.append(detail_id) or "new")
+    details = slr.stock_limitup_details(_frame(["000001", "000002"]), "2025-02-27")
+    assert calls == ["id000002"]
+    assert list(details) == ["cached", "new"]
+    assert slr.load_detail_cache("2025-02-27") == {"000001": "cached", "000002": "new"}
+
+
+def test_failures_degrade_to_partial_results(cache_dir, monkeypatch):
+    def fake_fetch(detail_id, timeout=10):
+        if detail_id == "id000002":
+            raise requests.exceptions.Timeout("slow")
+        if detail_id == "id000003":
+            return ""
+        return "ok"
+
+    monkeypatch.setattr(slr, "fetch_limitup_detail", fake_fetch)
+    details = slr.stock_limitup_details(_frame(["000001", "000002", "000003"]), "2025-02-27")
+    assert list(details) == ["ok", "", ""]
+    # 失败和空详因不缓存，下次重跑再取
+    assert slr.load_detail_cache("2025-02-27") == {"000001": "ok"}
+
+
+def test_total_timeout_returns_partial(cache_dir, monkeypatch):
+    release = threading.Event()
+
+    def fake_fetch(detail_id, timeout=10):
+        if detail_id == "id000002":
+            release.wait(5)
+        return "ok"
+
+    monkeypatch.setattr(slr, "fetch_limitup_detail", fake_fetch)
+    started = time.monotonic()
+    details = slr.stock_limitup_details(_frame(["000001", "000002"]), "2025-02-27", total_timeout=0.2)
+    release.set()
+    assert time.monotonic() - started < 2
+    assert list(details) == ["ok", ""]
+
+
+def test_corrupt_cache_is_ignored(cache_dir):
+    (cache_dir / "2025-02-27.json").write_text("{not json")
+    assert slr.load_detail_cache("2025-02-27") == {}
@@ -0,0 +1,132 @@
+import datetime
+
+import pandas as pd
+import pytest
+
+import instock.core.stockfetch as stf
+import instock.core.tablestructure as tbs
+
+
+def _bars(dates, closes):
+    cols = list(tbs.CN_STOCK_HIST_DATA["columns"])
+    rows = []
+    for d, c in zip(dates, closes):
+        rows.append([d, c, c, c, c, 100.0, 1000.0, 1.0, 0.5, 0.1, 0.2])
+    return pd.DataFrame(rows, columns=["日期"] + cols[1:])
+
+
+class _FakeHist:
+    """Stands in for stock_hist_em.stock_zh_a_hist over a fixed daily series."""
+
+    def __init__(self, dates, closes):
+        self.dates = list(dates)
+        self.closes = list(closes)
+        self.calls = []
+
+    def __call__(self, symbol, period="daily", start_date="19700101", adjust=""):
+        self.calls.append(start_date)
+        start = f"{start_date[0:4]}-{start_date[4:6]}-{start_date[6:8]}"
+        pairs = [(d, c) for d, c in zip(self.dates, self.closes) if d >= start]
+        if not pairs:
+            return pd.DataFrame()
+        return _bars(*zip(*pairs))
+
+
+@pytest.fixture
+def hist_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(stf, "stock_hist_cache_path", str(tmp_path))
+    return tmp_path
+
+
+def test_second_run_fetches_only_delta(hist_root, monkeypatch):
+    fake = _FakeHist(["2024-01-02", "2024-01-03", "2024-01-04"], [10.0, 10.5, 10.2])
+    monkeypatch.setattr(stf.she, "stock_zh_a_hist", fake)
+
+    first = stf.stock_hist_cache_incremental("000001", "20240101", adjust="qfq")
+    assert list(first["date"]) == ["2024-01-02", "2024-01-03", "2024-01-04"]
+
+    fake.dates.append("2024-01-05")
+    fake.closes.append(10.8)
+    second = stf.stock_hist_cache_incremental("000001", "20240101", adjust="qfq")
+
+    assert fake.calls == ["20240101", "20240104"]
+    assert list(second["date"]) == ["2024-01-02", "2024-01-03", "2024-01-04", "2024-01-05"]
+    assert list(second.index) == [0, 1, 2, 3]
+
+    # 追加后的缓存仍记录起始日，更早的起始日会触发全量抓取
+    stf.stock_hist_cache_incremental("000001", "20231201", adjust="qfq")
+    assert fake.calls[-1] == "20231201"
+
+
+def test_price_change_on_overlap_triggers_full_refetch(hist_root, monkeypatch):
+    fake = _FakeHist(["2024-01-02", "2024-01-03"], [10.0, 10.5])
+    monkeypatch.setattr(stf.she, "stock_zh_a_hist", fake)
+    stf.stock_hist_cache_incremental("000001", "20240101", adjust="qfq")
+
+    # 除权后前复权价格整体下移
+    fake.closes = [9.0, 9.5]
+    fake.dates.append("2024-01-04")
+    fake.closes.append(9.7)
+    data = stf.stock_hist_cache_incremental("000001", "20240101", adjust="qfq")
+
+    assert fake.calls == ["20240101", "20240103", "20240101"]
+    assert list(data["close"]) == [9.0, 9.5, 9.7]
+
+
+def test_ex_dividend_after_last_bar_skips_delta(hist_root, monkeypatch):
+    fake = _FakeHist(["2024-01-02", "2024-01-03"], [10.0, 10.5])
+    monkeypatch.setattr(stf.she, "stock_zh_a_hist", fake)
+    stf.stock_hist_cache_incremental("000001", "20240101", adjust="qfq")
+
+    stf.stock_hist_cache_incremental("000001", "20240101", adjust="qfq", ex_dividend_date="2024-01-04")
+
+    assert fake.calls == ["20240101", "20240101"]
+
+
+def test_future_ex_dividend_date_keeps_incremental(hist_root, monkeypatch):
+    fake = _FakeHist(["2024-01-02", "2024-01-03"], [10.0, 10.5])
+    monkeypatch.setattr(stf.she, "stock_zh_a_hist", fake)
+    stf.stock_hist_cache_incremental("000001", "20240101", adjust="qfq")
+
+    # 已公告、运行日期之后才除权除息，仍然只抓增量
+    stf.stock_hist_cache_incremental("000001", "20240101", adjust="qfq", ex_dividend_date="2024-01-10",
+                                     date=datetime.date(2024, 1, 4))
+    assert fake.calls == ["20240101", "20240103"]
+
+    stf.stock_hist_cache_incremental("000001", "20240101", adjust="qfq", ex_dividend_date="2024-01-10",
+                                     date="2024-01-10")
+    assert fake.calls == ["20240101", "20240103", "20240101"]
+
+
+def test_earlier_start_refetches_and_later_start_slices(hist_root, monkeypatch):
+    fake = _FakeHist(["2023-12-29", "2024-01-02", "2024-01-03"], [9.8, 10.0, 10.5])
+    monkeypatch.setattr(stf.she, "stock_zh_a_hist", fake)
+    stf.stock_hist_cache_incremental("000001", "20240101", adjust="qfq")
+
+    earlier = stf.stock_hist_cache_incremental("000001", "20231201", adjust="qfq")
+    assert fake.calls == ["20240101", "20231201"]
+    assert list(earlier["date"]) == ["2023-12-29", "2024-01-02", "2024-01-03"]
+
+    later = stf.stock_hist_cache_incremental("000001", "20240103", adjust="qfq")
+    assert list(later["date"]) == ["2024-01-03"]
+
+
+def test_no_cache_does_not_persist_delta(hist_root, monkeypatch):
+    fake = _FakeHist(["2024-01-02"], [10.0])
+    monkeypatch.setattr(stf.she, "stock_zh_a_hist", fake)
+    stf.stock_hist_cache_incremental("000001", "20240101", adjust="qfq")
+
+    fake.dates.append("2024-01-03")
+    fake.closes.append(10.5)
+    intraday = stf.stock_hist_cache_incremental("000001", "20240101", is_cache=False, adjust="qfq")
+    assert list(intraday["date"]) == ["2024-01-02", "2024-01-03"]
+
+    cached = pd.read_pickle(hist_root / "canonical" / "000001qfq.gzip.pickle", compression="gzip")
+    assert list(cached["date"]) == ["2024-01-02"]
+
+
+def test_is_hist_incremental_env(monkeypatch):
+    monkeypatch.delenv("INSTOCK_HIST_INCREMENTAL", raising=False)
+    assert not stf.is_hist_incremental()
+    monkeypatch.setenv("INSTOCK_HIST_INCREMENTAL", "1")
+    assert stf.is_hist_incremental()
@@ -0,0 +1,74 @@
+import os
+import time
+
+import pandas as pd
+import pytest
+
+import instock.core.tablestructure as tbs
+from instock.core import hist_cache, hist_store
+from instock.job import hist_store_job
+
+
+def _stock(dates, closes):
+    cols = list(tbs.CN_STOCK_HIST_DATA["columns"])
+    rows = [[d, c, c, c, c, 100.0, 1000.0, 1.0, 0.5, 0.1, 0.2] for d, c in zip(dates, closes)]
+    return pd.DataFrame(rows, columns=cols)
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(hist_store, "store_root", str(tmp_path / "hist" / "store"))
+    monkeypatch.setattr(hist_store, "_stores", {})
+    return tmp_path / "hist"
+
+
+def _write(path, frame, mtime=None):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    frame.to_pickle(path, compression="gzip")
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def test_migrate_picks_newest_pickle_per_code(cache):
+    now = time.time()
+    _write(cache / "202401" / "20210102" / "000001qfq.gzip.pickle", _stock(["2024-01-02"], [1.0]), now - 100)
+    _write(cache / "202401" / "20210103" / "000001qfq.gzip.pickle",
+           _stock(["2024-01-02", "2024-01-03"], [1.0, 2.0]), now)
+    canonical = _stock(["2023-06-01", "2024-01-03"], [5.0, 6.0])
+    canonical.attrs["date_start"] = "20210101"
+    _write(cache / "canonical" / "000002qfq.gzip.pickle", canonical)
+    _write(cache / "202401" / "20210103" / "000003.gzip.pickle", _stock(["2024-01-02"], [1.0]))
+
+    counts = hist_store_job.migrate(str(cache))
+    assert counts == {"migrated": 2, "skipped": 0, "failed": 0}
+
+    store = hist_store.hist_store("qfq")
+    assert store.entry("000001") == {"start": "20210103", "through": "2024-01-03", "rows": 2}
+    assert store.entry("000002") == {"start": "20210101", "through": "2024-01-03", "rows": 2}
+    assert store.entry("000003") is None
+
+    # 再次迁移时已存在的代码跳过
+    assert hist_store_job.migrate(str(cache))["skipped"] == 2
+
+
+def test_main_status_and_migrate(cache, capsys):
+    _write(cache / "202401" / "20210103" / "000001qfq.gzip.pickle", _stock(["2024-01-02"], [1.0]))
+    assert hist_store_job.main(["migrate", "--source", str(cache)]) == 0
+    assert "migrated=1" in capsys.readouterr().out
+    assert hist_store_job.main(["status"]) == 0
+    assert "codes: 1" in capsys.readouterr().out
+
+
+def test_main_gc(cache, capsys, monkeypatch):
+    monkeypatch.setattr(hist_cache, "_managers", {})
+    old = time.time() - 1000
+    _write(cache / "202101" / "20210101" / "000001qfq.gzip.pickle", _stock(["2024-01-02"], [1.0]), old)
+    _write(cache / "202101" / "20210102" / "000001qfq.gzip.pickle", _stock(["2024-01-02"], [1.0]))
+    assert hist_store_job.main(["gc", "--budget", "1", "--keep", "1", "--dry-run"]) == 0
+    assert "would evict 20210101" in capsys.readouterr().out
+    assert (cache / "202101" / "20210101").exists()
+    assert hist_store_job.main(["gc", "--budget", "1", "--keep", "1", "--rebuild"]) == 0
+    assert "evicted 20210101" in capsys.readouterr().out
+    assert not (cache / "202101" / "20210101").exists()
+    with pytest.raises(SystemExit):
+        hist_store_job.main(["gc", "--budget", "lots"])
@@ -0,0 +1,18 @@
+import pandas as pd
+import pytest
+
+from instock.factors import storage
+from instock.job import segment_compact_job
+
+
+def test_segment_compact_job(tmp_path, monkeypatch, capsys):
+    monkeypatch.setenv("INSTOCK_FACTOR_ROOT", str(tmp_path / "factors"))
+    df = pd.DataFrame({"date": pd.to_datetime(["2024-01-02"]), "code": ["600519"], "value": [1.0]})
+    storage.write_factor("mom_5d", df)
+    storage.write_factor("mom_5d", df.assign(value=2.0))
+    assert segment_compact_job.main(["factors"]) == 0
+    assert "1 partitions compacted" in capsys.readouterr().out
+    out = storage.read_factor("mom_5d", pd.Timestamp("2024-01-01"), pd.Timestamp("2024-01-31"))
+    assert out["value"].tolist() == [2.0]
+    with pytest.raises(SystemExit):
+        segment_compact_job.main(["nope"])
@@ -0,0 +1,102 @@
+from datetime import date
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from instock.factors.storage import write_factor
+from instock.lake import Lake
+from instock.lib.segment_table import SegmentTable, compact_partition
+from instock.portfolio.storage import write_holding
+from instock.refdata.industry import write_industry_snapshot
+from instock.refdata.listing import upsert_listing_dates
+
+
+@pytest.fixture
+def lake(tmp_factor_root, tmp_holding_root, tmp_refdata_root, tmp_ohlcv_root):
+    lake = Lake(threads=2)
+    yield lake
+    lake.close()
+
+
+def _ohlcv(root, rows):
+    table = SegmentTable(root, keys=["date", "code"], partition_by=lambda df: df["date"].dt.year)
+    table.append(pd.DataFrame(rows, columns=["date", "code", "close"]).assign(
+        date=lambda df: pd.to_datetime(df["date"])))
+
+
+def test_views_follow_the_stores(lake, tmp_factor_root):
+    assert lake.views() == []
+    write_factor("mom", pd.DataFrame({
+        "date": pd.to_datetime(["2024-01-02"]), "code": ["000001"], "value": [1.0],
+    }))
+    assert lake.views() == ["factors"]
+    got = lake.query("SELECT factor, code, value FROM factors")
+    assert got.to_dict("records") == [{"factor": "mom", "code": "000001", "value": 1.0}]
+
+
+def test_segments_are_deduplicated_latest_wins(lake, tmp_ohlcv_root):
+    _ohlcv(tmp_ohlcv_root, [("2024-01-02", "000001", 10.0), ("2024-01-03", "000001", 10.5)])
+    _ohlcv(tmp_ohlcv_root, [("2024-01-03", "000001", 11.0)])
+    _ohlcv(tmp_ohlcv_root, [("2023-12-29", "000001", 9.0)])
+    got = lake.query("SELECT date, close FROM ohlcv ORDER BY date")
+    assert got["close"].tolist() == [9.0, 10.0, 11.0]
+
+
+def test_query_survives_compaction_after_refresh(lake, tmp_ohlcv_root, monkeypatch):
+    _ohlcv(tmp_ohlcv_root, [("2024-01-02", "000001", 10.0)])
+    _ohlcv(tmp_ohlcv_root, [("2024-01-02", "000001", 11.0), ("2024-01-03", "000001", 12.0)])
+    refresh = lake.refresh
+    compacted = []
+
+    def refresh_then_compact(force=False):
+        views = refresh(force)
+        if not compacted:
+            # compaction lands between the view rebuild and the scan
+            compacted.append(compact_partition(tmp_ohlcv_root / "2024.parquet"))
+        return views
+
+    monkeypatch.setattr(lake, "refresh", refresh_then_compact)
+    got = lake.query("SELECT date, close FROM ohlcv ORDER BY date")
+    assert compacted == [True]
+    assert got["close"].tolist() == [11.0, 12.0]
+
+
+def test_holdings_join_next_week_returns(lake, tmp_ohlcv_root):
+    write_holding("s1", pd.DataFrame({
+        "date": pd.to_datetime(["2024-01-05", "2024-01-05"]),
+        "code": ["000001", "000002"], "weight": [0.5, 0.5],
+        "score": [1.0, 0.5], "strategy": ["s1", "s1"],
+    }))
+    _ohlcv(tmp_ohlcv_root, [
+        ("2024-01-05", "000001", 10.0), ("2024-01-12", "000001", 11.0),
+        ("2024-01-05", "000002", 20.0), ("2024-01-12", "000002", 19.0),
+    ])
+    got = lake.query(
+        """
+        SELECT h.code, n.close / c.close - 1 AS ret
+        FROM holdings h
+        JOIN ohlcv c ON c.code = h.code AND c.date = h.date
+        JOIN ohlcv n ON n.code = h.code AND n.date = h.date + INTERVAL 7 DAY
+        WHERE h.strategy = $strategy
+        ORDER BY h.code
+        """,
+        {"strategy": "s1"},
+    )
+    assert got["ret"].round(4).tolist() == [0.1, -0.05]
+
+
+def test_refdata_views_and_arrow_result(lake):
+    upsert_listing_dates(pd.DataFrame({
+        "code": ["000001"], "listing_date": pd.to_datetime(["1991-04-03"]),
+    }))
+    write_industry_snapshot(pd.DataFrame({
+        "code": ["000001"], "industry": ["银行"],
+        "snapshot_date": pd.to_datetime(["2026-01-15"]),
+    }))
+    table = lake.query_arrow(
+        "SELECT l.code, i.industry FROM listing_dates l JOIN industry_snapshots i USING (code) "
+        "WHERE i.snapshot_date <= ?", [date(2026, 2, 1)],
+    )
+    assert isinstance(table, pa.Table)
+    assert table.to_pylist() == [{"code": "000001", "industry": "银行"}]
@@ -0,0 +1,61 @@
+import asyncio
+import time
+
+import pytest
+
+import instock.lib.database as mdb
+from instock.lib.async_database import _with_timeout_hint, async_database
+
+
+@pytest.fixture
+def sqlite_db(tmp_path, monkeypatch):
+    mdb.dispose_engines()
+    monkeypatch.setattr(mdb, "MYSQL_CONN_URL", f"sqlite:///{tmp_path / 'instock.db'}")
+    mdb.executeSql("CREATE TABLE t (date TEXT, code TEXT, close REAL)")
+    mdb.executeSql("INSERT INTO t VALUES ('2024-01-02', '000001', 1.5), ('2024-01-02', '000002', 2.5)")
+    yield
+    mdb.dispose_engines()
+
+
+def test_query_returns_rows(sqlite_db):
+    db = async_database(max_workers=2, timeout=5)
+    rows = asyncio.run(db.query("SELECT code, close FROM t WHERE date = ? ORDER BY code", "2024-01-02"))
+    assert rows == [{"code": "000001", "close": 1.5}, {"code": "000002", "close": 2.5}]
+    assert rows[0].code == "000001"
+    db.close()
+
+
+def test_execute_rowcount_and_get(sqlite_db):
+    db = async_database(max_workers=2, timeout=5)
+
+    async def main():
+        deleted = await db.execute_rowcount("DELETE FROM t WHERE code = ?", "000002")
+        row = await db.get("SELECT code FROM t")
+        missing = await db.get("SELECT code FROM t WHERE code = ?", "x")
+        return deleted, row, missing
+
+    assert asyncio.run(main()) == (1, {"code": "000001"}, None)
+    db.close()
+
+
+def test_slow_work_times_out_without_blocking_other_requests(sqlite_db):
+    db = async_database(max_workers=2, timeout=0.2)
+
+    async def main():
+        slow = asyncio.ensure_future(db._submit(lambda cursor: time.sleep(1)))
+        t0 = time.perf_counter()
+        rows = await db.query("SELECT code FROM t ORDER BY code")
+        fast = time.perf_counter() - t0
+        with pytest.raises(TimeoutError):
+            await slow
+        return rows, fast
+
+    rows, fast = asyncio.run(main())
+    assert [r["code"] for r in rows] == ["000001", "000002"]
+    assert fast < 0.5
+    db.close()
+
+
+def test_timeout_hint_only_on_select():
+    assert _with_timeout_hint(" SELECT * FROM t", 1.5) == " SELECT /*+ MAX_EXECUTION_TIME(1500) */ * FROM t"
+    assert _with_timeout_hint("DELETE FROM t", 1.5) == "DELETE FROM t"
@@ -0,0 +1,12 @@
+import pytest
+
+from instock.lib.byte_size import parse_size
+
+
+def test_parse_size():
+    assert parse_size("1024") == 1024
+    assert parse_size("2K") == 2048
+    assert parse_size("1.5m") == 1536 * 1024
+    assert parse_size("5GB") == 5 << 30
+    with pytest.raises(ValueError):
+        parse_size("lots")
@@ -0,0 +1,294 @@
+import pandas as pd
+import pytest
+from sqlalchemy import event
+from sqlalchemy.types import FLOAT, VARCHAR
+
+import instock.lib.database as mdb
+
+
+@pytest.fixture
+def sqlite_db(tmp_path, monkeypatch):
+    mdb.dispose_engines()
+    monkeypatch.setattr(mdb, "MYSQL_CONN_URL", f"sqlite:///{tmp_path / 'instock.db'}")
+    yield mdb.engine()
+    mdb.dispose_engines()
+
+
+def test_engine_is_shared_and_pooled(sqlite_db):
+    assert mdb.engine() is sqlite_db
+    connects = []
+    event.listen(sqlite_db, "connect", lambda *args: connects.append(1))
+    for _ in range(5):
+        mdb.executeSqlCount("SELECT 1")
+        mdb.read_sql("SELECT 1 AS x")
+    assert len(connects) == 1
+
+
+def test_borrow_connection_rolls_back_on_error(sqlite_db):
+    mdb.executeSql("CREATE TABLE t (x INTEGER)")
+    with pytest.raises(RuntimeError):
+        with mdb.borrow_cursor() as db:
+            db.execute("INSERT INTO t VALUES (1)")
+            raise RuntimeError("boom")
+    with mdb.borrow_cursor() as db:
+        db.execute("INSERT INTO t VALUES (2)")
+    assert mdb.executeSqlFetch("SELECT x FROM t") == [(2,)]
+
+
+def test_schema_cache_and_ddl_invalidation(sqlite_db, monkeypatch):
+    calls = []
+    inspect = mdb.inspect
+    monkeypatch.setattr(mdb, "inspect", lambda e: calls.append(1) or inspect(e))
+
+    assert not mdb.checkTableIsExist("t")
+    assert not mdb.checkTableIsExist("t")
+    assert len(calls) == 1
+
+    mdb.executeSql("CREATE TABLE t (x INTEGER PRIMARY KEY, y TEXT)")
+    assert mdb.checkTableIsExist("t")
+    schema = mdb.table_schema("t")
+    assert schema["columns"] == {"x", "y"}
+    assert schema["primary_key"] == ["x"]
+    assert len(calls) == 2
+
+    # other processes' DDL shows up after the TTL
+    monkeypatch.setenv("INSTOCK_DB_SCHEMA_TTL", "0")
+    with mdb.borrow_cursor() as db:
+        db.execute("ALTER TABLE t ADD COLUMN z REAL")
+    assert "z" in mdb.table_schema("t")["columns"]
+
+
+def test_insert_adds_columns_without_repeated_inspection(sqlite_db, monkeypatch):
+    mdb.executeSql("CREATE TABLE t (code VARCHAR(6) PRIMARY KEY, close FLOAT)")
+    calls = []
+    inspect = mdb.inspect
+    monkeypatch.setattr(mdb, "inspect", lambda e: calls.append(1) or inspect(e))
+    cols_type = {"code": VARCHAR(6), "close": FLOAT}
+    df = pd.DataFrame({"code": ["000001", "000002"], "close": ["1.5", "-"]})
+    mdb.insert_db_from_df(df, "t", cols_type, False, "`code`")
+    mdb.insert_db_from_df(df.assign(code=["000003", "000004"]), "t", cols_type, False, "`code`")
+    assert len(calls) == 1
+
+    df = pd.DataFrame({"code": ["000005"], "close": [2.0], "open": [1.0]})
+    mdb.insert_db_from_df(df, "t", cols_type, False, "`code`")
+    assert "open" in mdb.table_schema("t")["columns"]
+    out = mdb.read_sql("SELECT code, close, open FROM t ORDER BY code")
+    assert out["code"].tolist() == ["000001", "000002", "000003", "000004", "000005"]
+    assert out["close"].isna().tolist() == [False, True, False, True, False]
+    assert float(out["open"].tolist()[-1]) == 1.0
+
+
+class _Cursor:
+    """Records bulk_insert statements; LOAD DATA reads the file like the server would."""
+
+    def __init__(self, local_infile=True):
+        self.local_infile = local_infile
+        self.loads = []
+        self.executemany_calls = []
+
+    def execute(self, sql, params=None):
+        assert sql.startswith("LOAD DATA LOCAL INFILE '")
+        if not self.local_infile:
+            raise mdb.pymysql.err.OperationalError(3948, "Loading local data is disabled")
+        path = sql.split("'")[1]
+        with open(path, encoding="utf-8") as f:
+            self.loads.append((sql, f.read()))
+
+    def executemany(self, sql, rows):
+        self.executemany_calls.append((sql, rows))
+
+
+def _frame():
+    return pd.DataFrame({
+        "date": ["2024-01-02", "2024-01-02", "2024-01-02"],
+        "name": ["平安\t银行", "a\\b", None],
+        "close": [1.5, None, 3.0],
+        "volume": [100.0, 200.4, None],
+        "is_up": [True, False, None],
+    })
+
+
+def test_bulk_insert_load_data_escapes_and_batches(monkeypatch):
+    from sqlalchemy.dialects.mysql import BIT
+    from sqlalchemy.types import BIGINT, DATE
+    monkeypatch.setenv("INSTOCK_DB_BULK_BATCH_BYTES", "1024")
+    cols_type = {"date": DATE, "name": VARCHAR(20), "close": FLOAT, "volume": BIGINT, "is_up": BIT}
+    db = _Cursor()
+    assert mdb.bulk_insert(db, "t", _frame(), cols_type, "mysql://a") == 3
+    (sql, body), = db.loads
+    assert "(`date`, `name`, `close`, `volume`, @`is_up`)" in sql
+    assert "SET `is_up` = CAST(@`is_up` AS UNSIGNED)" in sql
+    assert body.split("\n") == [
+        "2024-01-02\t平安\\t银行\t1.5\t100\t1",
+        "2024-01-02\ta\\\\b\t\\N\t200\t0",
+        "2024-01-02\t\\N\t3.0\t\\N\t\\N",
+        "",
+    ]
+    assert not db.executemany_calls
+
+
+def test_bulk_insert_falls_back_to_executemany(monkeypatch):
+    monkeypatch.setattr(mdb, "_local_infile_off", set())
+    monkeypatch.setattr(mdb, "_batch_bytes", lambda: 1)  # one row per batch
+    db = _Cursor(local_infile=False)
+    mdb.bulk_insert(db, "t", _frame()[["date", "close"]], {"close": FLOAT}, "mysql://a")
+    mdb.bulk_insert(db, "t", _frame()[["date", "close"]], {"close": FLOAT}, "mysql://a")
+    assert [rows for _, rows in db.executemany_calls] == [
+        [["2024-01-02", 1.5]], [["2024-01-02", None]], [["2024-01-02", 3.0]],
+    ] * 2
+    assert db.executemany_calls[0][0] == "INSERT IGNORE INTO `t` (`date`, `close`) VALUES (%s, %s)"
+    assert mdb._local_infile_off == {"mysql://a"}
+
+
+def test_bulk_insert_counts_skipped_duplicates(monkeypatch, caplog):
+    class Cursor(_Cursor):
+        rowcount = -1
+
+        def execute(self, sql, params=None):
+            super().execute(sql, params)
+            self.rowcount = 2  # 一行主键重复被忽略
+
+        def executemany(self, sql, rows):
+            super().executemany(sql, rows)
+            self.rowcount = len(rows) - 1
+
+    monkeypatch.setattr(mdb, "_local_infile_off", set())
+    assert mdb.bulk_insert(Cursor(), "t", _frame()[["date", "close"]], {"close": FLOAT}, "mysql://a") == 2
+    monkeypatch.setattr(mdb, "_local_infile_off", {"mysql://a"})
+    with caplog.at_level("WARNING"):
+        assert mdb.bulk_insert(Cursor(), "t", _frame()[["date", "close"]], {"close": FLOAT}, "mysql://a") == 2
+    assert "忽略了1行" in caplog.text
+
+
+def test_batches_split_by_bytes():
+    assert mdb._batches([4, 4, 4, 10, 1], 8) == [(0, 2), (2, 3), (3, 4), (4, 5)]
+    assert mdb._batches([], 8) == []
+
+
+def test_clean_numeric_single_pass():
+    df = pd.DataFrame({"code": ["1", "-"], "a": ["1.5", "-"], "b": ["", "2"], "c": [float("inf"), 1.0]})
+    out = mdb._clean_numeric(df, {"code": VARCHAR(6), "a": FLOAT, "b": FLOAT, "c": FLOAT})
+    assert out["code"].tolist() == ["1", "-"]
+    assert out["a"].tolist()[0] == 1.5 and pd.isna(out["a"].tolist()[1])
+    assert pd.isna(out["b"].tolist()[0]) and out["b"].tolist()[1] == 2.0
+    assert pd.isna(out["c"].tolist()[0])
+    clean = pd.DataFrame({"a": [1.0, 2.0]})
+    assert mdb._clean_numeric(clean, {"a": FLOAT}) is clean
+
+
+class _UpsertCursor:
+    def __init__(self, existing):
+        self.existing = existing
+        self.statements = []
+
+    def execute(self, sql, params=None):
+        self.statements.append((sql, params))
+
+    def fetchall(self):
+        return self.existing
+
+    def executemany(self, sql, rows):
+        self.statements.append((sql, rows))
+
+
+@pytest.fixture
+def mysql_table(monkeypatch):
+    """A MySQL table with primary key (date, code), seen through a recording cursor."""
+    schema = {"exists": True, "columns": {"date", "code", "close"}, "primary_key": ["date", "code"],
+              "types": {"date": VARCHAR(10), "code": VARCHAR(6), "close": FLOAT}}
+    monkeypatch.setattr(mdb, "table_schema", lambda table_name, to_db=None: schema)
+    cursor = _UpsertCursor(existing=[("000001",), ("000009",)])
+    borrowed = []
+
+    class _Borrow:
+        def __enter__(self):
+            borrowed.append(1)
+            return cursor
+
+        def __exit__(self, *exc):
+            return False
+
+    monkeypatch.setattr(mdb, "borrow_cursor", lambda to_db=None: _Borrow())
+    cursor.borrowed = borrowed
+    return cursor
+
+
+def test_replace_partition_upserts_and_drops_stale_rows_in_one_transaction(mysql_table):
+    df = pd.DataFrame({"date": ["2024-01-02"] * 2, "code": ["000001", "000002"], "close": ["1.5", "-"]})
+    assert mdb.replace_partition("t", "2024-01-02", df) == 2
+    assert len(mysql_table.borrowed) == 1
+    (upsert, rows), (select, select_params), (delete, delete_params) = mysql_table.statements
+    assert upsert == ("INSERT INTO `t` (`date`, `code`, `close`) VALUES (%s, %s, %s) "
+                      "ON DUPLICATE KEY UPDATE `close` = VALUES(`close`)")
+    assert rows == [["2024-01-02", "000001", 1.5], ["2024-01-02", "000002", None]]
+    assert select == "SELECT `code` FROM `t` WHERE `date` = %s"
+    assert delete == "DELETE FROM `t` WHERE `date` = %s AND `code` IN (%s)"
+    assert delete_params == ["2024-01-02", "000009"]
+
+
+def test_upsert_df_batches_by_bytes(mysql_table, monkeypatch):
+    monkeypatch.setattr(mdb, "_batch_bytes", lambda: 1)
+    df = pd.DataFrame({"date": ["2024-01-02"] * 3, "code": ["1", "2", "3"], "close": [1.0, 2.0, 3.0]})
+    assert mdb.upsert_df("t", df, ["date", "code"]) == 3
+    assert [len(rows) for _, rows in mysql_table.statements] == [1, 1, 1]
+
+
+def test_bulk_update_loads_temp_table_and_joins_once_per_chunk(monkeypatch):
+    schema = {"exists": True, "columns": {"date", "code", "rate_1", "rate_2"}, "primary_key": ["date", "code"],
+              "types": {"date": VARCHAR(10), "code": VARCHAR(6), "rate_1": FLOAT, "rate_2": FLOAT}}
+    monkeypatch.setattr(mdb, "table_schema", lambda table_name, to_db=None: schema)
+    monkeypatch.setattr(mdb, "_local_infile_off", {str(mdb.engine().url)})
+    monkeypatch.setenv("INSTOCK_DB_UPDATE_CHUNK_ROWS", "2")
+    statements = []
+
+    class Cursor:
+        rowcount = 0
+
+        def execute(self, sql, params=None):
+            statements.append(sql)
+            self.rowcount = 2 if sql.startswith("UPDATE") else 0
+
+        def executemany(self, sql, rows):
+            statements.append((sql, rows))
+
+        def close(self):
+            statements.append("close")
+
+    class Conn:
+        commits = 0
+
+        def cursor(self):
+            return Cursor()
+
+        def commit(self):
+            Conn.commits += 1
+
+    class Borrow:
+        def __enter__(self):
+            return Conn()
+
+        def __exit__(self, *exc):
+            return False
+
+    monkeypatch.setattr(mdb, "borrow_connection", lambda to_db=None: Borrow())
+    df = pd.DataFrame({"date": ["2024-01-02"] * 3, "code": ["1'; DROP TABLE t; --", "2", "3"],
+                       "rate_1": [1.0, None, 3.0], "rate_2": ["-", "2", "3"]})
+    assert mdb.bulk_update_df(df, "t", ("date", "code")) == 4
+    assert statements[:3] == [
+        "DROP TEMPORARY TABLE IF EXISTS `_upd_t`",
+        "CREATE TEMPORARY TABLE `_upd_t` AS SELECT `date`, `code`, `rate_1`, `rate_2` FROM `t` WHERE 1 = 0",
+        "ALTER TABLE `_upd_t` ADD PRIMARY KEY (`date`, `code`)",
+    ]
+    update = "UPDATE `t` AS t JOIN `_upd_t` AS s ON t.`date` = s.`date` AND t.`code` = s.`code` " \
+             "SET t.`rate_1` = s.`rate_1`, t.`rate_2` = s.`rate_2`"
+    insert = "INSERT IGNORE INTO `_upd_t` (`date`, `code`, `rate_1`, `rate_2`) VALUES (%s, %s, %s, %s)"
+    assert statements[3:] == [
+        (insert, [["2024-01-02", "1'; DROP TABLE t; --", 1.0, None], ["2024-01-02", "2", None, 2.0]]),
+        update,
+        "DELETE FROM `_upd_t`",
+        (insert, [["2024-01-02", "3", 3.0, 3.0]]),
+        update,
+        "DROP TEMPORARY TABLE IF EXISTS `_upd_t`",
+        "close",
+    ]
+    assert Conn.commits == 2
@@ -0,0 +1,108 @@
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from instock.factors.storage import read_factor, write_factor
+from instock.lib import panel_cache
+from instock.lib.panel_cache import PanelCache, path_version
+from instock.refdata.industry import read_industry_map, write_industry_snapshot
+
+
+@pytest.fixture
+def shared(monkeypatch):
+    cache = PanelCache(1 << 30)
+    monkeypatch.setattr(panel_cache, "_shared", cache)
+    return cache
+
+
+def test_hit_miss_and_version_invalidation():
+    cache = PanelCache(1 << 20)
+    calls = []
+
+    def load():
+        calls.append(1)
+        return {"a": len(calls)}
+
+    assert cache.get_or_load("k", 1, load) == {"a": 1}
+    assert cache.get_or_load("k", 1, load) == {"a": 1}
+    assert cache.get_or_load("k", 2, load) == {"a": 2}
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 2, 1)
+    assert stats["bytes"] > 0
+
+
+def test_lru_eviction_by_bytes():
+    frame = pd.DataFrame({"x": range(1000)})
+    size = panel_cache.sizeof(frame)
+    cache = PanelCache(size * 2 + size // 2)
+    for key in "abc":
+        cache.get_or_load(key, 0, lambda: frame.copy())
+        if key == "b":
+            cache.get_or_load("a", 0, lambda: pytest.fail("a should be cached"))
+    # b was least recently used when c arrived
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] <= cache.max_bytes
+    cache.get_or_load("a", 0, lambda: pytest.fail("a should be cached"))
+    loaded = []
+    cache.get_or_load("b", 0, lambda: loaded.append(1) or frame)
+    assert loaded == [1]
+
+
+def test_oversized_value_is_not_cached():
+    cache = PanelCache(10)
+    cache.get_or_load("big", 0, lambda: pd.DataFrame({"x": range(100)}))
+    assert cache.stats()["entries"] == 0
+
+
+def test_path_version_tracks_files_and_manifests(tmp_path):
+    assert path_version(tmp_path / "missing") is None
+    f = tmp_path / "a.parquet"
+    pd.DataFrame({"x": [1]}).to_parquet(f)
+    v1 = path_version(f)
+    pd.DataFrame({"x": [1, 2]}).to_parquet(f)
+    assert path_version(f) != v1
+
+
+def test_read_factor_uses_cache_and_sees_appends(tmp_factor_root, shared):
+    write_factor("mom", pd.DataFrame({
+        "date": pd.to_datetime(["2024-01-02", "2024-06-03"]),
+        "code": ["000001", "000001"], "value": [1.0, 2.0],
+    }))
+    start, end = pd.Timestamp("2024-01-01"), pd.Timestamp("2024-12-31")
+    first = read_factor("mom", start, end)
+    assert len(first) == 2
+    first.loc[0, "value"] = 99.0  # callers get their own frame
+    again = read_factor("mom", pd.Timestamp("2024-06-01"), end)
+    assert again["value"].tolist() == [2.0]
+    assert shared.stats()["hits"] == 1
+
+    write_factor("mom", pd.DataFrame({
+        "date": pd.to_datetime(["2024-01-02"]), "code": ["000001"], "value": [5.0],
+    }))
+    assert read_factor("mom", start, end)["value"].tolist() == [5.0, 2.0]
+    assert shared.stats()["misses"] == 2
+
+
+def test_industry_map_read_once_per_snapshot(tmp_refdata_root, shared, monkeypatch):
+    write_industry_snapshot(pd.DataFrame({
+        "code": ["000001"], "industry": ["bank"],
+        "snapshot_date": pd.to_datetime(["2026-01-15"]),
+    }))
+    reads = []
+    real = pd.read_parquet
+    monkeypatch.setattr(pd, "read_parquet", lambda *a, **k: reads.append(a[0]) or real(*a, **k))
+    for day in range(16, 31):
+        assert read_industry_map(date(2026, 1, day)) == {"000001": "bank"}
+    assert len(reads) == 1
+
+    got = read_industry_map(date(2026, 1, 20))
+    got["000002"] = "x"
+    assert read_industry_map(date(2026, 1, 20)) == {"000001": "bank"}
+
+    write_industry_snapshot(pd.DataFrame({
+        "code": ["000001"], "industry": ["insurance"],
+        "snapshot_date": pd.to_datetime(["2026-02-02"]),
+    }))
+    assert read_industry_map(date(2026, 2, 3)) == {"000001": "insurance"}
+    assert read_industry_map(date(2026, 1, 20)) == {"000001": "bank"}
@@ -0,0 +1,97 @@
+import asyncio
+import time
+
+import pytest
+import requests
+
+from instock.lib.rate_limiter import (
+    host_key,
+    host_rate_limiter,
+    is_throttle_error,
+    token_bucket,
+)
+
+
+def _bucket(**kw):
+    conf = dict(rate=20.0, burst=1, min_rate=1.0, max_rate=40.0)
+    conf.update(kw)
+    return token_bucket(**conf)
+
+
+def _response(status, headers=None):
+    r = requests.Response()
+    r.status_code = status
+    r.headers.update(headers or {})
+    return r
+
+
+@pytest.mark.parametrize("raw, key", [
+    ("https://80.push2.eastmoney.com/api/qt/clist/get", "push2.eastmoney.com"),
+    ("push2his.eastmoney.com", "push2his.eastmoney.com"),
+    ("https://vip.stock.finance.sina.com.cn/q/go.php", "sina"),
+    ("https://datacenter-web.eastmoney.com:443/api", "datacenter-web.eastmoney.com"),
+])
+def test_host_key_normalises_mirrors(raw, key):
+    assert host_key(raw) == key
+
+
+def test_bucket_enforces_rate():
+    b = _bucket(rate=50.0)
+    t0 = time.perf_counter()
+    for _ in range(6):
+        b.acquire()
+    # first token is free (burst=1), the next 5 cost 1/50s each
+    assert time.perf_counter() - t0 >= 5 / 50.0 * 0.9
+
+
+def test_throttle_halves_rate_and_backs_off():
+    b = _bucket(rate=20.0, backoff_base=0.05)
+    b.on_throttle()
+    assert b.rate == pytest.approx(10.0)
+    assert b.stats()["backoff_remaining"] > 0
+    t0 = time.perf_counter()
+    b.acquire()
+    assert time.perf_counter() - t0 >= 0.04
+
+
+def test_success_increases_rate_up_to_max():
+    b = _bucket(rate=39.99, max_rate=40.0, increase=1.0)
+    b.on_success()
+    assert b.rate == 40.0
+    assert b.stats()["successes"] == 1
+
+
+def test_rate_never_drops_below_min():
+    b = _bucket(rate=2.0, min_rate=1.5, backoff_base=0.0)
+    for _ in range(5):
+        b.on_throttle()
+    assert b.rate == 1.5
+
+
+def test_async_acquire_shares_bucket():
+    b = _bucket(rate=100.0)
+
+    async def _run():
+        await asyncio.gather(*[b.acquire_async() for _ in range(5)])
+
+    asyncio.run(_run())
+    assert b.stats()["acquired"] == 5
+
+
+def test_is_throttle_error():
+    assert is_throttle_error(requests.exceptions.ReadTimeout())
+    assert is_throttle_error(
+        requests.exceptions.HTTPError(response=_response(429)))
+    assert not is_throttle_error(
+        requests.exceptions.HTTPError(response=_response(404)))
+    assert not is_throttle_error(ValueError("bad json"))
+
+
+def test_host_limiter_report_uses_retry_after():
+    limiter = host_rate_limiter()
+    key = "unit-test.example.com"
+    before = limiter.bucket(key).rate
+    limiter.report(key, response=_response(503, {"Retry-After": "0.2"}))
+    stats = limiter.stats()[key]
+    assert stats["rate"] < before
+    assert 0 < stats["backoff_remaining"] <= 0.2
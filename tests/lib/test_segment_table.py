@@ -0,0 +1,142 @@
+import json
+import multiprocessing
+import threading
+
+import pandas as pd
+import pyarrow.dataset as ds
+
+from instock.lib import segment_table
+from instock.lib.segment_table import MANIFEST, SegmentTable, compact_partition, compact_tree
+
+
+def _frame(dates, codes, value):
+    return pd.DataFrame({
+        "date": pd.to_datetime(dates),
+        "code": codes,
+        "value": [value] * len(dates),
+    })
+
+
+def _table(root, **kwargs):
+    return SegmentTable(root, keys=["date", "code"], partition_by=lambda df: df["date"].dt.year, **kwargs)
+
+
+def _append_codes(root, codes):
+    table = _table(root, compact_at=100)
+    for code in codes:
+        table.append(_frame(["2024-01-02"], [code], 1.0))
+
+
+def test_appends_from_several_processes_keep_every_segment(tmp_path):
+    ctx = multiprocessing.get_context("fork")
+    workers = [
+        ctx.Process(target=_append_codes, args=(tmp_path, [f"{w}{i:05d}" for i in range(10)]))
+        for w in range(4)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    manifest = json.loads((tmp_path / "2024.parquet" / MANIFEST).read_text())
+    assert len(manifest["segments"]) == 40
+    assert len(_table(tmp_path).read()) == 40
+    assert (tmp_path / "2024.parquet" / segment_table.LOCK_FILE).exists()
+
+
+def test_append_writes_segments_not_rewrites(tmp_path):
+    table = _table(tmp_path, compact_at=100)
+    table.append(_frame(["2024-01-02"], ["000001"], 1.0))
+    first = sorted((tmp_path / "2024.parquet").glob("seg-*.parquet"))
+    mtime = first[0].stat().st_mtime_ns
+    table.append(_frame(["2024-01-03"], ["000001"], 2.0))
+    segments = sorted((tmp_path / "2024.parquet").glob("seg-*.parquet"))
+    assert len(segments) == 2
+    assert segments[0].stat().st_mtime_ns == mtime
+    manifest = json.loads((tmp_path / "2024.parquet" / MANIFEST).read_text())
+    assert [seg["seq"] for seg in manifest["segments"]] == [1, 2]
+    assert table.partitions() == ["2024"]
+
+
+def test_latest_segment_wins_on_read(tmp_path):
+    table = _table(tmp_path, compact_at=100)
+    table.append(_frame(["2024-01-02", "2024-01-03"], ["000001", "000001"], 1.0))
+    table.append(_frame(["2024-01-03"], ["000001"], 9.0))
+    out = table.read(["2024"])
+    assert list(out["value"]) == [1.0, 9.0]
+    assert list(out["date"]) == list(pd.to_datetime(["2024-01-02", "2024-01-03"]))
+
+
+def test_read_pushes_down_filter_and_projection(tmp_path):
+    table = _table(tmp_path, compact_at=100)
+    table.append(_frame(["2023-12-29", "2024-01-02"], ["000001", "000002"], 1.0))
+    out = table.read(["2024"], columns=["value"], filter=ds.field("code") == "000002")
+    assert list(out.columns) == ["value"]
+    assert list(out["value"]) == [1.0]
+    assert table.read(["2025"]).empty
+    assert len(table.read()) == 2
+
+
+def test_compaction_merges_and_dedups(tmp_path):
+    table = _table(tmp_path, compact_at=100, sort_by=["code", "date"])
+    table.append(_frame(["2024-01-03"], ["000002"], 1.0))
+    table.append(_frame(["2024-01-02"], ["000001"], 1.0))
+    table.append(_frame(["2024-01-03"], ["000002"], 5.0))
+    before = table.read(["2024"])
+    assert table.compact() == 1
+    assert table.segment_count("2024") == 1
+    assert len(list((tmp_path / "2024.parquet").glob("*.parquet"))) == 1
+    pd.testing.assert_frame_equal(table.read(["2024"]), before)
+    # 压缩后继续追加仍然是后写入的生效
+    table.append(_frame(["2024-01-03"], ["000002"], 7.0))
+    assert table.read(["2024"])["value"].tolist() == [1.0, 7.0]
+    assert table.compact() == 1
+    assert table.compact() == 0
+
+
+def test_background_compaction_at_threshold(tmp_path, monkeypatch):
+    done = threading.Event()
+    original = segment_table.compact_partition
+
+    def compact(*args, **kwargs):
+        try:
+            return original(*args, **kwargs)
+        finally:
+            done.set()
+
+    monkeypatch.setattr(segment_table, "compact_partition", compact)
+    table = _table(tmp_path, compact_at=3)
+    for day in (2, 3, 4):
+        table.append(_frame([f"2024-01-0{day}"], ["000001"], float(day)))
+    assert done.wait(5)
+    assert table.segment_count("2024") == 1
+    assert table.read(["2024"])["value"].tolist() == [2.0, 3.0, 4.0]
+
+
+def test_legacy_file_partition_is_read_and_converted(tmp_path):
+    _frame(["2024-01-02"], ["000001"], 1.0).to_parquet(tmp_path / "2024.parquet", index=False)
+    table = _table(tmp_path, compact_at=100)
+    assert table.read(["2024"])["value"].tolist() == [1.0]
+    table.append(_frame(["2024-01-02", "2024-01-03"], ["000001", "000001"], 2.0))
+    assert (tmp_path / "2024.parquet").is_dir()
+    assert table.segment_count("2024") == 2
+    assert table.read(["2024"])["value"].tolist() == [2.0, 2.0]
+
+
+def test_unpartitioned_table(tmp_path):
+    table = SegmentTable(tmp_path / "listing.parquet", keys=["code"], compact_at=100)
+    assert table.partitions() == []
+    table.append(pd.DataFrame({"code": ["000002", "000001"], "v": [1, 2]}))
+    table.append(pd.DataFrame({"code": ["000002"], "v": [3]}))
+    assert table.partitions() == ["listing.parquet"]
+    assert table.read()["v"].tolist() == [2, 3]
+
+
+def test_compact_tree_uses_manifest_settings(tmp_path):
+    table = _table(tmp_path / "mom", compact_at=100)
+    table.append(_frame(["2024-01-02"], ["000001"], 1.0))
+    table.append(_frame(["2024-01-02"], ["000001"], 2.0))
+    table.append(_frame(["2023-01-03"], ["000001"], 1.0))
+    assert compact_tree(tmp_path) == 1
+    assert compact_partition(tmp_path / "mom" / "2024.parquet") is False
+    assert table.read(["2024"])["value"].tolist() == [2.0]
+    assert compact_tree(tmp_path / "missing") == 0
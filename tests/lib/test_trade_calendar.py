@@ -0,0 +1,66 @@
+import datetime
+from datetime import date
+
+import pytest
+
+from instock.lib import trade_time
+from instock.lib.trade_calendar import TradeCalendar
+from instock.portfolio.schedule import WeeklyRebalance
+
+# Jan 2024 weekdays, with New Year's Day and Friday the 12th closed.
+_DAYS = [date(2024, 1, d) for d in (2, 3, 4, 5, 8, 9, 10, 11, 15, 16)]
+
+
+@pytest.fixture
+def cal():
+    return TradeCalendar(reversed(_DAYS))
+
+
+def test_prev_next_skip_non_trading_days(cal):
+    assert cal.prev(date(2024, 1, 8)) == date(2024, 1, 5)
+    assert cal.prev(date(2024, 1, 7)) == date(2024, 1, 5)
+    assert cal.prev(date(2024, 1, 15), 3) == date(2024, 1, 9)
+    assert cal.next(date(2024, 1, 11)) == date(2024, 1, 15)
+    assert cal.next(date(2024, 1, 6), 2) == date(2024, 1, 9)
+
+
+def test_out_of_range_returns_none(cal):
+    assert cal.prev(date(2024, 1, 2)) is None
+    assert cal.next(date(2024, 1, 16)) is None
+    assert cal.floor(date(2024, 1, 1)) is None
+    assert cal.ceil(date(2024, 1, 17)) is None
+
+
+def test_offset_and_membership(cal):
+    assert cal.offset(date(2024, 1, 10), 2) == date(2024, 1, 15)
+    assert cal.offset(date(2024, 1, 10), -2) == date(2024, 1, 8)
+    assert cal.offset(date(2024, 1, 10), 0) == date(2024, 1, 10)
+    assert cal.offset(date(2024, 1, 13), 0) is None
+    assert date(2024, 1, 12) not in cal
+    assert datetime.datetime(2024, 1, 11, 15, 0) in cal
+
+
+def test_range_and_count_between(cal):
+    assert cal.range(date(2024, 1, 6), date(2024, 1, 12)) == [date(2024, 1, d) for d in (8, 9, 10, 11)]
+    assert cal.count_between(date(2024, 1, 1), date(2024, 1, 31)) == len(_DAYS)
+    assert cal.count_between(date(2024, 1, 13), date(2024, 1, 14)) == 0
+    assert cal.count_between(date(2024, 1, 16), date(2024, 1, 2)) == 0
+
+
+def test_trade_time_uses_index(monkeypatch):
+    class _Singleton:
+        def get_data(self):
+            return set(_DAYS)
+
+    monkeypatch.setattr(trade_time, "stock_trade_date", _Singleton)
+    monkeypatch.setattr(trade_time, "_calendar", None)
+    assert trade_time.get_one_previous_trade_date(date(2024, 1, 15)) == date(2024, 1, 11)
+    assert trade_time.get_previous_trade_date(date(2024, 1, 15), 5) == date(2024, 1, 5)
+    assert trade_time.get_next_trade_date(date(2024, 1, 11)) == date(2024, 1, 15)
+    # Outside the calendar the input date is returned unchanged, as before.
+    assert trade_time.get_next_trade_date(date(2024, 1, 16)) == date(2024, 1, 16)
+
+
+def test_weekly_rebalance_accepts_index(cal):
+    out = WeeklyRebalance("FRI").rebalance_dates(date(2024, 1, 1), date(2024, 1, 16), cal)
+    assert out == [date(2024, 1, 5), date(2024, 1, 11), date(2024, 1, 16)]
@@ -81,3 +81,78 @@ def test_single_code_fetch_failure_logged_and_skipped(tmp_ohlcv_root, caplog):
         ["000001", "600000"], date(2026, 4, 1), date(2026, 4, 1)
     )
     assert set(got["code"]) == {"600000"}
+
+
+def _store_with(tmp_ohlcv_root, frames):
+    source = MagicMock()
+    source.get_trade_calendar.return_value = [date(2026, 4, 1), date(2026, 4, 2)]
+    source.get_ohlcv.side_effect = AssertionError("should not fetch")
+    store = OhlcvPanelStore(source=source)
+    store._write_cache(pd.concat(frames, ignore_index=True))
+    return store
+
+
+def test_year_file_sorted_by_code_in_row_groups(tmp_ohlcv_root, monkeypatch):
+    import pyarrow.parquet as pq
+    from instock.refdata import ohlcv_store
+
+    monkeypatch.setattr(ohlcv_store, "ROW_GROUP_SIZE", 2)
+    codes = ["600000", "000001", "300750"]
+    store = _store_with(tmp_ohlcv_root, [_ohlcv_rows(c, ["2026-04-01"]) for c in codes])
+    store._write_cache(pd.concat([_ohlcv_rows(c, ["2026-04-02"]) for c in codes], ignore_index=True))
+    assert store.table.segment_count("2026") == 2
+    assert store.table.compact() == 1
+    segments = sorted((tmp_ohlcv_root / "2026.parquet").glob("seg-*.parquet"))
+    assert len(segments) == 1
+    meta = pq.ParquetFile(segments[0]).metadata
+    assert meta.num_row_groups == 3
+    code_idx = meta.schema.to_arrow_schema().get_field_index("code")
+    ranges = [
+        (meta.row_group(i).column(code_idx).statistics.min, meta.row_group(i).column(code_idx).statistics.max)
+        for i in range(meta.num_row_groups)
+    ]
+    assert ranges == [("000001", "000001"), ("300750", "300750"), ("600000", "600000")]
+
+
+def test_get_panel_pushes_down_codes_dates_and_columns(tmp_ohlcv_root):
+    codes = ["000001", "000002", "600000"]
+    store = _store_with(
+        tmp_ohlcv_root, [_ohlcv_rows(c, ["2026-03-31", "2026-04-01", "2026-04-02"]) for c in codes]
+    )
+    got = store.get_panel(
+        ["600000", "000001"], date(2026, 4, 1), date(2026, 4, 2), columns=["close"]
+    )
+    assert list(got.columns) == ["date", "code", "close"]
+    assert list(got["code"]) == ["000001", "600000", "000001", "600000"]
+    assert got["date"].min() == pd.Timestamp("2026-04-01")
+
+
+def test_get_panel_reads_cache_once(tmp_ohlcv_root, monkeypatch):
+    source = MagicMock()
+    source.get_trade_calendar.return_value = [date(2026, 4, 1), date(2026, 4, 2)]
+    source.get_ohlcv.side_effect = lambda c, s, e, adjust="qfq": \
+        _ohlcv_rows(c, ["2026-04-01", "2026-04-02"])
+    store = OhlcvPanelStore(source=source)
+    store._write_cache(_ohlcv_rows("000001", ["2026-04-01", "2026-04-02"]))
+
+    loads = []
+    original = store._load_cache
+    monkeypatch.setattr(store, "_load_cache", lambda *a, **k: loads.append(a) or original(*a, **k))
+    got = store.get_panel(["000001", "600000"], date(2026, 4, 1), date(2026, 4, 2))
+    assert len(loads) == 1
+    assert list(got["code"]) == ["000001", "600000", "000001", "600000"]
+    source.get_ohlcv.assert_called_once()
+
+
+def test_legacy_date_sorted_file_still_readable(tmp_ohlcv_root):
+    legacy = pd.concat(
+        [_ohlcv_rows(c, ["2026-04-01", "2026-04-02"]) for c in ("600000", "000001")],
+        ignore_index=True,
+    ).sort_values(["date", "code"])
+    legacy.to_parquet(tmp_ohlcv_root / "2026.parquet", index=False)
+    source = MagicMock()
+    source.get_trade_calendar.return_value = [date(2026, 4, 1), date(2026, 4, 2)]
+    store = OhlcvPanelStore(source=source)
+    got = store.get_panel(["000001"], date(2026, 4, 1), date(2026, 4, 2))
+    assert len(got) == 2
+    source.get_ohlcv.assert_not_called()
@@ -0,0 +1,93 @@
+import json
+from datetime import date
+
+import pandas as pd
+
+from instock.refdata.industry import (
+    read_industry_intervals,
+    read_industry_map,
+    read_industry_maps,
+    write_industry_snapshot,
+)
+from instock.refdata.snapshots import INDEX, SnapshotIndex, materialize
+from instock.refdata.st import read_st_flag_sets, read_st_flags, write_st_snapshot
+
+
+def _industry(day, mapping):
+    write_industry_snapshot(pd.DataFrame({
+        "code": list(mapping), "industry": list(mapping.values()),
+        "snapshot_date": pd.to_datetime([day] * len(mapping)),
+    }))
+
+
+def _st(day, flags):
+    write_st_snapshot(pd.DataFrame({
+        "code": list(flags), "is_st": list(flags.values()),
+        "snapshot_date": pd.to_datetime([day] * len(flags)),
+    }))
+
+
+def test_index_persisted_and_bisected(tmp_refdata_root):
+    _industry("2026-01-15", {"000001": "银行"})
+    _industry("2026-03-02", {"000001": "保险"})
+    d = tmp_refdata_root / "industry"
+    assert json.loads((d / INDEX).read_text())["dates"] == ["20260115", "20260302"]
+    index = SnapshotIndex(d)
+    assert index.as_of(date(2026, 1, 14)) is None
+    assert index.as_of(date(2026, 3, 1)).name == "20260115.parquet"
+    assert index.as_of(date(2026, 3, 2)).name == "20260302.parquet"
+    assert index.covering(date(2026, 2, 1), date(2026, 4, 1)) == ["20260115", "20260302"]
+
+
+def test_missing_index_is_rebuilt(tmp_refdata_root):
+    _industry("2026-01-15", {"000001": "银行"})
+    d = tmp_refdata_root / "industry"
+    (d / INDEX).unlink()
+    assert read_industry_map(date(2026, 2, 1)) == {"000001": "银行"}
+    assert (d / INDEX).exists()
+
+
+def test_industry_intervals_collapse_runs(tmp_refdata_root):
+    _industry("2026-01-05", {"000001": "银行", "000002": "地产"})
+    _industry("2026-01-12", {"000001": "银行", "000002": "建筑"})
+    _industry("2026-01-19", {"000001": "银行"})
+    _industry("2026-01-26", {"000001": "保险", "000002": "建筑"})
+    got = read_industry_intervals(date(2026, 1, 5), date(2026, 1, 20))
+    ts = pd.Timestamp
+    assert got.to_dict("records") == [
+        {"code": "000001", "industry": "银行", "valid_from": ts("2026-01-05"), "valid_to": ts("2026-01-26")},
+        {"code": "000002", "industry": "地产", "valid_from": ts("2026-01-05"), "valid_to": ts("2026-01-12")},
+        {"code": "000002", "industry": "建筑", "valid_from": ts("2026-01-12"), "valid_to": ts("2026-01-19")},
+    ]
+    latest = read_industry_intervals(date(2026, 2, 1), date(2026, 2, 1))
+    assert latest["valid_to"].isna().all()
+
+
+def test_maps_match_point_reads(tmp_refdata_root):
+    _industry("2026-01-05", {"000001": "银行", "000002": "地产"})
+    _industry("2026-01-19", {"000001": "保险"})
+    days = [date(2026, 1, 2), date(2026, 1, 9), date(2026, 1, 16), date(2026, 1, 23)]
+    maps = read_industry_maps(days)
+    assert date(2026, 1, 2) not in maps
+    for d in days[1:]:
+        assert maps[d] == read_industry_map(d)
+
+
+def test_st_flag_sets(tmp_refdata_root):
+    _st("2026-01-05", {"000001": True, "000002": False})
+    _st("2026-01-19", {"000001": False, "000002": False})
+    days = [date(2026, 1, 9), date(2026, 1, 20)]
+    sets = read_st_flag_sets(days)
+    assert sets == {date(2026, 1, 9): {"000001"}, date(2026, 1, 20): set()}
+    assert sets[date(2026, 1, 20)] == read_st_flags(date(2026, 1, 20))
+
+
+def test_materialize_expands_onto_grid():
+    intervals = pd.DataFrame({
+        "code": ["a", "b"], "value": [1, 2],
+        "valid_from": pd.to_datetime(["2026-01-01", "2026-01-03"]),
+        "valid_to": pd.to_datetime(["2026-01-03", None]),
+    })
+    grid = [date(2026, 1, d) for d in (1, 2, 3, 4)]
+    got = materialize(intervals, grid).sort_values(["date", "code"])
+    assert list(zip(got["date"].dt.day, got["code"])) == [(1, "a"), (2, "a"), (3, "b"), (4, "b")]